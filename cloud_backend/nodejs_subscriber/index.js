@@ -8,6 +8,7 @@
  */
 
 require('dotenv').config();
+const crypto = require('crypto');
 const mqtt = require('mqtt');
 const { createClient } = require('@supabase/supabase-js');
 
@@ -16,6 +17,9 @@ const DiseaseAnalyzer = require('./intelligence/disease-analyzer');
 const IrrigationOptimizer = require('./intelligence/irrigation-optimizer');
 const AnomalyDetector = require('./intelligence/anomaly-detector');
 const AlertManager = require('./intelligence/alert-manager');
+const InsightCache = require('./intelligence/insight-cache');
+const { CropRules, DEFAULT_CROP } = require('./intelligence/crop-rules');
+const FarmResolver = require('./routing/farm-resolver');
 
 // ==========================================
 // CONFIGURATION
@@ -32,7 +36,11 @@ const config = {
         password: process.env.MQTT_PASSWORD,
         clientId: `cloud_subscriber_${Date.now()}`
     },
-    farmId: process.env.FARM_ID || 'FARM-CM-001'
+    farmId: process.env.FARM_ID || 'FARM-CM-001', // Fallback for gateways without a farm
+    crop: process.env.CROP_TYPE || DEFAULT_CROP, // Rule file the analyzers use
+    metadataTtl: parseInt(process.env.METADATA_TTL) || 600000,
+    insightCacheSize: parseInt(process.env.INSIGHT_CACHE_SIZE) || 10000,
+    statsInterval: 300000 // Log cache hit rates every 5 minutes
 };
 
 // ==========================================
@@ -47,11 +55,23 @@ console.log('✓ Supabase client initialized');
 
 // Initialize Intelligence Modules
 const diseaseAnalyzer = new DiseaseAnalyzer();
-const irrigationOptimizer = new IrrigationOptimizer();
-const anomalyDetector = new AnomalyDetector();
+// Thresholds come from cloud_backend/rules/, shared with the Python pipeline
+const rules = new CropRules().profile(config.crop);
+const irrigationOptimizer = new IrrigationOptimizer(rules.irrigation);
+const anomalyDetector = new AnomalyDetector(rules);
 const alertManager = new AlertManager(supabase);
+const insightCache = new InsightCache({ maxEntries: config.insightCacheSize });
 console.log('✓ Intelligence modules loaded');
 
+// Initialize gateway → farm resolver (bulk load, then change notifications)
+const farmResolver = new FarmResolver(supabase, {
+    defaultFarmId: config.farmId,
+    ttl: config.metadataTtl
+});
+farmResolver.start().catch(error => {
+    console.error('✗ Metadata cache load failed:', error.message);
+});
+
 // Initialize MQTT Client
 const mqttClient = mqtt.connect(config.mqtt.broker, {
     username: config.mqtt.username,
@@ -117,7 +137,7 @@ mqttClient.on('message', async (topic, message) => {
         
         // Route based on topic type
         if (topic.startsWith('agriconnect/data/')) {
-            await handleSensorData(topic, data);
+            await handleSensorData(topic, data, message);
         } else if (topic.startsWith('agriconnect/status/')) {
             await handleStatusMessage(topic, data);
         }
@@ -131,7 +151,7 @@ mqttClient.on('message', async (topic, message) => {
 // SENSOR DATA HANDLER
 // ==========================================
 
-async function handleSensorData(topic, data) {
+async function handleSensorData(topic, data, rawPayload) {
     console.log(` Processing sensor data from ${data.gatewayId}...`);
     
     // Extract topic components
@@ -140,46 +160,57 @@ async function handleSensorData(topic, data) {
     const fieldId = parseInt(topicParts[3]);
     const zoneId = parseInt(topicParts[4]);
     
+    // Farm and node metadata come from the in-memory cache
+    const { farmId, node } = await farmResolver.resolve(gatewayId, fieldId, zoneId);
+    
     // ==========================================
     // STEP 1: STORE IN DATABASE
     // ==========================================
     
+    // QoS 1 redeliveries and gateway buffer replays share a fingerprint;
+    // the unique index turns them into no-ops in the same round-trip
+    const fingerprint = readingFingerprint(gatewayId, fieldId, zoneId, data.timestamp, rawPayload);
+    
     try {
         const { data: insertedData, error } = await supabase
             .from('sensor_readings')
-            .insert({
+            .upsert({
                 gateway_id: gatewayId,
                 field_id: fieldId,
                 zone_id: zoneId,
                 reading_time: new Date().toISOString(),
-                latitude: data.location?.lat || null,
-                longitude: data.location?.lon || null,
+                latitude: data.location?.lat ?? node?.latitude ?? null,
+                longitude: data.location?.lon ?? node?.longitude ?? null,
                 
                 // Environmental sensors
-                air_temperature: data.sensors?.airTemperature || null,
-                air_humidity: data.sensors?.airHumidity || null,
-                light_intensity: data.sensors?.lightIntensity || null,
-                par_value: data.sensors?.parValue || null,
-                co2_ppm: data.sensors?.co2PPM || null,
+                air_temperature: data.sensors?.airTemperature ?? null,
+                air_humidity: data.sensors?.airHumidity ?? null,
+                light_intensity: data.sensors?.lightIntensity ?? null,
+                par_value: data.sensors?.parValue ?? null,
+                co2_ppm: data.sensors?.co2PPM ?? null,
                 
                 // Soil sensors
-                soil_moisture: data.sensors?.soilMoisture || null,
-                soil_temperature: data.sensors?.soilTemperature || null,
-                ph_value: data.sensors?.phValue || null,
-                ec_value: data.sensors?.ecValue || null,
+                soil_moisture: data.sensors?.soilMoisture ?? null,
+                soil_temperature: data.sensors?.soilTemperature ?? null,
+                ph_value: data.sensors?.phValue ?? null,
+                ec_value: data.sensors?.ecValue ?? null,
                 
                 // NPK values
-                nitrogen_ppm: data.sensors?.nitrogenPPM || null,
-                phosphorus_ppm: data.sensors?.phosphorusPPM || null,
-                potassium_ppm: data.sensors?.potassiumPPM || null,
+                nitrogen_ppm: data.sensors?.nitrogenPPM ?? null,
+                phosphorus_ppm: data.sensors?.phosphorusPPM ?? null,
+                potassium_ppm: data.sensors?.potassiumPPM ?? null,
                 
                 // System status
-                water_level: data.system?.waterLevel || null,
-                battery_level: data.system?.batteryLevel || null,
-                pump_status: data.system?.pumpStatus || false,
-                rssi: data.system?.rssi || null,
+                water_level: data.system?.waterLevel ?? null,
+                battery_level: data.system?.batteryLevel ?? null,
+                pump_status: data.system?.pumpStatus ?? false,
+                rssi: data.system?.rssi ?? null,
                 
-                data_valid: true
+                data_valid: true,
+                reading_fingerprint: fingerprint
+            }, {
+                onConflict: 'gateway_id,reading_fingerprint',
+                ignoreDuplicates: true
             })
             .select();
         
@@ -188,6 +219,11 @@ async function handleSensorData(topic, data) {
             return;
         }
         
+        if (!insertedData || insertedData.length === 0) {
+            console.log('[INFO] Duplicate reading (redelivery or replay) - skipped');
+            return;
+        }
+        
         console.log('✓ Data stored in database');
         
     } catch (dbError) {
@@ -208,9 +244,23 @@ async function handleSensorData(topic, data) {
         nutrients: []
     };
     
+    // Analyzers run on readings snapped to sensor resolution so that
+    // unchanged conditions hit the insight cache
+    const sensors = insightCache.quantize(data.sensors || {});
+    const context = {
+        gatewayId: gatewayId,
+        fieldId: fieldId,
+        zoneId: zoneId
+    };
+    const insightKeys = [];
+    const now = new Date();
+    
     // Disease Risk Analysis
-    if (data.sensors?.airTemperature && data.sensors?.airHumidity) {
-        const diseaseRisks = diseaseAnalyzer.analyze(data.sensors);
+    if (sensors.airTemperature && sensors.airHumidity) {
+        const key = insightCache.key('disease', sensors);
+        insightKeys.push(key);
+        const diseaseRisks = insightCache.memoize('disease', key, () => diseaseAnalyzer.analyze(sensors))
+            .map(risk => ({ ...risk, timestamp: now.toISOString() }));
         insights.diseases = diseaseRisks;
         
         if (diseaseRisks.length > 0) {
@@ -223,9 +273,15 @@ async function handleSensorData(topic, data) {
         }
     }
     
-    // Irrigation Optimization
-    if (data.sensors?.soilMoisture) {
-        const irrigationAdvice = irrigationOptimizer.optimize(data.sensors, data.system);
+    // Irrigation Optimization (advice depends on daytime vs evening)
+    if (sensors.soilMoisture) {
+        const hour = now.getHours();
+        const key = insightCache.key('irrigation', sensors, hour >= 6 && hour <= 16 ? 'day' : 'night');
+        insightKeys.push(key);
+        const irrigationAdvice = {
+            ...insightCache.memoize('irrigation', key, () => irrigationOptimizer.optimize(sensors, data.system)),
+            timestamp: now.toISOString()
+        };
         insights.irrigation = irrigationAdvice;
         
         console.log(`  💧 Irrigation: ${irrigationAdvice.recommendation}`);
@@ -234,12 +290,11 @@ async function handleSensorData(topic, data) {
         }
     }
     
-    // Anomaly Detection
-    const anomalies = anomalyDetector.detect(data.sensors, {
-        gatewayId: gatewayId,
-        fieldId: fieldId,
-        zoneId: zoneId
-    });
+    // Anomaly Detection (cached without context, re-attached per zone)
+    const anomalyKey = insightCache.key('anomaly', sensors);
+    insightKeys.push(anomalyKey);
+    const anomalies = insightCache.memoize('anomaly', anomalyKey, () => anomalyDetector.detect(sensors, null))
+        .map(anomaly => ('context' in anomaly ? { ...anomaly, context } : anomaly));
     
     if (anomalies.length > 0) {
         insights.anomalies = anomalies;
@@ -252,8 +307,10 @@ async function handleSensorData(topic, data) {
     }
     
     // NPK Analysis
-    if (data.sensors?.nitrogenPPM || data.sensors?.phosphorusPPM || data.sensors?.potassiumPPM) {
-        const nutrientStatus = analyzeNutrients(data.sensors);
+    if (sensors.nitrogenPPM || sensors.phosphorusPPM || sensors.potassiumPPM) {
+        const key = insightCache.key('nutrients', sensors);
+        insightKeys.push(key);
+        const nutrientStatus = insightCache.memoize('nutrients', key, () => analyzeNutrients(sensors));
         insights.nutrients = nutrientStatus;
         
         if (nutrientStatus.length > 0) {
@@ -270,12 +327,19 @@ async function handleSensorData(topic, data) {
     // STEP 3: GENERATE ALERTS
     // ==========================================
     
-    await alertManager.processInsights(insights, {
-        farmId: config.farmId,
-        gatewayId: gatewayId,
-        fieldId: fieldId,
-        zoneId: zoneId
-    });
+    // Same insight set as last time and all its alerts still on cooldown:
+    // AlertManager would deduplicate everything, so skip the work entirely
+    const zoneKey = `${gatewayId}_${fieldId}_${zoneId}`;
+    const insightKey = insightKeys.join('#');
+    if (insightCache.canSkipAlerts(zoneKey, insightKey)) {
+        console.log('[INFO] Insights unchanged - alert processing skipped');
+    } else {
+        const result = await alertManager.processInsights(insights, {
+            farmId: farmId,
+            ...context
+        });
+        insightCache.recordAlertPass(zoneKey, insightKey, result.cooldownUntil);
+    }
     
     console.log('='.repeat(60));
 }
@@ -304,70 +368,77 @@ async function handleStatusMessage(topic, data) {
     }
 }
 
+// ==========================================
+// READING FINGERPRINT HELPER
+// ==========================================
+
+// Device timestamp as hashed; must match timestamp_text() in dedup.py.
+// Whole numbers are written as integers (BigInt keeps 1e21 out of
+// exponent form), other numbers in their shortest round-trip form.
+function timestampText(deviceTimestamp) {
+    if (deviceTimestamp === null || deviceTimestamp === undefined) return '';
+    if (Number.isInteger(deviceTimestamp)) return BigInt(deviceTimestamp).toString();
+    return String(deviceTimestamp);
+}
+
+// First 8 bytes of SHA-256 as a signed BIGINT string; must match
+// reading_fingerprint() in python_pipeline/agriconnect_pipeline/dedup.py
+function readingFingerprint(gatewayId, fieldId, zoneId, deviceTimestamp, payload) {
+    const digest = crypto.createHash('sha256')
+        .update(`${gatewayId}|${fieldId}|${zoneId}|${timestampText(deviceTimestamp)}|`)
+        .update(payload)
+        .digest();
+    return digest.readBigInt64BE(0).toString();
+}
+
 // ==========================================
 // NUTRIENT ANALYSIS HELPER
 // ==========================================
 
-function analyzeNutrients(sensors) {
+// (sensor, rules key, name, also flag HIGH)
+const NUTRIENT_CHECKS = [
+    ['nitrogenPPM', 'nitrogen', 'Nitrogen', true],
+    ['phosphorusPPM', 'phosphorus', 'Phosphorus', false],
+    ['potassiumPPM', 'potassium', 'Potassium', false]
+];
+
+function analyzeNutrients(sensors, optimalRanges = rules.nutrients) {
     const issues = [];
     
-    // Optimal ranges for tomatoes (vegetative/fruiting average)
-    const optimalRanges = {
-        nitrogen: { min: 150, max: 250, name: 'Nitrogen' },
-        phosphorus: { min: 40, max: 80, name: 'Phosphorus' },
-        potassium: { min: 200, max: 400, name: 'Potassium' }
-    };
-    
-    // Check Nitrogen
-    if (sensors.nitrogenPPM !== undefined) {
-        if (sensors.nitrogenPPM < optimalRanges.nitrogen.min) {
-            issues.push({
-                nutrient: 'Nitrogen',
-                status: 'LOW',
-                current: sensors.nitrogenPPM,
-                target: `${optimalRanges.nitrogen.min}-${optimalRanges.nitrogen.max}`,
-                severity: 'warning'
-            });
-        } else if (sensors.nitrogenPPM > optimalRanges.nitrogen.max) {
-            issues.push({
-                nutrient: 'Nitrogen',
-                status: 'HIGH',
-                current: sensors.nitrogenPPM,
-                target: `${optimalRanges.nitrogen.min}-${optimalRanges.nitrogen.max}`,
-                severity: 'info'
-            });
-        }
-    }
-    
-    // Check Phosphorus
-    if (sensors.phosphorusPPM !== undefined) {
-        if (sensors.phosphorusPPM < optimalRanges.phosphorus.min) {
-            issues.push({
-                nutrient: 'Phosphorus',
-                status: 'LOW',
-                current: sensors.phosphorusPPM,
-                target: `${optimalRanges.phosphorus.min}-${optimalRanges.phosphorus.max}`,
-                severity: 'warning'
-            });
-        }
-    }
-    
-    // Check Potassium
-    if (sensors.potassiumPPM !== undefined) {
-        if (sensors.potassiumPPM < optimalRanges.potassium.min) {
-            issues.push({
-                nutrient: 'Potassium',
-                status: 'LOW',
-                current: sensors.potassiumPPM,
-                target: `${optimalRanges.potassium.min}-${optimalRanges.potassium.max}`,
-                severity: 'warning'
-            });
+    for (const [sensor, key, name, checkHigh] of NUTRIENT_CHECKS) {
+        const value = sensors[sensor];
+        if (value === undefined) continue;
+        
+        const range = optimalRanges[key];
+        const target = `${range.min}-${range.max}`;
+        if (value < range.min) {
+            issues.push({ nutrient: name, status: 'LOW', current: value, target, severity: 'warning' });
+        } else if (checkHigh && value > range.max) {
+            issues.push({ nutrient: name, status: 'HIGH', current: value, target, severity: 'info' });
         }
     }
     
     return issues;
 }
 
+// ==========================================
+// CACHE STATISTICS
+// ==========================================
+
+setInterval(() => {
+    const stats = insightCache.getStats();
+    console.log(`[STATS] Insight cache: ${stats.entries}/${stats.maxEntries} entries | ` +
+        `disease ${stats.disease.hitRate}% | irrigation ${stats.irrigation.hitRate}% | ` +
+        `anomaly ${stats.anomaly.hitRate}% | nutrients ${stats.nutrients.hitRate}% hit rate | ` +
+        `alerts processed ${stats.alerts.processed}, suppressed ${stats.alerts.suppressed}`);
+    const routing = farmResolver.stats;
+    console.log(`[STATS] Farm resolver: ${routing.hits} hits, ${routing.misses} misses, ` +
+        `${routing.nodeMisses} node misses, ` +
+        `${routing.batchedLookups} batched lookups, ${routing.changeEvents} change events, ` +
+        `${routing.reloads} reloads`);
+    alertManager.cleanupOldAlerts();
+}, config.statsInterval).unref();
+
 // ==========================================
 // GRACEFUL SHUTDOWN
 // ==========================================
@@ -375,6 +446,7 @@ function analyzeNutrients(sensors) {
 process.on('SIGINT', () => {
     console.log('\n\n🛑 Shutting down gracefully...');
     mqttClient.end();
+    farmResolver.stop();
     process.exit(0);
 });
 
@@ -13,6 +13,7 @@ class AlertManager {
     
     async processInsights(insights, context) {
         const alerts = [];
+        const candidates = [];
         
         // Process disease risks
         for (const disease of insights.diseases) {
@@ -27,6 +28,7 @@ class AlertManager {
                 acknowledged: false
             };
             
+            candidates.push(alert);
             if (this.shouldCreateAlert(alert)) {
                 alerts.push(alert);
             }
@@ -45,6 +47,7 @@ class AlertManager {
                 acknowledged: false
             };
             
+            candidates.push(alert);
             if (this.shouldCreateAlert(alert)) {
                 alerts.push(alert);
             }
@@ -63,6 +66,7 @@ class AlertManager {
                 acknowledged: false
             };
             
+            candidates.push(alert);
             if (this.shouldCreateAlert(alert)) {
                 alerts.push(alert);
             }
@@ -81,6 +85,7 @@ class AlertManager {
                 acknowledged: false
             };
             
+            candidates.push(alert);
             if (this.shouldCreateAlert(alert)) {
                 alerts.push(alert);
             }
@@ -93,11 +98,24 @@ class AlertManager {
         } else {
             console.log('[INFO] No alerts generated - conditions normal');
         }
+        
+        // Earliest time any of these alerts could fire again
+        let cooldownUntil = Infinity;
+        for (const alert of candidates) {
+            const lastAlert = this.recentAlerts.get(this.alertKey(alert));
+            cooldownUntil = Math.min(cooldownUntil, lastAlert + this.alertCooldown);
+        }
+        
+        return { stored: alerts.length, cooldownUntil };
     }
     
-    shouldCreateAlert(alert) {
+    alertKey(alert) {
         // Create unique key for deduplication
-        const key = `${alert.farm_id}_${alert.gateway_id}_${alert.field_id}_${alert.zone_id}_${alert.alert_type}`;
+        return `${alert.farm_id}_${alert.gateway_id}_${alert.field_id}_${alert.zone_id}_${alert.alert_type}`;
+    }
+    
+    shouldCreateAlert(alert) {
+        const key = this.alertKey(alert);
         
         const now = Date.now();
         const lastAlert = this.recentAlerts.get(key);
@@ -4,32 +4,35 @@
  * sensor malfunction or genuine environmental issues
  */
 
+const { CropRules, DEFAULT_CROP } = require('./crop-rules');
+
+// Display names; the ranges come from the crop rule files
+const SENSOR_NAMES = {
+    airTemperature: 'Air Temperature',
+    airHumidity: 'Air Humidity',
+    soilMoisture: 'Soil Moisture',
+    soilTemperature: 'Soil Temperature',
+    phValue: 'pH',
+    ecValue: 'EC',
+    nitrogenPPM: 'Nitrogen',
+    phosphorusPPM: 'Phosphorus',
+    potassiumPPM: 'Potassium',
+    lightIntensity: 'Light Intensity',
+    parValue: 'PAR',
+    batteryLevel: 'Battery'
+};
+
 class AnomalyDetector {
-    constructor() {
-        // Define normal ranges for sensors
-        this.normalRanges = {
-            airTemperature: { min: 5, max: 45, name: 'Air Temperature' },
-            airHumidity: { min: 10, max: 100, name: 'Air Humidity' },
-            soilMoisture: { min: 100, max: 900, name: 'Soil Moisture' },
-            soilTemperature: { min: 10, max: 40, name: 'Soil Temperature' },
-            phValue: { min: 3.0, max: 10.0, name: 'pH' },
-            ecValue: { min: 0.5, max: 8.0, name: 'EC' },
-            nitrogenPPM: { min: 0, max: 500, name: 'Nitrogen' },
-            phosphorusPPM: { min: 0, max: 200, name: 'Phosphorus' },
-            potassiumPPM: { min: 0, max: 800, name: 'Potassium' },
-            lightIntensity: { min: 0, max: 120000, name: 'Light Intensity' },
-            parValue: { min: 0, max: 2000, name: 'PAR' },
-            batteryLevel: { min: 0, max: 100, name: 'Battery' }
-        };
+    // rules: a CropRules profile (normalRanges, optimalRanges, ...)
+    constructor(rules = new CropRules().profile(DEFAULT_CROP)) {
+        // Normal ranges for sensors
+        this.normalRanges = {};
+        for (const [sensor, range] of Object.entries(rules.normalRanges)) {
+            this.normalRanges[sensor] = { ...range, name: SENSOR_NAMES[sensor] || sensor };
+        }
         
         // Optimal ranges (stricter)
-        this.optimalRanges = {
-            airTemperature: { min: 18, max: 30 },
-            airHumidity: { min: 60, max: 80 },
-            soilMoisture: { min: 400, max: 600 },
-            phValue: { min: 6.0, max: 7.0 },
-            ecValue: { min: 2.0, max: 3.5 }
-        };
+        this.optimalRanges = rules.optimalRanges;
     }
     
     detect(sensors, context) {
@@ -0,0 +1,93 @@
+/**
+ * Crop Rules Module
+ * Loads the threshold rule files in cloud_backend/rules/ - the same files
+ * the Python pipeline compiles (agriconnect_pipeline/rules.py) - so the
+ * analyzers carry no threshold constants of their own.
+ *
+ * - One file per crop; the default stage holds the crop's base values,
+ *   other stages list only what changes and the days after planting
+ *   they cover
+ * - Sections a crop leaves out fall back to tomato's default stage
+ * - Crop names are normalized like features.crop_key, so a "Tomatoes"
+ *   farm gets the tomato rules
+ */
+
+const fs = require('fs');
+const path = require('path');
+
+const RULES_DIR = process.env.RULES_DIR || path.join(__dirname, '..', '..', 'rules');
+const DEFAULT_CROP = 'tomato';
+const DEFAULT_STAGE = 'default';
+
+// Crop names as the dashboard lists them -> the farms.crop_type spelling
+const CROP_ALIASES = { tomatoes: 'tomato' };
+
+function cropKey(crop) {
+    const key = (crop || DEFAULT_CROP).trim().toLowerCase();
+    return CROP_ALIASES[key] || key;
+}
+
+const copy = value => JSON.parse(JSON.stringify(value));
+
+// Deep-merge override into a copy of base
+function merge(base, override) {
+    const merged = copy(base);
+    for (const [key, value] of Object.entries(override)) {
+        const current = merged[key];
+        if (value && typeof value === 'object' && !Array.isArray(value) &&
+            current && typeof current === 'object' && !Array.isArray(current)) {
+            merged[key] = merge(current, value);
+        } else {
+            merged[key] = copy(value);
+        }
+    }
+    return merged;
+}
+
+class CropRules {
+    constructor(directory = RULES_DIR) {
+        this.crops = new Map();   // crop -> { stages: Map(stage -> rules), days: [[first, last, stage]] }
+
+        const specs = fs.readdirSync(directory)
+            .filter(file => file.endsWith('.json'))
+            .sort()
+            .map(file => {
+                const spec = JSON.parse(fs.readFileSync(path.join(directory, file), 'utf8'));
+                return { crop: cropKey(spec.crop || path.basename(file, '.json')), stages: spec.stages || {} };
+            });
+
+        const fallback = specs.find(spec => spec.crop === DEFAULT_CROP);
+        if (!fallback) {
+            throw new Error(`No ${DEFAULT_CROP} rules in ${directory}`);
+        }
+        const builtIn = fallback.stages[DEFAULT_STAGE] || {};
+
+        for (const { crop, stages: overrides } of specs) {
+            const base = merge(builtIn, overrides[DEFAULT_STAGE] || {});
+            const stages = new Map([[DEFAULT_STAGE, base]]);
+            const days = [];
+            for (const [stage, override] of Object.entries(overrides)) {
+                if (stage === DEFAULT_STAGE) continue;
+                stages.set(stage, merge(base, override));
+                if (override.days) days.push([...override.days, stage]);
+            }
+            days.sort((a, b) => a[0] - b[0]);
+            this.crops.set(crop, { stages, days });
+        }
+    }
+
+    // Thresholds for (crop, stage), falling back to the crop, then tomato, default
+    profile(crop, stage = DEFAULT_STAGE) {
+        const rules = this.crops.get(cropKey(crop)) || this.crops.get(DEFAULT_CROP);
+        return rules.stages.get(stage) || rules.stages.get(DEFAULT_STAGE);
+    }
+
+    // Growth stage for a crop on a given day after planting
+    stageForDay(crop, day) {
+        const rules = this.crops.get(cropKey(crop));
+        const match = rules && rules.days.find(([first, last]) => first <= day && day < last);
+        return match ? match[2] : DEFAULT_STAGE;
+    }
+}
+
+module.exports = { CropRules, cropKey, DEFAULT_CROP, DEFAULT_STAGE };
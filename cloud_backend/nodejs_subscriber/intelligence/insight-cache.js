@@ -0,0 +1,128 @@
+/**
+ * Insight Cache Module
+ * Memoizes analyzer results on sensor inputs quantized to the sensors'
+ * real resolution, so stable zones skip re-running the analyzers and
+ * rebuilding identical recommendation strings every 60 seconds
+ */
+
+class InsightCache {
+    constructor(options = {}) {
+        this.maxEntries = options.maxEntries || 10000;
+        this.entries = new Map(); // Map keeps insertion order -> cheap LRU
+        this.lastInsights = new Map(); // Per-zone last processed insight set
+
+        // Resolution of each sensor as reported by the field node firmware
+        this.resolution = {
+            airTemperature: 0.1,    // DHT22
+            airHumidity: 0.1,       // DHT22
+            soilMoisture: 1,        // 0-1000 mapped ADC
+            soilTemperature: 0.1,   // DS18B20 (0.0625) reported to 0.1
+            phValue: 0.01,
+            ecValue: 0.01,
+            nitrogenPPM: 1,
+            phosphorusPPM: 1,
+            potassiumPPM: 1,
+            lightIntensity: 1,
+            parValue: 0.1,
+            co2PPM: 1,
+            batteryLevel: 1
+        };
+
+        // Inputs each analyzer actually reads
+        this.inputs = {
+            disease: ['airTemperature', 'airHumidity', 'soilMoisture'],
+            irrigation: ['soilMoisture', 'airTemperature', 'airHumidity'],
+            anomaly: Object.keys(this.resolution),
+            nutrients: ['nitrogenPPM', 'phosphorusPPM', 'potassiumPPM']
+        };
+
+        this.stats = {};
+        for (const name of Object.keys(this.inputs)) {
+            this.stats[name] = { hits: 0, misses: 0 };
+        }
+        this.stats.alerts = { processed: 0, suppressed: 0 };
+    }
+
+    // Snap readings to sensor resolution; analyzers then run on these values
+    quantize(sensors) {
+        const quantized = { ...sensors };
+        for (const [sensor, step] of Object.entries(this.resolution)) {
+            const value = sensors[sensor];
+            if (typeof value === 'number') {
+                const decimals = step < 1 ? Math.round(-Math.log10(step)) : 0;
+                quantized[sensor] = Number((Math.round(value / step) * step).toFixed(decimals));
+            }
+        }
+        return quantized;
+    }
+
+    key(analyzer, sensors, extra = '') {
+        const parts = this.inputs[analyzer].map(sensor => {
+            const value = sensors[sensor];
+            return value === undefined || value === null ? '' : value;
+        });
+        return `${analyzer}|${parts.join('|')}|${extra}`;
+    }
+
+    // Return the cached result for key, computing and storing it on a miss
+    memoize(analyzer, key, compute) {
+        const stats = this.stats[analyzer];
+
+        if (this.entries.has(key)) {
+            const value = this.entries.get(key);
+            // Refresh recency
+            this.entries.delete(key);
+            this.entries.set(key, value);
+            stats.hits++;
+            return value;
+        }
+
+        stats.misses++;
+        const value = compute();
+        this.entries.set(key, value);
+
+        if (this.entries.size > this.maxEntries) {
+            // Evict least recently used (first in iteration order)
+            this.entries.delete(this.entries.keys().next().value);
+        }
+
+        return value;
+    }
+
+    // True when the zone's insight set is unchanged and every alert it could
+    // raise is still on AlertManager cooldown, so processing would be a no-op
+    canSkipAlerts(zoneKey, insightKey) {
+        const last = this.lastInsights.get(zoneKey);
+
+        if (last && last.key === insightKey && Date.now() < last.cooldownUntil) {
+            this.stats.alerts.suppressed++;
+            return true;
+        }
+
+        return false;
+    }
+
+    recordAlertPass(zoneKey, insightKey, cooldownUntil) {
+        this.lastInsights.set(zoneKey, { key: insightKey, cooldownUntil });
+        this.stats.alerts.processed++;
+    }
+
+    getStats() {
+        const summary = { entries: this.entries.size, maxEntries: this.maxEntries };
+
+        for (const name of Object.keys(this.inputs)) {
+            const { hits, misses } = this.stats[name];
+            const total = hits + misses;
+            summary[name] = {
+                hits,
+                misses,
+                hitRate: total > 0 ? Math.round((hits / total) * 1000) / 10 : 0
+            };
+        }
+
+        summary.alerts = { ...this.stats.alerts };
+        return summary;
+    }
+}
+
+module.exports = InsightCache;
@@ -4,18 +4,14 @@
  * soil moisture, VPD, and environmental conditions
  */
 
+const { CropRules, DEFAULT_CROP } = require('./crop-rules');
+
 class IrrigationOptimizer {
-    constructor() {
-        this.thresholds = {
-            moistureCritical: 350,
-            moistureLow: 400,
-            moistureOptimal: 500,
-            moistureHigh: 650,
-            
-            tempHigh: 30,
-            vpdHigh: 1.5,
-            vpdLow: 0.4
-        };
+    // thresholds: the irrigation section of a CropRules profile
+    // (moistureCritical, moistureLow, moistureOptimal, moistureHigh,
+    // tempHigh, vpdHigh, vpdLow)
+    constructor(thresholds = new CropRules().profile(DEFAULT_CROP).irrigation) {
+        this.thresholds = { ...thresholds };
     }
     
     optimize(sensors, systemStatus) {
@@ -0,0 +1,230 @@
+/**
+ * Farm Resolver Module
+ * Resolves gateway → farm and (gateway, field, zone) → field node metadata
+ * from an in-memory cache so one subscriber can serve many farms without
+ * a metadata query per message.
+ *
+ * - Bulk loaded at startup
+ * - Kept fresh by Supabase realtime change notifications, with a periodic
+ *   full reload (TTL) as a backstop for missed events
+ * - Unknown gateways, and unknown field/zone nodes of known gateways, are
+ *   collected for a few milliseconds and fetched with one batched query,
+ *   shared by every message waiting on them
+ */
+
+const PAGE_SIZE = 1000;
+
+class FarmResolver {
+    constructor(supabaseClient, options = {}) {
+        this.supabase = supabaseClient;
+        this.defaultFarmId = options.defaultFarmId || null;
+        this.ttl = options.ttl || 600000;                 // Full reload every 10 minutes
+        this.batchWindow = options.batchWindow || 20;     // Collect misses for 20 ms
+        this.negativeTtl = options.negativeTtl || 60000;  // Retry unknown gateways and nodes after 1 minute
+
+        this.gatewayFarms = new Map();   // gateway_id -> farm_id
+        this.nodes = new Map();          // "gateway|field|zone" -> field_nodes row
+        this.unknownGateways = new Map(); // gateway_id -> time of failed lookup
+        this.unknownNodes = new Map();   // "gateway|field|zone" -> time of failed lookup
+
+        this.inflight = new Map();       // gateway_id -> promise of its pending lookup
+        this.queued = new Map();         // gateway_id -> { resolve, nodesOnly }, for the next flush
+        this.flushTimer = null;
+        this.refreshTimer = null;
+        this.channel = null;
+
+        this.stats = { hits: 0, misses: 0, nodeMisses: 0, batchedLookups: 0, reloads: 0, changeEvents: 0 };
+    }
+
+    nodeKey(gatewayId, fieldId, zoneId) {
+        return `${gatewayId}|${fieldId}|${zoneId}`;
+    }
+
+    // ==========================================
+    // BULK LOAD & REFRESH
+    // ==========================================
+
+    async start() {
+        await this.load();
+        this.subscribe();
+        this.refreshTimer = setInterval(() => {
+            this.load().catch(error => {
+                console.error('✗ Metadata reload failed:', error.message);
+            });
+        }, this.ttl);
+        this.refreshTimer.unref();
+    }
+
+    async fetchAll(table, columns) {
+        const rows = [];
+        for (let from = 0; ; from += PAGE_SIZE) {
+            const { data, error } = await this.supabase
+                .from(table)
+                .select(columns)
+                .range(from, from + PAGE_SIZE - 1);
+
+            if (error) throw new Error(`${table}: ${error.message}`);
+            rows.push(...data);
+            if (data.length < PAGE_SIZE) return rows;
+        }
+    }
+
+    async load() {
+        const [gateways, nodes] = await Promise.all([
+            this.fetchAll('gateways', 'gateway_id, farm_id'),
+            this.fetchAll('field_nodes', '*')
+        ]);
+
+        // Build new maps, then swap, so lookups never see a half-loaded cache
+        const gatewayFarms = new Map(gateways.map(g => [g.gateway_id, g.farm_id]));
+        const nodeMap = new Map(nodes.map(n => [this.nodeKey(n.gateway_id, n.field_id, n.zone_id), n]));
+
+        this.gatewayFarms = gatewayFarms;
+        this.nodes = nodeMap;
+        this.unknownGateways.clear();
+        this.unknownNodes.clear();
+        this.stats.reloads++;
+
+        console.log(`✓ Metadata cache loaded: ${gatewayFarms.size} gateways, ${nodeMap.size} field nodes`);
+    }
+
+    subscribe() {
+        this.channel = this.supabase
+            .channel('farm-resolver-metadata')
+            .on('postgres_changes', { event: '*', schema: 'public', table: 'gateways' },
+                payload => this.applyGatewayChange(payload))
+            .on('postgres_changes', { event: '*', schema: 'public', table: 'field_nodes' },
+                payload => this.applyNodeChange(payload))
+            .subscribe();
+    }
+
+    applyGatewayChange(payload) {
+        this.stats.changeEvents++;
+        if (payload.eventType === 'DELETE') {
+            this.gatewayFarms.delete(payload.old.gateway_id);
+        } else {
+            this.gatewayFarms.set(payload.new.gateway_id, payload.new.farm_id);
+            this.unknownGateways.delete(payload.new.gateway_id);
+        }
+    }
+
+    applyNodeChange(payload) {
+        this.stats.changeEvents++;
+        if (payload.eventType === 'DELETE') {
+            const old = payload.old;
+            this.nodes.delete(this.nodeKey(old.gateway_id, old.field_id, old.zone_id));
+        } else {
+            const node = payload.new;
+            const key = this.nodeKey(node.gateway_id, node.field_id, node.zone_id);
+            this.nodes.set(key, node);
+            this.unknownNodes.delete(key);
+        }
+    }
+
+    // ==========================================
+    // LOOKUP
+    // ==========================================
+
+    // Returns { farmId, node } - node is the field_nodes row or null
+    async resolve(gatewayId, fieldId, zoneId) {
+        let farmId = this.gatewayFarms.get(gatewayId);
+        const key = this.nodeKey(gatewayId, fieldId, zoneId);
+
+        if (farmId !== undefined) {
+            this.stats.hits++;
+            // Known gateway, new zone: fetch its nodes in the next batch too
+            if (!this.nodes.has(key) && this.canRetry(this.unknownNodes, key)) {
+                this.stats.nodeMisses++;
+                await this.lookup(gatewayId, true);
+                if (!this.nodes.has(key)) {
+                    this.unknownNodes.set(key, Date.now());
+                }
+            }
+        } else {
+            this.stats.misses++;
+            if (this.canRetry(this.unknownGateways, gatewayId)) {
+                await this.lookup(gatewayId);
+                farmId = this.gatewayFarms.get(gatewayId);
+            }
+        }
+
+        return {
+            farmId: farmId || this.defaultFarmId,
+            node: this.nodes.get(key) || null
+        };
+    }
+
+    // Not looked up yet, or the last failed lookup is older than negativeTtl
+    canRetry(failures, key) {
+        const failedAt = failures.get(key);
+        return failedAt === undefined || Date.now() - failedAt > this.negativeTtl;
+    }
+
+    // Queue a gateway (nodesOnly: just its field nodes); all queued IDs are
+    // fetched together and messages for a gateway already being looked up
+    // share that lookup, which always includes the gateway's nodes
+    lookup(gatewayId, nodesOnly = false) {
+        if (this.inflight.has(gatewayId)) {
+            return this.inflight.get(gatewayId);
+        }
+
+        const promise = new Promise(resolve => this.queued.set(gatewayId, { resolve, nodesOnly }));
+        this.inflight.set(gatewayId, promise);
+
+        if (!this.flushTimer) {
+            this.flushTimer = setTimeout(() => this.flush(), this.batchWindow);
+        }
+        return promise;
+    }
+
+    async flush() {
+        const batch = this.queued;
+        this.queued = new Map();
+        this.flushTimer = null;
+
+        const gatewayIds = Array.from(batch.keys());
+        const unknownIds = gatewayIds.filter(gatewayId => !batch.get(gatewayId).nodesOnly);
+        this.stats.batchedLookups++;
+
+        try {
+            const [gateways, nodes] = await Promise.all([
+                unknownIds.length > 0
+                    ? this.supabase.from('gateways').select('gateway_id, farm_id').in('gateway_id', unknownIds)
+                    : { data: [], error: null },
+                this.supabase.from('field_nodes').select('*').in('gateway_id', gatewayIds)
+            ]);
+
+            if (gateways.error) throw new Error(gateways.error.message);
+            if (nodes.error) throw new Error(nodes.error.message);
+
+            for (const g of gateways.data) {
+                this.gatewayFarms.set(g.gateway_id, g.farm_id);
+            }
+            for (const n of nodes.data) {
+                this.nodes.set(this.nodeKey(n.gateway_id, n.field_id, n.zone_id), n);
+            }
+
+            const now = Date.now();
+            for (const gatewayId of unknownIds) {
+                if (!this.gatewayFarms.has(gatewayId)) {
+                    this.unknownGateways.set(gatewayId, now);
+                    console.warn(`⚠ Unknown gateway ${gatewayId} - using default farm ${this.defaultFarmId}`);
+                }
+            }
+        } catch (error) {
+            console.error('✗ Metadata lookup failed:', error.message);
+        }
+
+        for (const [gatewayId, { resolve }] of batch) {
+            this.inflight.delete(gatewayId);
+            resolve();
+        }
+    }
+
+    stop() {
+        if (this.refreshTimer) clearInterval(this.refreshTimer);
+        if (this.channel) this.supabase.removeChannel(this.channel);
+    }
+}
+
+module.exports = FarmResolver;
@@ -0,0 +1,6 @@
+"""
+AgriConnect Cloud Backend - Python Pipeline
+Batch and server-side services that complement the Node.js subscriber
+"""
+
+__version__ = "1.0.0"
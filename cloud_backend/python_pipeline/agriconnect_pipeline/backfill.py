@@ -0,0 +1,236 @@
+"""
+Historical Reprocessing (Backfill)
+Replays archived sensor_readings through the intelligence layer, writes
+the resulting alerts to alerts_shadow and diffs them against alerts.
+
+Work is split by zone and each zone is streamed in time windows. A zone
+is always handled by one worker from start to end, so the per-zone state
+(alert cooldowns) carries across window boundaries exactly as it does in
+the live subscriber. Zones run in parallel in a process pool.
+
+Usage:
+    python -m agriconnect_pipeline.backfill --start 2025-01-01 --end 2026-01-01 \\
+        --workers 8 --overrides thresholds.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from . import db
+from .config import load_config
+from .intelligence import AlertManager, Analyzers
+from .intelligence.alerts import ALERT_COLUMNS
+from .readings import SELECT_READINGS, row_to_payload
+
+SHADOW_COLUMNS = ("run_id", "reading_id") + ALERT_COLUMNS
+
+# Irrigation advice depends on the farm's local hour
+LOCAL_TZ = ZoneInfo("Africa/Douala")
+
+ZONES_QUERY = """
+    SELECT g.farm_id, r.gateway_id, r.field_id, r.zone_id
+    FROM (SELECT DISTINCT gateway_id, field_id, zone_id
+          FROM sensor_readings
+          WHERE reading_time >= %(start)s AND reading_time < %(end)s) r
+    JOIN gateways g ON g.gateway_id = r.gateway_id
+    WHERE %(farm_id)s::text IS NULL OR g.farm_id = %(farm_id)s
+    ORDER BY g.farm_id, r.gateway_id, r.field_id, r.zone_id
+"""
+
+ZONE_READINGS_QUERY = SELECT_READINGS + """
+    WHERE gateway_id = %s AND field_id = %s AND zone_id = %s
+      AND reading_time >= %s AND reading_time < %s
+      AND data_valid
+    ORDER BY reading_time, id
+"""
+
+DIFF_QUERY = """
+    WITH live AS (
+        SELECT farm_id, field_id, zone_id, alert_type, severity, COUNT(*) AS n
+        FROM alerts
+        WHERE created_at >= %(start)s AND created_at < %(end)s
+          AND (%(farm_id)s::text IS NULL OR farm_id = %(farm_id)s)
+        GROUP BY 1, 2, 3, 4, 5
+    ), shadow AS (
+        SELECT farm_id, field_id, zone_id, alert_type, severity, COUNT(*) AS n
+        FROM alerts_shadow
+        WHERE run_id = %(run_id)s
+        GROUP BY 1, 2, 3, 4, 5
+    )
+    SELECT alert_type, severity,
+           SUM(COALESCE(live.n, 0)) AS live_count,
+           SUM(COALESCE(shadow.n, 0)) AS shadow_count,
+           COUNT(*) FILTER (WHERE COALESCE(live.n, 0) <> COALESCE(shadow.n, 0)) AS zones_changed
+    FROM live FULL OUTER JOIN shadow
+         USING (farm_id, field_id, zone_id, alert_type, severity)
+    GROUP BY alert_type, severity
+    ORDER BY alert_type, severity
+"""
+
+
+@dataclass(frozen=True)
+class ZoneTask:
+    farm_id: str
+    gateway_id: str
+    field_id: int
+    zone_id: int
+
+
+class ZoneReprocessor:
+    """Runs the analyzers over one zone's readings in time order.
+
+    Keeps the zone's alert cooldown state between calls, so feeding it
+    consecutive chunks gives the same alerts as one pass over the range.
+    """
+
+    def __init__(self, analyzers, task, run_id):
+        self.analyzers = analyzers
+        self.run_id = run_id
+        self.alert_manager = AlertManager()
+        self.context = {
+            "farmId": task.farm_id,
+            "gatewayId": task.gateway_id,
+            "fieldId": task.field_id,
+            "zoneId": task.zone_id,
+        }
+
+    def process(self, rows):
+        """Analyze a chunk of READING_COLUMNS rows; returns shadow alert rows"""
+        out = []
+        for row in rows:
+            reading_id, reading_time = row[0], row[4]
+            sensors, system = row_to_payload(row)
+            now = reading_time.astimezone(LOCAL_TZ)
+            insights = self.analyzers.analyze(sensors, system, self.context, now)
+            for alert in self.alert_manager.process_insights(insights, self.context, reading_time):
+                out.append((self.run_id, reading_id) + tuple(alert[c] for c in ALERT_COLUMNS))
+        # Cooldown keys older than the window can never suppress again
+        if rows:
+            self.alert_manager.cleanup_old_alerts(rows[-1][4])
+        return out
+
+
+def time_windows(start, end, step):
+    """Split [start, end) into consecutive windows of at most step"""
+    cursor = start
+    while cursor < end:
+        upper = min(cursor + step, end)
+        yield cursor, upper
+        cursor = upper
+
+
+# Per-process state, set up once by the pool initializer
+_worker = {}
+
+
+def _init_worker(dsn, overrides, run_id, window, chunk_size):
+    _worker["conn"] = db.connect(dsn)
+    _worker["analyzers"] = Analyzers(overrides)
+    _worker["run_id"] = run_id
+    _worker["window"] = window
+    _worker["chunk_size"] = chunk_size
+
+
+def reprocess_zone(args):
+    """Pool task: reprocess one zone over [start, end) window by window"""
+    task, start, end = args
+    conn = _worker["conn"]
+    processor = ZoneReprocessor(_worker["analyzers"], task, _worker["run_id"])
+    readings = alerts = 0
+
+    for lower, upper in time_windows(start, end, _worker["window"]):
+        params = (task.gateway_id, task.field_id, task.zone_id, lower, upper)
+        for rows in db.iter_chunks(conn, ZONE_READINGS_QUERY, params,
+                                   _worker["chunk_size"], name="backfill_zone"):
+            shadow_rows = processor.process(rows)
+            readings += len(rows)
+            if shadow_rows:
+                alerts += db.copy_rows(conn, "alerts_shadow", SHADOW_COLUMNS, shadow_rows)
+        conn.commit()
+
+    return task, readings, alerts
+
+
+def list_zones(conn, start, end, farm_id=None):
+    with conn.cursor() as cur:
+        cur.execute(ZONES_QUERY, {"start": start, "end": end, "farm_id": farm_id})
+        return [ZoneTask(*row) for row in cur.fetchall()]
+
+
+def diff_report(conn, run_id, start, end, farm_id=None):
+    """Per alert type/severity counts: live alerts vs the shadow run"""
+    with conn.cursor() as cur:
+        cur.execute(DIFF_QUERY, {"run_id": run_id, "start": start, "end": end,
+                                 "farm_id": farm_id})
+        return cur.fetchall()
+
+
+def run_backfill(start, end, workers, window, overrides=None, farm_id=None, run_id=None):
+    config = load_config()
+    run_id = run_id or f"backfill-{uuid.uuid4().hex[:8]}"
+
+    with db.connect(config.database_url) as conn:
+        zones = list_zones(conn, start, end, farm_id)
+    print(f"Reprocessing {len(zones)} zone(s) from {start:%Y-%m-%d} to {end:%Y-%m-%d} "
+          f"as run {run_id} with {workers} worker(s)")
+
+    started = time.perf_counter()
+    total_readings = total_alerts = 0
+    init_args = (config.database_url, overrides, run_id, window, config.chunk_size)
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+        tasks = [(zone, start, end) for zone in zones]
+        for zone, readings, alerts in pool.imap_unordered(reprocess_zone, tasks):
+            total_readings += readings
+            total_alerts += alerts
+            print(f"  ✓ {zone.gateway_id}/{zone.field_id}/{zone.zone_id}: "
+                  f"{readings} readings → {alerts} alerts")
+
+    elapsed = time.perf_counter() - started
+    rate = total_readings / elapsed if elapsed else 0.0
+    print(f"✓ {total_readings} readings → {total_alerts} alerts in {elapsed:.1f}s "
+          f"({rate:,.0f} readings/s)")
+    return run_id
+
+
+def _parse_date(value):
+    return datetime.fromisoformat(value).replace(tzinfo=LOCAL_TZ)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocess historical readings into alerts_shadow")
+    parser.add_argument("--start", required=True, type=_parse_date)
+    parser.add_argument("--end", required=True, type=_parse_date)
+    parser.add_argument("--farm-id", help="Limit to one farm (default: all farms)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--window-days", type=int, default=7,
+                        help="Time window per query within a zone")
+    parser.add_argument("--overrides", help="JSON file with threshold/model overrides")
+    parser.add_argument("--run-id", help="Shadow run identifier (default: generated)")
+    args = parser.parse_args()
+
+    overrides = None
+    if args.overrides:
+        with open(args.overrides, "r", encoding="utf-8") as f:
+            overrides = json.load(f)
+
+    run_id = run_backfill(args.start, args.end, args.workers, timedelta(days=args.window_days),
+                          overrides, args.farm_id, args.run_id)
+
+    with db.connect(load_config().database_url) as conn:
+        report = diff_report(conn, run_id, args.start, args.end, args.farm_id)
+
+    print(f"\n{'alert_type':<22}{'severity':<10}{'live':>10}{'shadow':>10}{'delta':>10}{'zones':>8}")
+    print("-" * 70)
+    for alert_type, severity, live, shadow, zones_changed in report:
+        print(f"{alert_type:<22}{severity:<10}{live:>10}{shadow:>10}{shadow - live:>+10}"
+              f"{zones_changed:>8}")
+
+
+if __name__ == "__main__":
+    main()
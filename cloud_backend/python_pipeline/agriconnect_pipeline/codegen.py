@@ -0,0 +1,541 @@
+"""
+Reading Type Generator
+Parses the sensor_readings table in cloud_backend/database/schema.sql
+(plus the ADD COLUMN statements in supabase/migrations) and writes
+reading_types.py: a __slots__ record (SensorReading) and a struct-of-
+arrays batch (ReadingBatch), each with straight-line converters from the
+MQTT data payload and to COPY input.
+
+Payload keys come from readings.SENSOR_FIELDS / SYSTEM_FIELDS; location
+columns read data.location, and the identifying columns are arguments.
+Re-run after changing the table; --check fails when the generated module
+is out of date.
+
+Usage:
+    python -m agriconnect_pipeline.codegen
+    python -m agriconnect_pipeline.codegen --check
+"""
+
+import argparse
+import glob
+import os
+import re
+import sys
+from decimal import Decimal
+
+from .readings import SENSOR_FIELDS, SYSTEM_FIELDS
+
+ROOT = os.path.join(os.path.dirname(__file__), "..", "..", "..")
+DEFAULT_SCHEMA = os.path.join(ROOT, "cloud_backend", "database", "schema.sql")
+DEFAULT_MIGRATIONS = os.path.join(ROOT, "supabase", "migrations")
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), "reading_types.py")
+
+TABLE = "sensor_readings"
+
+# Columns passed to the converters rather than read from the payload
+ARGUMENTS = {
+    "gateway_id": "gateway_id",
+    "field_id": "field_id",
+    "zone_id": "zone_id",
+    "reading_time": "reading_time",
+    "reading_fingerprint": "fingerprint",
+}
+LOCATION_KEYS = {"latitude": "lat", "longitude": "lon"}
+VALIDITY_COLUMN = "data_valid"
+
+# SQL type -> kind of Python value
+KINDS = {
+    "TEXT": "text",
+    "VARCHAR": "text",
+    "INTEGER": "int",
+    "BIGINT": "int",
+    "SMALLINT": "int",
+    "DECIMAL": "float",
+    "NUMERIC": "float",
+    "REAL": "float",
+    "DOUBLE": "float",
+    "BOOLEAN": "bool",
+    "TIMESTAMPTZ": "time",
+}
+
+PYTHON_TYPES = {"text": "str", "int": "int", "float": "float", "bool": "bool"}
+
+# Values a column can hold, as exclusive (low, high); DECIMAL(p, s) is worked out
+# from p and s. Integer bounds exclude NULL_INT, which stands for NULL in batches.
+RANGES = {
+    "INTEGER": (-(1 << 31) - 1, 1 << 31),
+    "BIGINT": (-(1 << 63), 1 << 63),
+    "SMALLINT": (-(1 << 15) - 1, 1 << 15),
+    "REAL": (-3.4028234663852886e38, 3.4028234663852886e38),
+}
+
+
+def decimal_range(precision, scale):
+    """Exclusive bounds of DECIMAL(precision, scale): anything that rounds to
+    10 ** (precision - scale) overflows"""
+    high = Decimal(10) ** (precision - scale) - Decimal(5).scaleb(-(scale + 1))
+    return -high, high
+
+
+# ==========================================
+# SCHEMA PARSING
+# ==========================================
+
+def _split_top_level(body):
+    """Split a column list on commas outside parentheses"""
+    parts, depth, current = [], 0, []
+    for char in body:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _strip_comments(sql):
+    return "\n".join(line.split("--", 1)[0] for line in sql.splitlines())
+
+
+def _column(definition):
+    """(name, kind, default, nullable, limits) for one column definition, or None to
+    skip it; limits are RANGES-style bounds, or None"""
+    match = re.match(r"(\w+)\s+(\w+)(?:\s*\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\))?", definition)
+    if not match or match.group(1).upper() in ("CONSTRAINT", "PRIMARY", "UNIQUE", "CHECK",
+                                                "FOREIGN"):
+        return None
+    name, sql_type = match.group(1), match.group(2).upper()
+    if sql_type in ("SERIAL", "BIGSERIAL") or re.search(r"DEFAULT\s+nextval\(", definition,
+                                                         re.IGNORECASE):
+        return None              # assigned by the database
+    if sql_type not in KINDS:
+        raise ValueError(f"{TABLE}.{name}: unsupported type {sql_type}")
+
+    default = None
+    found = re.search(r"DEFAULT\s+([\w.'-]+)", definition, re.IGNORECASE)
+    if found:
+        literal = found.group(1).upper()
+        if literal in ("TRUE", "FALSE"):
+            default = literal == "TRUE"
+        elif re.fullmatch(r"-?\d+(\.\d+)?", literal):
+            default = float(literal) if "." in literal else int(literal)
+        # NOW() and other expressions are not constants
+    nullable = not re.search(r"NOT\s+NULL", definition, re.IGNORECASE)
+    limits = RANGES.get(sql_type)
+    if sql_type in ("DECIMAL", "NUMERIC") and match.group(3):
+        limits = decimal_range(int(match.group(3)), int(match.group(4) or 0))
+    return name, KINDS[sql_type], default, nullable, limits
+
+
+def parse_columns(schema_path=DEFAULT_SCHEMA, migrations_dir=DEFAULT_MIGRATIONS):
+    """Columns of sensor_readings in table order, as (name, kind, default, nullable, limits)"""
+    with open(schema_path, encoding="utf-8") as f:
+        schema = _strip_comments(f.read())
+    match = re.search(rf"CREATE TABLE\s+(?:IF NOT EXISTS\s+)?{TABLE}\s*\((.*?)\);",
+                      schema, re.IGNORECASE | re.DOTALL)
+    if not match:
+        raise ValueError(f"No CREATE TABLE {TABLE} in {schema_path}")
+    columns = [column for column in map(_column, _split_top_level(match.group(1)))
+               if column]
+
+    for path in sorted(glob.glob(os.path.join(migrations_dir, "*.sql"))):
+        with open(path, encoding="utf-8") as f:
+            migration = _strip_comments(f.read())
+        for added in re.finditer(
+                rf"ALTER TABLE\s+{TABLE}\s+ADD COLUMN\s+(?:IF NOT EXISTS\s+)?([^;]+);",
+                migration, re.IGNORECASE):
+            column = _column(added.group(1))
+            if column and column[0] not in {c[0] for c in columns}:
+                columns.append(column)
+        # Columns that later get a sequence default are assigned by the database too
+        for sequenced in re.finditer(
+                rf"ALTER TABLE\s+{TABLE}\s+ALTER COLUMN\s+(\w+)\s+SET DEFAULT\s+nextval\(",
+                migration, re.IGNORECASE):
+            columns = [c for c in columns if c[0] != sequenced.group(1)]
+    return columns
+
+
+def payload_sources(columns):
+    """column -> (container, key) in the payload, or ("arg", name)"""
+    payload_keys = {column: ("sensors", key) for column, key in SENSOR_FIELDS}
+    payload_keys.update({column: ("system", key) for column, key in SYSTEM_FIELDS})
+    payload_keys.update({column: ("location", key) for column, key in LOCATION_KEYS.items()})
+    sources = {}
+    for name, *_ in columns:
+        if name in ARGUMENTS:
+            sources[name] = ("arg", ARGUMENTS[name])
+        elif name in payload_keys:
+            sources[name] = payload_keys[name]
+        elif name != VALIDITY_COLUMN:
+            print(f"⚠ {TABLE}.{name} has no payload key; it is always NULL or its default",
+                  file=sys.stderr)
+    return sources
+
+
+# ==========================================
+# CODE GENERATION
+# ==========================================
+
+PRELUDE = '''"""
+Sensor Reading Types
+Generated by codegen.py from the sensor_readings table (schema.sql and
+the ADD COLUMN migrations). Do not edit; re-run
+    python -m agriconnect_pipeline.codegen
+
+SensorReading is one row with __slots__. ReadingBatch keeps many rows as
+one typed array per column (NULL is NaN, NULL_INT or NULL_BOOL), which
+takes a fraction of the memory of a tuple per row and turns into COPY
+text a column at a time.
+
+A missing or null payload value is stored as NULL, or the column's
+constant default; 0 and false are kept. A value that cannot be converted
+to its column's type, or is outside the range the column can hold (e.g.
+DECIMAL(5, 2) or INTEGER), is stored as NULL and clears data_valid.
+"""
+
+import math
+from array import array
+from datetime import datetime, timezone
+
+NULL_INT = -(1 << 63)    # stands for NULL in integer columns
+NULL_BOOL = 2            # stands for NULL in boolean columns
+NAN = math.nan           # stands for NULL in float and time columns
+
+_COPY_NULL = "\\\\N"
+_BOOL_TEXT = ("f", "t", _COPY_NULL)
+
+
+def _int(value):
+    """JSON value -> int (450.0 -> 450), or None if it is not a number"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(round(value)) if math.isfinite(value) else None
+
+
+def _float(value):
+    if isinstance(value, bool):
+        return float(value)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _bool(value):
+    if isinstance(value, (bool, int, float)):
+        return bool(value)
+    if isinstance(value, str) and value.lower() in ("true", "false", "1", "0"):
+        return value.lower() in ("true", "1")
+    return None
+
+
+def _text(value):
+    return value if isinstance(value, str) else str(value)
+
+
+def _copy_escape(value):
+    if "\\\\" in value or "\\t" in value or "\\n" in value or "\\r" in value:
+        return (value.replace("\\\\", "\\\\\\\\").replace("\\t", "\\\\t")
+                .replace("\\n", "\\\\n").replace("\\r", "\\\\r"))
+    return value
+
+
+def _text_column(values):
+    return [_COPY_NULL if value is None else _copy_escape(value) for value in values]
+
+
+def _int_column(values):
+    return [_COPY_NULL if value == NULL_INT else str(value) for value in values]
+
+
+def _float_column(values):
+    return [_COPY_NULL if value != value else repr(value) for value in values]
+
+
+def _bool_column(values):
+    return [_BOOL_TEXT[value] for value in values]
+
+
+def _time_column(values):
+    # Readings in one batch share few distinct seconds; format each once
+    formatted = {}
+    column = []
+    for value in values:
+        text = formatted.get(value)
+        if text is None:
+            text = formatted[value] = (
+                _COPY_NULL if value != value
+                else datetime.fromtimestamp(value, timezone.utc).isoformat())
+        column.append(text)
+    return column
+
+
+def _time(value):
+    return None if value != value else datetime.fromtimestamp(value, timezone.utc)
+'''
+
+CONVERTERS = {"text": "_text", "int": "_int", "float": "_float", "bool": "_bool"}
+
+# Batch storage: kind -> (empty column, NULL stand-in, stored-value expression)
+BATCH = {
+    "text": ("[]", "None", "{v}"),
+    "int": ('array("q")', "NULL_INT", "{v}"),
+    "float": ('array("d")', "NAN", "{v}"),
+    "bool": ("bytearray()", "NULL_BOOL", "{v}"),
+    "time": ('array("d")', "NAN", "{v}.timestamp()"),
+}
+READ_BACK = {
+    "text": "{c}[i]",
+    "int": "None if {c}[i] == NULL_INT else {c}[i]",
+    "float": "None if {c}[i] != {c}[i] else {c}[i]",
+    "bool": "None if {c}[i] == NULL_BOOL else bool({c}[i])",
+    "time": "_time({c}[i])",
+}
+COPY_COLUMN = {"text": "_text_column", "int": "_int_column", "float": "_float_column",
+               "bool": "_bool_column", "time": "_time_column"}
+
+
+def _value_lines(kind, default, source, limits, indent):
+    """Statements leaving the converted column value in `value`"""
+    pad = " " * indent
+    container, key = source
+    lines = [f'{pad}value = {container}.get("{key}")']
+    python_type = PYTHON_TYPES[kind]
+    # Fast path: JSON already gave the column's type (an int for a float
+    # column is converted too, so COPY sees one type per column)
+    if limits is None:
+        lines.append(f"{pad}if value is not None and type(value) is not {python_type}:")
+        lines.append(f"{pad}    value = {CONVERTERS[kind]}(value)")
+        lines.append(f"{pad}    if value is None:")
+        lines.append(f"{pad}        valid = False")
+    else:
+        low, high = limits
+        lines.append(f"{pad}if value is not None:")
+        lines.append(f"{pad}    if type(value) is not {python_type}:")
+        lines.append(f"{pad}        value = {CONVERTERS[kind]}(value)")
+        lines.append(f"{pad}    if value is None or not {low} < value < {high}:")
+        lines.append(f"{pad}        value = None")
+        lines.append(f"{pad}        valid = False")
+    if default is not None:
+        lines.append(f"{pad}if value is None:")
+        lines.append(f"{pad}    value = {default!r}")
+    return lines
+
+
+def _argument_checks(columns, sources, indent):
+    """Statements rejecting identifying arguments their NOT NULL integer column cannot hold"""
+    pad = " " * indent
+    lines = []
+    for name, kind, _, nullable, limits in columns:
+        source = sources.get(name)
+        if source and source[0] == "arg" and kind == "int" and not nullable and limits:
+            low, high = limits
+            lines.append(f"{pad}if not {low} < {source[1]} < {high}:")
+            lines.append(f'{pad}    raise ValueError(f"{name} {{{source[1]}}} is out of range")')
+    return lines
+
+
+def _payload_prologue(pad):
+    return [
+        f'{pad}sensors = data.get("sensors") or {{}}',
+        f'{pad}system = data.get("system") or {{}}',
+        f'{pad}location = data.get("location") or {{}}',
+        f"{pad}valid = True",
+    ]
+
+
+def _wrapped(head, items, tail, indent):
+    """head + items joined by ", " + tail, broken into lines of at most 96 characters"""
+    pad = " " * indent
+    lines, line = [], pad + head
+    for i, item in enumerate(items):
+        piece = item + (", " if i < len(items) - 1 else tail)
+        if len(line) + len(piece.rstrip()) > 96:
+            lines.append(line.rstrip())
+            line = pad + " " * len(head)
+        line += piece
+    lines.append(line)
+    return lines
+
+
+def generate(columns):
+    """Source of reading_types.py for the given parse_columns() columns"""
+    sources = payload_sources(columns)
+    names = [name for name, *_ in columns]
+    arguments = ", ".join(ARGUMENTS[name] for name in names if name in ARGUMENTS
+                          and name != "reading_fingerprint")
+    signature = f"{arguments}, data, fingerprint=None"
+
+    out = [PRELUDE, ""]
+    out.append("COPY_COLUMNS = (")
+    out.extend(f'    "{name}",' for name in names)
+    out.append(")")
+    out.append("")
+    out.append("")
+
+    # --- SensorReading ---
+    out.append("class SensorReading:")
+    out.append('    """One sensor_readings row"""')
+    out.append("")
+    out.append("    __slots__ = COPY_COLUMNS")
+    out.append("")
+    out.append("    @classmethod")
+    out.append(f"    def from_payload(cls, {signature}):")
+    out.append('        """Row for one agriconnect/data payload"""')
+    out.extend(_argument_checks(columns, sources, 8))
+    out.extend(_payload_prologue(" " * 8))
+    out.append("        self = cls.__new__(cls)")
+    for name, kind, default, _, limits in columns:
+        source = sources.get(name)
+        if name == VALIDITY_COLUMN:
+            continue
+        if source is None:
+            out.append(f"        self.{name} = {default!r}")
+        elif source[0] == "arg":
+            out.append(f"        self.{name} = {source[1]}")
+        else:
+            out.extend(_value_lines(kind, default, source, limits, 8))
+            out.append(f"        self.{name} = value")
+    if VALIDITY_COLUMN in names:
+        out.append(f"        self.{VALIDITY_COLUMN} = valid")
+    out.append("        return self")
+    out.append("")
+    out.append("    def copy_row(self):")
+    out.append('        """Values in COPY_COLUMNS order"""')
+    out.extend(_wrapped("return (", [f"self.{name}" for name in names], ")", 8))
+    out.append("")
+    out.append("    def __repr__(self):")
+    out.append('        return f"SensorReading({self.gateway_id}/{self.field_id}/{self.zone_id})"')
+    out.append("")
+    out.append("")
+
+    # --- ReadingBatch ---
+    kinds = {name: kind for name, kind, *_ in columns}
+    out.append("class ReadingBatch:")
+    out.append('    """sensor_readings rows as one array per column (struct of arrays)"""')
+    out.append("")
+    out.append("    __slots__ = COPY_COLUMNS")
+    out.append("")
+    out.append("    def __init__(self):")
+    for name in names:
+        out.append(f"        self.{name} = {BATCH[kinds[name]][0]}")
+    out.append("")
+    out.append("    def __len__(self):")
+    out.append(f"        return len(self.{names[0]})")
+    out.append("")
+    out.append(f"    def append_payload(self, {signature}):")
+    out.append('        """Add one agriconnect/data payload (same rules as SensorReading).')
+    out.append("")
+    out.append("        Every value is converted before any column is touched, and a value")
+    out.append("        a column cannot hold undoes the columns already appended, so the")
+    out.append("        row is stored whole or not at all and the columns stay aligned.")
+    out.append('        """')
+    out.extend(_argument_checks(columns, sources, 8))
+    out.extend(_payload_prologue(" " * 8))
+    stored_values = {}
+    for name, kind, default, nullable, limits in columns:
+        source = sources.get(name)
+        _, null, stored = BATCH[kind]
+        if name == VALIDITY_COLUMN:
+            stored_values[name] = "valid"
+        elif source is None:
+            stored_values[name] = null if default is None else repr(default)
+        elif source[0] == "arg":
+            value = source[1]
+            if kind == "text" or not nullable:
+                stored_values[name] = stored.format(v=value)
+            else:
+                stored_values[name] = f"{null} if {value} is None else {stored.format(v=value)}"
+        else:
+            out.extend(_value_lines(kind, default, source, limits, 8))
+            if kind == "text":
+                out.append(f"        {name} = value")
+            else:
+                out.append(f"        {name} = {null} if value is None "
+                           f"else {stored.format(v='value')}")
+            stored_values[name] = name
+    out.append("        row = len(self)")
+    out.append("        try:")
+    for name in names:
+        out.append(f"            self.{name}.append({stored_values[name]})")
+    out.append("        except Exception:")
+    out.append("            for name in COPY_COLUMNS:")
+    out.append("                del getattr(self, name)[row:]")
+    out.append("            raise")
+    out.append("")
+    out.append("    def rows(self):")
+    out.append('        """Rows as tuples in COPY_COLUMNS order (NULLs as None)"""')
+    for name in names:
+        out.append(f"        {name} = self.{name}")
+    out.append("        for i in range(len(self)):")
+    out.append("            yield (")
+    for name in names:
+        out.append(f"                {READ_BACK[kinds[name]].format(c=name)},")
+    out.append("            )")
+    out.append("")
+    out.append("    def copy_text(self):")
+    out.append('        """COPY ... FROM STDIN text for every row, columns in COPY_COLUMNS order"""')
+    out.append("        columns = (")
+    for name in names:
+        out.append(f"            {COPY_COLUMN[kinds[name]]}(self.{name}),")
+    out.append("        )")
+    out.append('        return "".join("\\t".join(row) + "\\n" for row in zip(*columns))')
+    out.append("")
+    out.append("    def nbytes(self):")
+    out.append('        """Memory held by the columns (not counting shared str objects)"""')
+    out.append("        total = 0")
+    out.append("        for name in COPY_COLUMNS:")
+    out.append("            column = getattr(self, name)")
+    out.append("            if isinstance(column, array):")
+    out.append("                total += column.itemsize * len(column)")
+    out.append("            elif isinstance(column, bytearray):")
+    out.append("                total += len(column)")
+    out.append("            else:")
+    out.append("                total += 8 * len(column)")
+    out.append("        return total")
+    return "\n".join(out) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate reading_types.py from schema.sql")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA)
+    parser.add_argument("--migrations", default=DEFAULT_MIGRATIONS)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 if the output is out of date")
+    args = parser.parse_args()
+
+    columns = parse_columns(args.schema, args.migrations)
+    source = generate(columns)
+    if args.check:
+        try:
+            with open(args.output, encoding="utf-8") as f:
+                current = f.read()
+        except FileNotFoundError:
+            current = None
+        if current != source:
+            print(f"✗ {os.path.relpath(args.output)} is out of date; "
+                  f"run python -m agriconnect_pipeline.codegen")
+            sys.exit(1)
+        print(f"✓ {os.path.relpath(args.output)} is up to date")
+        return
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(source)
+    print(f"✓ Wrote {os.path.relpath(args.output)} ({len(columns)} columns)")
+
+
+if __name__ == "__main__":
+    main()
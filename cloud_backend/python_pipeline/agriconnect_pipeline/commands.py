@@ -0,0 +1,376 @@
+"""
+Command Broker
+Delivers dashboard commands (pump on/off, config updates, reboots) to
+gateways on agriconnect/commands/{gateway_id} and tracks them until the
+gateway acknowledges on agriconnect/ack/{gateway_id}.
+
+Commands are read from the command_outbox table, so nothing queued while
+the broker or a gateway is down is lost. Each gateway has a small window
+of unacknowledged commands; a command without an ack is re-sent with an
+exponentially growing timeout and marked failed after max_attempts. A
+newer command for the same gateway, field, zone and action supersedes an
+older one that is still open, so a pump-off clicked while the pump-on is
+still queued or unacknowledged cancels it instead of racing it.
+
+Usage:
+    python -m agriconnect_pipeline.commands
+"""
+
+import argparse
+import heapq
+import json
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+
+from . import db
+from .config import load_config
+from .mqtt_client import create_client
+
+OPEN_COMMANDS_QUERY = """
+    SELECT id, command_id, farm_id, gateway_id, target_field_id, target_zone_id,
+           action, parameters, status, attempts, created_at
+    FROM command_outbox
+    WHERE status IN ('pending', 'sent') AND id > %s
+    ORDER BY id
+"""
+
+# A farm's commands go to its first registered gateway unless the dashboard names one
+FARM_GATEWAYS_QUERY = """
+    SELECT DISTINCT ON (farm_id) farm_id, gateway_id
+    FROM gateways
+    ORDER BY farm_id, gateway_id
+"""
+
+UPDATE_COMMANDS = """
+    UPDATE command_outbox AS c
+    SET status = u.status, attempts = u.attempts, gateway_id = u.gateway_id,
+        sent_at = u.sent_at, acked_at = u.acked_at,
+        superseded_by = u.superseded_by, last_error = u.last_error
+    FROM unnest(%s::text[], %s::text[], %s::int[], %s::text[], %s::timestamptz[],
+                %s::timestamptz[], %s::text[], %s::text[])
+         AS u(command_id, status, attempts, gateway_id, sent_at, acked_at,
+              superseded_by, last_error)
+    WHERE c.command_id = u.command_id
+"""
+
+# Ids are assigned at insert but rows become visible at commit, so a poll
+# can see id N + 1 before id N; each poll re-reads this many ids back
+RESCAN_IDS = 1000
+
+
+@dataclass
+class Command:
+    command_id: str
+    gateway_id: str
+    field_id: int
+    zone_id: int
+    action: str
+    parameters: dict
+    created_at: float            # epoch seconds of the dashboard click
+    status: str = "pending"
+    attempts: int = 0
+    sent_at: float = None
+    acked_at: float = None
+    superseded_by: str = None
+    last_error: str = None
+    farm_id: str = None
+
+    @property
+    def target(self):
+        """Commands with the same target supersede each other"""
+        return (self.gateway_id, self.field_id, self.zone_id, self.action)
+
+    def payload(self, now):
+        """MQTT message, as documented in docs/mqtt/topic_structure.md"""
+        return json.dumps({
+            "commandId": self.command_id,
+            "timestamp": datetime.fromtimestamp(now, timezone.utc).isoformat(),
+            "action": self.action,
+            "targetFieldId": self.field_id,
+            "targetZoneId": self.zone_id,
+            "parameters": self.parameters,
+        })
+
+    def row(self):
+        """Column values for UPDATE_COMMANDS"""
+        def ts(value):
+            return datetime.fromtimestamp(value, timezone.utc) if value is not None else None
+        return (self.command_id, self.status, self.attempts, self.gateway_id,
+                ts(self.sent_at), ts(self.acked_at), self.superseded_by, self.last_error)
+
+
+class CommandBroker:
+    """Per-gateway delivery state; all methods take the current time.
+
+    publish(gateway_id, payload) is called for every (re)send. The broker
+    only keeps open commands in memory; changes to any command are
+    collected until drain() so they can be written in one UPDATE.
+    """
+
+    def __init__(self, publish, window=4, ack_timeout=5.0, max_attempts=5):
+        self.publish = publish
+        self.window = window
+        self.ack_timeout = ack_timeout
+        self.max_attempts = max_attempts
+
+        self.commands = {}       # command_id -> open Command
+        self.latest = {}         # target -> command_id of its newest open command
+        self.queues = {}         # gateway_id -> deque of commands waiting to be sent
+        self.in_flight = {}      # gateway_id -> {command_id: Command} awaiting ack
+        self.ready = set()       # gateways that may be able to send
+        self.timers = []         # heap of (deadline, command_id, attempt)
+        self.changed = {}        # command_id -> Command to persist
+        self.latencies = []      # click-to-ack seconds of acked commands
+        self.stats = {"queued": 0, "sent": 0, "retries": 0, "acked": 0,
+                      "rejected": 0, "superseded": 0, "failed": 0, "unmatched_acks": 0}
+
+    def enqueue(self, command, now):
+        """Accept a new (or restored) open command"""
+        if command.command_id in self.commands:
+            return
+        self.stats["queued"] += 1
+
+        older = self.latest.get(command.target)
+        if older is not None:
+            self._supersede(self.commands[older], command.command_id)
+
+        # A command restored as "sent" may not have arrived: send it again
+        command.status = "pending"
+        self.commands[command.command_id] = command
+        self.latest[command.target] = command.command_id
+        self.queues.setdefault(command.gateway_id, deque()).append(command)
+        self.ready.add(command.gateway_id)
+
+    def _supersede(self, command, newer_id):
+        self._close(command, "superseded")
+        command.superseded_by = newer_id
+        self.stats["superseded"] += 1
+        # Frees its window slot; a queued copy is skipped when popped
+        self.in_flight.get(command.gateway_id, {}).pop(command.command_id, None)
+        self.ready.add(command.gateway_id)
+
+    def _close(self, command, status):
+        command.status = status
+        del self.commands[command.command_id]
+        if self.latest.get(command.target) == command.command_id:
+            del self.latest[command.target]
+        self.changed[command.command_id] = command
+
+    def pump(self, now):
+        """Send queued commands while their gateway has room in its window"""
+        for gateway_id in self.ready:
+            queue = self.queues.get(gateway_id)
+            in_flight = self.in_flight.setdefault(gateway_id, {})
+            while queue and len(in_flight) < self.window:
+                command = queue.popleft()
+                if command.status != "pending":
+                    continue
+                self._send(command, in_flight, now)
+            if not queue:
+                self.queues.pop(gateway_id, None)
+        self.ready.clear()
+
+    def _send(self, command, in_flight, now):
+        command.attempts += 1
+        command.status = "sent"
+        command.sent_at = now
+        in_flight[command.command_id] = command
+        self.publish(command.gateway_id, command.payload(now))
+        self.stats["sent"] += 1
+        # Exponential backoff: each attempt waits twice as long for its ack
+        deadline = now + self.ack_timeout * 2 ** (command.attempts - 1)
+        heapq.heappush(self.timers, (deadline, command.command_id, command.attempts))
+        self.changed[command.command_id] = command
+
+    def acknowledge(self, gateway_id, command_id, now, ok=True, error=None):
+        """An ack arrived; returns the matched Command or None"""
+        command = self.commands.get(command_id)
+        if command is None or command.gateway_id != gateway_id or command.attempts == 0:
+            # Duplicate ack (QoS 1), ack for a superseded command, or garbage
+            self.stats["unmatched_acks"] += 1
+            return None
+
+        # Also matches a command that timed out and is queued for a resend:
+        # the earlier copy did arrive
+        self.in_flight.get(gateway_id, {}).pop(command_id, None)
+        self.ready.add(gateway_id)
+        command.acked_at = now
+        if ok:
+            self._close(command, "acked")
+            self.stats["acked"] += 1
+            self.latencies.append(now - command.created_at)
+        else:
+            # The gateway understood and refused it; resending will not help
+            command.last_error = error or "rejected by gateway"
+            self._close(command, "failed")
+            self.stats["rejected"] += 1
+        return command
+
+    def expire(self, now):
+        """Handle ack timeouts up to now: requeue for retry or give up"""
+        while self.timers and self.timers[0][0] <= now:
+            _, command_id, attempt = heapq.heappop(self.timers)
+            command = self.commands.get(command_id)
+            if command is None or command.status != "sent" or command.attempts != attempt:
+                continue  # acked, superseded or already resent since
+            self.in_flight[command.gateway_id].pop(command_id, None)
+            self.ready.add(command.gateway_id)
+            if command.attempts >= self.max_attempts:
+                command.last_error = f"no ack after {command.attempts} attempts"
+                self._close(command, "failed")
+                self.stats["failed"] += 1
+                print(f"✗ Command {command_id} to {command.gateway_id} failed: "
+                      f"{command.last_error}")
+                continue
+            # Retries go ahead of newer commands for the same gateway
+            command.status = "pending"
+            self.queues.setdefault(command.gateway_id, deque()).appendleft(command)
+            self.stats["retries"] += 1
+
+    def next_deadline(self):
+        return self.timers[0][0] if self.timers else None
+
+    def drain(self):
+        """Changed commands as UPDATE_COMMANDS rows; clears them"""
+        rows = [command.row() for command in self.changed.values()]
+        self.changed = {}
+        return rows
+
+    def latency_percentiles(self, percentiles=(50, 99)):
+        """Click-to-ack latency percentiles in seconds (None before any ack)"""
+        if not self.latencies:
+            return None
+        return dict(zip(percentiles, np.percentile(self.latencies, percentiles).tolist()))
+
+
+class OutboxReader:
+    """Fetches open commands from command_outbox in insertion order"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.last_id = 0
+        self.farm_gateways = {}
+
+    def load_gateways(self):
+        with self.conn.cursor() as cur:
+            cur.execute(FARM_GATEWAYS_QUERY)
+            self.farm_gateways = dict(cur.fetchall())
+        self.conn.commit()
+
+    def poll(self):
+        """Open commands inserted since (about) the last poll; the broker
+        ignores the ones it already holds"""
+        with self.conn.cursor() as cur:
+            cur.execute(OPEN_COMMANDS_QUERY, (max(0, self.last_id - RESCAN_IDS),))
+            rows = cur.fetchall()
+        self.conn.commit()
+
+        commands = []
+        for (row_id, command_id, farm_id, gateway_id, field_id, zone_id,
+             action, parameters, status, attempts, created_at) in rows:
+            self.last_id = max(self.last_id, row_id)
+            command = Command(command_id, gateway_id, field_id, zone_id, action,
+                              parameters or {}, created_at.timestamp(), status,
+                              attempts, farm_id=farm_id)
+            if command.gateway_id is None:
+                command.gateway_id = self.farm_gateways.get(farm_id)
+            if command.gateway_id is None:
+                self.load_gateways()
+                command.gateway_id = self.farm_gateways.get(farm_id)
+            commands.append(command)
+        return commands
+
+
+def write_changes(conn, rows):
+    if not rows:
+        return
+    with conn.cursor() as cur:
+        cur.execute(UPDATE_COMMANDS, [list(column) for column in zip(*rows)])
+    conn.commit()
+
+
+def handle_ack(broker, topic, payload, now):
+    """Match one agriconnect/ack/{gateway_id} message to its command"""
+    gateway_id = topic.split("/")[-1]
+    try:
+        ack = json.loads(payload)
+        command_id = ack["commandId"]
+    except (ValueError, KeyError, TypeError):
+        print(f"⚠ Malformed ack from {gateway_id}")
+        return None
+    status = ack.get("status", "ok")
+    return broker.acknowledge(gateway_id, command_id, now,
+                              ok=status == "ok", error=ack.get("error"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gateway command delivery with ack tracking")
+    parser.add_argument("--window", type=int, default=4,
+                        help="Unacknowledged commands allowed per gateway")
+    parser.add_argument("--ack-timeout", type=float, default=5.0,
+                        help="Seconds to wait for the first ack; doubles per retry")
+    parser.add_argument("--max-attempts", type=int, default=5)
+    parser.add_argument("--poll-interval", type=float, default=0.25,
+                        help="Seconds between outbox polls")
+    parser.add_argument("--stats-interval", type=float, default=60.0)
+    args = parser.parse_args()
+
+    config = load_config()
+    conn = db.connect(config.database_url)
+    reader = OutboxReader(conn)
+    reader.load_gateways()
+
+    client = None
+
+    def publish(gateway_id, payload):
+        client.publish(f"agriconnect/commands/{gateway_id}", payload, qos=1)
+
+    broker = CommandBroker(publish, window=args.window, ack_timeout=args.ack_timeout,
+                           max_attempts=args.max_attempts)
+
+    def on_message(message):
+        handle_ack(broker, message.topic, message.payload, time.time())
+
+    client = create_client(config, "command_broker", [("agriconnect/ack/+", 1)], on_message)
+
+    last_poll = 0.0
+    last_stats = time.monotonic()
+    try:
+        # Single thread: acks, polling, sends and timeouts never race
+        while True:
+            client.loop(timeout=0.05)
+            now = time.time()
+            if time.monotonic() - last_poll >= args.poll_interval:
+                last_poll = time.monotonic()
+                for command in reader.poll():
+                    if command.gateway_id is None:
+                        command.status = "failed"
+                        command.last_error = f"no gateway registered for farm {command.farm_id}"
+                        broker.changed[command.command_id] = command
+                        continue
+                    broker.enqueue(command, now)
+            broker.expire(now)
+            broker.pump(now)
+            write_changes(conn, broker.drain())
+
+            if time.monotonic() - last_stats >= args.stats_interval:
+                last_stats = time.monotonic()
+                latency = broker.latency_percentiles()
+                summary = (f"click-to-ack p50 {latency[50]:.2f}s p99 {latency[99]:.2f}s"
+                           if latency else "no acks yet")
+                print(f"[STATS] {broker.stats} | {summary}")
+                broker.latencies.clear()
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down gracefully...")
+        write_changes(conn, broker.drain())
+    finally:
+        client.disconnect()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
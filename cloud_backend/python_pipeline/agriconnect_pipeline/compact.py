@@ -0,0 +1,213 @@
+"""
+Storage Compaction
+Copies sensor_readings into sensor_readings_compact (migration 0012):
+two-decimal sensors as hundredths in SMALLINT, the rest in SMALLINT or
+REAL where they fit, location moved to field_nodes, and a BRIN index on
+reading_time in place of the time btree. sensor_readings_compact_v reads
+it back in the original shape.
+
+Conversion runs in the database, one INSERT ... SELECT per id range, with
+ranges spread over a process pool. Ranges that were already copied are
+skipped (ON CONFLICT on id), so an interrupted run can be started again.
+A value that does not fit its narrow column is stored as NULL and
+counted in the report.
+
+Usage:
+    python -m agriconnect_pipeline.compact --workers 4 --chunk-rows 100000
+"""
+
+import argparse
+import multiprocessing
+import time
+
+from . import db
+from .config import load_config
+
+# Stored as hundredths: DECIMAL(p, 2) -> SMALLINT
+SCALED_COLUMNS = ("air_temperature", "air_humidity", "soil_temperature", "ph_value")
+SMALLINT_COLUMNS = ("field_id", "zone_id", "co2_ppm", "soil_moisture", "nitrogen_ppm",
+                    "phosphorus_ppm", "potassium_ppm", "water_level", "battery_level", "rssi")
+REAL_COLUMNS = ("par_value", "ec_value")
+COPIED_COLUMNS = ("id", "reading_time", "reading_fingerprint", "sync_seq", "light_intensity",
+                  "pump_status", "data_valid", "gateway_id")
+
+
+def _smallint(expression):
+    return (f"CASE WHEN {expression} BETWEEN -32768 AND 32767 "
+            f"THEN ({expression})::SMALLINT END")
+
+
+def compact_columns():
+    """(compact column, SQL expression over a sensor_readings row) pairs"""
+    columns = [(c, c) for c in COPIED_COLUMNS]
+    columns += [(f"{c}_x100", _smallint(f"round({c} * 100)")) for c in SCALED_COLUMNS]
+    columns += [(c, _smallint(c)) for c in SMALLINT_COLUMNS]
+    columns += [(c, f"{c}::REAL") for c in REAL_COLUMNS]
+    return columns
+
+
+def compact_select(source):
+    """SELECT producing sensor_readings_compact rows from source"""
+    return f"SELECT {', '.join(e for _, e in compact_columns())} FROM {source}"
+
+
+def copy_range_query(source, target):
+    columns = ", ".join(c for c, _ in compact_columns())
+    return (f"INSERT INTO {target} ({columns}) {compact_select(source)} "
+            f"WHERE id >= %s AND id < %s ON CONFLICT (id) DO NOTHING")
+
+
+def overflow_query(source):
+    """Counts of non-NULL source values that do not fit their compact column"""
+    checks = [f"count(*) FILTER (WHERE {c} IS NOT NULL AND round({c} * 100) "
+              f"NOT BETWEEN -32768 AND 32767) AS {c}" for c in SCALED_COLUMNS]
+    checks += [f"count(*) FILTER (WHERE {c} NOT BETWEEN -32768 AND 32767) AS {c}"
+               for c in SMALLINT_COLUMNS]
+    return f"SELECT {', '.join(checks)} FROM {source}"
+
+
+def location_query(source, nodes):
+    """Latest reported location per zone onto field_nodes, keeping locations already set"""
+    return f"""
+        INSERT INTO {nodes} AS n (node_id, gateway_id, field_id, zone_id, latitude, longitude)
+        SELECT DISTINCT ON (gateway_id, field_id, zone_id)
+               gateway_id || '-F' || field_id || '-Z' || zone_id,
+               gateway_id, field_id, zone_id, latitude, longitude
+        FROM {source}
+        WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        ORDER BY gateway_id, field_id, zone_id, reading_time DESC
+        ON CONFLICT (gateway_id, field_id, zone_id) DO UPDATE
+        SET latitude = COALESCE(n.latitude, EXCLUDED.latitude),
+            longitude = COALESCE(n.longitude, EXCLUDED.longitude)
+    """
+
+
+SIZE_QUERY = """
+    SELECT c.reltuples::BIGINT, pg_table_size(c.oid), pg_indexes_size(c.oid),
+           COALESCE(json_object_agg(i.relname, pg_relation_size(i.oid))
+                    FILTER (WHERE i.oid IS NOT NULL), '{}')
+    FROM pg_class c
+    LEFT JOIN pg_index x ON x.indrelid = c.oid
+    LEFT JOIN pg_class i ON i.oid = x.indexrelid
+    WHERE c.oid = %s::regclass
+    GROUP BY c.oid, c.reltuples
+"""
+
+
+def id_ranges(conn, source, chunk_rows):
+    """[start, end) id ranges of about chunk_rows ids covering source"""
+    with conn.cursor() as cur:
+        cur.execute(f"SELECT min(id), max(id) FROM {source}")
+        low, high = cur.fetchone()
+    if low is None:
+        return []
+    return [(start, min(start + chunk_rows, high + 1))
+            for start in range(low, high + 1, chunk_rows)]
+
+
+def table_sizes(conn, table):
+    """{"rows", "table_bytes", "index_bytes", "indexes": {name: bytes}, "bytes_per_row"}"""
+    with conn.cursor() as cur:
+        cur.execute(SIZE_QUERY, (table,))
+        rows, table_bytes, index_bytes, indexes = cur.fetchone()
+    return {"rows": rows, "table_bytes": table_bytes, "index_bytes": index_bytes,
+            "indexes": indexes, "bytes_per_row": table_bytes / rows if rows > 0 else 0.0}
+
+
+# ==========================================
+# WORKER
+# ==========================================
+
+_worker = {}
+
+
+def _init_worker(dsn, query):
+    _worker["conn"] = db.connect(dsn)
+    _worker["query"] = query
+
+
+def _run_range(bounds):
+    conn = _worker["conn"]
+    with conn.cursor() as cur:
+        cur.execute(_worker["query"], bounds)
+        copied = cur.rowcount
+    conn.commit()
+    return bounds, copied
+
+
+def run_ranges(dsn, query, ranges, workers=4, progress=True):
+    """Run query once per (start, end) range over a process pool; returns (rows, seconds)"""
+    started = time.perf_counter()
+    total = done = 0
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, initializer=_init_worker, initargs=(dsn, query)) as pool:
+        # Handed out in order, so concurrent ranges stay close in time
+        for _, rows in pool.imap_unordered(_run_range, ranges):
+            total += rows
+            done += 1
+            if progress and done % max(1, len(ranges) // 20) == 0:
+                elapsed = time.perf_counter() - started
+                print(f"  {done}/{len(ranges)} ranges, {total:,} rows "
+                      f"({total / elapsed:,.0f} rows/s)")
+    return total, time.perf_counter() - started
+
+
+def migrate(dsn, source="sensor_readings", target="sensor_readings_compact", workers=4,
+            chunk_rows=100000, progress=True):
+    """Copy source into target in parallel id ranges; returns (rows copied, seconds).
+
+    Ranges running at the same time share BRIN page ranges, so each BRIN
+    summary spans about workers x chunk_rows readings; keep that to hours
+    of data, not weeks.
+    """
+    with db.connect(dsn) as conn:
+        ranges = id_ranges(conn, source, chunk_rows)
+    return run_ranges(dsn, copy_range_query(source, target), ranges, workers, progress)
+
+
+def print_sizes(label, sizes):
+    print(f"{label:<26}: {sizes['rows']:,} rows, {sizes['bytes_per_row']:.0f} B/row, "
+          f"table {sizes['table_bytes'] / 2**20:,.0f} MiB, "
+          f"indexes {sizes['index_bytes'] / 2**20:,.0f} MiB")
+    for name, size in sorted(sizes["indexes"].items()):
+        print(f"  {name:<32}{size / 2**20:>10,.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy sensor_readings into the compact layout")
+    parser.add_argument("--source", default="sensor_readings")
+    parser.add_argument("--target", default="sensor_readings_compact")
+    parser.add_argument("--nodes", default="field_nodes", help="Table that receives locations")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--chunk-rows", type=int, default=100000, help="Ids per INSERT")
+    parser.add_argument("--skip-locations", action="store_true",
+                        help="Leave field_nodes latitude/longitude as they are")
+    args = parser.parse_args()
+
+    dsn = load_config().database_url
+    with db.connect(dsn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(overflow_query(args.source))
+            overflow = {d.name: n for d, n in zip(cur.description, cur.fetchone()) if n}
+            if not args.skip_locations:
+                cur.execute(location_query(args.source, args.nodes))
+                print(f"✓ Locations for {cur.rowcount} zone(s) on {args.nodes}")
+        conn.commit()
+    if overflow:
+        print(f"⚠ Values out of range, stored as NULL: {overflow}")
+
+    print(f"Copying {args.source} → {args.target} with {args.workers} worker(s)")
+    copied, seconds = migrate(dsn, args.source, args.target, args.workers, args.chunk_rows)
+    print(f"✓ {copied:,} rows in {seconds:.1f}s ({copied / max(seconds, 1e-9):,.0f} rows/s)")
+
+    with db.connect(dsn) as conn:
+        conn.autocommit = True
+        conn.execute(f"ANALYZE {args.source}")
+        conn.execute(f"VACUUM ANALYZE {args.target}")
+        print()
+        print_sizes(args.source, table_sizes(conn, args.source))
+        print_sizes(args.target, table_sizes(conn, args.target))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Pipeline Configuration
+Reads the same environment variables as the Node.js subscriber
+"""
+
+import os
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    database_url: str
+    farm_id: str
+    model_dir: str
+    chunk_size: int
+    mqtt_broker: str
+    mqtt_port: int
+    mqtt_username: str
+    mqtt_password: str
+    resend_api_key: str
+    twilio_account_sid: str
+    twilio_auth_token: str
+    twilio_phone_number: str
+    twilio_whatsapp_number: str
+    supabase_jwt_secret: str
+
+
+def load_config():
+    """Build the pipeline configuration from environment variables"""
+    return PipelineConfig(
+        database_url=os.environ.get("DATABASE_URL", ""),
+        farm_id=os.environ.get("FARM_ID", "FARM-CM-001"),
+        model_dir=os.environ.get("MODEL_DIR", os.path.join(os.getcwd(), "models")),
+        chunk_size=int(os.environ.get("CHUNK_SIZE", "10000")),
+        mqtt_broker=os.environ.get("MQTT_BROKER", ""),
+        mqtt_port=int(os.environ.get("MQTT_PORT", "8883")),
+        mqtt_username=os.environ.get("MQTT_USERNAME", ""),
+        mqtt_password=os.environ.get("MQTT_PASSWORD", ""),
+        resend_api_key=os.environ.get("RESEND_API_KEY", ""),
+        twilio_account_sid=os.environ.get("TWILIO_ACCOUNT_SID", ""),
+        twilio_auth_token=os.environ.get("TWILIO_AUTH_TOKEN", ""),
+        twilio_phone_number=os.environ.get("TWILIO_PHONE_NUMBER", ""),
+        twilio_whatsapp_number=os.environ.get("TWILIO_WHATSAPP_NUMBER", ""),
+        supabase_jwt_secret=os.environ.get("SUPABASE_JWT_SECRET", ""),
+    )
@@ -0,0 +1,162 @@
+"""
+Alert Correlation
+AlertManager emits one alert per zone per insight, so a regional humidity
+spike raises the same Late Blight alert in every zone of a farm. This
+stage groups zone alerts with the same farm, type, subject (disease or
+nutrient) and severity into one incident while they keep arriving within
+a sliding window, and stores the incident as a single alerts row that is
+updated as more zones join.
+
+The row's location follows the field hierarchy: a single zone while only
+one zone is affected, the field (zone_id NULL) while all members share a
+field, the farm (field_id NULL) once several fields are affected. The
+member list is kept in alerts.member_zones.
+"""
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from . import db
+
+DEFAULT_WINDOW = timedelta(minutes=30)
+MAX_ZONES_LISTED = 8
+
+INCIDENT_COLUMNS = (
+    "incident_key", "farm_id", "gateway_id", "field_id", "zone_id", "alert_type",
+    "severity", "message", "created_at", "member_zones", "zone_count", "updated_at",
+)
+
+
+def alert_subject(alert):
+    """What the alert is about beyond its type, so Late Blight and Powdery
+    Mildew (both disease_risk) stay separate incidents"""
+    if alert["alert_type"] == "disease_risk":
+        return alert["message"].split(" detected", 1)[0]
+    if alert["alert_type"] == "nutrient_deficiency":
+        return alert["message"].split(" level", 1)[0]
+    return ""
+
+
+@dataclass
+class Incident:
+    key: str
+    farm_id: str
+    alert_type: str
+    severity: str
+    message: str                 # message of the first alert
+    created_at: datetime
+    last_at: datetime
+    members: dict = field(default_factory=dict)   # (gateway, field, zone) -> last alert time
+    dirty: bool = True
+
+    def location(self):
+        """(gateway_id, field_id, zone_id) at the narrowest level covering every member"""
+        zones = list(self.members)
+        if len(zones) == 1:
+            return zones[0]
+        gateways = {gateway for gateway, _, _ in zones}
+        fields = {field_id for _, field_id, _ in zones}
+        gateway = gateways.pop() if len(gateways) == 1 else None
+        return gateway, (fields.pop() if len(fields) == 1 else None), None
+
+    def summary(self):
+        if len(self.members) == 1:
+            return self.message
+        by_field = {}
+        for _, field_id, zone_id in sorted(self.members, key=lambda m: (m[1], m[2])):
+            by_field.setdefault(field_id, []).append(zone_id)
+        listed = "; ".join(
+            f"Field {field_id}: zones {', '.join(str(z) for z in zones[:MAX_ZONES_LISTED])}"
+            + (f" (+{len(zones) - MAX_ZONES_LISTED})" if len(zones) > MAX_ZONES_LISTED else "")
+            for field_id, zones in by_field.items()
+        )
+        return f"{self.message} [{len(self.members)} zones affected - {listed}]"
+
+    def row(self, now):
+        gateway_id, field_id, zone_id = self.location()
+        members = [list(member) for member in self.members]
+        return (self.key, self.farm_id, gateway_id, field_id, zone_id, self.alert_type,
+                self.severity, self.summary(), self.created_at, members,
+                len(self.members), now)
+
+
+class Correlator:
+    """Open incidents keyed by (farm, type, subject, severity).
+
+    add() takes alert dicts (the ALERT_COLUMNS of intelligence.alerts) in
+    roughly time order; alerts from different workers may interleave. An
+    alert joins the open incident for its key if it is no more than window
+    after the incident's last alert, otherwise it opens a new incident.
+    drain() returns rows for incidents that are new or gained zones.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self.open = {}
+        self.closing = []        # replaced incidents with changes not yet drained
+        self.latest = None       # newest alert time seen (event time, not wall clock)
+        self.stats = {"alerts": 0, "incidents": 0, "joined": 0}
+
+    def add(self, alert):
+        self.stats["alerts"] += 1
+        group = (alert["farm_id"], alert["alert_type"], alert_subject(alert), alert["severity"])
+        at = alert["created_at"]
+        member = (alert["gateway_id"], alert["field_id"], alert["zone_id"])
+
+        incident = self.open.get(group)
+        if incident is None or at - incident.last_at > self.window:
+            if incident is not None and incident.dirty:
+                self.closing.append(incident)
+            key = f"{group[0]}:{group[1]}:{group[3]}:{at.timestamp():.3f}"
+            if group[2]:
+                key += f":{group[2]}"
+            incident = self.open[group] = Incident(
+                key, alert["farm_id"], alert["alert_type"], alert["severity"],
+                alert["message"], at, at,
+            )
+            self.stats["incidents"] += 1
+        elif member not in incident.members:
+            self.stats["joined"] += 1
+            incident.dirty = True
+
+        # A zone that alerts again (after its cooldown) extends the incident
+        # without changing the row
+        incident.members[member] = at
+        incident.last_at = max(incident.last_at, at)
+        self.latest = at if self.latest is None else max(self.latest, at)
+        return incident
+
+    def drain(self, now=None):
+        """Rows (INCIDENT_COLUMNS) for new or grown incidents; marks them clean"""
+        now = now or datetime.now(timezone.utc)
+        rows = [incident.row(now) for incident in self.closing]
+        self.closing = []
+        for incident in self.open.values():
+            if incident.dirty:
+                rows.append(incident.row(now))
+                incident.dirty = False
+        return rows
+
+    def expire(self, now=None):
+        """Forget incidents quiet for longer than the window before now
+        (default: the newest alert seen)"""
+        now = now or self.latest
+        if now is None:
+            return 0
+        closed = [group for group, incident in self.open.items()
+                  if now - incident.last_at > self.window and not incident.dirty]
+        for group in closed:
+            del self.open[group]
+        return len(closed)
+
+
+def write_incidents(conn, rows):
+    """Insert new incidents and update grown ones in one statement.
+
+    acknowledged is left alone, so acknowledging an incident is not undone
+    when another zone joins it.
+    """
+    rows = [row[:9] + (json.dumps(row[9]),) + row[10:] for row in rows]
+    db.upsert_rows(conn, "alerts", INCIDENT_COLUMNS, ("incident_key",), rows)
+    conn.commit()
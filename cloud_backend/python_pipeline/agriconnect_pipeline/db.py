@@ -0,0 +1,140 @@
+"""
+Database Helpers
+Thin wrappers around psycopg for chunked reads and bulk writes.
+psycopg is imported lazily so pure computation modules work without it.
+"""
+
+from .config import load_config
+
+
+def connect(dsn=None):
+    """Open a PostgreSQL connection to the Supabase database"""
+    try:
+        import psycopg
+    except ImportError as error:
+        raise RuntimeError(
+            "psycopg is required for database access: pip install -r requirements.txt"
+        ) from error
+
+    dsn = dsn or load_config().database_url
+    if not dsn:
+        raise RuntimeError("DATABASE_URL is not set")
+    return psycopg.connect(dsn)
+
+
+def is_transient(error):
+    """True for errors that may go away on retry (lost connection, timeout,
+    deadlock); False for ones the same statement will hit again (bad data,
+    constraint violations)"""
+    try:
+        import psycopg
+    except ImportError:
+        return False
+    return isinstance(error, (psycopg.OperationalError, psycopg.InterfaceError))
+
+
+def rollback(conn):
+    """Roll back after a failed statement; a broken connection is left for reset()"""
+    try:
+        conn.rollback()
+    except Exception:
+        pass
+
+
+def reset(conn, dsn=None):
+    """Roll back conn, or open a new connection if it is broken; returns the one to use"""
+    if not conn.closed:
+        try:
+            conn.rollback()
+            return conn
+        except Exception:
+            pass
+    try:
+        conn.close()
+    except Exception:
+        pass
+    return connect(dsn)
+
+
+def iter_chunks(conn, query, params=(), chunk_size=10000, name="pipeline_cursor"):
+    """Stream query results in lists of at most chunk_size rows.
+
+    Uses a server-side (named) cursor so the full result set never has to
+    fit in memory on the client.
+    """
+    with conn.cursor(name=name) as cur:
+        cur.itersize = chunk_size
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+def copy_rows(conn, table, columns, rows):
+    """Bulk insert rows with COPY; returns the number of rows written.
+
+    rows may also be a column batch with copy_text() (reading_types.ReadingBatch),
+    which is written as one block of COPY text instead of row by row.
+    """
+    count = 0
+    with conn.cursor() as cur:
+        with cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            if hasattr(rows, "copy_text"):
+                copy.write(rows.copy_text())
+                return len(rows)
+            for row in rows:
+                copy.write_row(row)
+                count += 1
+    return count
+
+
+def _stage_rows(conn, table, columns, rows):
+    """COPY rows into a temp table shaped like table; returns (name, count)"""
+    staging = f"_staging_{table}"
+    with conn.cursor() as cur:
+        cur.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {staging} "
+            f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+        )
+    return staging, copy_rows(conn, staging, columns, rows)
+
+
+def upsert_rows(conn, table, columns, key_columns, rows):
+    """Bulk upsert rows through a temporary staging table.
+
+    Rows are COPYed into a temp table shaped like the target, then merged
+    with a single INSERT ... ON CONFLICT so the whole batch is one round-trip.
+    """
+    update_columns = [c for c in columns if c not in key_columns]
+    if update_columns:
+        conflict_action = "DO UPDATE SET " + ", ".join(
+            f"{c} = EXCLUDED.{c}" for c in update_columns
+        )
+    else:
+        conflict_action = "DO NOTHING"
+
+    staging, count = _stage_rows(conn, table, columns, rows)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"SELECT {', '.join(columns)} FROM {staging} "
+            f"ON CONFLICT ({', '.join(key_columns)}) {conflict_action}"
+        )
+    return count
+
+
+def insert_new_rows(conn, table, columns, key_columns, rows):
+    """Bulk insert rows, skipping any whose key already exists.
+
+    Returns the number of rows actually inserted.
+    """
+    staging, _ = _stage_rows(conn, table, columns, rows)
+    with conn.cursor() as cur:
+        cur.execute(
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"SELECT {', '.join(columns)} FROM {staging} "
+            f"ON CONFLICT ({', '.join(key_columns)}) DO NOTHING"
+        )
+        return cur.rowcount
@@ -0,0 +1,210 @@
+"""
+Duplicate Suppression
+agriconnect/data/# is consumed at QoS 1 (at-least-once) and gateways
+replay their offline buffer with sendBufferedMessages(), so the same
+reading can arrive more than once. Each reading gets a fingerprint of
+(gateway, field, zone, device timestamp, payload); a rotating Bloom
+filter answers "definitely new" for almost every reading without touching
+the database, and only "maybe seen" readings are confirmed against the
+unique index on sensor_readings(gateway_id, reading_fingerprint).
+"""
+
+import hashlib
+import math
+import time
+
+from . import db
+
+RECENT_FINGERPRINTS_QUERY = """
+    SELECT reading_fingerprint FROM sensor_readings
+    WHERE reading_time >= now() - make_interval(hours => %s)
+      AND reading_fingerprint IS NOT NULL
+"""
+
+FINGERPRINT_EXISTS_QUERY = """
+    SELECT 1 FROM sensor_readings
+    WHERE gateway_id = %s AND reading_fingerprint = %s
+    LIMIT 1
+"""
+
+
+def timestamp_text(device_timestamp):
+    """Device timestamp as hashed; same as timestampText() in the Node.js subscriber.
+
+    Whole numbers are written as integers whether the JSON had 1 or 1.0
+    (JavaScript cannot tell them apart), other numbers in their shortest
+    round-trip form.
+    """
+    if device_timestamp is None:
+        return ""
+    if isinstance(device_timestamp, bool):
+        return "true" if device_timestamp else "false"
+    if isinstance(device_timestamp, float) and device_timestamp.is_integer():
+        return str(int(device_timestamp))
+    if isinstance(device_timestamp, float):
+        return repr(device_timestamp)
+    return str(device_timestamp)
+
+
+def reading_fingerprint(gateway_id, field_id, zone_id, device_timestamp, payload):
+    """Signed 64-bit fingerprint (fits BIGINT); same as the Node.js subscriber"""
+    timestamp = timestamp_text(device_timestamp)
+    digest = hashlib.sha256(
+        f"{gateway_id}|{field_id}|{zone_id}|{timestamp}|".encode() + payload
+    ).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit fingerprints.
+
+    The fingerprint is already a uniform hash, so the k probe positions are
+    derived from its two 32-bit halves (double hashing) instead of hashing
+    again.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, fingerprint):
+        h1 = fingerprint & 0xFFFFFFFF
+        h2 = (fingerprint >> 32) & 0xFFFFFFFF | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def __contains__(self, fingerprint):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(fingerprint))
+
+    def add(self, fingerprint):
+        bits = self.bits
+        for p in self._positions(fingerprint):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class RotatingBloomFilter:
+    """Two Bloom generations: when the current one is full it becomes the
+    previous one and the oldest is dropped. Lookups check both, so the last
+    capacity to 2 × capacity fingerprints are always remembered, and
+    memory and false-positive rate stay fixed however long ingest runs.
+    """
+
+    def __init__(self, capacity=2_000_000, error_rate=1e-4):
+        self.capacity = capacity
+        # Each lookup checks two generations, so split the error budget
+        self.error_rate = error_rate / 2
+        self.current = BloomFilter(capacity, self.error_rate)
+        self.previous = None
+        self.rotations = 0
+
+    def __contains__(self, fingerprint):
+        return fingerprint in self.current or (
+            self.previous is not None and fingerprint in self.previous
+        )
+
+    def add(self, fingerprint):
+        if self.current.count >= self.capacity:
+            self.previous = self.current
+            self.current = BloomFilter(self.capacity, self.error_rate)
+            self.rotations += 1
+        self.current.add(fingerprint)
+
+    @property
+    def memory_bytes(self):
+        return len(self.current.bits) * (1 if self.previous is None else 2)
+
+
+class Deduplicator:
+    """Decides per reading whether it was already ingested.
+
+    Readings still waiting to be written are checked first, then the
+    filter: fingerprints not in it are new (Bloom filters have no false
+    negatives for what they hold), and hits are confirmed against the
+    database. With conn=None (dry run) a filter hit counts as a duplicate.
+
+    Fingerprints only enter the filter once their batch is committed
+    (mark_written); a batch that is never stored is forgotten with
+    discard(), so its replay is not mistaken for a duplicate.
+
+    While the database cannot be read, a filter hit is taken as new: the
+    reading is analyzed again, and the unique fingerprint index keeps it
+    from being stored twice.
+    """
+
+    def __init__(self, conn=None, capacity=2_000_000, error_rate=1e-4):
+        self.conn = conn
+        self.filter = RotatingBloomFilter(capacity, error_rate)
+        self.unwritten = set()  # fingerprints buffered but not committed yet
+        self.stats = {"new": 0, "duplicates": 0, "db_checks": 0, "false_positives": 0,
+                      "db_errors": 0}
+
+    def warm(self, hours=6, chunk_size=100000):
+        """Load recent fingerprints so a restart does not forget them"""
+        if self.conn is None:
+            return 0
+        started = time.perf_counter()
+        count = 0
+        try:
+            for rows in db.iter_chunks(self.conn, RECENT_FINGERPRINTS_QUERY, (hours,),
+                                       chunk_size, name="dedup_warm"):
+                for (fingerprint,) in rows:
+                    self.filter.add(fingerprint)
+                count += len(rows)
+            self.conn.commit()
+        except Exception as error:
+            db.rollback(self.conn)
+            print(f"⚠ Dedup filter not warmed ({count} fingerprint(s) loaded): {error}")
+            return count
+        print(f"✓ Dedup filter warmed with {count} fingerprint(s) from the last {hours}h "
+              f"in {time.perf_counter() - started:.1f}s")
+        return count
+
+    def is_duplicate(self, gateway_id, fingerprint):
+        """True if the reading was seen before; otherwise records it"""
+        if fingerprint in self.unwritten:
+            self.stats["duplicates"] += 1
+            return True
+
+        if fingerprint not in self.filter:
+            self.unwritten.add(fingerprint)
+            self.stats["new"] += 1
+            return False
+
+        if self.conn is None:
+            duplicate = True
+        else:
+            self.stats["db_checks"] += 1
+            try:
+                with self.conn.cursor() as cur:
+                    cur.execute(FINGERPRINT_EXISTS_QUERY, (gateway_id, fingerprint))
+                    duplicate = cur.fetchone() is not None
+            except Exception:
+                db.rollback(self.conn)
+                self.stats["db_errors"] += 1
+                self.stats["new"] += 1
+                self.unwritten.add(fingerprint)
+                return False
+
+        if duplicate:
+            self.stats["duplicates"] += 1
+            return True
+
+        self.stats["false_positives"] += 1
+        self.stats["new"] += 1
+        self.unwritten.add(fingerprint)
+        return False
+
+    def mark_written(self):
+        """Buffered readings were committed; the filter and database now guard them"""
+        for fingerprint in self.unwritten:
+            self.filter.add(fingerprint)
+        self.unwritten.clear()
+
+    def discard(self):
+        """Buffered readings were not stored; a redelivery must be accepted"""
+        self.unwritten.clear()
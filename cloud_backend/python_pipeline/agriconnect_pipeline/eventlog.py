@@ -0,0 +1,169 @@
+"""
+Sampled Event Log
+Structured per-message logging for the ingest pipeline that stays off the
+hot path. The Node.js subscriber prints 10-20 console lines per reading
+(topic, "Data stored", every disease risk and anomaly, separators); at
+fleet scale that costs more than the analysis.
+
+event() checks the category's sampling rate and appends a tuple to an
+in-memory queue; formatting and writing happen on a background thread
+that writes JSON lines in batches. Warnings and errors are never
+sampled out, and each error also brings along the records sampled out
+just before it and keeps the next few, so a burst of failures arrives
+with its context.
+
+Categories used by ingest and their default rates:
+
+    reading     1 in 1000  received / stored
+    duplicate   1 in 100   redelivery or replay skipped
+    insight     1 in 100   disease risks, anomalies, irrigation, nutrients
+    alert       all        alerts generated
+"""
+
+import json
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+DEFAULT_RATES = {"reading": 0.001, "duplicate": 0.01, "insight": 0.01, "alert": 1.0}
+
+LEVELS = ("debug", "info", "warning", "error")
+
+
+def parse_rates(specs):
+    """{"category": rate} from ["category=rate", ...] (command-line form)"""
+    rates = {}
+    for spec in specs or ():
+        category, _, rate = spec.partition("=")
+        rates[category.strip()] = float(rate)
+    return rates
+
+
+class EventLog:
+    """Queue-backed, sampled JSON-lines log for one process.
+
+    rates maps category -> fraction kept (0 to 1); categories not listed
+    are kept in full. Sampling is by counter (every n-th event), so it
+    costs no random numbers and keeps a steady share of each category.
+    Up to `context` sampled-out events are remembered and written when an
+    error follows, then the next `after` events are kept unsampled.
+
+    The queue holds at most queue_size events; beyond that info events
+    are dropped and counted, while warnings and errors are still queued.
+    """
+
+    def __init__(self, stream=None, path=None, rates=None, source=None, queue_size=100000,
+                 context=50, after=20, flush_interval=0.25):
+        rates = {**DEFAULT_RATES, **(rates or {})}
+        # Keep every n-th event; 0 means never (still eligible as context)
+        self.periods = {category: (round(1 / rate) if rate > 0 else 0)
+                        for category, rate in rates.items() if rate < 1}
+        self.counters = dict.fromkeys(self.periods, 0)
+        self.source = source
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.after = after
+
+        self.queue = deque()
+        self.recent = deque(maxlen=context)   # sampled-out events, newest last
+        self.keep = 0                         # events still to keep after an error
+        self.stats = {"queued": 0, "sampled_out": 0, "dropped": 0, "written": 0}
+
+        self._path = path
+        self._stream = stream
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ==========================================
+    # HOT PATH
+    # ==========================================
+
+    def event(self, category, message, fields=None, level="info"):
+        """Log one event; returns immediately (no formatting or I/O here)"""
+        entry = (time.time(), level, category, message, fields)
+        period = self.periods.get(category)
+        if period is not None and level == "info" and not self.keep:
+            count = self.counters[category] = self.counters[category] + 1
+            if not period or count % period:
+                self.recent.append(entry)
+                self.stats["sampled_out"] += 1
+                return
+        if self.keep:
+            self.keep -= 1
+        if len(self.queue) >= self.queue_size and level == "info":
+            self.stats["dropped"] += 1
+            return
+        self.queue.append(entry)
+        self.stats["queued"] += 1
+
+    def warning(self, category, message, fields=None):
+        self.event(category, message, fields, "warning")
+
+    def error(self, category, message, fields=None):
+        """Log an error with the events sampled out just before it"""
+        while self.recent:
+            entry = self.recent.popleft()
+            self.queue.append(entry[:4] + ({**(entry[4] or {}), "context": True},))
+            self.stats["queued"] += 1
+        self.keep = self.after
+        self.event(category, message, fields, "error")
+        self._wake.set()
+
+    # ==========================================
+    # WRITER
+    # ==========================================
+
+    def start(self):
+        self._thread = threading.Thread(target=self._writer, name="eventlog", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Write everything still queued and stop the writer"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _writer(self):
+        stream = self._stream
+        owned = stream is None and self._path is not None
+        if owned:
+            stream = open(self._path, "a", encoding="utf-8", buffering=1 << 16)
+        elif stream is None:
+            stream = sys.stderr
+        try:
+            while True:
+                stopping = self._stop.is_set()
+                self._write_batch(stream)
+                if stopping:
+                    break
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+            self._write_batch(stream)
+        finally:
+            if owned:
+                stream.close()
+
+    def _write_batch(self, stream):
+        queue = self.queue
+        lines = []
+        while queue:
+            at, level, category, message, fields = queue.popleft()
+            record = {"ts": datetime.fromtimestamp(at, timezone.utc).isoformat(
+                          timespec="milliseconds"),
+                      "level": level, "category": category, "msg": message}
+            if self.source is not None:
+                record["source"] = self.source
+            if fields:
+                record.update(fields)
+            lines.append(json.dumps(record, default=str))
+        if lines:
+            lines.append("")
+            stream.write("\n".join(lines))
+            stream.flush()
+            self.stats["written"] += len(lines) - 1
@@ -0,0 +1,521 @@
+"""
+Realtime Fan-out
+Pushes live zone values to open dashboards over WebSocket, replacing the
+Supabase Realtime subscription on sensor_readings through which every
+dashboard received every row and updated cards, charts and map one
+reading at a time.
+
+Ingest workers publish each commit batch once, as the latest values per
+zone, to a local JSON-lines port. The service keeps one channel per farm
+holding the current values of every zone and what changed since the last
+tick. Every tick (1 s by default) each channel with changes encodes one
+delta frame, holding only the changed fields, and writes the same bytes
+to all of its subscribers:
+
+    {"t":"d","s":42,"ts":1750000000000,"z":{"GW-CM-BUE-001/1/3":{"soil_moisture":512}}}
+
+A new subscriber first gets a snapshot frame ("t":"s") of every zone.
+A subscriber whose socket buffer is above the high-water mark is not
+sent more deltas: intermediate frames are dropped, and once its buffer
+has drained it gets one fresh snapshot instead. A slow dashboard never
+makes the service buffer without limit, and it never falls further behind.
+
+Dashboards connect to ws://<host>:<port>/farms/<farm_id>. Browsers
+cannot set headers on a WebSocket, so the Supabase access token travels
+as a subprotocol: the dashboard offers "agriconnect.v1" and
+"bearer.<token>", and the service accepts only "agriconnect.v1" once the
+token is verified as in the delta sync service and its
+app_metadata.farm_ids claim lists the farm. Only then is the farm's
+channel created; one that was never published to goes away with its
+last subscriber, so requests for made-up farm IDs leave nothing behind.
+WebSocket framing is implemented here on asyncio streams (server frames,
+ping and close only), so the service needs nothing beyond the standard
+library.
+
+Usage:
+    python -m agriconnect_pipeline.fanout --port 8765 --publish-port 8766
+    python -m agriconnect_pipeline.ingest --fanout 127.0.0.1:8766
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import signal
+import socket
+import struct
+import time
+import urllib.parse
+
+from .config import load_config
+from .readings import SENSOR_FIELDS, SYSTEM_FIELDS
+from .sync import verify_token
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_TEXT, OP_CLOSE, OP_PING, OP_PONG = 0x1, 0x8, 0x9, 0xA
+MAX_CLIENT_FRAME = 4096          # dashboards only send control frames
+SUBPROTOCOL = "agriconnect.v1"
+TOKEN_PREFIX = "bearer."         # subprotocol carrying the access token
+
+JSON_SEPARATORS = (",", ":")
+
+
+def live_fields(sensors, system, reading_time):
+    """{column: value} pushed for one reading, named like sensor_readings columns"""
+    fields = {}
+    for mapping, source in ((SENSOR_FIELDS, sensors), (SYSTEM_FIELDS, system)):
+        for column, key in mapping:
+            value = source.get(key)
+            if value is not None:
+                fields[column] = value
+    fields["reading_time"] = reading_time.isoformat(timespec="seconds")
+    return fields
+
+
+# ==========================================
+# WEBSOCKET FRAMING
+# ==========================================
+
+def encode_frame(payload, opcode=OP_TEXT):
+    """One unmasked, unfragmented server frame"""
+    length = len(payload)
+    if length < 126:
+        header = bytes((0x80 | opcode, length))
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+async def read_frame(reader):
+    """(opcode, payload) of the next client frame, unmasked"""
+    head = await reader.readexactly(2)
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", await reader.readexactly(8))[0]
+    if length > MAX_CLIENT_FRAME:
+        raise ValueError(f"client frame of {length} bytes")
+    mask = await reader.readexactly(4) if head[1] & 0x80 else None
+    payload = await reader.readexactly(length)
+    if mask is not None:
+        payload = bytes(b ^ mask[i & 3] for i, b in enumerate(payload))
+    return head[0] & 0x0F, payload
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+def _json_frame(message):
+    return encode_frame(json.dumps(message, separators=JSON_SEPARATORS).encode())
+
+
+# ==========================================
+# CHANNELS
+# ==========================================
+
+class Subscriber:
+    """One dashboard connection"""
+
+    __slots__ = ("transport", "farm_id", "stale")
+
+    def __init__(self, transport, farm_id):
+        self.transport = transport
+        self.farm_id = farm_id
+        self.stale = False       # frames were dropped; resync with a snapshot
+
+
+class Channel:
+    """One farm: current values per zone, changes since the last tick, subscribers"""
+
+    __slots__ = ("farm_id", "state", "changes", "subscribers", "stale", "seq", "_snapshot")
+
+    def __init__(self, farm_id):
+        self.farm_id = farm_id
+        self.state = {}          # zone key -> {column: value}
+        self.changes = {}        # zone key -> {column: value} changed since the last tick
+        self.subscribers = set()
+        self.stale = set()       # subscribers waiting for their buffer to drain
+        self.seq = 0
+        self._snapshot = None    # (seq, frame) of the last snapshot encoded
+
+    def update(self, zone, fields):
+        """Merge one zone's latest values; only real changes are queued for the tick"""
+        current = self.state.get(zone)
+        if current is None:
+            current = self.state[zone] = {}
+        changed = None
+        for column, value in fields.items():
+            if column not in current or current[column] != value:
+                current[column] = value
+                if changed is None:
+                    changed = self.changes.get(zone)
+                    if changed is None:
+                        changed = self.changes[zone] = {}
+                changed[column] = value
+
+    def delta_frame(self, now_ms):
+        """Frame with the changes since the last tick, which it clears"""
+        self.seq += 1
+        frame = _json_frame({"t": "d", "s": self.seq, "ts": now_ms, "z": self.changes})
+        self.changes = {}
+        return frame
+
+    def snapshot_frame(self, now_ms):
+        """Frame with every zone's values, shared by everyone resyncing at this seq"""
+        if self._snapshot is None or self._snapshot[0] != self.seq:
+            self._snapshot = (self.seq, _json_frame({"t": "s", "s": self.seq, "ts": now_ms,
+                                                     "z": self.state}))
+        return self._snapshot[1]
+
+
+class FanoutHub:
+    """Per-farm channels, coalesced into one frame per channel per tick.
+
+    publish() and flush() are plain methods; run() calls flush() every
+    tick on the running event loop. Subscribers are written to through
+    their transports without awaiting, and anyone whose write buffer is
+    over high_water bytes skips frames until it has drained below
+    low_water, then gets a snapshot. Each socket's kernel send buffer is
+    capped at send_buffer, so a slow dashboard shows up in the transport
+    buffer instead of hiding in (and growing) kernel memory.
+    """
+
+    def __init__(self, tick=1.0, high_water=64 * 1024, low_water=None, send_buffer=32 * 1024):
+        self.tick = tick
+        self.send_buffer = send_buffer
+        self.high_water = high_water
+        self.low_water = high_water // 4 if low_water is None else low_water
+        self.channels = {}
+        self.stats = {"published": 0, "subscribers": 0, "frames": 0, "bytes": 0,
+                      "dropped": 0, "snapshots": 0, "rejected": 0}
+
+    def channel(self, farm_id):
+        channel = self.channels.get(farm_id)
+        if channel is None:
+            channel = self.channels[farm_id] = Channel(farm_id)
+        return channel
+
+    def publish(self, farm_id, zones):
+        """Merge {zone key: {column: value}} into the farm's channel"""
+        channel = self.channel(farm_id)
+        for zone, fields in zones.items():
+            channel.update(zone, fields)
+        self.stats["published"] += len(zones)
+
+    def subscribe(self, farm_id, transport):
+        channel = self.channel(farm_id)
+        subscriber = Subscriber(transport, farm_id)
+        channel.subscribers.add(subscriber)
+        self.stats["subscribers"] += 1
+        # Changes not yet flushed are already in state, so the next delta
+        # repeats them harmlessly
+        self._write(subscriber, channel.snapshot_frame(int(time.time() * 1000)))
+        self.stats["snapshots"] += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        channel = self.channels.get(subscriber.farm_id)
+        if channel is not None and subscriber in channel.subscribers:
+            channel.subscribers.discard(subscriber)
+            channel.stale.discard(subscriber)
+            self.stats["subscribers"] -= 1
+            # Channels with published values stay: their state is the next
+            # subscriber's snapshot, and deltas alone would leave zones partial
+            if not channel.subscribers and not channel.state:
+                del self.channels[subscriber.farm_id]
+
+    def close(self):
+        """Hang up on every subscriber (dashboards reconnect on their own)"""
+        for channel in self.channels.values():
+            for subscriber in channel.subscribers:
+                subscriber.transport.close()
+
+    def _write(self, subscriber, frame):
+        subscriber.transport.write(frame)
+        self.stats["frames"] += 1
+        self.stats["bytes"] += len(frame)
+
+    def flush(self, now_ms=None):
+        """Send this tick's delta on every changed channel; resync drained subscribers"""
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        high_water, low_water = self.high_water, self.low_water
+        for channel in self.channels.values():
+            if channel.stale:
+                for subscriber in list(channel.stale):
+                    if subscriber.transport.get_write_buffer_size() <= low_water:
+                        channel.stale.discard(subscriber)
+                        subscriber.stale = False
+                        self._write(subscriber, channel.snapshot_frame(now_ms))
+                        self.stats["snapshots"] += 1
+            if not channel.changes:
+                continue
+            if not channel.subscribers:
+                # Nobody to tell; the next snapshot is built from state
+                channel.seq += 1
+                channel.changes = {}
+                continue
+            frame = channel.delta_frame(now_ms)
+            for subscriber in channel.subscribers:
+                if subscriber.stale:
+                    self.stats["dropped"] += 1
+                elif subscriber.transport.get_write_buffer_size() > high_water:
+                    subscriber.stale = True
+                    channel.stale.add(subscriber)
+                    self.stats["dropped"] += 1
+                else:
+                    self._write(subscriber, frame)
+
+    async def run(self, stop):
+        """flush() every tick until stop is set"""
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while not stop.is_set():
+            self.flush()
+            # Fixed schedule: a slow flush shortens the next wait instead of drifting
+            next_tick += self.tick
+            try:
+                await asyncio.wait_for(stop.wait(), max(0.0, next_tick - loop.time()))
+            except asyncio.TimeoutError:
+                pass
+
+
+# ==========================================
+# CONNECTIONS
+# ==========================================
+
+def _http_error(writer, status):
+    writer.write(f"HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+                 .encode())
+    writer.close()
+
+
+def token_farms(claims):
+    """Farm IDs an access token may follow: its app_metadata.farm_ids claim
+    (set per user with the service role), or a single app_metadata.farm_id"""
+    metadata = claims.get("app_metadata")
+    if not isinstance(metadata, dict):
+        return frozenset()
+    farms = metadata.get("farm_ids")
+    if farms is None and metadata.get("farm_id") is not None:
+        farms = [metadata["farm_id"]]
+    if not isinstance(farms, list):
+        return frozenset()
+    return frozenset(str(farm_id) for farm_id in farms)
+
+
+def handshake_token(headers):
+    """Access token offered as a "bearer.<token>" subprotocol, else None"""
+    for protocol in headers.get("sec-websocket-protocol", "").split(","):
+        protocol = protocol.strip()
+        if protocol.startswith(TOKEN_PREFIX):
+            return protocol[len(TOKEN_PREFIX):]
+    return None
+
+
+async def handle_dashboard(hub, reader, writer, secret=None, handshake_timeout=10.0):
+    """Upgrade GET /farms/<farm_id> to a WebSocket and keep it subscribed.
+
+    With a secret, the handshake must offer a valid Supabase access token
+    (see handshake_token) whose farm claim includes the farm (token_farms);
+    without one, auth is off (local testing).
+    """
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), handshake_timeout)
+    except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+            ConnectionError):
+        writer.close()
+        return
+    lines = head.decode("latin-1").split("\r\n")
+    method, _, rest = lines[0].partition(" ")
+    path = rest.split(" ")[0].split("?")[0]
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    parts = path.strip("/").split("/")
+    if method != "GET" or len(parts) != 2 or parts[0] != "farms" or not parts[1]:
+        _http_error(writer, "404 Not Found")
+        return
+    key = headers.get("sec-websocket-key")
+    if headers.get("upgrade", "").lower() != "websocket" or not key:
+        _http_error(writer, "400 Bad Request")
+        return
+    farm_id = urllib.parse.unquote(parts[1])
+    if secret is not None:
+        token = handshake_token(headers)
+        claims = None if token is None else verify_token(token, secret)
+        if claims is None:
+            hub.stats["rejected"] += 1
+            _http_error(writer, "401 Unauthorized")
+            return
+        if farm_id not in token_farms(claims):
+            hub.stats["rejected"] += 1
+            _http_error(writer, "403 Forbidden")
+            return
+    # Echo the plain subprotocol (never the token) when one was offered
+    offered = {p.strip() for p in headers.get("sec-websocket-protocol", "").split(",")}
+    protocol = f"Sec-WebSocket-Protocol: {SUBPROTOCOL}\r\n" if SUBPROTOCOL in offered else ""
+
+    sock = writer.get_extra_info("socket")
+    if sock is not None and hub.send_buffer:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, hub.send_buffer)
+    writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                  f"Connection: Upgrade\r\n{protocol}"
+                  f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n").encode())
+    subscriber = hub.subscribe(farm_id, writer.transport)
+    try:
+        while True:
+            opcode, payload = await read_frame(reader)
+            if opcode == OP_CLOSE:
+                writer.write(encode_frame(payload[:2], OP_CLOSE))
+                break
+            if opcode == OP_PING:
+                writer.write(encode_frame(payload, OP_PONG))
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+        pass
+    finally:
+        hub.unsubscribe(subscriber)
+        writer.close()
+
+
+async def handle_publisher(hub, reader, writer):
+    """JSON lines of {"farm": ..., "zones": {zone key: {column: value}}} from ingest"""
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                message = json.loads(line)
+                hub.publish(message["farm"], message["zones"])
+            except (ValueError, KeyError, TypeError, AttributeError) as error:
+                print(f"✗ Bad fan-out update: {error}")
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+class FanoutPublisher:
+    """Sends zone updates from an ingest worker to the fan-out service.
+
+    Live values are best-effort: if the service is down or slow, the
+    update is dropped and the connection is retried after retry seconds,
+    so ingest never waits on dashboards for more than timeout.
+    """
+
+    def __init__(self, host, port, timeout=0.5, retry=5.0):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.retry = retry
+        self.sock = None
+        self.retry_at = 0.0
+        self.stats = {"sent": 0, "failed": 0}
+
+    @classmethod
+    def from_address(cls, address):
+        """From "host:port" (command-line form)"""
+        host, _, port = address.rpartition(":")
+        return cls(host or "127.0.0.1", int(port))
+
+    def publish(self, updates):
+        """Send {farm_id: {zone key: {column: value}}}; returns whether it went out"""
+        if not updates:
+            return True
+        if self.sock is None:
+            if time.monotonic() < self.retry_at:
+                self.stats["failed"] += 1
+                return False
+            try:
+                self.sock = socket.create_connection(self.address, self.timeout)
+            except OSError:
+                return self._failed()
+        data = "".join(json.dumps({"farm": farm_id, "zones": zones}, separators=JSON_SEPARATORS)
+                       + "\n" for farm_id, zones in updates.items()).encode()
+        try:
+            self.sock.sendall(data)
+        except OSError:
+            return self._failed()
+        self.stats["sent"] += 1
+        return True
+
+    def _failed(self):
+        self.close()
+        self.retry_at = time.monotonic() + self.retry
+        self.stats["failed"] += 1
+        return False
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+# ==========================================
+# SERVICE
+# ==========================================
+
+async def serve(args, secret):
+    hub = FanoutHub(tick=args.tick, high_water=args.high_water)
+    dashboards = await asyncio.start_server(
+        lambda reader, writer: handle_dashboard(hub, reader, writer, secret), args.host,
+        args.port, backlog=4096)
+    publishers = await asyncio.start_server(
+        lambda reader, writer: handle_publisher(hub, reader, writer), "127.0.0.1",
+        args.publish_port)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    runner = asyncio.create_task(hub.run(stop))
+    print(f"✓ Fan-out on ws://{args.host}:{args.port}/farms/<farm_id> "
+          f"(updates on 127.0.0.1:{args.publish_port}, {args.tick:g}s tick)")
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), 60)
+        except asyncio.TimeoutError:
+            print(f"[STATS] {len(hub.channels)} farms, {hub.stats}")
+
+    print("\n🛑 Shutting down gracefully...")
+    await runner
+    for server in (dashboards, publishers):
+        server.close()
+    hub.close()
+    for server in (dashboards, publishers):
+        await server.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WebSocket fan-out of live zone values")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Dashboard interface (put TLS in front of it)")
+    parser.add_argument("--port", type=int, default=8765, help="Dashboard WebSocket port")
+    parser.add_argument("--publish-port", type=int, default=8766,
+                        help="Local port ingest workers send updates to")
+    parser.add_argument("--tick", type=float, default=1.0,
+                        help="Seconds updates are coalesced into one frame per farm")
+    parser.add_argument("--high-water", type=int, default=64 * 1024,
+                        help="Buffered bytes at which a slow dashboard starts skipping frames")
+    parser.add_argument("--no-auth", action="store_true",
+                        help="Skip access token checks (local testing only)")
+    args = parser.parse_args()
+
+    secret = None
+    if not args.no_auth:
+        secret = load_config().supabase_jwt_secret
+        if not secret:
+            raise RuntimeError("SUPABASE_JWT_SECRET is not set; use --no-auth for local testing")
+
+    asyncio.run(serve(args, secret))
+
+
+if __name__ == "__main__":
+    main()
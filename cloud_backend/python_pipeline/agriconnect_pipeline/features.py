@@ -0,0 +1,120 @@
+"""
+Feature Store
+Season-level feature vectors for yield modelling, read in chunks from
+harvest_records (training) and aggregated from sensor_readings (scoring)
+"""
+
+import numpy as np
+
+from .db import iter_chunks
+
+# Same inputs YieldForecast collects in the dashboard
+YIELD_FEATURES = (
+    "avg_soil_moisture",
+    "avg_temperature",
+    "total_rainfall",
+    "avg_ndvi",
+    "irrigation_hours",
+    "fertilization_level",
+)
+
+# Crop names as the dashboard lists them -> the farms.crop_type spelling.
+# Harvest records, farms, yield_predictions and the crop rule tables all go
+# through crop_key, so a model trained on "tomatoes" scores and is found for
+# "tomato" farms, and a "Tomatoes" farm gets the tomato rules.
+CROP_ALIASES = {
+    "tomatoes": "tomato",
+}
+
+TRAINING_QUERY = f"""
+    SELECT crop_type, {', '.join(YIELD_FEATURES)}, actual_yield_kg_ha
+    FROM harvest_records
+    WHERE actual_yield_kg_ha IS NOT NULL
+    ORDER BY crop_type, id
+"""
+
+# Current-season features per zone. Rainfall and fertilization are not
+# measured by the field nodes, so they come back NULL and are imputed by
+# the model with the training mean.
+ZONE_FEATURES_QUERY = """
+    SELECT g.farm_id,
+           COALESCE(f.crop_type, 'tomato') AS crop_type,
+           r.field_id,
+           r.zone_id,
+           AVG(r.soil_moisture)   AS avg_soil_moisture,
+           AVG(r.air_temperature) AS avg_temperature,
+           NULL::numeric          AS total_rainfall,
+           ndvi.mean_ndvi         AS avg_ndvi,
+           SUM(CASE WHEN r.pump_status THEN COALESCE(n.sample_interval, 60) ELSE 0 END)
+               / 3600.0           AS irrigation_hours,
+           NULL::numeric          AS fertilization_level
+    FROM sensor_readings r
+    JOIN gateways g ON g.gateway_id = r.gateway_id
+    LEFT JOIN farms f ON f.farm_id = g.farm_id
+    LEFT JOIN field_nodes n
+           ON n.gateway_id = r.gateway_id AND n.field_id = r.field_id AND n.zone_id = r.zone_id
+    LEFT JOIN LATERAL (
+        SELECT mean_ndvi FROM satellite_ndvi_history h
+        WHERE h.farm_id = g.farm_id
+        ORDER BY analysis_date DESC LIMIT 1
+    ) ndvi ON TRUE
+    WHERE r.reading_time >= %(season_start)s
+      AND r.data_valid
+    GROUP BY g.farm_id, f.crop_type, r.field_id, r.zone_id, ndvi.mean_ndvi
+"""
+
+
+def crop_key(crop):
+    """Canonical crop name used to train, store and look up yield models"""
+    crop = (crop or "tomato").strip().lower()
+    return CROP_ALIASES.get(crop, crop)
+
+
+def _to_float(value):
+    return np.nan if value is None else float(value)
+
+
+def load_training_sets(conn, chunk_size=10000):
+    """Load harvest records grouped by crop as (X, y) float arrays.
+
+    Rows are streamed in chunks and converted per chunk, so memory use is
+    bounded by the final arrays rather than by Python row objects.
+    """
+    blocks = {}
+    width = len(YIELD_FEATURES)
+    for rows in iter_chunks(conn, TRAINING_QUERY, chunk_size=chunk_size, name="yield_training"):
+        crops = np.array([crop_key(row[0]) for row in rows], dtype=object)
+        values = np.array(
+            [[_to_float(v) for v in row[1:]] for row in rows], dtype=np.float64
+        )
+        for crop in np.unique(crops):
+            mask = crops == crop
+            blocks.setdefault(crop, []).append(values[mask])
+
+    training_sets = {}
+    for crop, parts in blocks.items():
+        data = np.vstack(parts)
+        training_sets[crop] = (data[:, :width], data[:, width])
+    return training_sets
+
+
+def load_zone_features(conn, season_start, chunk_size=10000):
+    """Aggregate current-season features for every zone, grouped by crop.
+
+    Returns {crop: (keys, X)} where keys is a list of
+    (farm_id, field_id, zone_id) tuples aligned with the rows of X.
+    """
+    grouped = {}
+    params = {"season_start": season_start}
+    for rows in iter_chunks(conn, ZONE_FEATURES_QUERY, params, chunk_size, name="yield_zones"):
+        for row in rows:
+            farm_id, crop, field_id, zone_id = row[:4]
+            crop = crop_key(crop)
+            keys, vectors = grouped.setdefault(crop, ([], []))
+            keys.append((farm_id, field_id, zone_id))
+            vectors.append([_to_float(v) for v in row[4:]])
+
+    return {
+        crop: (keys, np.array(vectors, dtype=np.float64))
+        for crop, (keys, vectors) in grouped.items()
+    }
@@ -0,0 +1,993 @@
+"""
+Sharded Ingest Supervisor
+Consumes agriconnect/data/# and spreads readings over a pool of worker
+processes, so parsing, storage and analysis use every core and one slow
+write no longer stalls every farm.
+
+Readings are sharded by zone (gateway_id, field_id, zone_id) with
+rendezvous hashing. Each zone belongs to exactly one worker and each
+worker reads one FIFO queue, so a zone's readings are analyzed in arrival
+order and its alert cooldown state lives in one place. Queues are bounded:
+when a worker falls behind, the MQTT thread blocks instead of buffering
+without limit, and unacknowledged QoS 1 messages stay with the broker.
+
+Adding a worker moves only the zones the new worker wins. Their previous
+owner finishes everything queued for them, hands over their cooldown
+state, and the new worker holds their readings until that state arrives.
+
+Alerts cross zones, and so workers: workers return them to the
+supervisor, which correlates them into farm-level incidents (see
+correlate.py) and writes those instead of one alerts row per zone.
+
+With --metrics-port each worker times its stages (see metrics.py) and
+sends the supervisor a snapshot about once a second; the merged
+histograms are served at http://127.0.0.1:<port>/metrics.
+
+Per-reading logging goes through a sampled event log (see eventlog.py),
+one JSON-lines file per worker with --log-dir, stderr otherwise.
+
+With --fanout each worker also sends the latest values per zone of every
+commit batch to the dashboard fan-out service (see fanout.py).
+
+Thresholds follow each farm's crop and growth stage from the rule files
+(see rules.py), which are reloaded when they change.
+
+Pump runtime and cycles (see pumps.py) and hourly disease risk (see
+risk.py) are accounted in the transaction of each commit batch.
+
+Usage:
+    python -m agriconnect_pipeline.ingest --workers 8
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta, timezone
+
+from . import db
+from .backfill import LOCAL_TZ
+from .config import load_config
+from .correlate import DEFAULT_WINDOW, Correlator, write_incidents
+from .dedup import Deduplicator, reading_fingerprint
+from .eventlog import EventLog, parse_rates
+from .fanout import FanoutPublisher, live_fields
+from .intelligence import AlertManager, Analyzers
+from .intelligence.alerts import ALERT_COLUMNS
+from .metrics import NULL_METRICS, Metrics, MetricsAggregate
+from .mqtt_client import create_client
+from .pumps import PumpAccounting
+from .reading_types import COPY_COLUMNS, ReadingBatch
+from .readings import quantize
+from .risk import RiskTimeline
+from .rules import DEFAULT_CROP, RuleRegistry, farm_profiles, sensor_values
+
+DATA_TOPIC = "agriconnect/data/#"
+
+ALERT_CREATED_AT = ALERT_COLUMNS.index("created_at")
+
+# Backoff for a failed batch write; a stopping worker gives up after STOP_RETRIES
+RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 30.0
+STOP_RETRIES = 3
+
+# A parsed and buffered reading waiting for the batch's rule evaluation
+Prepared = namedtuple("Prepared", "key topic message context sensors system now started")
+
+GATEWAY_FARMS_QUERY = "SELECT gateway_id, farm_id FROM gateways"
+
+INSERT_READING = (f"INSERT INTO sensor_readings ({', '.join(COPY_COLUMNS)}) "
+                  f"VALUES ({', '.join(['%s'] * len(COPY_COLUMNS))}) "
+                  f"ON CONFLICT (gateway_id, reading_fingerprint) DO NOTHING")
+
+
+def zone_key(topic):
+    """(gateway_id, field_id, zone_id) from agriconnect/data/{gw}/{field}/{zone}"""
+    parts = topic.split("/")
+    return parts[2], int(parts[3]), int(parts[4])
+
+
+class ShardRing:
+    """Rendezvous (highest random weight) hashing of zones onto workers.
+
+    Growing from n to n + 1 workers only moves zones to the new worker,
+    about 1/(n + 1) of them; every other zone keeps its owner.
+    """
+
+    def __init__(self, workers):
+        self.workers = workers
+
+    @staticmethod
+    def weight(worker, key):
+        digest = hashlib.blake2b(f"{worker}|{key[0]}|{key[1]}|{key[2]}".encode(),
+                                 digest_size=8).digest()
+        return int.from_bytes(digest, "big")
+
+    def owner(self, key):
+        return max(range(self.workers), key=lambda worker: self.weight(worker, key))
+
+
+class FarmDirectory:
+    """gateway_id -> farm_id, loaded in bulk and reloaded every ttl seconds.
+
+    While the database cannot be read the last loaded map is kept, and
+    the load is tried again after negative_ttl.
+    """
+
+    def __init__(self, conn, default_farm_id, ttl=600.0, negative_ttl=60.0):
+        self.conn = conn
+        self.default_farm_id = default_farm_id
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.farms = {}
+        self.loaded_at = float("-inf")
+
+    def load(self):
+        if self.conn is not None:
+            try:
+                with self.conn.cursor() as cur:
+                    cur.execute(GATEWAY_FARMS_QUERY)
+                    self.farms = dict(cur.fetchall())
+                self.conn.commit()
+            except Exception as error:
+                db.rollback(self.conn)
+                print(f"⚠ Gateway farms not reloaded, keeping {len(self.farms)}: {error}")
+                self.loaded_at = time.monotonic() - self.ttl + self.negative_ttl
+                return
+        self.loaded_at = time.monotonic()
+
+    def farm_for(self, gateway_id):
+        age = time.monotonic() - self.loaded_at
+        # An unknown gateway triggers at most one reload per negative_ttl
+        if age > self.ttl or (gateway_id not in self.farms and age > self.negative_ttl):
+            self.load()
+        return self.farms.get(gateway_id, self.default_farm_id)
+
+
+class FarmRules:
+    """farm_id -> Analyzers with the thresholds of its crop and growth stage.
+
+    Profiles come from the compiled rule tables (see rules.py) and farms'
+    crop_type and planting_date. They are resolved again every ttl seconds,
+    since growth stages move with the date, and whenever the registry has
+    reloaded changed rule files. Analyzers are built once per profile row.
+    While the farms cannot be read their last profiles are kept (all
+    farms fall back to the default crop if the rule tables changed), and
+    the read is tried again after retry seconds.
+    """
+
+    def __init__(self, conn, registry, ttl=600.0, retry=60.0):
+        self.conn = conn
+        self.registry = registry
+        self.ttl = ttl
+        self.retry = retry
+        self.tables = None
+        self.profiles = {}               # farm_id -> profile row
+        self.analyzers = {}              # profile row -> Analyzers
+        self.loaded_at = float("-inf")
+
+    def load(self):
+        changed = self.registry.current is not self.tables
+        self.tables = self.registry.current
+        self.analyzers = {}
+        if self.conn is not None:
+            try:
+                self.profiles = farm_profiles(self.conn, self.tables,
+                                              datetime.now(LOCAL_TZ).date())
+                self.conn.commit()
+            except Exception as error:
+                db.rollback(self.conn)
+                if changed:
+                    self.profiles = {}   # rows of the old tables
+                print(f"⚠ Farm crop profiles not reloaded: {error}")
+                self.loaded_at = time.monotonic() - self.ttl + self.retry
+                return
+        self.loaded_at = time.monotonic()
+
+    def maybe_reload(self):
+        """Pick up changed rule files and the farms' current stages"""
+        self.registry.maybe_reload()
+        if (self.registry.current is not self.tables
+                or time.monotonic() - self.loaded_at > self.ttl):
+            self.load()
+
+    def profile_for(self, farm_id):
+        row = self.profiles.get(farm_id)
+        return self.tables.profile(DEFAULT_CROP) if row is None else row
+
+    def analyzers_for(self, row):
+        """Disease, irrigation and cross-sensor checks for a profile row"""
+        analyzers = self.analyzers.get(row)
+        if analyzers is None:
+            analyzers = self.analyzers[row] = Analyzers(self.tables.overrides_for(row))
+        return analyzers
+
+
+class ShardWorker:
+    """One worker process: analyzes its zones in order and bulk-writes results"""
+
+    def __init__(self, index, inbox, outbox, conn, default_farm_id, commit_rows=2000,
+                 metrics=False, metrics_interval=1.0, log=None, fanout=None, dsn=None):
+        self.index = index
+        self.inbox = inbox
+        self.outbox = outbox
+        self.conn = conn
+        self.dsn = dsn                   # to reconnect with
+        self.commit_rows = commit_rows
+        self.log = log or EventLog(source=f"worker-{index}")
+        self.fanout = fanout
+        self.live = {}                   # farm_id -> {zone key: latest live fields}
+        self.metrics = Metrics() if metrics else NULL_METRICS
+        self.metrics_interval = metrics_interval
+        self.metrics_sent_at = time.monotonic()
+        self.farms = FarmDirectory(conn, default_farm_id)
+        self.rules = FarmRules(conn, RuleRegistry())
+        self.dedup = Deduplicator(conn)
+        self.pumps = PumpAccounting(conn)
+        self.risk = RiskTimeline()
+        self.zones = {}                  # zone key -> AlertManager
+        self.last_seq = {}               # zone key -> last sequence number seen
+        self.pending = set()             # zones waiting for state from their old worker
+        self.held = defaultdict(list)    # readings for pending zones, in arrival order
+        self.readings = ReadingBatch()   # column arrays, written with one COPY
+        self.received = []               # received_at of each buffered reading
+        self.alerts = []
+        self.order_violations = 0
+        self.duplicates = 0
+        self.stopping = False
+
+    def run(self):
+        self.log.start()
+        try:
+            self._run()
+        finally:
+            self.log.close()
+            if self.fanout is not None:
+                self.fanout.close()
+
+    def _run(self):
+        self.farms.load()
+        self.rules.load()
+        self.dedup.warm()
+        # A stop can overtake the state for zones this worker just gained;
+        # keep reading until their readings have been released and processed
+        # With metrics on, an idle worker still ships its last snapshot
+        timeout = self.metrics_interval if self.metrics.enabled else None
+        while not (self.stopping and not self.pending):
+            self.rules.maybe_reload()
+            try:
+                item = self.inbox.get(timeout=timeout)
+            except queue.Empty:
+                self.send_metrics()
+                continue
+            kind = item[0]
+            if kind == "readings":
+                batch = []
+                for message in item[1]:
+                    key = zone_key(message[1])
+                    if key in self.pending:
+                        self.held[key].append(message)
+                    else:
+                        batch.append((key, message))
+                self.process(batch)
+            elif kind == "expect":
+                self.pending.update(item[2])
+            elif kind == "fence":
+                self.write()
+                self.pumps.forget(item[2])
+                states = {}
+                for key in item[2]:
+                    manager = self.zones.pop(key, None)
+                    states[key] = (manager.recent_alerts if manager else {},
+                                   self.last_seq.pop(key, -1))
+                self.outbox.put(("fenced", self.index, item[1], states))
+            elif kind == "adopt":
+                for key, (recent_alerts, last_seq) in item[1].items():
+                    manager = self.zones.setdefault(key, AlertManager())
+                    manager.recent_alerts.update(recent_alerts)
+                    self.last_seq[key] = max(self.last_seq.get(key, -1), last_seq)
+                    self.pending.discard(key)
+                    self.process([(key, message) for message in self.held.pop(key, ())])
+            elif kind == "stop":
+                self.stopping = True
+
+            if len(self.readings) >= self.commit_rows or self.inbox.empty():
+                self.write()
+        self.write()
+        self.send_metrics(force=True)
+
+    def process(self, batch):
+        """Buffer and analyze a batch of (zone key, message) in arrival order.
+
+        Readings are buffered first; the range and nutrient checks of the
+        whole batch then run in one RuleTables.evaluate call, and each
+        reading's insights and alerts are built from its row. A message
+        that cannot be handled is logged and dropped.
+        """
+        if not batch:
+            return
+        metrics = self.metrics
+        prepared = []
+        for key, message in batch:
+            try:
+                reading = self._prepare(key, message)
+            except Exception as error:
+                self._drop(message, error)
+                continue
+            if reading is not None:
+                prepared.append(reading)
+        if not prepared:
+            return
+
+        t = metrics.clock()
+        tables = self.rules.tables
+        profiles = [self.rules.profile_for(reading.context["farmId"]) for reading in prepared]
+        result = tables.evaluate(profiles, [sensor_values(reading.sensors) for reading in prepared])
+        metrics.observe("rules", t)
+
+        for row, reading in enumerate(prepared):
+            try:
+                thresholds = tables.findings(result, row, profiles[row], reading.sensors,
+                                             reading.context)
+                self._analyze(reading, thresholds, self.rules.analyzers_for(profiles[row]))
+            except Exception as error:
+                self._drop(reading.message, error)
+
+    def _drop(self, message, error):
+        # A bad message must not take the worker, and with it the zones' inbox, down
+        self.log.error("reading", "message dropped", {"topic": message[1],
+                                                      "error": repr(error)})
+        self.metrics.count("dropped")
+
+    def _prepare(self, key, message):
+        """Parse, dedup and buffer one reading; returns what _analyze needs, or
+        None for a bad payload or a duplicate"""
+        metrics = self.metrics
+        started = t = metrics.clock()
+        seq, topic, payload, received_at = message
+        if seq <= self.last_seq.get(key, -1):
+            self.order_violations += 1
+        self.last_seq[key] = seq
+
+        try:
+            data = json.loads(payload)
+            if not isinstance(data, dict):
+                raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+            for section in ("sensors", "system"):
+                if not isinstance(data.get(section) or {}, dict):
+                    raise ValueError(f"{section} must be a JSON object")
+        except ValueError as error:
+            self.log.error("reading", "bad payload", {"topic": topic, "error": str(error)})
+            metrics.count("parse_errors")
+            return
+        t = metrics.observe("parse", t)
+
+        gateway_id, field_id, zone_id = key
+        fingerprint = reading_fingerprint(gateway_id, field_id, zone_id,
+                                          data.get("timestamp"), payload)
+        duplicate = self.dedup.is_duplicate(gateway_id, fingerprint)
+        t = metrics.observe("dedup", t)
+        if duplicate:
+            # Redelivery or buffer replay: already stored and analyzed
+            self.duplicates += 1
+            metrics.count("duplicates")
+            self.log.event("duplicate", "redelivery or replay skipped", {"topic": topic})
+            return
+
+        now = datetime.fromtimestamp(received_at, timezone.utc)
+        self.readings.append_payload(gateway_id, field_id, zone_id, now, data, fingerprint)
+        self.received.append(received_at)
+        pump = (data.get("system") or {}).get("pumpStatus")
+        if pump is not None:
+            self.pumps.observe(key, received_at, pump)
+
+        context = {
+            "farmId": self.farms.farm_for(gateway_id),
+            "gatewayId": gateway_id,
+            "fieldId": field_id,
+            "zoneId": zone_id,
+        }
+        sensors = quantize(data.get("sensors") or {})
+        self.risk.observe(key, received_at, sensors)
+        if self.fanout is not None:
+            # Quantized, so sensor noise below display resolution is not a change
+            zones = self.live.setdefault(context["farmId"], {})
+            zones[f"{gateway_id}/{field_id}/{zone_id}"] = live_fields(
+                sensors, data.get("system") or {}, now)
+        metrics.observe("prepare", t)
+        return Prepared(key, topic, message, context, sensors, data.get("system") or {}, now,
+                        started)
+
+    def _analyze(self, reading, thresholds, analyzers):
+        """Insights and alerts of one prepared reading"""
+        metrics = self.metrics
+        key, topic, _, context, sensors, system, now, started = reading
+        insights = analyzers.analyze(sensors, system, context, now.astimezone(LOCAL_TZ),
+                                     metrics, thresholds)
+        t = metrics.clock()
+        manager = self.zones.get(key)
+        if manager is None:
+            manager = self.zones[key] = AlertManager()
+        alerts = manager.process_insights(insights, context, now)
+        for alert in alerts:
+            self.alerts.append(tuple(alert[c] for c in ALERT_COLUMNS))
+        metrics.observe("alerts", t)
+
+        # Fields are formatted by the log's writer thread, not here
+        log = self.log
+        log.event("reading", "received", {"topic": topic})
+        if (insights["diseases"] or insights["anomalies"] or insights["nutrients"]
+                or insights["irrigation"]):
+            log.event("insight", "analysis", {"topic": topic, "insights": insights})
+        for alert in alerts:
+            log.event("alert", alert["message"],
+                      {"topic": topic, "alert_type": alert["alert_type"],
+                       "severity": alert["severity"]})
+        metrics.observe("reading", started)
+        metrics.count("readings")
+        if alerts:
+            metrics.count("alerts", len(alerts))
+
+    def write(self):
+        """Store buffered readings in one transaction; their alerts go to the supervisor"""
+        if not self.readings and not self.duplicates:
+            return
+        readings, alerts, received = self.readings, self.alerts, self.received
+        self.readings, self.alerts, self.received = ReadingBatch(), [], []
+
+        if self.conn is not None and readings:
+            if self._store(readings):
+                self.dedup.mark_written()
+            else:
+                self.dedup.discard()
+                readings, alerts, received = [], [], []
+        else:
+            if readings:
+                # Dry run: pump accounting and risk hours stay in memory
+                self.pumps.write()
+                self.pumps.mark_written()
+                self.risk.write(None)
+                self.risk.mark_written()
+            self.dedup.mark_written()
+        if self.metrics.enabled:
+            # Receipt (or load generator send time) to committed write
+            done = time.time()
+            for at in received:
+                self.metrics.record("write_lag", int((done - at) * 1e9))
+
+        if self.live:
+            t = self.metrics.clock()
+            self.fanout.publish(self.live)
+            self.live = {}
+            self.metrics.observe("fanout", t)
+
+        self.outbox.put(("batch", self.index, len(readings), alerts,
+                         self.order_violations, self.duplicates))
+        self.order_violations = self.duplicates = 0
+        self.send_metrics()
+
+    def _store(self, readings):
+        """Write a batch with its pump and risk rows, retrying until it is committed.
+
+        Only transient errors (see db.is_transient) are retried. While it
+        retries the worker reads nothing, so its inbox fills and the MQTT
+        thread waits instead of dropping readings. Once stopping, the batch
+        is given up after STOP_RETRIES attempts. A batch the database
+        rejects (a value a column cannot hold, a constraint) is written
+        again one reading at a time, and the readings it still rejects are
+        quarantined in the log.
+        """
+        delay = RETRY_DELAY
+        attempt = 0
+        rows = None                      # readings one by one, after a rejected batch
+        while True:
+            t = self.metrics.clock()
+            try:
+                if rows is None:
+                    # The unique fingerprint index drops duplicates the filter
+                    # could not know about (e.g. zones just moved from another worker)
+                    db.insert_new_rows(self.conn, "sensor_readings", COPY_COLUMNS,
+                                       ("gateway_id", "reading_fingerprint"), readings)
+                else:
+                    rows = self._insert_each(rows)
+                self.pumps.write()
+                self.risk.write(self.conn)
+                self.conn.commit()
+                self.pumps.mark_written()
+                self.risk.mark_written()
+                self.metrics.observe("db_write", t)
+                return True
+            except Exception as error:
+                self._reconnect()
+                self.pumps.discard()
+                self.metrics.count("db_errors")
+                attempt += 1
+                fields = {"readings": len(readings), "attempt": attempt, "error": str(error)}
+                if not db.is_transient(error):
+                    if rows is None:
+                        self.log.warning("db", "batch rejected, writing readings one by one",
+                                         fields)
+                        rows = list(readings.rows())
+                        continue
+                    # Not the readings: the pump or risk rows cannot be stored either
+                    self.risk.clear()
+                    self.log.error("db", "batch write failed, readings lost", fields)
+                    return False
+                if self.stopping and attempt >= STOP_RETRIES:
+                    self.risk.clear()
+                    self.log.error("db", "batch write failed at shutdown, readings lost", fields)
+                    return False
+                fields["retry_in"] = delay
+                self.log.warning("db", "batch write failed, will retry", fields)
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    def _insert_each(self, rows):
+        """Insert rows one by one in the open transaction; returns those the database took"""
+        accepted = []
+        with self.conn.cursor() as cur:
+            for row in rows:
+                cur.execute("SAVEPOINT reading")
+                try:
+                    cur.execute(INSERT_READING, row)
+                except Exception as error:
+                    if db.is_transient(error):
+                        raise
+                    cur.execute("ROLLBACK TO SAVEPOINT reading")
+                    self.metrics.count("quarantined")
+                    self.log.error("db", "reading quarantined", {
+                        "reading": dict(zip(COPY_COLUMNS, row)), "error": str(error)})
+                    continue
+                cur.execute("RELEASE SAVEPOINT reading")
+                accepted.append(row)
+        return accepted
+
+    def _reconnect(self):
+        """Roll back, replacing the connection everywhere it is held if it broke;
+        False while the database cannot be reached"""
+        if self.conn is None:
+            return True
+        try:
+            conn = db.reset(self.conn, self.dsn)
+        except Exception as error:
+            self.log.warning("db", "reconnect failed", {"error": str(error)})
+            return False
+        if conn is not self.conn:
+            self.conn = self.farms.conn = self.rules.conn = conn
+            self.dedup.conn = self.pumps.conn = conn
+            self.log.warning("db", "reconnected")
+        return True
+
+    def send_metrics(self, force=False):
+        """Ship what was recorded since the last snapshot, at most every metrics_interval"""
+        if not self.metrics.enabled:
+            return
+        now = time.monotonic()
+        if not (self.metrics.histograms or self.metrics.counters):
+            return
+        if force or now - self.metrics_sent_at >= self.metrics_interval:
+            self.metrics_sent_at = now
+            self.outbox.put(("metrics", self.index, self.metrics.snapshot()))
+
+
+def _run_worker(index, inbox, outbox, dsn, default_farm_id, metrics=False, log_dir=None,
+                log_rates=None, fanout=None):
+    # Ctrl+C goes to the whole process group; the supervisor stops workers
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    conn = db.connect(dsn) if dsn else None
+    path = os.path.join(log_dir, f"ingest-worker-{index}.jsonl") if log_dir else None
+    log = EventLog(path=path, rates=log_rates, source=f"worker-{index}")
+    publisher = FanoutPublisher.from_address(fanout) if fanout else None
+    ShardWorker(index, inbox, outbox, conn, default_farm_id, metrics=metrics, log=log,
+                fanout=publisher, dsn=dsn).run()
+
+
+class IngestSupervisor:
+    """Shards incoming readings across worker processes.
+
+    submit() is called from the MQTT thread. Messages are grouped into
+    small per-worker batches (one queue operation per batch_size readings)
+    and flushed at least every flush_interval seconds. With dsn=None the
+    workers analyze but do not write (dry run / benchmarks). With
+    metrics=True the workers' stage timings are merged into self.metrics.
+    Workers log to log_dir/ingest-worker-<n>.jsonl (stderr without one),
+    sampled per category at log_rates over eventlog.DEFAULT_RATES.
+    With fanout="host:port" they publish live zone values there.
+    """
+
+    def __init__(self, workers, dsn=None, default_farm_id="FARM-CM-001",
+                 queue_size=20000, batch_size=200, flush_interval=0.02,
+                 correlation_window=DEFAULT_WINDOW, incident_interval=1.0, metrics=False,
+                 log_dir=None, log_rates=None, fanout=None, watch_interval=1.0):
+        self.dsn = dsn
+        self.fanout = fanout
+        self.log_dir = log_dir
+        self.log_rates = log_rates
+        self.metrics = MetricsAggregate() if metrics else None
+        self.default_farm_id = default_farm_id
+        self.batch_size = batch_size
+        self.queue_batches = max(1, queue_size // batch_size)
+        self.flush_interval = flush_interval
+        self.incident_interval = incident_interval
+        self.watch_interval = watch_interval
+
+        self.ring = ShardRing(workers)
+        self.owners = {}                 # zone key -> worker index
+        self.inboxes = []
+        self.processes = []
+        self.buffers = []
+        # Workers are started while the flush/collect threads run, which
+        # fork() does not handle safely
+        self._context = multiprocessing.get_context("spawn")
+        self.outbox = self._context.Queue()
+
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._epoch = 0
+        self._epoch_targets = {}         # rebalance epoch -> new worker index
+        self._stopping = threading.Event()
+        self._collected = threading.Event()   # every worker result has been read
+        self._threads = []
+
+        self.correlator = Correlator(correlation_window)
+        self._incident_lock = threading.Lock()
+        self._unwritten = {}             # incident_key -> latest row not yet stored
+        self._alert_times = []           # created_at of alerts whose incident is not stored
+
+        self.stats = {"submitted": 0, "processed": 0, "duplicates": 0, "alerts": 0,
+                      "incidents": 0, "order_violations": 0, "rebalanced_zones": 0, "restarted_workers": 0}
+        self.worker_processed = []
+
+    def _spawn(self, index):
+        self.inboxes.append(self._context.Queue(self.queue_batches))
+        self.processes.append(self._start_worker(index))
+        self.buffers.append([])
+        self.worker_processed.append(0)
+
+    def _start_worker(self, index):
+        process = self._context.Process(
+            target=_run_worker, name=f"ingest-worker-{index}",
+            args=(index, self.inboxes[index], self.outbox, self.dsn, self.default_farm_id,
+                  self.metrics is not None, self.log_dir, self.log_rates, self.fanout),
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def start(self):
+        for index in range(self.ring.workers):
+            self._spawn(index)
+        for target in (self._flush_loop, self._collect_loop, self._incident_loop,
+                       self._watch_loop):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"✓ Ingest supervisor started with {self.ring.workers} worker(s)")
+
+    # ==========================================
+    # DISPATCH
+    # ==========================================
+
+    def submit(self, topic, payload, received_at=None):
+        """Route one data message to its zone's worker; blocks when it is full"""
+        try:
+            key = zone_key(topic)
+        except (IndexError, ValueError):
+            print(f"✗ Ignoring message on unexpected topic {topic}")
+            return
+        received_at = received_at if received_at is not None else time.time()
+
+        with self._lock:
+            owner = self.owners.get(key)
+            if owner is None:
+                owner = self.owners[key] = self.ring.owner(key)
+            self._seq += 1
+            buffer = self.buffers[owner]
+            buffer.append((self._seq, topic, payload, received_at))
+            if len(buffer) >= self.batch_size:
+                self._flush_worker(owner)
+            self.stats["submitted"] += 1
+
+    def _flush_worker(self, index):
+        batch = self.buffers[index]
+        self.buffers[index] = []
+        # Blocking put is the backpressure: the caller (MQTT thread) waits
+        self._put(index, ("readings", batch))
+
+    def _put(self, index, item):
+        """Queue item for a worker (holding self._lock); waits while it is full,
+        restarting the worker if it died"""
+        while True:
+            try:
+                self.inboxes[index].put(item, timeout=self.watch_interval)
+                return
+            except queue.Full:
+                if not self.processes[index].is_alive():
+                    self._restart_worker(index)
+
+    def _flush_all(self):
+        for index, buffer in enumerate(self.buffers):
+            if buffer:
+                self._flush_worker(index)
+
+    def _flush_loop(self):
+        while not self._stopping.wait(self.flush_interval):
+            with self._lock:
+                self._flush_all()
+
+    def _watch_loop(self):
+        """Restart workers that died, e.g. killed for memory.
+
+        While the MQTT thread holds self._lock it is waiting on a full
+        inbox, and _put restarts that worker itself if it is dead.
+        """
+        while not self._stopping.wait(self.watch_interval):
+            for index in range(len(self.processes)):
+                if self.processes[index].is_alive():
+                    continue
+                if not self._lock.acquire(timeout=self.watch_interval):
+                    continue
+                try:
+                    if not (self.processes[index].is_alive() or self._stopping.is_set()):
+                        self._restart_worker(index)
+                finally:
+                    self._lock.release()
+
+    def _restart_worker(self, index):
+        """Start a new process for a dead worker on a new inbox (holding self._lock).
+
+        The old inbox's backlog moves over in order. A killed process can
+        leave that queue's read lock taken, in which case the backlog is
+        lost; so is what the worker had buffered but not committed. Its
+        zones' alert cooldowns start over.
+        """
+        dead = self.processes[index]
+        print(f"✗ Worker {index} exited with code {dead.exitcode}, restarting it")
+        old = self.inboxes[index]
+        self.inboxes[index] = self._context.Queue(self.queue_batches)
+        self.processes[index] = self._start_worker(index)
+        while True:
+            try:
+                item = old.get(timeout=0.2)
+            except queue.Empty:
+                break
+            self.inboxes[index].put(item)
+        self.stats["restarted_workers"] += 1
+
+    # ==========================================
+    # REBALANCING
+    # ==========================================
+
+    def add_worker(self):
+        """Start one more worker and move the zones it now owns to it"""
+        with self._lock:
+            # Everything already accepted must be queued ahead of the fences
+            self._flush_all()
+            index = len(self.inboxes)
+            self._spawn(index)
+            ring = ShardRing(index + 1)
+
+            owners, moved = {}, defaultdict(list)
+            for key, owner in self.owners.items():
+                owners[key] = ring.owner(key)
+                if owners[key] != owner:
+                    moved[owner].append(key)
+
+            self._epoch += 1
+            self._epoch_targets[self._epoch] = index
+            self._put(index, ("expect", self._epoch,
+                                     [key for keys in moved.values() for key in keys]))
+            for owner, keys in moved.items():
+                self._put(owner, ("fence", self._epoch, keys))
+
+            self.ring, self.owners = ring, owners
+            count = sum(len(keys) for keys in moved.values())
+            self.stats["rebalanced_zones"] += count
+
+        print(f"✓ Added worker {index}: {count} of {len(owners)} zone(s) moved")
+        return index
+
+    # ==========================================
+    # RESULTS
+    # ==========================================
+
+    def _collect_loop(self):
+        while True:
+            item = self.outbox.get()
+            kind = item[0]
+            if kind == "batch":
+                _, index, readings, alerts, violations, duplicates = item
+                self.stats["processed"] += readings + duplicates
+                self.stats["duplicates"] += duplicates
+                self.stats["alerts"] += len(alerts)
+                if alerts:
+                    with self._incident_lock:
+                        for alert in alerts:
+                            self.correlator.add(dict(zip(ALERT_COLUMNS, alert)))
+                        if self.metrics is not None:
+                            self._alert_times.extend(alert[ALERT_CREATED_AT]
+                                                     for alert in alerts)
+                self.stats["order_violations"] += violations
+                self.worker_processed[index] += readings
+            elif kind == "metrics":
+                self.metrics.merge(item[2])
+            elif kind == "fenced":
+                _, _, epoch, states = item
+                # The new worker is holding these zones' readings until now
+                self.inboxes[self._epoch_targets[epoch]].put(("adopt", states))
+            elif kind == "closed":
+                self._collected.set()
+                return
+
+    def _incident_loop(self):
+        """Store incidents every incident_interval until the workers are done.
+
+        A connection that cannot be opened or breaks is reopened with
+        backoff; incidents wait in self._unwritten meanwhile.
+        """
+        conn, delay, retry_at = None, RETRY_DELAY, 0.0
+        try:
+            while True:
+                done = self._collected.wait(self.incident_interval)
+                if self.dsn and conn is None and time.monotonic() >= retry_at:
+                    try:
+                        conn = db.connect(self.dsn)
+                        delay = RETRY_DELAY
+                    except Exception as error:
+                        print(f"✗ Incident writer cannot connect, retrying in {delay:g}s: "
+                              f"{error}")
+                        retry_at = time.monotonic() + delay
+                        delay = min(delay * 2, MAX_RETRY_DELAY)
+                try:
+                    if not self._write_incidents(conn):
+                        conn = db.reset(conn, self.dsn)
+                except Exception as error:
+                    # Unreachable database on reset, or a bug: keep the thread alive
+                    print(f"✗ Incident writer error, reconnecting: {error}")
+                    if conn is not None:
+                        try:
+                            conn.close()
+                        except Exception:
+                            pass
+                    conn = None
+                if done:
+                    break
+        finally:
+            if self._unwritten:
+                print(f"✗ Incident writer stopped with {len(self._unwritten)} incident(s) "
+                      f"not stored")
+            if conn is not None:
+                conn.close()
+
+    def _write_incidents(self, conn):
+        """Store incidents drained from the correlator; False if the write failed"""
+        with self._incident_lock:
+            rows = self.correlator.drain()
+            self.correlator.expire()
+            self.stats["incidents"] = self.correlator.stats["incidents"]
+            alert_times, self._alert_times = self._alert_times, []
+        if not self.dsn:
+            self._record_alert_lag(alert_times)
+            return True
+        # A row superseded by a newer one for the same incident is not needed
+        for row in rows:
+            self._unwritten[row[0]] = row
+        if not self._unwritten:
+            return True
+        if conn is None:
+            with self._incident_lock:
+                self._alert_times[:0] = alert_times
+            return True
+        started = time.perf_counter_ns()
+        try:
+            write_incidents(conn, list(self._unwritten.values()))
+            self._unwritten = {}
+            if self.metrics is not None:
+                self.metrics.observe("incident_write", started)
+            self._record_alert_lag(alert_times)
+            return True
+        except Exception as error:
+            with self._incident_lock:
+                self._alert_times[:0] = alert_times
+            print(f"✗ Writing {len(self._unwritten)} incident(s) failed, will retry: {error}")
+            return False
+
+    def _record_alert_lag(self, alert_times):
+        """Reading receipt to the alerts row being stored, per alert"""
+        if self.metrics is not None and alert_times:
+            done = datetime.now(timezone.utc)
+            self.metrics.record_all("alert_lag", (int((done - at).total_seconds() * 1e9)
+                                                  for at in alert_times))
+
+    def stop(self):
+        """Drain every queue, stop the workers and wait for them"""
+        self._stopping.set()
+        with self._lock:
+            self._flush_all()
+            for index in range(len(self.inboxes)):
+                self._put(index, ("stop",))
+        for process in self.processes:
+            process.join()
+        self.outbox.put(("closed",))
+        for thread in self._threads:
+            thread.join()
+        print(f"✓ Ingest stopped: {self.stats['processed']} readings, "
+              f"{self.stats['alerts']} alerts in {self.stats['incidents']} incidents")
+
+
+def run_mqtt(supervisor, config, stats_interval=60.0):
+    """Subscribe to agriconnect/data/# and feed the supervisor until Ctrl+C"""
+    # paho sends the PUBACK after on_message returns, so a full queue also
+    # holds back acknowledgements
+    client = create_client(config, "ingest_supervisor", [(DATA_TOPIC, 1)],
+                           lambda message: supervisor.submit(message.topic, message.payload))
+    client.loop_start()
+
+    try:
+        while True:
+            time.sleep(stats_interval)
+            stats = supervisor.stats
+            backlog = stats["submitted"] - stats["processed"]
+            print(f"[STATS] {stats['processed']} readings ({stats['duplicates']} duplicates), "
+                  f"{stats['alerts']} alerts in {stats['incidents']} incidents, "
+                  f"backlog {backlog}, per worker {supervisor.worker_processed}")
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down gracefully...")
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded multi-core ingest for agriconnect/data/#")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--queue-size", type=int, default=20000,
+                        help="Readings each worker may have queued before MQTT blocks")
+    parser.add_argument("--batch-size", type=int, default=200,
+                        help="Readings per dispatch to a worker")
+    parser.add_argument("--correlation-window", type=float, default=30.0,
+                        help="Minutes a farm-level incident stays open after its last zone alert")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Analyze but do not write to the database")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve per-stage latency metrics on 127.0.0.1:<port>/metrics")
+    parser.add_argument("--log-dir",
+                        help="Write per-worker JSON-lines logs here instead of stderr")
+    parser.add_argument("--log-sample", action="append", metavar="CATEGORY=RATE",
+                        help="Share of a log category to keep, e.g. reading=0.01 (repeatable)")
+    parser.add_argument("--fanout", metavar="HOST:PORT",
+                        help="Publish live zone values to the dashboard fan-out service")
+    args = parser.parse_args()
+
+    config = load_config()
+    if args.log_dir:
+        os.makedirs(args.log_dir, exist_ok=True)
+    supervisor = IngestSupervisor(
+        args.workers, None if args.dry_run else config.database_url, config.farm_id,
+        args.queue_size, args.batch_size,
+        correlation_window=timedelta(minutes=args.correlation_window),
+        metrics=args.metrics_port is not None,
+        log_dir=args.log_dir, log_rates=parse_rates(args.log_sample), fanout=args.fanout,
+    )
+    supervisor.start()
+    if supervisor.metrics is not None:
+        supervisor.metrics.serve(args.metrics_port)
+
+    # kill -USR1 <pid> adds a worker without dropping or reordering readings
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: supervisor.add_worker())
+
+    try:
+        run_mqtt(supervisor, config)
+    finally:
+        supervisor.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Intelligence Layer (Python port)
+Mirrors cloud_backend/nodejs_subscriber/intelligence so batch jobs produce
+the same insights and alerts as the live subscriber.
+"""
+
+from ..metrics import NULL_METRICS
+from .alerts import AlertManager, build_alerts
+from .anomaly import AnomalyDetector
+from .disease import DiseaseAnalyzer
+from .irrigation import IrrigationOptimizer
+from .nutrients import DEFAULT_OPTIMAL_RANGES as DEFAULT_NUTRIENT_RANGES, analyze_nutrients
+
+
+class Analyzers:
+    """The four analyzers handleSensorData runs, with optional overrides.
+
+    overrides is a dict shaped like
+        {"disease": {"lateBlight": {...}}, "anomaly": {"normalRanges": {...},
+         "optimalRanges": {...}}, "irrigation": {...}, "nutrients": {...}}
+    and is merged over the built-in defaults, so a backfill can test a
+    changed threshold without editing code.
+    """
+
+    def __init__(self, overrides=None):
+        overrides = overrides or {}
+        self.disease = DiseaseAnalyzer()
+        for key, model in overrides.get("disease", {}).items():
+            merged = self.disease.models.setdefault(key, {"conditions": {}})
+            merged.update({k: v for k, v in model.items() if k != "conditions"})
+            merged["conditions"].update(model.get("conditions", {}))
+
+        anomaly = overrides.get("anomaly", {})
+        self.anomaly = AnomalyDetector()
+        for sensor, rng in anomaly.get("normalRanges", {}).items():
+            self.anomaly.normal_ranges.setdefault(sensor, {"name": sensor}).update(rng)
+        for sensor, rng in anomaly.get("optimalRanges", {}).items():
+            self.anomaly.optimal_ranges.setdefault(sensor, {}).update(rng)
+
+        self.irrigation = IrrigationOptimizer(overrides.get("irrigation"))
+
+        self.nutrient_ranges = {k: dict(v) for k, v in DEFAULT_NUTRIENT_RANGES.items()}
+        for key, rng in overrides.get("nutrients", {}).items():
+            self.nutrient_ranges.setdefault(key, {"name": key}).update(rng)
+
+    def analyze(self, sensors, system, context, now, metrics=NULL_METRICS, thresholds=None):
+        """Run all analyzers for one reading (handleSensorData step 2).
+
+        thresholds is (anomalies, nutrient issues) when the range checks
+        already ran batched (RuleTables.findings); only the cross-sensor
+        checks are then added to the anomalies.
+        """
+        insights = {"diseases": [], "irrigation": None, "anomalies": [], "nutrients": []}
+        t = metrics.clock()
+
+        if sensors.get("airTemperature") and sensors.get("airHumidity"):
+            insights["diseases"] = self.disease.analyze(sensors, now.isoformat())
+            t = metrics.observe("analyze_disease", t)
+
+        if sensors.get("soilMoisture"):
+            insights["irrigation"] = self.irrigation.optimize(sensors, system, now)
+            t = metrics.observe("analyze_irrigation", t)
+
+        if thresholds is None:
+            insights["anomalies"] = self.anomaly.detect(sensors, context)
+        else:
+            insights["anomalies"] = thresholds[0] + self.anomaly.cross_validate(sensors)
+        t = metrics.observe("analyze_anomaly", t)
+
+        if (sensors.get("nitrogenPPM") or sensors.get("phosphorusPPM")
+                or sensors.get("potassiumPPM")):
+            if thresholds is None:
+                insights["nutrients"] = analyze_nutrients(sensors, self.nutrient_ranges)
+            else:
+                insights["nutrients"] = thresholds[1]
+            metrics.observe("analyze_nutrients", t)
+
+        return insights
+
+
+__all__ = [
+    "Analyzers",
+    "AlertManager",
+    "AnomalyDetector",
+    "DiseaseAnalyzer",
+    "IrrigationOptimizer",
+    "analyze_nutrients",
+    "build_alerts",
+]
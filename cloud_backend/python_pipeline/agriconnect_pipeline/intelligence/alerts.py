@@ -0,0 +1,110 @@
+"""
+Alert Manager
+Python port of intelligence/alert-manager.js. Builds alert rows from
+insights and applies the same one-hour per-key cooldown, but leaves
+storage to the caller so batch jobs can bulk-write the rows.
+"""
+
+from datetime import timedelta
+
+from .utils import js_number
+
+ALERT_COOLDOWN = timedelta(hours=1)
+
+SEVERITY_MAP = {
+    "CRITICAL": "critical",
+    "HIGH": "critical",
+    "MEDIUM": "warning",
+    "WARNING": "warning",
+    "LOW": "info",
+    "INFO": "info",
+}
+
+ALERT_COLUMNS = (
+    "farm_id", "gateway_id", "field_id", "zone_id",
+    "alert_type", "severity", "message", "acknowledged", "created_at",
+)
+
+
+def map_severity(input_severity):
+    return SEVERITY_MAP.get(input_severity, "info")
+
+
+def build_alerts(insights, context):
+    """Turn an insight set into candidate alert dicts (before cooldown)"""
+    base = {
+        "farm_id": context["farmId"],
+        "gateway_id": context["gatewayId"],
+        "field_id": context["fieldId"],
+        "zone_id": context["zoneId"],
+        "acknowledged": False,
+    }
+    alerts = []
+
+    for disease in insights["diseases"]:
+        alerts.append({
+            **base,
+            "alert_type": "disease_risk",
+            "severity": map_severity(disease["severity"]),
+            "message": f"{disease['disease']} detected ({disease['probability']}% probability). "
+                       f"{disease['recommendation']}",
+        })
+
+    irrigation = insights["irrigation"]
+    if irrigation and irrigation["recommendation"] == "URGENT":
+        alerts.append({
+            **base,
+            "alert_type": "irrigation_urgent",
+            "severity": "critical",
+            "message": f"Urgent irrigation needed: {irrigation['reason']}. {irrigation['action']}",
+        })
+
+    for anomaly in insights["anomalies"]:
+        alerts.append({
+            **base,
+            "alert_type": anomaly["type"].lower(),
+            "severity": map_severity(anomaly["severity"]),
+            "message": f"{anomaly['message']}. {anomaly['action']}",
+        })
+
+    for nutrient in insights["nutrients"]:
+        alerts.append({
+            **base,
+            "alert_type": "nutrient_deficiency",
+            "severity": map_severity(nutrient["severity"]),
+            "message": f"{nutrient['nutrient']} level {nutrient['status']}: "
+                       f"{js_number(nutrient['current'])} ppm (target: {nutrient['target']})",
+        })
+
+    return alerts
+
+
+class AlertManager:
+    """Cooldown deduplication state; one instance per zone stream is enough"""
+
+    def __init__(self, cooldown=ALERT_COOLDOWN):
+        self.cooldown = cooldown
+        self.recent_alerts = {}
+
+    def process_insights(self, insights, context, now):
+        """Return the alerts that survive the cooldown, stamped with now"""
+        alerts = []
+        for alert in build_alerts(insights, context):
+            if self.should_create_alert(alert, now):
+                alert["created_at"] = now
+                alerts.append(alert)
+        return alerts
+
+    def should_create_alert(self, alert, now):
+        key = (alert["farm_id"], alert["gateway_id"], alert["field_id"],
+               alert["zone_id"], alert["alert_type"])
+        last_alert = self.recent_alerts.get(key)
+        if last_alert is not None and now - last_alert < self.cooldown:
+            return False
+        self.recent_alerts[key] = now
+        return True
+
+    def cleanup_old_alerts(self, now):
+        expired = [k for k, t in self.recent_alerts.items() if now - t > self.cooldown]
+        for key in expired:
+            del self.recent_alerts[key]
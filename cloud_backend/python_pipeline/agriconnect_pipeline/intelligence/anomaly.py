@@ -0,0 +1,160 @@
+"""
+Anomaly Detector
+Python port of intelligence/anomaly-detector.js
+"""
+
+import copy
+
+from .utils import js_number, to_fixed
+
+DEFAULT_NORMAL_RANGES = {
+    "airTemperature": {"min": 5, "max": 45, "name": "Air Temperature"},
+    "airHumidity": {"min": 10, "max": 100, "name": "Air Humidity"},
+    "soilMoisture": {"min": 100, "max": 900, "name": "Soil Moisture"},
+    "soilTemperature": {"min": 10, "max": 40, "name": "Soil Temperature"},
+    "phValue": {"min": 3.0, "max": 10.0, "name": "pH"},
+    "ecValue": {"min": 0.5, "max": 8.0, "name": "EC"},
+    "nitrogenPPM": {"min": 0, "max": 500, "name": "Nitrogen"},
+    "phosphorusPPM": {"min": 0, "max": 200, "name": "Phosphorus"},
+    "potassiumPPM": {"min": 0, "max": 800, "name": "Potassium"},
+    "lightIntensity": {"min": 0, "max": 120000, "name": "Light Intensity"},
+    "parValue": {"min": 0, "max": 2000, "name": "PAR"},
+    "batteryLevel": {"min": 0, "max": 100, "name": "Battery"},
+}
+
+DEFAULT_OPTIMAL_RANGES = {
+    "airTemperature": {"min": 18, "max": 30},
+    "airHumidity": {"min": 60, "max": 80},
+    "soilMoisture": {"min": 400, "max": 600},
+    "phValue": {"min": 6.0, "max": 7.0},
+    "ecValue": {"min": 2.0, "max": 3.5},
+}
+
+OPTIMIZATION_ADVICE = {
+    "airTemperature": ("Consider adding heating or improving insulation",
+                       "Improve ventilation or add shading"),
+    "airHumidity": ("Increase misting or reduce ventilation",
+                    "Improve air circulation or reduce watering frequency"),
+    "soilMoisture": ("Increase irrigation frequency or duration",
+                     "Reduce watering or improve drainage"),
+    "phValue": ("Add lime to raise pH", "Add sulfur to lower pH"),
+    "ecValue": ("Increase fertilizer concentration",
+                "Flush soil with water to reduce salt buildup"),
+}
+
+
+def _range_text(value):
+    # Ranges print like JS numbers: 3.0 -> "3"
+    return js_number(float(value))
+
+
+def out_of_range_anomaly(name, value, rng, context):
+    """Reading outside the sensor's valid range - likely sensor error"""
+    return {
+        "sensor": name,
+        "value": value,
+        "expected": f"{_range_text(rng['min'])} - {_range_text(rng['max'])}",
+        "severity": "CRITICAL",
+        "type": "OUT_OF_RANGE",
+        "message": f"{name} reading {js_number(value)} is outside valid range",
+        "diagnosis": "Possible sensor malfunction or calibration error",
+        "action": f"Check {name} sensor connections and calibration",
+        "context": context,
+    }
+
+
+def suboptimal_anomaly(sensor, name, value, optimal, context):
+    """Reading within the valid range but outside the optimal one"""
+    return {
+        "sensor": name,
+        "value": value,
+        "expected": f"{_range_text(optimal['min'])} - {_range_text(optimal['max'])} (optimal)",
+        "severity": "WARNING",
+        "type": "SUBOPTIMAL",
+        "message": f"{name} reading {js_number(value)} is suboptimal",
+        "diagnosis": "Within safe range but not ideal for plant growth",
+        "action": AnomalyDetector.get_optimization_advice(sensor, value, optimal),
+        "context": context,
+    }
+
+
+class AnomalyDetector:
+    def __init__(self, normal_ranges=None, optimal_ranges=None):
+        self.normal_ranges = copy.deepcopy(normal_ranges or DEFAULT_NORMAL_RANGES)
+        self.optimal_ranges = copy.deepcopy(optimal_ranges or DEFAULT_OPTIMAL_RANGES)
+
+    def detect(self, sensors, context):
+        anomalies = []
+
+        for sensor, rng in self.normal_ranges.items():
+            value = sensors.get(sensor)
+            if value is None:
+                continue
+
+            # Out of normal range - likely sensor error
+            if value < rng["min"] or value > rng["max"]:
+                anomalies.append(out_of_range_anomaly(rng["name"], value, rng, context))
+            # Within normal but outside optimal
+            elif sensor in self.optimal_ranges:
+                optimal = self.optimal_ranges[sensor]
+                if value < optimal["min"] or value > optimal["max"]:
+                    anomalies.append(suboptimal_anomaly(sensor, rng["name"], value, optimal,
+                                                        context))
+
+        anomalies.extend(self.cross_validate(sensors))
+        return anomalies
+
+    def cross_validate(self, sensors):
+        issues = []
+        air = sensors.get("airTemperature")
+        soil = sensors.get("soilTemperature")
+
+        # Soil temp should be close to air temp
+        if air and soil:
+            diff = abs(air - soil)
+            if diff > 15:
+                issues.append({
+                    "sensor": "Temperature Correlation",
+                    "value": f"Air: {js_number(air)}C, Soil: {js_number(soil)}C",
+                    "severity": "WARNING",
+                    "type": "CORRELATION",
+                    "message": f"Unusual temperature difference: {to_fixed(diff, 1)}C",
+                    "diagnosis": "Soil and air temperatures normally differ by <10C",
+                    "action": "Check both temperature sensors for accuracy",
+                })
+
+        battery = sensors.get("batteryLevel")
+        if battery is not None and battery < 20:
+            issues.append({
+                "sensor": "Battery",
+                "value": f"{js_number(battery)}%",
+                "severity": "WARNING",
+                "type": "LOW_BATTERY",
+                "message": f"Battery level critically low: {js_number(battery)}%",
+                "diagnosis": "Node may shut down soon",
+                "action": "Replace or recharge battery within 24 hours",
+            })
+
+        n, p, k = (sensors.get("nitrogenPPM"), sensors.get("phosphorusPPM"),
+                   sensors.get("potassiumPPM"))
+        if n and p and k:
+            total = n + p + k
+            if total > 1000:
+                issues.append({
+                    "sensor": "NPK Sensor",
+                    "value": f"Total: {js_number(total)} ppm",
+                    "severity": "WARNING",
+                    "type": "SUSPICIOUS",
+                    "message": "Unusually high total NPK reading",
+                    "diagnosis": "May indicate sensor calibration issue",
+                    "action": "Recalibrate NPK sensor or verify with soil test",
+                })
+
+        return issues
+
+    @staticmethod
+    def get_optimization_advice(sensor, current_value, optimal):
+        advice = OPTIMIZATION_ADVICE.get(sensor)
+        if advice is None:
+            return "Adjust conditions to reach optimal range"
+        return advice[0] if current_value < optimal["min"] else advice[1]
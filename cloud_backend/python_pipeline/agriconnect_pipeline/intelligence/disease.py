@@ -0,0 +1,130 @@
+"""
+Disease Risk Analyzer
+Python port of intelligence/disease-analyzer.js
+"""
+
+import copy
+
+from .utils import js_number, js_round
+
+DEFAULT_MODELS = {
+    "earlyBlight": {
+        "name": "Early Blight (Alternaria solani)",
+        "conditions": {"tempMin": 24, "tempMax": 29, "humidityMin": 90, "leafWetnessHours": 2},
+        "severity": "HIGH",
+        "actionThreshold": 0.7,
+    },
+    "lateBlight": {
+        "name": "Late Blight (Phytophthora infestans)",
+        "conditions": {"tempMin": 10, "tempMax": 25, "humidityMin": 90, "leafWetnessHours": 10},
+        "severity": "CRITICAL",
+        "actionThreshold": 0.6,
+    },
+    "septoriaLeafSpot": {
+        "name": "Septoria Leaf Spot",
+        "conditions": {"tempMin": 15, "tempMax": 27, "humidityMin": 85, "leafWetnessHours": 48},
+        "severity": "MEDIUM",
+        "actionThreshold": 0.7,
+    },
+    "powderyMildew": {
+        "name": "Powdery Mildew",
+        "conditions": {"tempMin": 20, "tempMax": 30, "humidityMin": 50, "humidityMax": 70},
+        "severity": "MEDIUM",
+        "actionThreshold": 0.6,
+    },
+    "bacterialSpot": {
+        "name": "Bacterial Spot",
+        "conditions": {"tempMin": 24, "tempMax": 30, "humidityMin": 85},
+        "severity": "HIGH",
+        "actionThreshold": 0.7,
+    },
+    "blossomEndRot": {
+        "name": "Blossom End Rot (Physiological)",
+        "conditions": {"calciumDeficiency": True, "irregularWatering": True},
+        "severity": "MEDIUM",
+        "actionThreshold": 0.5,
+    },
+}
+
+RECOMMENDATIONS = {
+    "earlyBlight": "Apply copper-based fungicide. Remove affected leaves. Improve air circulation.",
+    "lateBlight": "URGENT: Apply systemic fungicide immediately. Monitor surrounding zones. Consider preventive treatment.",
+    "septoriaLeafSpot": "Apply fungicide. Remove lower leaves. Mulch to prevent soil splash.",
+    "powderyMildew": "Apply sulfur or neem oil. Increase air circulation. Reduce humidity if possible.",
+    "bacterialSpot": "Apply copper bactericide. Avoid overhead watering. Remove affected tissue.",
+    "blossomEndRot": "Apply calcium spray. Maintain consistent watering schedule. Check soil pH (target 6.0-6.8).",
+}
+
+
+class DiseaseAnalyzer:
+    def __init__(self, models=None):
+        self.models = copy.deepcopy(models or DEFAULT_MODELS)
+
+    def analyze(self, sensors, timestamp=None):
+        risks = []
+        for key, model in self.models.items():
+            risk = self.evaluate_disease(key, model, sensors, timestamp)
+            if risk:
+                risks.append(risk)
+        return risks
+
+    def evaluate_disease(self, disease_key, model, sensors, timestamp=None):
+        temp = sensors.get("airTemperature")
+        humidity = sensors.get("airHumidity")
+        conditions = model["conditions"]
+
+        probability = 0.0
+        factors_met = []
+
+        # Temperature check
+        if "tempMin" in conditions:
+            if conditions["tempMin"] <= temp <= conditions["tempMax"]:
+                factors_met.append(
+                    f"Temperature {js_number(temp)}C in risk range "
+                    f"({conditions['tempMin']}-{conditions['tempMax']}C)"
+                )
+                probability += 0.4
+
+        # Humidity check
+        if "humidityMin" in conditions:
+            if conditions.get("humidityMax"):
+                # Range check (e.g., powdery mildew)
+                if conditions["humidityMin"] <= humidity <= conditions["humidityMax"]:
+                    factors_met.append(
+                        f"Humidity {js_number(humidity)}% in risk range "
+                        f"({conditions['humidityMin']}-{conditions['humidityMax']}%)"
+                    )
+                    probability += 0.4
+            elif humidity >= conditions["humidityMin"]:
+                factors_met.append(
+                    f"Humidity {js_number(humidity)}% above threshold ({conditions['humidityMin']}%)"
+                )
+                probability += 0.4
+
+        # Leaf wetness estimation (based on high humidity duration)
+        if conditions.get("leafWetnessHours") and humidity > 95:
+            factors_met.append("Leaf wetness likely (humidity >95%)")
+            probability += 0.2
+
+        # Blossom End Rot special checks
+        if disease_key == "blossomEndRot":
+            moisture = sensors.get("soilMoisture")
+            if moisture is not None and (moisture < 350 or moisture > 600):
+                factors_met.append(f"Soil moisture irregular ({js_number(moisture)})")
+                probability += 0.5
+
+        if probability >= model["actionThreshold"]:
+            return {
+                "disease": model["name"],
+                "severity": model["severity"],
+                "probability": js_round(probability * 100),
+                "factorsMet": factors_met,
+                "recommendation": self.get_recommendation(disease_key),
+                "timestamp": timestamp,
+            }
+        return None
+
+    def get_recommendation(self, disease_key):
+        return RECOMMENDATIONS.get(
+            disease_key, "Consult agricultural extension for treatment options."
+        )
@@ -0,0 +1,104 @@
+"""
+Irrigation Optimizer
+Python port of intelligence/irrigation-optimizer.js
+"""
+
+import math
+from datetime import datetime
+
+from .utils import js_number, to_fixed
+
+DEFAULT_THRESHOLDS = {
+    "moistureCritical": 350,
+    "moistureLow": 400,
+    "moistureOptimal": 500,
+    "moistureHigh": 650,
+    "tempHigh": 30,
+    "vpdHigh": 1.5,
+    "vpdLow": 0.4,
+}
+
+
+class IrrigationOptimizer:
+    def __init__(self, thresholds=None):
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        self.thresholds.update(thresholds or {})
+
+    def optimize(self, sensors, system_status=None, now=None):
+        """Irrigation advice for one reading; now is the reading time"""
+        t = self.thresholds
+        moisture = sensors.get("soilMoisture")
+        temp = sensors.get("airTemperature")
+        humidity = sensors.get("airHumidity")
+        now = now or datetime.now()
+
+        vpd = self.calculate_vpd(temp, humidity)
+
+        recommendation = "NORMAL"
+        action = None
+        reason = []
+        duration = 0
+
+        if moisture < t["moistureCritical"]:
+            recommendation = "URGENT"
+            action = "Irrigate immediately"
+            duration = self.calculate_duration(moisture, t["moistureOptimal"])
+            reason.append(f"Soil moisture critically low ({js_number(moisture)})")
+
+            if temp is not None and temp > t["tempHigh"]:
+                reason.append(f"High temperature stress ({js_number(temp)}C)")
+                duration += 5  # Extra time for heat
+        elif moisture < t["moistureLow"]:
+            recommendation = "NEEDED"
+
+            # Prefer evening watering
+            if 6 <= now.hour <= 16:
+                action = "Schedule irrigation for evening (after 5 PM)"
+                reason.append("Avoid midday evaporation")
+            else:
+                action = "Irrigate now"
+
+            duration = self.calculate_duration(moisture, t["moistureOptimal"])
+            reason.append(f"Soil moisture low ({js_number(moisture)})")
+        elif moisture <= t["moistureHigh"]:
+            recommendation = "OPTIMAL"
+            action = "No irrigation needed"
+            reason.append(f"Soil moisture optimal ({js_number(moisture)})")
+        else:
+            recommendation = "EXCESS"
+            action = "Do NOT water - risk of root rot"
+            reason.append(f"Soil moisture too high ({js_number(moisture)})")
+
+        if vpd is not None:
+            if vpd > t["vpdHigh"]:
+                reason.append(f"High VPD ({to_fixed(vpd, 2)} kPa) - plants transpiring heavily")
+            elif vpd < t["vpdLow"]:
+                reason.append(f"Low VPD ({to_fixed(vpd, 2)} kPa) - reduced water uptake")
+
+        return {
+            "recommendation": recommendation,
+            "action": action,
+            "duration": duration,
+            "reason": ". ".join(reason),
+            "vpd": to_fixed(vpd, 2) if vpd is not None else "NaN",
+            "currentMoisture": moisture,
+            "targetMoisture": t["moistureOptimal"],
+            "timestamp": now.isoformat(),
+        }
+
+    @staticmethod
+    def calculate_vpd(temperature, relative_humidity):
+        # Missing inputs produce NaN in the JS version; None here
+        if temperature is None or relative_humidity is None:
+            return None
+        svp = 0.6108 * math.exp((17.27 * temperature) / (temperature + 237.3))
+        avp = svp * (relative_humidity / 100)
+        return svp - avp
+
+    @staticmethod
+    def calculate_duration(current_moisture, target_moisture):
+        deficit = target_moisture - current_moisture
+        if deficit <= 0:
+            return 0
+        # Rough estimate: 1 minute per 10 units deficit, capped at 30 minutes
+        return min(math.ceil(deficit / 10), 30)
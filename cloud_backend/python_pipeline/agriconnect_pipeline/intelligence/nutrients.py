@@ -0,0 +1,44 @@
+"""
+Nutrient Analysis
+Python port of analyzeNutrients() in index.js
+"""
+
+from .utils import js_number
+
+# Optimal ranges for tomatoes (vegetative/fruiting average)
+DEFAULT_OPTIMAL_RANGES = {
+    "nitrogen": {"min": 150, "max": 250, "name": "Nitrogen"},
+    "phosphorus": {"min": 40, "max": 80, "name": "Phosphorus"},
+    "potassium": {"min": 200, "max": 400, "name": "Potassium"},
+}
+
+# (sensor key, range key, also flag HIGH)
+_CHECKS = (
+    ("nitrogenPPM", "nitrogen", True),
+    ("phosphorusPPM", "phosphorus", False),
+    ("potassiumPPM", "potassium", False),
+)
+
+
+def nutrient_issue(rng, status, value):
+    """LOW (a warning) or HIGH (for information) reading against rng"""
+    return {"nutrient": rng["name"], "status": status, "current": value,
+            "target": f"{js_number(rng['min'])}-{js_number(rng['max'])}",
+            "severity": "warning" if status == "LOW" else "info"}
+
+
+def analyze_nutrients(sensors, optimal_ranges=None):
+    ranges = optimal_ranges or DEFAULT_OPTIMAL_RANGES
+    issues = []
+
+    for sensor, key, check_high in _CHECKS:
+        value = sensors.get(sensor)
+        if value is None:
+            continue
+        rng = ranges[key]
+        if value < rng["min"]:
+            issues.append(nutrient_issue(rng, "LOW", value))
+        elif check_high and value > rng["max"]:
+            issues.append(nutrient_issue(rng, "HIGH", value))
+
+    return issues
@@ -0,0 +1,30 @@
+"""
+Formatting helpers shared by the intelligence ports.
+Alert messages must match the Node.js subscriber byte for byte so that
+reprocessed alerts can be diffed against the live alerts table.
+"""
+
+import math
+from decimal import ROUND_HALF_UP, Decimal
+
+
+def js_number(value):
+    """Format a number the way a JavaScript template literal would"""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def js_round(value):
+    """Math.round: half-up rounding (Python's round() is half-even)"""
+    # floor(value + 0.5) would round x.4999... up when the sum rounds to x+1
+    floor = math.floor(value)
+    return int(floor + 1 if value - floor >= 0.5 else floor)
+
+
+def to_fixed(value, digits):
+    """Number.prototype.toFixed: exact binary value, ties away from zero"""
+    quantum = Decimal(1).scaleb(-digits)
+    return str(Decimal(value).quantize(quantum, rounding=ROUND_HALF_UP))
@@ -0,0 +1,318 @@
+"""
+Device Liveness
+Marks gateways and field nodes offline when their messages stop, instead
+of leaving gateways.status at "online" forever and making the dashboard
+guess from timestamps.
+
+Every data or status message re-arms the device's timer in a hierarchical
+timer wheel (O(1) arm and cancel, no per-device scan). When a timer
+expires the device goes offline; status changes and last-seen times are
+collected and written as one batched UPDATE per table every few seconds.
+
+Usage:
+    python -m agriconnect_pipeline.liveness
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+
+from . import db
+from .config import load_config
+from .mqtt_client import create_client
+
+# A device is offline after this many missed reporting intervals
+MISSED_INTERVALS = 3
+
+GATEWAY_HEARTBEAT = 300          # status/{gateway_id} every 5 minutes
+NODE_SAMPLE_INTERVAL = 60        # field_nodes.sample_interval default
+
+GATEWAYS_QUERY = "SELECT gateway_id, status, last_seen FROM gateways"
+
+NODES_QUERY = """
+    SELECT gateway_id, field_id, zone_id, sample_interval, status, last_reading
+    FROM field_nodes
+"""
+
+UPDATE_GATEWAYS = """
+    UPDATE gateways AS g
+    SET status = u.status, last_seen = GREATEST(g.last_seen, u.last_seen), updated_at = NOW()
+    FROM unnest(%s::text[], %s::text[], %s::timestamptz[]) AS u(gateway_id, status, last_seen)
+    WHERE g.gateway_id = u.gateway_id
+"""
+
+UPDATE_NODES = """
+    UPDATE field_nodes AS n
+    SET status = u.status, last_reading = GREATEST(n.last_reading, u.last_seen),
+        updated_at = NOW()
+    FROM unnest(%s::text[], %s::int[], %s::int[], %s::text[], %s::timestamptz[])
+         AS u(gateway_id, field_id, zone_id, status, last_seen)
+    WHERE n.gateway_id = u.gateway_id AND n.field_id = u.field_id AND n.zone_id = u.zone_id
+"""
+
+# Status values already used by the schema
+ONLINE_STATUS = {"gateway": "online", "node": "active"}
+OFFLINE_STATUS = "offline"
+
+
+class TimerWheel:
+    """Hierarchical hashed timer wheel.
+
+    levels wheels of slots each; level L covers slots ** (L + 1) ticks. A
+    timer sits at the lowest level whose span still separates its deadline
+    from the current tick, and moves down a level each time the level above
+    turns over, until it fires from level 0. Each slot is a dict, so arm
+    and cancel are O(1); advancing costs O(1) per tick plus O(1) per timer
+    moved or fired. Deadlines past the top level are parked in it and
+    re-placed each time it turns over.
+    """
+
+    def __init__(self, tick=1.0, bits=6, levels=4, start=0.0):
+        self.tick = tick
+        self.bits = bits
+        self.mask = (1 << bits) - 1
+        self.levels = levels
+        self.wheels = [[{} for _ in range(1 << bits)] for _ in range(levels)]
+        self.location = {}           # key -> slot dict holding it
+        self.deadlines = {}          # key -> deadline tick
+        self.current = int(start // tick)
+
+    def __len__(self):
+        return len(self.location)
+
+    def arm(self, key, deadline):
+        """(Re)schedule key to expire at deadline (seconds, same clock as advance)"""
+        slot = self.location.get(key)
+        if slot is not None:
+            del slot[key]
+        due = max(-int(-deadline // self.tick), self.current + 1)
+        self.deadlines[key] = due
+        self._place(key, due)
+
+    def cancel(self, key):
+        slot = self.location.pop(key, None)
+        if slot is not None:
+            del slot[key]
+            del self.deadlines[key]
+
+    def _place(self, key, due):
+        # Lowest level at which due and the current tick share all higher bits
+        level = ((due ^ self.current).bit_length() - 1) // self.bits if due != self.current else 0
+        if level < self.levels:
+            index = (due >> (self.bits * level)) & self.mask
+        else:
+            # Beyond the top level: park in the next top-level slot to turn
+            # over, where it is re-placed against its real deadline
+            level = self.levels - 1
+            index = ((self.current >> (self.bits * level)) + 1) & self.mask
+        slot = self.wheels[level][index]
+        slot[key] = None
+        self.location[key] = slot
+
+    def advance(self, now):
+        """Move time forward to now; returns the keys that expired, in order"""
+        target = int(now // self.tick)
+        expired = []
+        while self.current < target:
+            self.current += 1
+            tick = self.current
+            # Cascade from the top so timers reach level 0 before it fires
+            for level in range(self.levels - 1, 0, -1):
+                if tick & ((1 << (self.bits * level)) - 1) == 0:
+                    slot = self.wheels[level][(tick >> (self.bits * level)) & self.mask]
+                    if slot:
+                        moved = list(slot)
+                        slot.clear()
+                        for key in moved:
+                            self._place(key, self.deadlines[key])
+
+            slot = self.wheels[0][tick & self.mask]
+            if slot:
+                due_now = list(slot)
+                slot.clear()
+                for key in due_now:
+                    if self.deadlines[key] > tick:
+                        # Parked in a single-level wheel; not due yet
+                        self._place(key, self.deadlines[key])
+                        continue
+                    del self.location[key]
+                    del self.deadlines[key]
+                    expired.append(key)
+        return expired
+
+
+class LivenessTracker:
+    """Online/offline state per device, driven by messages and the timer wheel.
+
+    Keys are ("gateway", gateway_id) and ("node", gateway_id, field_id,
+    zone_id). Changes are coalesced per device until drain(): a device that
+    went offline and came back between two flushes is written once, with
+    its latest state.
+    """
+
+    def __init__(self, start=None, tick=1.0):
+        start = time.time() if start is None else start
+        self.wheel = TimerWheel(tick=tick, start=start)
+        self.timeouts = {}           # key -> seconds without messages before offline
+        self.status = {}             # key -> "online" / "offline"
+        self.dirty = {}              # key -> (status, last_seen) waiting to be written
+        self.stats = {"messages": 0, "online": 0, "offline": 0}
+
+    def timeout_for(self, key):
+        default = GATEWAY_HEARTBEAT if key[0] == "gateway" else NODE_SAMPLE_INTERVAL
+        return self.timeouts.get(key, default * MISSED_INTERVALS)
+
+    def restore(self, key, status, last_seen, interval=None):
+        """Seed state from the database so a restart catches silent devices"""
+        if interval:
+            self.timeouts[key] = interval * MISSED_INTERVALS
+        online = status != OFFLINE_STATUS
+        self.status[key] = "online" if online else "offline"
+        if online:
+            if last_seen is None:
+                last_seen = self.wheel.current * self.wheel.tick
+            self.wheel.arm(key, last_seen + self.timeout_for(key))
+
+    def seen(self, key, now):
+        """A message from key arrived at now (epoch seconds)"""
+        self.stats["messages"] += 1
+        self.wheel.arm(key, now + self.timeout_for(key))
+        previous = self.status.get(key)
+        if previous != "online":
+            self.status[key] = "online"
+            self.stats["online"] += 1
+            if key[0] == "gateway" and previous == "offline":
+                print(f"✓ Gateway {key[1]} back online")
+        self.dirty[key] = ("online", now)
+
+    def gone(self, key, now):
+        """Explicit offline (the gateway's Last Will message)"""
+        self.wheel.cancel(key)
+        self._offline(key, now)
+
+    def advance(self, now):
+        """Expire timers up to now; returns the keys that went offline"""
+        expired = self.wheel.advance(now)
+        for key in expired:
+            self._offline(key, now)
+        return expired
+
+    def _offline(self, key, now):
+        if self.status.get(key) == "offline":
+            return
+        self.status[key] = "offline"
+        self.stats["offline"] += 1
+        if key[0] == "gateway":
+            print(f"⚠ Gateway {key[1]} offline (no messages for {self.timeout_for(key)}s)")
+        last_seen = self.dirty.get(key, (None, None))[1]
+        self.dirty[key] = ("offline", last_seen)
+
+    def drain(self):
+        """Pending changes as (gateway_rows, node_rows); clears them"""
+        gateways, nodes = [], []
+        for key, (status, last_seen) in self.dirty.items():
+            seen_at = datetime.fromtimestamp(last_seen, timezone.utc) if last_seen else None
+            if key[0] == "gateway":
+                gateways.append((key[1], ONLINE_STATUS["gateway"] if status == "online"
+                                 else OFFLINE_STATUS, seen_at))
+            else:
+                nodes.append(key[1:] + (ONLINE_STATUS["node"] if status == "online"
+                                        else OFFLINE_STATUS, seen_at))
+        self.dirty = {}
+        return gateways, nodes
+
+
+def load_devices(conn, tracker):
+    """Restore every registered gateway and node into the tracker"""
+    with conn.cursor() as cur:
+        cur.execute(GATEWAYS_QUERY)
+        for gateway_id, status, last_seen in cur.fetchall():
+            tracker.restore(("gateway", gateway_id), status,
+                            last_seen.timestamp() if last_seen else None)
+        cur.execute(NODES_QUERY)
+        for gateway_id, field_id, zone_id, interval, status, last_reading in cur.fetchall():
+            tracker.restore(("node", gateway_id, field_id, zone_id), status,
+                            last_reading.timestamp() if last_reading else None, interval)
+    conn.commit()
+    print(f"✓ Tracking {len(tracker.status)} device(s), {len(tracker.wheel)} armed")
+
+
+def write_changes(conn, gateways, nodes):
+    """One UPDATE per table for a whole flush of coalesced changes"""
+    with conn.cursor() as cur:
+        if gateways:
+            cur.execute(UPDATE_GATEWAYS, [list(column) for column in zip(*gateways)])
+        if nodes:
+            cur.execute(UPDATE_NODES, [list(column) for column in zip(*nodes)])
+    conn.commit()
+
+
+def handle_message(tracker, topic, payload, now):
+    """Feed one agriconnect/data or agriconnect/status message to the tracker"""
+    parts = topic.split("/")
+    if len(parts) < 3:
+        return
+    gateway = ("gateway", parts[2])
+
+    if parts[1] == "data" and len(parts) >= 5:
+        # A data message proves both the node and its gateway are alive
+        tracker.seen(gateway, now)
+        try:
+            node = ("node", parts[2], int(parts[3]), int(parts[4]))
+        except ValueError:
+            return
+        tracker.seen(node, now)
+    elif parts[1] == "status":
+        try:
+            data = json.loads(payload)
+        except ValueError:
+            data = None
+        status = data.get("status") if isinstance(data, dict) else None
+        if status == OFFLINE_STATUS:
+            tracker.gone(gateway, now)
+        else:
+            tracker.seen(gateway, now)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gateway and field node offline detection")
+    parser.add_argument("--flush-interval", type=float, default=10.0,
+                        help="Seconds between batched status writes")
+    args = parser.parse_args()
+
+    config = load_config()
+    tracker = LivenessTracker()
+    conn = db.connect(config.database_url)
+    load_devices(conn, tracker)
+
+    def on_message(message):
+        # Retained status messages are old news, not proof the gateway is up
+        if not message.retain:
+            handle_message(tracker, message.topic, message.payload, time.time())
+
+    # QoS 0 is enough: one missed message does not make a device offline
+    client = create_client(config, "liveness_tracker",
+                           [("agriconnect/data/#", 0), ("agriconnect/status/#", 0)], on_message)
+
+    last_flush = time.monotonic()
+    try:
+        # Single thread: the network loop, timer wheel and writes never race
+        while True:
+            client.loop(timeout=0.2)
+            tracker.advance(time.time())
+            if time.monotonic() - last_flush >= args.flush_interval:
+                last_flush = time.monotonic()
+                gateways, nodes = tracker.drain()
+                if gateways or nodes:
+                    write_changes(conn, gateways, nodes)
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down gracefully...")
+        write_changes(conn, *tracker.drain())
+    finally:
+        client.disconnect()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Load Generator
+Simulates a fleet of gateways, each forwarding readings from its field
+nodes on agriconnect/data/{gateway_id}/{field_id}/{zone_id} plus a status
+message on agriconnect/status/{gateway_id}, to find how many gateways
+one ingest host can take.
+
+Each gateway is an asyncio task. Nodes report once per interval with
+jitter; some gateways drop off for a while, buffer up to 50 messages (as
+the firmware does) and publish the backlog in one burst when they come
+back. The offered rate is stepped up until ingest can no longer keep up.
+
+By default messages go straight into an in-process IngestSupervisor
+(no database unless --write), stamped with their scheduled send time, so
+the reported latencies run from the moment a gateway would have sent a
+reading to its sensor_readings write and to the alerts (incident) write.
+Stamping the scheduled time rather than the actual one means a stalled
+generator shows up as latency instead of hiding it. With --mqtt the
+messages go to the configured broker instead; latencies are then on the
+ingest's --metrics-port endpoint (write_lag, alert_lag).
+
+Usage:
+    python -m agriconnect_pipeline.loadgen --gateways 2000 --nodes 4 --workers 8
+    python -m agriconnect_pipeline.loadgen --rates 1000,2000,4000 --step 20
+    python -m agriconnect_pipeline.loadgen --mqtt --gateways 200 --rates 200
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from .config import load_config
+from .ingest import IngestSupervisor
+from .metrics import Histogram
+from .readings import SENSOR_FIELDS, SYSTEM_FIELDS
+from .synthetic import generate_readings
+
+DATA_PREFIX = "agriconnect/data/"
+BUFFER_SIZE = 50             # gateway firmware offline buffer (BUFFER_SIZE)
+STATUS_EVERY = 5             # status message per this many data intervals (5 min vs 60 s)
+
+PAYLOAD_STREAMS = 64
+STREAM_LENGTH = 240
+
+
+def payload_streams(streams=PAYLOAD_STREAMS, length=STREAM_LENGTH):
+    """Pre-serialized '"sensors": {...}, "system": {...}' fragments, one list per stream"""
+    fragments = []
+    for s in range(streams):
+        stream = []
+        for row in generate_readings(length, seed=s):
+            sensors = {key: row[5 + i] for i, (_, key) in enumerate(SENSOR_FIELDS)}
+            system = {key: row[5 + len(SENSOR_FIELDS) + i]
+                      for i, (_, key) in enumerate(SYSTEM_FIELDS)}
+            stream.append(json.dumps({"sensors": sensors, "system": system})[1:-1])
+        fragments.append(stream)
+    return fragments
+
+
+class InProcessBus:
+    """Hands data messages to an IngestSupervisor; other topics are counted"""
+
+    def __init__(self, supervisor):
+        self.supervisor = supervisor
+        self.other = 0
+
+    def publish(self, topic, payload, sent_at):
+        if topic.startswith(DATA_PREFIX):
+            # Blocks when the worker queue is full, like the MQTT thread
+            self.supervisor.submit(topic, payload, sent_at)
+        else:
+            self.other += 1
+
+
+class MqttBus:
+    """Publishes to the configured broker (QoS 1 data, QoS 0 retained status)"""
+
+    def __init__(self, config):
+        from .mqtt_client import create_client
+        self.client = create_client(config, "loadgen", [], lambda message: None)
+        self.client.loop_start()
+
+    def publish(self, topic, payload, sent_at):
+        if topic.startswith(DATA_PREFIX):
+            self.client.publish(topic, payload, qos=1)
+        else:
+            self.client.publish(topic, payload, qos=0, retain=True)
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
+
+
+class Fleet:
+    """gateways × nodes simulated publishers"""
+
+    def __init__(self, bus, gateways, nodes, jitter=0.1, outage_share=0.02,
+                 outage_seconds=30.0, seed=11):
+        self.bus = bus
+        self.gateways = [f"GW-LOAD-{g:05d}" for g in range(gateways)]
+        self.nodes = nodes
+        self.jitter = jitter
+        self.outage_share = outage_share
+        self.outage_seconds = outage_seconds
+        self.rng = random.Random(seed)
+        self.fragments = payload_streams()
+        self.positions = {}      # (gateway, node) -> [fragment stream, next index]
+
+    def payload(self, gateway_id, node, measured_at):
+        field_id, zone_id = node // 4 + 1, node % 4
+        key = (gateway_id, node)
+        position = self.positions.get(key)
+        if position is None:
+            position = self.positions[key] = [len(self.positions) % len(self.fragments), 0]
+        stream = self.fragments[position[0]]
+        fragment = stream[position[1] % len(stream)]
+        position[1] += 1
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(measured_at))
+        topic = f"{DATA_PREFIX}{gateway_id}/{field_id}/{zone_id}"
+        return topic, (f'{{"gatewayId": "{gateway_id}", "fieldId": {field_id}, '
+                       f'"zoneId": {zone_id}, "timestamp": "{timestamp}", {fragment}}}').encode()
+
+    async def run(self, rate, duration):
+        """Publish at about rate readings/s for duration seconds; returns step stats"""
+        interval = len(self.gateways) * self.nodes / rate
+        start = time.time()
+        end = start + duration
+        stats = {"sent": 0, "status": 0, "buffered": 0, "replayed": 0, "lost": 0,
+                 "lag": Histogram()}
+        outages = {}
+        for gateway_id in self.rng.sample(self.gateways,
+                                          int(len(self.gateways) * self.outage_share)):
+            down = start + self.rng.uniform(0, max(0.0, duration - self.outage_seconds))
+            outages[gateway_id] = (down, down + self.outage_seconds)
+        await asyncio.gather(*(self._gateway(gateway_id, interval, start, end,
+                                             outages.get(gateway_id), stats)
+                               for gateway_id in self.gateways))
+        return stats
+
+    async def _gateway(self, gateway_id, interval, start, end, outage, stats):
+        rng = self.rng
+        jitter = self.jitter
+        publish = self.bus.publish
+        lag = stats["lag"]
+        # Next due time per node, random phase; slot -1 is the status message
+        due = {node: start + rng.uniform(0, interval) for node in range(self.nodes)}
+        due[-1] = start + rng.uniform(0, interval * STATUS_EVERY)
+        backlog = []
+        while True:
+            node = min(due, key=due.get)
+            at = due[node]
+            if at >= end:
+                break
+            delay = at - time.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # How far behind schedule the generator itself is
+            lag.record(max(0, int((time.time() - at) * 1e9)))
+            offline = outage is not None and outage[0] <= at < outage[1]
+
+            if node < 0:
+                due[node] = at + interval * STATUS_EVERY
+                if not offline:
+                    publish(f"agriconnect/status/{gateway_id}",
+                            json.dumps({"gatewayId": gateway_id, "status": "online",
+                                        "bufferedMessages": len(backlog)}).encode(), at)
+                    stats["status"] += 1
+                continue
+
+            due[node] = at + interval * (1 + rng.uniform(-jitter, jitter))
+            message = self.payload(gateway_id, node, at)
+            if offline:
+                if len(backlog) < BUFFER_SIZE:
+                    backlog.append(message)
+                    stats["buffered"] += 1
+                else:
+                    stats["lost"] += 1
+                continue
+            if backlog:
+                # Reconnected: the buffer goes out first, all at once
+                for topic, payload in backlog:
+                    publish(topic, payload, at)
+                stats["replayed"] += len(backlog)
+                stats["sent"] += len(backlog)
+                backlog = []
+            publish(message[0], message[1], at)
+            stats["sent"] += 1
+
+
+def percentiles(histogram):
+    """(p50, p99) in seconds"""
+    return histogram.quantile(0.5) / 1e9, histogram.quantile(0.99) / 1e9
+
+
+async def ramp(fleet, supervisor, rates, step, max_lag, settle=30.0):
+    """Run each rate for step seconds; returns rows and the highest sustainable rate"""
+    sustainable = 0
+    rows = []
+    for rate in rates:
+        supervisor.metrics.reset()
+        before = dict(supervisor.stats)
+        began = time.time()
+        stats = await fleet.run(rate, step)
+        elapsed = time.time() - began
+        processed = supervisor.stats["processed"] - before["processed"]
+        backlog = supervisor.stats["submitted"] - supervisor.stats["processed"]
+
+        # Let the step's readings and alerts land before reading latencies
+        deadline = time.time() + settle
+        while (supervisor.stats["processed"] < supervisor.stats["submitted"]
+               and time.time() < deadline):
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(supervisor.incident_interval + 1.5)
+        metrics = supervisor.metrics.reset()
+
+        write = metrics.histograms.get("write_lag", Histogram())
+        alert = metrics.histograms.get("alert_lag", Histogram())
+        ok = (processed >= 0.95 * stats["sent"] and write.count
+              and percentiles(write)[1] <= max_lag)
+        if ok:
+            sustainable = max(sustainable, stats["sent"] / elapsed)
+        rows.append((rate, stats, elapsed, processed, backlog, write, alert, ok))
+        print_row(rows[-1])
+        if not ok:
+            break
+    return rows, sustainable
+
+
+def print_row(row):
+    rate, stats, elapsed, processed, backlog, write, alert, ok = row
+    write_p50, write_p99 = percentiles(write)
+    alert_p50, alert_p99 = percentiles(alert)
+    print(f"{rate:>9,}{stats['sent'] / elapsed:>10,.0f}{processed / elapsed:>11,.0f}"
+          f"{backlog:>9,}{write_p50:>9.2f}{write_p99:>9.2f}{alert_p50:>9.2f}{alert_p99:>9.2f}"
+          f"{alert.count:>8,}{percentiles(stats['lag'])[1]:>9.2f}"
+          f"{stats['replayed']:>9,}  {'✓' if ok else '✗'}")
+
+
+async def run_in_process(args, config):
+    # Worker logs (every alert) would drown the table on stderr
+    log_dir = args.log_dir or tempfile.mkdtemp(prefix="loadgen-logs-")
+    os.makedirs(log_dir, exist_ok=True)
+    supervisor = IngestSupervisor(args.workers, config.database_url if args.write else None,
+                                  config.farm_id, metrics=True, log_dir=log_dir)
+    supervisor.start()
+    await asyncio.sleep(2.0)     # spawned workers import before the first step
+    fleet = Fleet(InProcessBus(supervisor), args.gateways, args.nodes, args.jitter,
+                  args.outage_share, args.outage_seconds)
+    print(f"{args.gateways:,} gateways × {args.nodes} nodes, {args.workers} worker(s), "
+          f"{args.step:.0f}s per step, {args.outage_share:.0%} of gateways offline "
+          f"{args.outage_seconds:.0f}s per step, worker logs in {log_dir}\n")
+    print(f"{'offered':>9}{'sent/s':>10}{'stored/s':>11}{'backlog':>9}"
+          f"{'write50':>9}{'write99':>9}{'alert50':>9}{'alert99':>9}{'alerts':>8}"
+          f"{'gen99':>9}{'replayed':>9}")
+    try:
+        _, sustainable = await ramp(fleet, supervisor, args.rates, args.step, args.max_lag)
+    finally:
+        await asyncio.to_thread(supervisor.stop)
+
+    print()
+    print(f"Max sustainable    : {sustainable:,.0f} readings/s "
+          f"(write p99 ≤ {args.max_lag:.1f}s, ≥95% of sent stored during the step)")
+    print(f"At 60 s per reading: {sustainable * 60 / args.nodes:,.0f} gateways "
+          f"with {args.nodes} nodes each")
+
+
+async def run_mqtt(args, config):
+    bus = MqttBus(config)
+    fleet = Fleet(bus, args.gateways, args.nodes, args.jitter, args.outage_share,
+                  args.outage_seconds)
+    try:
+        for rate in args.rates:
+            began = time.time()
+            stats = await fleet.run(rate, args.step)
+            elapsed = time.time() - began
+            print(f"[STATS] offered {rate:,}/s: sent {stats['sent'] / elapsed:,.0f}/s, "
+                  f"{stats['replayed']:,} replayed, {stats['lost']:,} lost in buffers, "
+                  f"generator p99 lag {percentiles(stats['lag'])[1]:.2f}s")
+    finally:
+        bus.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated gateway fleet for ingest load tests")
+    parser.add_argument("--gateways", type=int, default=2000)
+    parser.add_argument("--nodes", type=int, default=4, help="Field nodes per gateway")
+    parser.add_argument("--rates", type=lambda value: [int(r) for r in value.split(",")],
+                        default=[1000, 2000, 4000, 8000, 16000, 32000],
+                        help="Comma-separated readings/s to step through")
+    parser.add_argument("--step", type=float, default=20.0, help="Seconds per rate")
+    parser.add_argument("--jitter", type=float, default=0.1,
+                        help="Relative jitter on each node's interval")
+    parser.add_argument("--outage-share", type=float, default=0.02,
+                        help="Share of gateways that go offline once per step")
+    parser.add_argument("--outage-seconds", type=float, default=10.0)
+    parser.add_argument("--max-lag", type=float, default=2.0,
+                        help="Highest acceptable p99 send-to-write latency (s)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--write", action="store_true",
+                        help="Let the in-process ingest write to DATABASE_URL")
+    parser.add_argument("--log-dir", help="Ingest worker logs (default: a temporary directory)")
+    parser.add_argument("--mqtt", action="store_true",
+                        help="Publish to the configured broker instead of in-process")
+    args = parser.parse_args()
+
+    config = load_config()
+    asyncio.run(run_mqtt(args, config) if args.mqtt else run_in_process(args, config))
+
+
+if __name__ == "__main__":
+    main()
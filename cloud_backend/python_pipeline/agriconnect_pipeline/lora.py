@@ -0,0 +1,310 @@
+"""
+LoRa Airtime Planner
+How many field nodes one gateway's channel carries before collisions
+eat the readings, and what to change when it does not. Field nodes and
+the gateway run SF10, 125 kHz, coding rate 4/8, preamble 8, explicit
+header and CRC on 433 MHz, and each node sends its whole ArduinoJson
+document every sample_interval.
+
+time_on_air() is the SX127x formula (Semtech AN1200.13), including low
+data rate optimisation above 16 ms symbols, for the actual payload bytes.
+Collisions come from a Monte-Carlo pure-ALOHA simulation: each node
+sends once per interval with its own phase and a clock that drifts a
+few percent (deep sleep runs on the RC oscillator), and any overlap on
+the channel loses both packets; nodes do not retransmit. In time
+measured in intervals the simulation depends only on the node count: a
+packet survives when its nearest neighbour on the channel is further away
+than its airtime, so one sorted array of those gaps per node count
+answers every configuration with a binary search, and thousands of
+configurations take about a second.
+
+Recommendations keep within the band's duty-cycle limit (10% for
+433.05-434.79 MHz under ERC 70-03) and the 255-byte LoRa payload, and
+prefer the smallest change: lose the least link budget (spreading factor
+and bandwidth), then lengthen the interval least, then change the payload
+format least.
+
+Usage:
+    python -m agriconnect_pipeline.lora --nodes 40 --interval 60
+    python -m agriconnect_pipeline.lora --from-db --target 0.99
+"""
+
+import argparse
+import json
+import math
+import struct
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from . import db
+from .config import load_config
+
+MAX_PAYLOAD = 255                 # SX127x FIFO; the LoRa library truncates longer packets
+
+# Radio settings in field_node_firmware and gateway_firmware_v2
+FIRMWARE = {"sf": 10, "bandwidth": 125e3, "coding_rate": 4, "preamble": 8}
+
+# What a field node sends (readSensors in AgriConnect_Field_Node.ino),
+# with typical values
+NODE_DOCUMENT = {
+    "nodeId": "NODE-F1-Z1", "fieldId": 1, "zoneId": 1,
+    "sensors": {"airTemperature": 24.3, "airHumidity": 78.5, "soilMoisture": 512,
+                "soilTemperature": 22.06, "lightIntensity": 45213, "nitrogenPpm": 0,
+                "phosphorusPpm": 0, "potassiumPpm": 0, "phValue": 6.5, "ecValue": 1.2},
+    "system": {"batteryLevel": 87, "pumpStatus": False, "waterLevel": 85},
+    "timestamp": 3600123,
+}
+
+# Same values as a JSON array in a fixed order, and as a packed struct:
+# node u16, field u8, zone u8, air temp x10 i16, humidity x10 u16, soil moisture u16,
+# soil temp x100 i16, light u32, N/P/K u16, pH x100 u16, EC x100 u16, battery u8,
+# pump u8, water u8, timestamp u32
+COMPACT_JSON = [1, 1, 1, 24.3, 78.5, 512, 22.06, 45213, 0, 0, 0, 6.5, 1.2, 87, 0, 85, 3600123]
+BINARY_LAYOUT = "<HBBhHHhIHHHHHBBBI"
+
+PAYLOAD_FORMATS = {
+    "json": len(json.dumps(NODE_DOCUMENT, separators=(",", ":"))),
+    "json-array": len(json.dumps(COMPACT_JSON, separators=(",", ":"))),
+    "binary": struct.calcsize(BINARY_LAYOUT),
+}
+FORMAT_ORDER = tuple(PAYLOAD_FORMATS)        # least to most firmware work
+
+SPREADING_FACTORS = (7, 8, 9, 10, 11, 12)
+BANDWIDTHS = (125e3, 250e3, 500e3)
+CODING_RATES = (1, 2, 3, 4)                  # 4/5 .. 4/8
+INTERVALS = (15, 30, 60, 120, 180, 300, 600, 900, 1800, 3600)
+NODE_COUNTS = tuple(sorted({int(round(n)) for n in np.geomspace(1, 2000, 64)}))
+
+NODES_QUERY = """
+    SELECT gateway_id, COUNT(*), COALESCE(MIN(sample_interval), 60)
+    FROM field_nodes
+    WHERE status <> 'decommissioned'
+    GROUP BY gateway_id
+    ORDER BY gateway_id
+"""
+
+Config = namedtuple("Config", "sf bandwidth coding_rate payload_format interval")
+
+
+# ==========================================
+# AIRTIME
+# ==========================================
+
+def time_on_air(payload_bytes, sf, bandwidth=125e3, coding_rate=4, preamble=8,
+                explicit_header=True, crc=True, low_data_rate=None):
+    """Seconds on air for one LoRa packet; arguments broadcast like numpy arrays.
+
+    coding_rate is 1-4 for 4/5-4/8. Low data rate optimisation follows
+    the LoRa library: on when a symbol lasts more than 16 ms.
+    """
+    sf = np.asarray(sf, dtype=float)
+    symbol = 2.0 ** sf / bandwidth
+    if low_data_rate is None:
+        low_data_rate = symbol > 0.016
+    de = np.asarray(low_data_rate, dtype=float)
+    ih = 0.0 if explicit_header else 1.0
+    numerator = (8.0 * np.asarray(payload_bytes) - 4.0 * sf + 28 + 16 * crc - 20 * ih)
+    payload_symbols = 8 + np.maximum(
+        np.ceil(numerator / (4.0 * (sf - 2 * de))) * (np.asarray(coding_rate) + 4), 0)
+    return (preamble + 4.25) * symbol + payload_symbols * symbol
+
+
+# ==========================================
+# COLLISIONS
+# ==========================================
+
+def clearances(nodes, rng, periods=12, drift=0.02, events=60000):
+    """Sorted gap from each packet to its nearest neighbour on the channel, in intervals.
+
+    Each node starts at a random phase and repeats with a period drawn
+    within +-drift of the interval. Only packets away from the edges of
+    the simulated window are kept, so every one has all its neighbours.
+    """
+    trials = max(1, events // (nodes * periods))
+    phase = rng.uniform(0.0, 1.0, (trials, nodes, 1))
+    period = 1.0 + rng.uniform(-drift, drift, (trials, nodes, 1))
+    starts = (phase + np.arange(periods) * period).reshape(trials, -1)
+    starts.sort(axis=1)
+    gaps = np.diff(starts, axis=1)
+    inf = np.full((trials, 1), np.inf)
+    nearest = np.minimum(np.concatenate([inf, gaps], axis=1),
+                         np.concatenate([gaps, inf], axis=1))
+    inside = (starts >= 1.0) & (starts <= (periods - 1) * (1.0 - drift))
+    return np.sort(nearest[inside])
+
+
+def delivery_ratio(clearance, duty):
+    """Share of packets that overlap no other, for each duty (airtime / interval)"""
+    lost = np.searchsorted(clearance, np.asarray(duty, dtype=float), side="right")
+    return 1.0 - lost / len(clearance)
+
+
+def aloha_ratio(nodes, duty):
+    """Pure-ALOHA success probability exp(-2G), for comparison"""
+    return np.exp(-2.0 * nodes * np.asarray(duty))
+
+
+# ==========================================
+# SWEEP
+# ==========================================
+
+def sweep(node_counts=NODE_COUNTS, sfs=SPREADING_FACTORS, bandwidths=BANDWIDTHS,
+          coding_rates=CODING_RATES, formats=FORMAT_ORDER, intervals=INTERVALS, preamble=8,
+          drift=0.02, seed=7):
+    """Delivery ratio for every configuration and node count.
+
+    Returns (configs, airtime, ratio): configs is a list of Config,
+    airtime an array over configs, ratio an array (configs, node counts).
+    """
+    configs = [Config(sf, bw, cr, fmt, interval) for sf in sfs for bw in bandwidths
+               for cr in coding_rates for fmt in formats for interval in intervals]
+    columns = np.array([(c.sf, c.bandwidth, c.coding_rate, PAYLOAD_FORMATS[c.payload_format],
+                         c.interval) for c in configs]).T
+    sf, bandwidth, coding_rate, payload, interval = columns
+    airtime = time_on_air(payload, sf, bandwidth, coding_rate, preamble)
+    duty = airtime / interval
+
+    rng = np.random.default_rng(seed)
+    ratio = np.empty((len(configs), len(node_counts)))
+    for j, nodes in enumerate(node_counts):
+        ratio[:, j] = delivery_ratio(clearances(nodes, rng, drift=drift), duty)
+    return configs, airtime, ratio
+
+
+def link_budget_loss(config, current):
+    """dB of sensitivity given up against current: about 2.5 per SF step, 3 per bandwidth doubling"""
+    return (max(0.0, 2.5 * (current.sf - config.sf))
+            + max(0.0, 3.0 * math.log2(config.bandwidth / current.bandwidth)))
+
+
+def capacity(ratio, node_counts, target):
+    """Most nodes (from node_counts) delivering at least target, per configuration"""
+    counts = np.asarray(node_counts)
+    ok = ratio >= target
+    # Delivery falls with more nodes; count the prefix that meets the target
+    prefix = np.cumprod(ok, axis=1).sum(axis=1)
+    return np.where(prefix > 0, counts[np.maximum(prefix - 1, 0)], 0)
+
+
+def recommend(configs, airtime, ratio, node_counts, nodes, current, target=0.99,
+              duty_cycle=0.10, limit=5):
+    """Configurations that carry nodes at target delivery, least change first.
+
+    Returns [(Config, airtime, delivery, duty)] sorted by link budget
+    given up, then interval lengthened, then payload format, keeping
+    the closest coding rate for each.
+    """
+    column = min(int(np.searchsorted(node_counts, nodes)), len(node_counts) - 1)
+    options = {}
+    for i, config in enumerate(configs):
+        duty = airtime[i] / config.interval
+        if PAYLOAD_FORMATS[config.payload_format] > MAX_PAYLOAD or duty > duty_cycle:
+            continue
+        if ratio[i, column] < target or config.interval < current.interval:
+            continue
+        cost = (round(link_budget_loss(config, current), 1), config.interval / current.interval,
+                FORMAT_ORDER.index(config.payload_format),
+                abs(config.coding_rate - current.coding_rate))
+        key = (config.sf, config.bandwidth, config.payload_format, config.interval)
+        if key not in options or cost < options[key][0]:
+            options[key] = (cost, config, airtime[i], ratio[i, column], duty)
+    ranked = sorted(options.values(), key=lambda option: option[0])
+    return [option[1:] for option in ranked[:limit]]
+
+
+# ==========================================
+# REPORT
+# ==========================================
+
+def load_gateways(dsn=None):
+    """[(gateway_id, nodes, interval)] from field_nodes"""
+    with db.connect(dsn or load_config().database_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute(NODES_QUERY)
+            return cur.fetchall()
+
+
+def describe(config):
+    return (f"SF{config.sf} {config.bandwidth / 1e3:.0f} kHz CR4/{config.coding_rate + 4} "
+            f"{config.payload_format} every {config.interval}s")
+
+
+def report(configs, airtime, ratio, nodes, current, target, duty_cycle, label=""):
+    index = configs.index(current)
+    payload = PAYLOAD_FORMATS[current.payload_format]
+    duty = airtime[index] / current.interval
+    column = min(int(np.searchsorted(NODE_COUNTS, nodes)), len(NODE_COUNTS) - 1)
+
+    print(f"\n{label}{nodes} node(s), {describe(current)}")
+    print(f"  Payload            : {payload} B"
+          + (f"  ✗ over the {MAX_PAYLOAD} B LoRa limit, packets are truncated"
+             if payload > MAX_PAYLOAD else ""))
+    print(f"  Time on air        : {airtime[index] * 1e3:.1f} ms, duty {duty:.2%} per node"
+          + ("  ✗ over the duty-cycle limit" if duty > duty_cycle else ""))
+    print(f"  Channel load       : {nodes * duty:.3f} Erlang, delivery "
+          f"{ratio[index, column]:.1%} (ALOHA exp(-2G) {aloha_ratio(nodes, duty):.1%})")
+
+    ok = ratio[index, column] >= target and payload <= MAX_PAYLOAD and duty <= duty_cycle
+    if ok:
+        print(f"  ✓ Meets {target:.0%} delivery")
+        return
+    options = recommend(configs, airtime, ratio, NODE_COUNTS, nodes, current, target, duty_cycle)
+    if not options:
+        print(f"  ✗ No configuration reaches {target:.0%} for {nodes} nodes; add a gateway "
+              f"or a channel")
+        return
+    print(f"  ⚠ Below {target:.0%} delivery; smallest changes that reach it:")
+    for config, seconds, delivery, config_duty in options:
+        print(f"    {describe(config):<44} {seconds * 1e3:7.1f} ms  "
+              f"{delivery:6.1%}  duty {config_duty:.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LoRa airtime and channel-capacity planner")
+    parser.add_argument("--nodes", type=int, default=40, help="Field nodes per gateway")
+    parser.add_argument("--interval", type=int, default=60, help="Seconds between readings")
+    parser.add_argument("--from-db", action="store_true",
+                        help="Plan every gateway from field_nodes instead of --nodes")
+    parser.add_argument("--sf", type=int, default=FIRMWARE["sf"])
+    parser.add_argument("--bandwidth", type=float, default=FIRMWARE["bandwidth"] / 1e3,
+                        choices=[b / 1e3 for b in BANDWIDTHS], help="kHz")
+    parser.add_argument("--coding-rate", type=int, default=FIRMWARE["coding_rate"],
+                        help="1-4 for 4/5-4/8")
+    parser.add_argument("--format", choices=FORMAT_ORDER, default="json")
+    parser.add_argument("--target", type=float, default=0.99, help="Delivery ratio to reach")
+    parser.add_argument("--duty-cycle", type=float, default=0.10, help="Band duty-cycle limit")
+    parser.add_argument("--drift", type=float, default=0.02,
+                        help="Node clock drift (fraction of the interval)")
+    args = parser.parse_args()
+
+    bandwidth = args.bandwidth * 1e3
+    gateways = load_gateways() if args.from_db else [("", args.nodes, args.interval)]
+    intervals = tuple(sorted(set(INTERVALS) | {interval for _, _, interval in gateways}))
+
+    started = time.perf_counter()
+    configs, airtime, ratio = sweep(intervals=intervals, drift=args.drift)
+    elapsed = time.perf_counter() - started
+    print(f"✓ Simulated {len(configs):,} configurations x {len(NODE_COUNTS)} node counts "
+          f"in {elapsed:.2f}s")
+
+    # Capacity at the current spreading factor and coding rate
+    print(f"\nNodes per gateway at {args.target:.0%} delivery "
+          f"(SF{args.sf}, {args.bandwidth:.0f} kHz, CR4/{args.coding_rate + 4}):")
+    print(f"  {'format':<12}{'bytes':>6}{'airtime ms':>12}"
+          + "".join(f"{f'{i}s':>8}" for i in intervals))
+    most = capacity(ratio, NODE_COUNTS, args.target)
+    for fmt in FORMAT_ORDER:
+        row = [configs.index(Config(args.sf, bandwidth, args.coding_rate, fmt, i)) for i in intervals]
+        print(f"  {fmt:<12}{PAYLOAD_FORMATS[fmt]:>6}{airtime[row[0]] * 1e3:>12.1f}"
+              + "".join(f"{most[i]:>8}" for i in row))
+
+    for gateway_id, nodes, interval in gateways:
+        current = Config(args.sf, bandwidth, args.coding_rate, args.format, interval)
+        report(configs, airtime, ratio, nodes, current, args.target, args.duty_cycle,
+               f"{gateway_id}: " if gateway_id else "")
+
+
+if __name__ == "__main__":
+    main()
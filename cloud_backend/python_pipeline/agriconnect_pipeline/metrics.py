@@ -0,0 +1,270 @@
+"""
+Pipeline Metrics
+Per-stage latency histograms and event counters for the ingest pipeline
+and the notification dispatcher, served as Prometheus text on a local
+HTTP endpoint (GET /metrics).
+
+Each worker process records into its own Metrics registry without locks
+and periodically ships the delta (snapshot()) to the supervisor, which
+merges it into the registry it serves. With metrics disabled the code
+paths hold NULL_METRICS, whose methods do nothing and never read the
+clock.
+
+Stages are timed by chaining clock reads:
+
+    t = metrics.clock()
+    data = json.loads(payload)
+    t = metrics.observe("parse", t)      # records the stage, returns now
+    ...
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 2**7 exact values, then 64 buckets per power of two: < 1.6% relative error
+SUB_BUCKET_BITS = 7
+
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class Histogram:
+    """HDR-style log-linear histogram of non-negative integers (nanoseconds).
+
+    Values below 2**bits get their own bucket; above that each power of two
+    is split into 2**(bits - 1) buckets, so any recorded value is within
+    one bucket width (under 1/2**(bits - 1) of the value) of its bucket.
+    Recording is an index computation and a list increment.
+    """
+
+    __slots__ = ("bits", "half", "counts", "count", "total", "max")
+
+    def __init__(self, bits=SUB_BUCKET_BITS):
+        self.bits = bits
+        self.half = 1 << (bits - 1)
+        self.counts = [0] * ((1 << bits) + (64 - bits) * self.half)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def index(self, value):
+        bits = self.bits
+        if value < (1 << bits):
+            return value
+        shift = value.bit_length() - bits
+        return (1 << bits) + (shift - 1) * self.half + (value >> shift) - self.half
+
+    def value(self, index):
+        """Midpoint of the values that fall into bucket index"""
+        full = 1 << self.bits
+        if index < full:
+            return index
+        shift = (index - full) // self.half + 1
+        top = (index - full) % self.half + self.half
+        return (top << shift) + (1 << (shift - 1))
+
+    def record(self, value):
+        if value < 0:
+            value = 0
+        # index() inlined: this runs for every stage of every reading
+        bits = self.bits
+        if value < (1 << bits):
+            self.counts[value] += 1
+        else:
+            shift = value.bit_length() - bits
+            self.counts[(1 << bits) + (shift - 2) * self.half + (value >> shift)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        if not self.count:
+            return 0
+        target = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            if n:
+                seen += n
+                if seen >= target:
+                    return min(self.value(index), self.max)
+        return self.max
+
+    def snapshot(self):
+        """Sparse copy for shipping between processes"""
+        return ({i: n for i, n in enumerate(self.counts) if n}, self.count, self.total, self.max)
+
+    def merge(self, snapshot):
+        counts, count, total, maximum = snapshot
+        for index, n in counts.items():
+            self.counts[index] += n
+        self.count += count
+        self.total += total
+        self.max = max(self.max, maximum)
+
+
+class Metrics:
+    """Histograms per stage and counters per event; not thread-safe"""
+
+    enabled = True
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+
+    clock = staticmethod(time.perf_counter_ns)
+
+    def observe(self, stage, started):
+        """Record now - started for stage; returns now for the next stage"""
+        now = time.perf_counter_ns()
+        try:
+            self.histograms[stage].record(now - started)
+        except KeyError:
+            self.histograms[stage] = Histogram()
+            self.histograms[stage].record(now - started)
+        return now
+
+    def record(self, stage, value):
+        """Record a duration measured elsewhere (nanoseconds)"""
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.record(value)
+
+    def count(self, event, n=1):
+        self.counters[event] = self.counters.get(event, 0) + n
+
+    def snapshot(self):
+        """Everything recorded since the last snapshot; resets the registry"""
+        snapshot = ({stage: h.snapshot() for stage, h in self.histograms.items() if h.count},
+                    dict(self.counters))
+        self.histograms = {}
+        self.counters = {}
+        return snapshot
+
+    def merge(self, snapshot):
+        histograms, counters = snapshot
+        for stage, data in histograms.items():
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = Histogram()
+            histogram.merge(data)
+        for event, n in counters.items():
+            self.count(event, n)
+
+    def render(self, prefix="agriconnect"):
+        """Prometheus text exposition (stage latencies as summaries)"""
+        lines = [
+            f"# HELP {prefix}_stage_seconds Time spent in each pipeline stage",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        for stage in sorted(self.histograms):
+            histogram = self.histograms[stage]
+            for q in QUANTILES:
+                lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{q}"}} '
+                             f"{histogram.quantile(q) / 1e9:.9f}")
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.total / 1e9:.9f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        lines.append(f"# HELP {prefix}_stage_max_seconds Slowest observation per stage")
+        lines.append(f"# TYPE {prefix}_stage_max_seconds gauge")
+        for stage in sorted(self.histograms):
+            lines.append(f'{prefix}_stage_max_seconds{{stage="{stage}"}} '
+                         f"{self.histograms[stage].max / 1e9:.9f}")
+        lines.append(f"# HELP {prefix}_events_total Pipeline events")
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for event in sorted(self.counters):
+            lines.append(f'{prefix}_events_total{{event="{event}"}} {self.counters[event]}')
+        return "\n".join(lines) + "\n"
+
+
+class NullMetrics:
+    """Stand-in when metrics are disabled: every call is a no-op"""
+
+    enabled = False
+
+    @staticmethod
+    def clock():
+        return 0
+
+    def observe(self, stage, started):
+        return 0
+
+    def record(self, stage, value):
+        pass
+
+    def count(self, event, n=1):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class MetricsAggregate:
+    """Thread-safe merge target that serves the merged registry over HTTP.
+
+    It can also be recorded into directly, with the same calls as Metrics
+    (e.g. by the notification dispatcher's workers).
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.metrics = Metrics()
+        self._lock = threading.Lock()
+
+    clock = staticmethod(time.perf_counter_ns)
+
+    def merge(self, snapshot):
+        with self._lock:
+            self.metrics.merge(snapshot)
+
+    def observe(self, stage, started):
+        with self._lock:
+            return self.metrics.observe(stage, started)
+
+    def record(self, stage, value):
+        with self._lock:
+            self.metrics.record(stage, value)
+
+    def count(self, event, n=1):
+        with self._lock:
+            self.metrics.count(event, n)
+
+    def record_all(self, stage, values):
+        with self._lock:
+            for value in values:
+                self.metrics.record(stage, value)
+
+    def reset(self):
+        """Start a new registry; returns the old one (e.g. per load step)"""
+        with self._lock:
+            metrics, self.metrics = self.metrics, Metrics()
+        return metrics
+
+    def render(self):
+        with self._lock:
+            return self.metrics.render()
+
+    def serve(self, port, host="127.0.0.1"):
+        """Start GET /metrics on host:port in a daemon thread; returns the server"""
+        aggregate = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = aggregate.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # no per-scrape log line
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"✓ Metrics on http://{host}:{port}/metrics")
+        return server
@@ -0,0 +1,42 @@
+"""
+MQTT Client
+Shared paho-mqtt setup for the long-running services. Uses the same
+HiveMQ Cloud settings (TLS, credentials) as the Node.js subscriber.
+paho is imported lazily so batch jobs work without it.
+"""
+
+import time
+
+
+def create_client(config, name, subscriptions, on_message):
+    """Connected (not yet looping) client that (re)subscribes on every connect.
+
+    subscriptions is a list of (topic, qos) pairs; on_message is called
+    with paho's MQTTMessage.
+    """
+    try:
+        import paho.mqtt.client as mqtt
+    except ImportError as error:
+        raise RuntimeError(
+            "paho-mqtt is required for MQTT services: pip install -r requirements.txt"
+        ) from error
+
+    client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2,
+                         client_id=f"{name}_{int(time.time())}", clean_session=True)
+    client.username_pw_set(config.mqtt_username, config.mqtt_password)
+    client.tls_set()
+    client.reconnect_delay_set(min_delay=1, max_delay=5)
+
+    def on_connect(client, userdata, flags, reason_code, properties):
+        if reason_code.is_failure:
+            print(f"✗ MQTT connection refused: {reason_code}")
+            return
+        print(f"✓ Connected to MQTT broker {config.mqtt_broker}")
+        for topic, qos in subscriptions:
+            client.subscribe(topic, qos=qos)
+            print(f"✓ Subscribed to: {topic}")
+
+    client.on_connect = on_connect
+    client.on_message = lambda client, userdata, message: on_message(message)
+    client.connect(config.mqtt_broker, config.mqtt_port)
+    return client
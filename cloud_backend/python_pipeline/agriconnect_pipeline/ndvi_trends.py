@@ -0,0 +1,471 @@
+"""
+NDVI Trend Rollups
+Keeps per-field NDVI trends in ndvi_monthly_trends, ndvi_season_trends
+and ndvi_field_trends, instead of a view regrouping all of
+satellite_ndvi_history on every query and NDVIHistory (dashboard)
+loading a field's whole history to chart it and work out its trend.
+
+Saving, editing or deleting an analysis queues its field and month in
+ndvi_rollup_queue (a trigger, migration 0015). Each pass claims a batch
+of queued months and, in one transaction, recomputes those months from
+their analyses, then the seasons containing them (and the seasons after,
+whose comparison with the previous season changed) from month rows, and
+each field's summary from its month rows and latest analyses. The work
+per saved analysis is one month of analyses and one field's months, no
+matter how long the history is, and the history modal reads one summary
+row and the field's months. Run one instance: two passes over months of
+the same field could each write its season from the other's old months.
+
+Months keep sums rather than averages (NDVI, health score, stressed
+area, and the least-squares terms over days since 2025-01-01), so a
+season or a field's whole history combines its months without rereading
+analyses. Slopes are NDVI change per 30 days. Seasons follow the
+Cameroon calendar the dashboard uses: dry from November to February,
+rainy from March to October.
+
+Usage:
+    python -m agriconnect_pipeline.ndvi_trends
+    python -m agriconnect_pipeline.ndvi_trends --rebuild --once
+"""
+
+import argparse
+import math
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+
+from . import db
+from .config import load_config
+
+ORIGIN = datetime(2025, 1, 1, tzinfo=timezone.utc)
+DAY = 86400
+SLOPE_DAYS = 30
+RECENT = 3                    # "last 3 vs previous 3" in the history modal
+
+# Backoff while the database is unreachable
+RETRY_DELAY = 1.0
+MAX_RETRY_DELAY = 60.0
+
+# Months waiting longest first; other passes skip the rows this one holds
+CLAIM_QUEUE = """
+    DELETE FROM ndvi_rollup_queue
+    WHERE (farm_id, field_name, month) IN (
+        SELECT farm_id, field_name, month FROM ndvi_rollup_queue
+        ORDER BY queued_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING farm_id, field_name, month
+"""
+
+ENQUEUE_ALL = """
+    INSERT INTO ndvi_rollup_queue (farm_id, field_name, month)
+    SELECT DISTINCT farm_id, COALESCE(field_name, ''),
+           date_trunc('month', analysis_date AT TIME ZONE 'UTC')::date
+    FROM satellite_ndvi_history
+    ON CONFLICT DO NOTHING
+"""
+
+MONTH_ANALYSES_QUERY = """
+    SELECT q.farm_id, q.field_name, q.month, h.analysis_date,
+           h.mean_ndvi, h.health_score, h.stressed_percentage
+    FROM unnest(%s::text[], %s::text[], %s::date[]) AS q(farm_id, field_name, month)
+    JOIN satellite_ndvi_history h
+      ON h.farm_id = q.farm_id AND COALESCE(h.field_name, '') = q.field_name
+     AND h.analysis_date >= q.month::timestamp AT TIME ZONE 'UTC'
+     AND h.analysis_date < (q.month + INTERVAL '1 month') AT TIME ZONE 'UTC'
+"""
+
+DELETE_MONTHS = """
+    DELETE FROM ndvi_monthly_trends m
+    USING unnest(%s::text[], %s::text[], %s::date[]) AS q(farm_id, field_name, month)
+    WHERE m.farm_id = q.farm_id AND m.field_name = q.field_name AND m.month = q.month
+"""
+
+DELETE_SEASONS = """
+    DELETE FROM ndvi_season_trends s
+    USING unnest(%s::text[], %s::text[], %s::date[]) AS q(farm_id, field_name, season_start)
+    WHERE s.farm_id = q.farm_id AND s.field_name = q.field_name
+      AND s.season_start = q.season_start
+"""
+
+DELETE_FIELDS = """
+    DELETE FROM ndvi_field_trends t
+    USING unnest(%s::text[], %s::text[]) AS q(farm_id, field_name)
+    WHERE t.farm_id = q.farm_id AND t.field_name = q.field_name
+"""
+
+TRUNCATE_ROLLUPS = "TRUNCATE ndvi_monthly_trends, ndvi_season_trends, ndvi_field_trends"
+
+
+# ==========================================
+# SUMS
+# ==========================================
+
+@dataclass
+class TrendSums:
+    """Additive NDVI statistics of one field over a month, season or history"""
+    analysis_count: int = 0
+    sum_ndvi: float = 0.0
+    sum_ndvi_sq: float = 0.0
+    sum_days: float = 0.0
+    sum_days_sq: float = 0.0
+    sum_days_ndvi: float = 0.0
+    health_count: int = 0
+    sum_health: float = 0.0
+    stressed_count: int = 0
+    sum_stressed: float = 0.0
+    min_ndvi: float = math.inf
+    max_ndvi: float = -math.inf
+    last_analysis: datetime = None
+
+    def add_analysis(self, analysis_date, ndvi, health_score, stressed_pct):
+        days = (analysis_date - ORIGIN).total_seconds() / DAY
+        ndvi = float(ndvi)
+        self.analysis_count += 1
+        self.sum_ndvi += ndvi
+        self.sum_ndvi_sq += ndvi * ndvi
+        self.sum_days += days
+        self.sum_days_sq += days * days
+        self.sum_days_ndvi += days * ndvi
+        if health_score is not None:
+            self.health_count += 1
+            self.sum_health += float(health_score)
+        if stressed_pct is not None:
+            self.stressed_count += 1
+            self.sum_stressed += float(stressed_pct)
+        self.min_ndvi = min(self.min_ndvi, ndvi)
+        self.max_ndvi = max(self.max_ndvi, ndvi)
+        if self.last_analysis is None or analysis_date > self.last_analysis:
+            self.last_analysis = analysis_date
+
+    def add(self, other):
+        for name in SUM_COLUMNS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.min_ndvi = min(self.min_ndvi, other.min_ndvi)
+        self.max_ndvi = max(self.max_ndvi, other.max_ndvi)
+        if other.last_analysis is not None and (
+                self.last_analysis is None or other.last_analysis > self.last_analysis):
+            self.last_analysis = other.last_analysis
+        return self
+
+    def averages(self):
+        """(avg NDVI, avg health score, avg stressed %), None where nothing was measured"""
+        return (self.sum_ndvi / self.analysis_count if self.analysis_count else None,
+                self.sum_health / self.health_count if self.health_count else None,
+                self.sum_stressed / self.stressed_count if self.stressed_count else None)
+
+    def trend(self):
+        """(NDVI change per SLOPE_DAYS, r²) of the least-squares line, or (None, None)"""
+        n = self.analysis_count
+        spread = n * self.sum_days_sq - self.sum_days ** 2
+        if n < 2 or spread <= 1e-9 * max(1.0, n * self.sum_days_sq):
+            return None, None
+        covariance = n * self.sum_days_ndvi - self.sum_days * self.sum_ndvi
+        variance = n * self.sum_ndvi_sq - self.sum_ndvi ** 2
+        r2 = min(covariance ** 2 / (spread * variance), 1.0) if variance > 1e-12 else None
+        return covariance / spread * SLOPE_DAYS, r2
+
+
+SUM_COLUMNS = ("analysis_count", "sum_ndvi", "sum_ndvi_sq", "sum_days", "sum_days_sq",
+               "sum_days_ndvi", "health_count", "sum_health", "stressed_count", "sum_stressed")
+STORED_COLUMNS = SUM_COLUMNS + ("min_ndvi", "max_ndvi", "last_analysis")
+
+MONTH_COLUMNS = ("farm_id", "field_name", "month", "avg_ndvi", "avg_health_score",
+                 "avg_stressed_pct") + STORED_COLUMNS + ("updated_at",)
+SEASON_COLUMNS = ("farm_id", "field_name", "season_start", "season", "analysis_count",
+                  "avg_ndvi", "min_ndvi", "max_ndvi", "avg_health_score", "avg_stressed_pct",
+                  "ndvi_slope", "ndvi_r2", "previous_avg_ndvi", "ndvi_change_pct",
+                  "updated_at")
+FIELD_COLUMNS = ("farm_id", "field_name", "analysis_count", "first_analysis", "first_ndvi",
+                 "last_analysis", "latest_ndvi", "latest_health_score", "latest_health_class",
+                 "latest_stressed_pct", "recent_avg_ndvi", "earlier_avg_ndvi", "ndvi_slope",
+                 "ndvi_r2", "updated_at")
+
+# Month rows of a range of each field, for seasons
+FIELD_MONTHS_QUERY = f"""
+    SELECT m.farm_id, m.field_name, m.month, {", ".join(f"m.{c}" for c in STORED_COLUMNS)}
+    FROM unnest(%s::text[], %s::text[], %s::date[], %s::date[])
+         AS q(farm_id, field_name, since, until)
+    JOIN ndvi_monthly_trends m
+      ON m.farm_id = q.farm_id AND m.field_name = q.field_name
+     AND m.month >= q.since AND m.month < q.until
+"""
+
+# A field's whole history, combined from its months
+FIELD_TOTALS_QUERY = f"""
+    SELECT m.farm_id, m.field_name, {", ".join(f"SUM(m.{c})" for c in SUM_COLUMNS)},
+           MIN(m.min_ndvi), MAX(m.max_ndvi), MAX(m.last_analysis)
+    FROM unnest(%s::text[], %s::text[]) AS q(farm_id, field_name)
+    JOIN ndvi_monthly_trends m ON m.farm_id = q.farm_id AND m.field_name = q.field_name
+    GROUP BY m.farm_id, m.field_name
+"""
+
+# The first analysis and the latest 2 * RECENT of each field, by index
+FIELD_ENDS_QUERY = f"""
+    SELECT q.farm_id, q.field_name, h.newest, h.analysis_date, h.mean_ndvi,
+           h.health_score, h.health_class, h.stressed_percentage
+    FROM unnest(%s::text[], %s::text[]) AS q(farm_id, field_name)
+    CROSS JOIN LATERAL (
+        (SELECT TRUE AS newest, s.analysis_date, s.mean_ndvi, s.health_score,
+                s.health_class, s.stressed_percentage
+         FROM satellite_ndvi_history s
+         WHERE s.farm_id = q.farm_id AND COALESCE(s.field_name, '') = q.field_name
+         ORDER BY s.analysis_date DESC LIMIT {2 * RECENT})
+        UNION ALL
+        (SELECT FALSE, s.analysis_date, s.mean_ndvi, s.health_score,
+                s.health_class, s.stressed_percentage
+         FROM satellite_ndvi_history s
+         WHERE s.farm_id = q.farm_id AND COALESCE(s.field_name, '') = q.field_name
+         ORDER BY s.analysis_date LIMIT 1)
+    ) h
+"""
+
+
+def from_row(values):
+    """TrendSums from STORED_COLUMNS values as read back from the database"""
+    sums = TrendSums()
+    for name, value in zip(STORED_COLUMNS, values):
+        if name == "last_analysis":
+            sums.last_analysis = value
+        elif value is not None:
+            setattr(sums, name, type(getattr(sums, name))(value))
+    return sums
+
+
+def month_sums(analyses):
+    """{(farm_id, field_name, month): TrendSums} of (farm_id, field_name, month,
+    analysis_date, ndvi, health_score, stressed_pct) rows"""
+    months = {}
+    for farm_id, field_name, month, analysis_date, ndvi, health, stressed in analyses:
+        key = (farm_id, field_name, month)
+        months.setdefault(key, TrendSums()).add_analysis(analysis_date, ndvi, health, stressed)
+    return months
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else None
+
+
+# ==========================================
+# SEASONS
+# ==========================================
+
+def season_of(month):
+    """(first day, name) of the season a month falls in"""
+    if 3 <= month.month <= 10:
+        return date(month.year, 3, 1), "rainy"
+    return date(month.year if month.month >= 11 else month.year - 1, 11, 1), "dry"
+
+
+def previous_season(start):
+    return date(start.year - 1, 11, 1) if start.month == 3 else date(start.year, 3, 1)
+
+
+def next_season(start):
+    return date(start.year, 11, 1) if start.month == 3 else date(start.year + 1, 3, 1)
+
+
+def season_rows(farm_id, field_name, months, starts, now):
+    """Season rows of one field for the given season starts, from
+    {month: TrendSums} covering those seasons and the ones before them;
+    returns (rows, starts without analyses)"""
+    seasons = {}
+    for month, sums in months.items():
+        seasons.setdefault(season_of(month)[0], TrendSums()).add(sums)
+
+    rows, empty = [], []
+    for start in sorted(starts):
+        sums = seasons.get(start)
+        if sums is None:
+            empty.append(start)
+            continue
+        avg_ndvi, avg_health, avg_stressed = sums.averages()
+        slope, r2 = sums.trend()
+        previous = seasons.get(previous_season(start))
+        previous_avg = previous.averages()[0] if previous else None
+        change = ((avg_ndvi - previous_avg) / previous_avg * 100
+                  if previous_avg else None)
+        rows.append((farm_id, field_name, start, season_of(start)[1], sums.analysis_count,
+                     avg_ndvi, sums.min_ndvi, sums.max_ndvi, avg_health, avg_stressed,
+                     slope, r2, previous_avg, change, now))
+    return rows, empty
+
+
+def field_row(farm_id, field_name, totals, latest, first, now):
+    """Summary row of one field; latest is its newest analyses, newest first,
+    each (analysis_date, ndvi, health_score, health_class, stressed_pct)"""
+    slope, r2 = totals.trend()
+    newest = latest[0]
+    recent = [float(a[1]) for a in latest[:RECENT]]
+    earlier = [float(a[1]) for a in latest[RECENT:2 * RECENT]]
+    return (farm_id, field_name, totals.analysis_count, first[0], float(first[1]),
+            newest[0], float(newest[1]), newest[2], newest[3],
+            None if newest[4] is None else float(newest[4]),
+            _mean(recent), _mean(earlier), slope, r2, now)
+
+
+# ==========================================
+# ROLLUP
+# ==========================================
+
+def _columns(keys):
+    return [list(column) for column in zip(*keys)]
+
+
+def roll_up(conn, batch=500):
+    """Claim up to batch queued months and bring their months, seasons and
+    fields up to date in one transaction; returns counts of rows written"""
+    now = datetime.now(timezone.utc)
+    with conn.cursor() as cur:
+        cur.execute(CLAIM_QUEUE, (batch,))
+        queued = cur.fetchall()
+        if not queued:
+            conn.commit()
+            return None
+        cur.execute(MONTH_ANALYSES_QUERY, _columns(queued))
+        months = month_sums(cur.fetchall())
+
+    # Months
+    empty = [key for key in queued if key not in months]
+    if empty:
+        with conn.cursor() as cur:
+            cur.execute(DELETE_MONTHS, _columns(empty))
+    if months:
+        rows = []
+        for (farm_id, field_name, month), sums in months.items():
+            rows.append((farm_id, field_name, month, *sums.averages())
+                        + tuple(getattr(sums, c) for c in STORED_COLUMNS) + (now,))
+        db.upsert_rows(conn, "ndvi_monthly_trends", MONTH_COLUMNS,
+                       ("farm_id", "field_name", "month"), rows)
+
+    # Seasons: the ones a queued month is in and the ones after them
+    touched = {}
+    for farm_id, field_name, month in queued:
+        start = season_of(month)[0]
+        touched.setdefault((farm_id, field_name), set()).update((start, next_season(start)))
+    ranges = [(farm_id, field_name, previous_season(min(starts)), next_season(max(starts)))
+              for (farm_id, field_name), starts in touched.items()]
+    field_months = {key: {} for key in touched}
+    with conn.cursor() as cur:
+        cur.execute(FIELD_MONTHS_QUERY, _columns(ranges))
+        for farm_id, field_name, month, *values in cur.fetchall():
+            field_months[(farm_id, field_name)][month] = from_row(values)
+
+    seasons, empty_seasons = [], []
+    for (farm_id, field_name), starts in touched.items():
+        rows, empty = season_rows(farm_id, field_name, field_months[(farm_id, field_name)],
+                                  starts, now)
+        seasons.extend(rows)
+        empty_seasons.extend((farm_id, field_name, start) for start in empty)
+    if empty_seasons:
+        with conn.cursor() as cur:
+            cur.execute(DELETE_SEASONS, _columns(empty_seasons))
+    if seasons:
+        db.upsert_rows(conn, "ndvi_season_trends", SEASON_COLUMNS,
+                       ("farm_id", "field_name", "season_start"), seasons)
+
+    # Field summaries
+    keys = list(touched)
+    with conn.cursor() as cur:
+        cur.execute(FIELD_TOTALS_QUERY, _columns(keys))
+        totals = {(farm_id, field_name): from_row(values)
+                  for farm_id, field_name, *values in cur.fetchall()}
+        cur.execute(FIELD_ENDS_QUERY, _columns(keys))
+        ends = cur.fetchall()
+    latest, first = {}, {}
+    for farm_id, field_name, newest, *analysis in ends:
+        if newest:
+            latest.setdefault((farm_id, field_name), []).append(tuple(analysis))
+        else:
+            first[(farm_id, field_name)] = tuple(analysis[:2])
+    summaries = []
+    for key in keys:
+        if key in totals and key in latest:
+            history = sorted(latest[key], key=lambda a: a[0], reverse=True)
+            summaries.append(field_row(*key, totals[key], history, first[key], now))
+    gone = [key for key in keys if key not in totals or key not in latest]
+    if gone:
+        with conn.cursor() as cur:
+            cur.execute(DELETE_FIELDS, _columns(gone))
+    if summaries:
+        db.upsert_rows(conn, "ndvi_field_trends", FIELD_COLUMNS,
+                       ("farm_id", "field_name"), summaries)
+
+    conn.commit()
+    return {"months": len(queued), "seasons": len(seasons) + len(empty_seasons),
+            "fields": len(keys)}
+
+
+def rebuild(conn):
+    """Empty the rollups and queue every month of the history"""
+    with conn.cursor() as cur:
+        cur.execute(TRUNCATE_ROLLUPS)
+        cur.execute(ENQUEUE_ALL)
+        queued = cur.rowcount
+    conn.commit()
+    print(f"✓ Queued {queued:,} field months")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental NDVI trend rollups")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Recompute every rollup from satellite_ndvi_history")
+    parser.add_argument("--once", action="store_true",
+                        help="Exit once the queue is empty")
+    parser.add_argument("--batch", type=int, default=500, help="Queued months per transaction")
+    parser.add_argument("--poll-interval", type=float, default=5.0)
+    args = parser.parse_args()
+
+    config = load_config()
+    conn = db.connect(config.database_url)
+    stats = {"passes": 0, "months": 0, "seasons": 0, "fields": 0, "db_errors": 0}
+    last_stats = time.monotonic()
+    delay = RETRY_DELAY
+    try:
+        if args.rebuild:
+            rebuild(conn)
+        print(f"✓ Rolling up NDVI trends ({args.batch} months per pass)")
+        while True:
+            try:
+                if conn is None:
+                    conn = db.connect(config.database_url)
+                written = roll_up(conn, args.batch)
+            except Exception as error:
+                if not db.is_transient(error):
+                    raise
+                # Lost connection, timeout or deadlock: the pass rolled back
+                # and its months are still queued
+                stats["db_errors"] += 1
+                print(f"⚠ Database unavailable, retrying in {delay:g}s: {error}")
+                if conn is not None:
+                    try:
+                        conn = db.reset(conn, config.database_url)
+                    except Exception:
+                        conn = None
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+                continue
+            delay = RETRY_DELAY
+            if written:
+                stats["passes"] += 1
+                for name, count in written.items():
+                    stats[name] += count
+            if time.monotonic() - last_stats >= 60:
+                last_stats = time.monotonic()
+                print(f"[STATS] {stats}")
+            if written and written["months"] == args.batch:
+                continue
+            if args.once:
+                break
+            time.sleep(args.poll_interval)
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down gracefully...")
+    finally:
+        if conn is not None:
+            conn.close()
+    print(f"✓ Done: {stats}")
+
+
+if __name__ == "__main__":
+    main()
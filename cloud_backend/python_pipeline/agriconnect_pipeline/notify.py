@@ -0,0 +1,592 @@
+"""
+Notification Dispatcher
+Sends new rows from the alerts table to each farm's recipients by email
+(Resend), SMS and WhatsApp (Twilio), replacing the one-provider-call-per-
+alert path of the send-alert-email / send-sms-alert edge functions.
+
+Alerts are collected per recipient into a digest: the first alert opens
+it, and everything that arrives for the same recipient within the window
+goes out as one message. A critical alert shortens the wait unless the
+recipient already got a message within the window. Each channel has a
+small pool of async workers behind a token bucket, so provider rate
+limits are respected however many digests fall due at once.
+An incident that gains zones after it was sent goes out again as an
+update. alert_emails_log and sms_alerts_log get one row per message sent,
+written in bulk.
+
+Usage:
+    python -m agriconnect_pipeline.notify
+    python -m agriconnect_pipeline.notify --local ./outbox   # write messages to files
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import signal
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import namedtuple
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from . import db
+from .config import load_config
+from .metrics import NULL_METRICS, MetricsAggregate
+
+SEVERITY_RANK = {"info": 0, "warning": 1, "critical": 2}
+SEVERITY_ICON = {"critical": "🚨", "warning": "⚠️", "info": "ℹ️"}
+
+# Provider send rates: (messages per second, burst)
+DEFAULT_RATES = {"email": (2.0, 10), "sms": (1.0, 5), "whatsapp": (1.0, 5)}
+
+SMS_MAX_LENGTH = 1600        # Twilio concatenated SMS limit, as in send-sms-alert
+MAX_ZONES_LISTED = 12
+
+# Incidents are updated in place as zones join (updated_at); plain alerts
+# from the Node.js subscriber and the dashboard only have created_at
+NEW_ALERTS_QUERY = """
+    SELECT alert_id, farm_id, gateway_id, field_id, zone_id, alert_type, severity,
+           message, member_zones, zone_count, COALESCE(updated_at, created_at)
+    FROM alerts
+    WHERE COALESCE(updated_at, created_at) > %s
+    ORDER BY COALESCE(updated_at, created_at)
+"""
+
+RECIPIENTS_QUERY = """
+    SELECT farm_id, channel, address, min_severity
+    FROM notification_recipients
+    WHERE enabled
+"""
+
+EMAIL_LOG_COLUMNS = ("alert_type", "severity", "message", "recipient", "farm_id", "sent_at")
+SMS_LOG_COLUMNS = ("alert_type", "severity", "message", "recipient_phone", "farm_id",
+                   "sent_at", "delivery_status", "twilio_sid", "error_message")
+
+# WhatsApp has no log table
+LOG_TABLES = {
+    "email": ("alert_emails_log", EMAIL_LOG_COLUMNS),
+    "sms": ("sms_alerts_log", SMS_LOG_COLUMNS),
+}
+
+Recipient = namedtuple("Recipient", "farm_id channel address min_severity")
+SendResult = namedtuple("SendResult", "ok provider_id error")
+
+
+@dataclass
+class Notification:
+    channel: str
+    address: str
+    farm_id: str
+    severity: str
+    alert_type: str              # the alert's type, or "Alert digest"
+    title: str
+    body: str
+    alert_count: int
+
+    @property
+    def subject(self):
+        return f"[{self.severity.upper()}] {self.title} - {self.farm_id}"
+
+
+@dataclass
+class Digest:
+    """Alerts for one recipient waiting to be sent together"""
+    recipient: Recipient
+    due: float
+    alerts: list = field(default_factory=list)
+
+
+class TokenBucket:
+    """rate tokens per second, at most burst saved up; one token per message"""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def _alert_zones(alert):
+    """(field_id, zone_id) of every zone in an alert or incident"""
+    members = alert.get("member_zones")
+    if members:
+        return [(field_id or 0, zone_id or 0) for _, field_id, zone_id in members]
+    return [(alert.get("field_id") or 0, alert.get("zone_id") or 0)]
+
+
+def _zone_list(alerts):
+    """'Field 1: zones 0, 1, 2; Field 2: zone 3', shortened for big storms"""
+    zones = sorted({zone for alert in alerts for zone in _alert_zones(alert)})
+    by_field = {}
+    for field_id, zone_id in zones[:MAX_ZONES_LISTED]:
+        by_field.setdefault(field_id, []).append(str(zone_id))
+    text = "; ".join(
+        f"Field {field_id}: zone{'s' if len(ids) > 1 else ''} {', '.join(ids)}"
+        for field_id, ids in by_field.items()
+    )
+    if len(zones) > MAX_ZONES_LISTED:
+        text += f" (+{len(zones) - MAX_ZONES_LISTED} more)"
+    return text
+
+
+def render(digest):
+    """One Notification for all alerts in a digest"""
+    alerts = digest.alerts
+    recipient = digest.recipient
+    severity = max((a["severity"] for a in alerts), key=lambda s: SEVERITY_RANK.get(s, 0))
+
+    if len(alerts) == 1:
+        alert = alerts[0]
+        title = alert_type = alert["alert_type"]
+        body = f"{alert['message']}\n{_zone_list(alerts)}"
+        if alert.get("update"):
+            title = f"{alert_type} update"
+            body = (f"{alert['message']}\nNow {alert['zone_count']} zones "
+                    f"(+{alert['new_zones']} since the last message)\n{_zone_list(alerts)}")
+    else:
+        alert_type = "Alert digest"
+        groups = {}
+        for alert in alerts:
+            groups.setdefault((alert["alert_type"], alert["severity"]), []).append(alert)
+        ordered = sorted(groups.items(),
+                         key=lambda item: (-SEVERITY_RANK.get(item[0][1], 0), -len(item[1])))
+        title = f"{len(alerts)} alerts"
+        body = "\n\n".join(
+            f"{SEVERITY_ICON.get(sev, '📢')} {kind} ({sev}) - {len(group)} alert(s)\n"
+            f"{group[-1]['message']}\n{_zone_list(group)}"
+            for (kind, sev), group in ordered
+        )
+
+    text = f"{SEVERITY_ICON.get(severity, '📢')} AgriConnect: {title}\n\n{body}\n\nFarm: {recipient.farm_id}"
+    if recipient.channel != "email" and len(text) > SMS_MAX_LENGTH:
+        text = text[:SMS_MAX_LENGTH - 3] + "..."
+
+    return Notification(recipient.channel, recipient.address, recipient.farm_id, severity,
+                        alert_type, title, text, len(alerts))
+
+
+# ==========================================
+# SINKS
+# ==========================================
+
+def _post(url, data, headers):
+    """Blocking HTTP POST; returns (status, decoded JSON body)"""
+    request = urllib.request.Request(url, data=data, headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=15) as response:
+            status, raw = response.status, response.read()
+    except urllib.error.HTTPError as error:
+        status, raw = error.code, error.read()
+    try:
+        return status, json.loads(raw or b"{}")
+    except ValueError:
+        return status, {"message": raw[:200].decode(errors="replace")}
+
+
+class LocalSink:
+    """Offline stand-in for a provider.
+
+    Appends each message to <directory>/<channel>.jsonl, or keeps it in
+    .sent when no directory is given. latency simulates the provider call.
+    """
+
+    def __init__(self, directory=None, latency=0.0):
+        self.directory = directory
+        self.latency = latency
+        self.sent = []
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    async def send(self, notification):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent.append(notification)
+        if self.directory:
+            path = os.path.join(self.directory, f"{notification.channel}.jsonl")
+            with open(path, "a") as f:
+                f.write(json.dumps({"to": notification.address, "subject": notification.subject,
+                                    "body": notification.body, "at": time.time()}) + "\n")
+        return SendResult(True, f"local-{len(self.sent)}", None)
+
+
+class ResendEmailSink:
+    """Email through the Resend API (same sender as send-alert-email)"""
+
+    def __init__(self, api_key, sender="AgriConnect Alerts <alerts@agriconnect.app>"):
+        self.api_key = api_key
+        self.sender = sender
+
+    async def send(self, notification):
+        data = json.dumps({"from": self.sender, "to": notification.address,
+                           "subject": notification.subject, "text": notification.body}).encode()
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"}
+        status, body = await asyncio.to_thread(_post, "https://api.resend.com/emails", data, headers)
+        if status >= 300:
+            return SendResult(False, None, body.get("message", f"HTTP {status}"))
+        return SendResult(True, body.get("id"), None)
+
+
+class TwilioSink:
+    """SMS or WhatsApp through the Twilio Messages API"""
+
+    def __init__(self, account_sid, auth_token, from_number, whatsapp=False):
+        self.url = f"https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json"
+        token = base64.b64encode(f"{account_sid}:{auth_token}".encode()).decode()
+        self.headers = {"Content-Type": "application/x-www-form-urlencoded",
+                        "Authorization": f"Basic {token}"}
+        self.prefix = "whatsapp:" if whatsapp else ""
+        self.from_number = from_number
+
+    async def send(self, notification):
+        data = urllib.parse.urlencode({"To": self.prefix + notification.address,
+                                       "From": self.prefix + self.from_number,
+                                       "Body": notification.body}).encode()
+        status, body = await asyncio.to_thread(_post, self.url, data, self.headers)
+        if status >= 300:
+            return SendResult(False, None, body.get("message", f"HTTP {status}"))
+        return SendResult(True, body.get("sid"), None)
+
+
+def provider_sinks(config):
+    """Sinks for every channel whose provider credentials are configured"""
+    sinks = {}
+    if config.resend_api_key:
+        sinks["email"] = ResendEmailSink(config.resend_api_key)
+    if config.twilio_account_sid and config.twilio_auth_token:
+        if config.twilio_phone_number:
+            sinks["sms"] = TwilioSink(config.twilio_account_sid, config.twilio_auth_token,
+                                      config.twilio_phone_number)
+        if config.twilio_whatsapp_number:
+            sinks["whatsapp"] = TwilioSink(config.twilio_account_sid, config.twilio_auth_token,
+                                           config.twilio_whatsapp_number, whatsapp=True)
+    return sinks
+
+
+# ==========================================
+# DISPATCHER
+# ==========================================
+
+class Dispatcher:
+    """Per-recipient digests feeding rate-limited per-channel worker pools.
+
+    submit() and due() are plain methods (the caller passes the time);
+    run() drives them and the workers on the running event loop.
+    """
+
+    def __init__(self, sinks, window=120.0, critical_window=15.0, workers=2, rates=None,
+                 metrics=NULL_METRICS):
+        self.sinks = sinks
+        self.metrics = metrics
+        self.window = window
+        self.critical_window = critical_window
+        self.workers = workers
+        rates = {**DEFAULT_RATES, **(rates or {})}
+        self.buckets = {channel: TokenBucket(*rates[channel]) for channel in sinks}
+
+        self.recipients = {}     # farm_id -> [Recipient]
+        self.digests = {}        # (channel, address, farm_id) -> open Digest
+        self.last_sent = {}      # same key -> when its last digest was dispatched
+        self.queues = {}         # channel -> asyncio.Queue of Notifications
+        self.log_rows = {channel: [] for channel in LOG_TABLES}
+        self.stats = {"alerts": 0, "updates": 0, "unrouted": 0, "digests": 0, "sent": 0,
+                      "failed": 0}
+
+    def set_recipients(self, rows):
+        recipients = {}
+        for row in rows:
+            recipient = Recipient(*row)
+            if recipient.channel in self.sinks:
+                recipients.setdefault(recipient.farm_id, []).append(recipient)
+        self.recipients = recipients
+
+    def submit(self, alert, now):
+        """Add an alert (dict with the alerts table's columns) to its digests.
+
+        An update of an incident still waiting in a digest replaces it there,
+        so the recipient gets the grown incident once.
+        """
+        self.stats["updates" if alert.get("update") else "alerts"] += 1
+        rank = SEVERITY_RANK.get(alert["severity"], 0)
+        routed = False
+        for recipient in self.recipients.get(alert["farm_id"], ()):
+            if rank < SEVERITY_RANK.get(recipient.min_severity, 1):
+                continue
+            routed = True
+            key = (recipient.channel, recipient.address, recipient.farm_id)
+            digest = self.digests.get(key)
+            if digest is None:
+                digest = self.digests[key] = Digest(recipient, now + self.window)
+            queued = None
+            if alert.get("update"):
+                queued = next((i for i, waiting in enumerate(digest.alerts)
+                               if waiting.get("alert_id") == alert["alert_id"]), None)
+            if queued is None:
+                digest.alerts.append(alert)
+            else:
+                waiting = digest.alerts[queued]
+                digest.alerts[queued] = {**alert, "update": waiting.get("update", False),
+                                         "new_zones": waiting["new_zones"] + alert["new_zones"]}
+            # Critical alerts go out fast, but only once per window: the rest
+            # of a storm is summed up in the next regular digest
+            if (rank == SEVERITY_RANK["critical"]
+                    and now - self.last_sent.get(key, float("-inf")) >= self.window):
+                digest.due = min(digest.due, now + self.critical_window)
+        if not routed:
+            self.stats["unrouted"] += 1
+
+    def due(self, now):
+        """Digests whose window has closed; removes them"""
+        ready = [key for key, digest in self.digests.items() if digest.due <= now]
+        for key in ready:
+            self.last_sent[key] = now
+        if len(self.last_sent) > 2 * len(self.digests) + 1000:
+            self.last_sent = {key: at for key, at in self.last_sent.items()
+                              if now - at < self.window}
+        return [self.digests.pop(key) for key in ready]
+
+    def _dispatch(self, digests):
+        for digest in digests:
+            self.stats["digests"] += 1
+            self.queues[digest.recipient.channel].put_nowait(render(digest))
+
+    async def run(self, stop, tick=0.25):
+        """Send digests as they fall due until stop is set, then flush"""
+        self.queues = {channel: asyncio.Queue() for channel in self.sinks}
+        workers = [asyncio.create_task(self._worker(channel))
+                   for channel in self.sinks for _ in range(self.workers)]
+        while not stop.is_set():
+            self._dispatch(self.due(time.time()))
+            try:
+                await asyncio.wait_for(stop.wait(), tick)
+            except asyncio.TimeoutError:
+                pass
+
+        # Send what is still collecting instead of dropping it
+        self._dispatch(list(self.digests.values()))
+        self.digests = {}
+        for queue in self.queues.values():
+            await queue.join()
+        for worker in workers:
+            worker.cancel()
+
+    async def _worker(self, channel):
+        queue = self.queues[channel]
+        sink = self.sinks[channel]
+        bucket = self.buckets[channel]
+        metrics = self.metrics
+        while True:
+            notification = await queue.get()
+            try:
+                t = metrics.clock()
+                await bucket.acquire()
+                t = metrics.observe(f"notify_rate_wait_{channel}", t)
+                try:
+                    result = await sink.send(notification)
+                except (OSError, ValueError) as error:
+                    result = SendResult(False, None, str(error))
+                metrics.observe(f"notify_send_{channel}", t)
+                metrics.count(f"notify_{'sent' if result.ok else 'failed'}_{channel}")
+                self._record(notification, result)
+            except Exception as error:
+                # Keep the worker alive: a dead worker would leave its queue unsent
+                self.stats["failed"] += 1
+                print(f"✗ {channel} worker error for {notification.address}: {error!r}")
+            finally:
+                queue.task_done()
+
+    def _record(self, notification, result):
+        now = time.time()
+        if result.ok:
+            self.stats["sent"] += 1
+        else:
+            self.stats["failed"] += 1
+            print(f"✗ {notification.channel} to {notification.address} failed: {result.error}")
+
+        sent_at = datetime.fromtimestamp(now, timezone.utc)
+        if notification.channel == "email" and result.ok:
+            self.log_rows["email"].append((notification.alert_type, notification.severity,
+                                           notification.body, notification.address,
+                                           notification.farm_id, sent_at))
+        elif notification.channel == "sms":
+            self.log_rows["sms"].append((notification.alert_type, notification.severity,
+                                         notification.body, notification.address,
+                                         notification.farm_id, sent_at,
+                                         "sent" if result.ok else "failed",
+                                         result.provider_id, result.error))
+
+    def drain_log(self):
+        """Log rows per channel since the last call; clears them"""
+        rows = self.log_rows
+        self.log_rows = {channel: [] for channel in LOG_TABLES}
+        return rows
+
+
+# ==========================================
+# DATABASE
+# ==========================================
+
+class AlertPoller:
+    """New alerts, and incidents that gained zones, from the alerts table.
+
+    The correlator inserts an incident with its first alert's created_at
+    and updates it in place (member_zones, zone_count, updated_at) as zones
+    join, so rows are polled by their last change. A row is returned once
+    when first seen and again, flagged as an update, whenever its
+    zone_count has grown. A change can commit after later ones, so every
+    poll re-reads the last `lookback` seconds. Zone counts are kept for
+    `memory` seconds after an incident's last change, longer than the
+    correlator keeps an incident open.
+    """
+
+    def __init__(self, conn, lookback=30, memory=6 * 3600):
+        self.conn = conn
+        self.lookback = timedelta(seconds=lookback)
+        self.memory = timedelta(seconds=memory)
+        self.since = None
+        self.zones = {}          # alert_id -> (zone_count, last change)
+
+    def poll(self):
+        with self.conn.cursor() as cur:
+            if self.since is None:
+                # Start from now: alerts from before the dispatcher started are not sent
+                cur.execute("SELECT now()")
+                self.since = cur.fetchone()[0]
+                rows = []
+            else:
+                cur.execute(NEW_ALERTS_QUERY, (self.since - self.lookback,))
+                rows = cur.fetchall()
+        self.conn.commit()
+
+        alerts = []
+        for (alert_id, farm_id, gateway_id, field_id, zone_id, alert_type, severity,
+             message, member_zones, zone_count, changed_at) in rows:
+            self.since = max(self.since, changed_at)
+            zone_count = zone_count or 1
+            known = self.zones.get(alert_id)
+            if known is not None and zone_count <= known[0]:
+                self.zones[alert_id] = (known[0], max(known[1], changed_at))
+                continue
+            self.zones[alert_id] = (zone_count, changed_at)
+            alerts.append({"alert_id": alert_id, "farm_id": farm_id, "gateway_id": gateway_id,
+                           "field_id": field_id, "zone_id": zone_id, "alert_type": alert_type,
+                           "severity": severity or "info", "message": message,
+                           "member_zones": member_zones, "zone_count": zone_count,
+                           "new_zones": zone_count - (known[0] if known else 0),
+                           "update": known is not None})
+
+        horizon = self.since - self.memory
+        self.zones = {key: value for key, value in self.zones.items() if value[1] >= horizon}
+        return alerts
+
+
+def load_recipients(conn):
+    with conn.cursor() as cur:
+        cur.execute(RECIPIENTS_QUERY)
+        rows = cur.fetchall()
+    conn.commit()
+    return rows
+
+
+def write_log(conn, rows_by_channel):
+    """One COPY per log table"""
+    written = False
+    for channel, rows in rows_by_channel.items():
+        if rows:
+            table, columns = LOG_TABLES[channel]
+            db.copy_rows(conn, table, columns, rows)
+            written = True
+    if written:
+        conn.commit()
+
+
+async def serve(args, config):
+    if args.local:
+        sinks = {channel: LocalSink(args.local) for channel in DEFAULT_RATES}
+    else:
+        sinks = provider_sinks(config)
+    if not sinks:
+        raise RuntimeError("No provider credentials set (RESEND_API_KEY, TWILIO_*); "
+                           "use --local to write messages to files")
+
+    metrics = NULL_METRICS
+    if args.metrics_port is not None:
+        metrics = MetricsAggregate()
+        metrics.serve(args.metrics_port)
+    dispatcher = Dispatcher(sinks, window=args.window, critical_window=args.critical_window,
+                            workers=args.workers, metrics=metrics)
+    conn = db.connect(config.database_url)
+    poller = AlertPoller(conn)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+
+    runner = asyncio.create_task(dispatcher.run(stop))
+    print(f"✓ Dispatching to {', '.join(sinks)} "
+          f"({args.window:.0f}s digests, {args.critical_window:.0f}s for critical)")
+
+    last_recipients = last_stats = float("-inf")
+    try:
+        # The connection is only used from this task, one call at a time
+        while not stop.is_set():
+            if time.monotonic() - last_recipients >= args.recipients_interval:
+                last_recipients = time.monotonic()
+                dispatcher.set_recipients(await asyncio.to_thread(load_recipients, conn))
+            for alert in await asyncio.to_thread(poller.poll):
+                dispatcher.submit(alert, time.time())
+            await asyncio.to_thread(write_log, conn, dispatcher.drain_log())
+
+            if time.monotonic() - last_stats >= 60:
+                last_stats = time.monotonic()
+                print(f"[STATS] {dispatcher.stats}")
+            try:
+                await asyncio.wait_for(stop.wait(), args.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+        print("\n🛑 Shutting down gracefully...")
+        await runner
+        write_log(conn, dispatcher.drain_log())
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alert digests by email, SMS and WhatsApp")
+    parser.add_argument("--window", type=float, default=120.0,
+                        help="Seconds alerts are collected into one message per recipient")
+    parser.add_argument("--critical-window", type=float, default=15.0,
+                        help="Shorter wait once a digest contains a critical alert")
+    parser.add_argument("--workers", type=int, default=2, help="Send workers per channel")
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    parser.add_argument("--recipients-interval", type=float, default=300.0,
+                        help="Seconds between reloads of notification_recipients")
+    parser.add_argument("--local", metavar="DIR",
+                        help="Write messages to DIR/<channel>.jsonl instead of calling providers")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Serve send latency metrics on 127.0.0.1:<port>/metrics")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args, load_config()))
+
+
+if __name__ == "__main__":
+    main()
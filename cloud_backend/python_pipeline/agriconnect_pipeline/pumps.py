@@ -0,0 +1,356 @@
+"""
+Pump Runtime Accounting
+Derives pump runtime, on/off cycles and duty cycle from the pumpStatus of
+every reading, instead of PredictiveMaintenance (dashboard) adding 15
+minutes per pump-activated event to counters in localStorage, which start
+again from zero on every browser.
+
+Each zone's readings are a run-length stream of pump_status: the time
+from one reading to the next counts as runtime when the pump was on at
+the first, an off → on step is one cycle. Gaps longer than a node can go
+silent before liveness calls it offline count for nothing. Totals per
+zone (with the last state, so the next batch continues the stream) live
+in pump_runtime and per gateway and day in pump_runtime_daily; the
+pump_usage view sums them per gateway for the maintenance page.
+
+Ingest workers account each commit batch in the same transaction as its
+readings. --rebuild recomputes both tables from sensor_readings, one
+chunk at a time in zone and time order.
+
+Usage:
+    python -m agriconnect_pipeline.pumps --rebuild
+    python -m agriconnect_pipeline.pumps --gateway-id GW-CM-BUE-001
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+
+from . import db
+from .backfill import LOCAL_TZ
+from .config import load_config
+from .liveness import MISSED_INTERVALS
+from .sampling import LADDER
+
+# Longest gap between two readings that still counts (liveness's offline cutoff)
+MAX_GAP = MISSED_INTERVALS * max(LADDER)
+
+# Africa/Douala keeps one offset all year
+DAY_OFFSET = LOCAL_TZ.utcoffset(datetime(2025, 1, 1)).total_seconds()
+
+STATE_QUERY = """
+    SELECT gateway_id, field_id, zone_id, last_reading_time, last_status, on_since
+    FROM pump_runtime
+    WHERE (gateway_id, field_id, zone_id) IN
+          (SELECT * FROM unnest(%s::text[], %s::int[], %s::int[]))
+"""
+
+UPSERT_TOTALS = """
+    INSERT INTO pump_runtime AS p (gateway_id, field_id, zone_id, runtime_seconds, cycles,
+                                   observed_seconds, last_reading_time, last_status, on_since)
+    SELECT * FROM unnest(%s::text[], %s::int[], %s::int[], %s::float8[], %s::bigint[],
+                         %s::float8[], %s::timestamptz[], %s::boolean[], %s::timestamptz[])
+    ON CONFLICT (gateway_id, field_id, zone_id) DO UPDATE SET
+        runtime_seconds = p.runtime_seconds + EXCLUDED.runtime_seconds,
+        cycles = p.cycles + EXCLUDED.cycles,
+        observed_seconds = p.observed_seconds + EXCLUDED.observed_seconds,
+        last_reading_time = EXCLUDED.last_reading_time,
+        last_status = EXCLUDED.last_status,
+        on_since = EXCLUDED.on_since,
+        updated_at = NOW()
+"""
+
+# Zones of one gateway are summed first: one statement cannot update a row twice
+UPSERT_DAILY = """
+    INSERT INTO pump_runtime_daily AS d (gateway_id, day, runtime_seconds, cycles,
+                                         observed_seconds)
+    SELECT gateway_id, day, SUM(runtime), SUM(cycles), SUM(observed)
+    FROM unnest(%s::text[], %s::date[], %s::float8[], %s::bigint[], %s::float8[])
+         AS u(gateway_id, day, runtime, cycles, observed)
+    GROUP BY gateway_id, day
+    ON CONFLICT (gateway_id, day) DO UPDATE SET
+        runtime_seconds = d.runtime_seconds + EXCLUDED.runtime_seconds,
+        cycles = d.cycles + EXCLUDED.cycles,
+        observed_seconds = d.observed_seconds + EXCLUDED.observed_seconds
+"""
+
+HISTORY_QUERY = """
+    SELECT gateway_id, field_id, zone_id, EXTRACT(EPOCH FROM reading_time), pump_status
+    FROM sensor_readings
+    WHERE pump_status IS NOT NULL
+    ORDER BY gateway_id, field_id, zone_id, reading_time
+"""
+
+USAGE_QUERY = """
+    SELECT gateway_id, runtime_hours, cycles, running, on_since, duty_cycle_7d, cycles_7d
+    FROM pump_usage
+    WHERE %s::text IS NULL OR gateway_id = %s
+    ORDER BY gateway_id
+"""
+
+
+@dataclass
+class RunLengths:
+    """Accounting of a batch of readings, per stream and per (stream, day)"""
+    runtime: np.ndarray          # seconds with the pump on
+    cycles: np.ndarray           # off -> on steps
+    observed: np.ndarray         # seconds covered by readings
+    last_time: np.ndarray        # epoch seconds of the stream's last reading
+    last_status: np.ndarray
+    on_since: np.ndarray         # last off -> on step in the batch, NaN if none
+    day_stream: np.ndarray
+    day: np.ndarray              # local day number (days since 1970-01-01)
+    day_runtime: np.ndarray
+    day_cycles: np.ndarray
+    day_observed: np.ndarray
+
+
+def run_lengths(streams, times, status, carried=None, count=None, max_gap=MAX_GAP):
+    """Runtime, cycles and observed time of many pump_status streams at once.
+
+    streams are small integer ids, times epoch seconds; rows need not be
+    sorted. carried marks rows that repeat a stream's last state from an
+    earlier batch: they start intervals but are not a new cycle.
+    """
+    streams = np.asarray(streams, dtype=np.int64)
+    times = np.asarray(times, dtype=np.float64)
+    status = np.asarray(status, dtype=bool)
+    carried = np.zeros(len(streams), dtype=bool) if carried is None else np.asarray(carried)
+    count = int(streams.max()) + 1 if count is None else count
+
+    order = np.lexsort((times, streams))
+    streams, times, status, carried = streams[order], times[order], status[order], carried[order]
+
+    same = streams[1:] == streams[:-1]
+    step = np.diff(times)
+    counted = same & (step >= 0) & (step <= max_gap)
+    observed = np.where(counted, step, 0.0)
+    runtime = np.where(status[:-1], observed, 0.0)
+
+    previous = np.zeros(len(streams), dtype=bool)
+    previous[1:] = status[:-1] & same
+    starts = status & ~previous & ~carried
+
+    # Intervals and cycles belong to the local day they start in
+    day = np.floor((times + DAY_OFFSET) / 86400).astype(np.int64)
+    day0 = int(day.min()) if len(day) else 0
+    width = int(day.max()) - day0 + 1 if len(day) else 1
+    cell = streams * width + (day - day0)
+    cells, inverse = np.unique(cell, return_inverse=True)
+
+    last = np.flatnonzero(np.append(~same, True))
+    last_time = np.full(count, np.nan)
+    last_time[streams[last]] = times[last]
+    last_status = np.zeros(count, dtype=bool)
+    last_status[streams[last]] = status[last]
+    on_since = np.full(count, -np.inf)
+    np.maximum.at(on_since, streams[starts], times[starts])
+    on_since[np.isinf(on_since)] = np.nan
+
+    return RunLengths(
+        runtime=np.bincount(streams[:-1], weights=runtime, minlength=count),
+        cycles=np.bincount(streams[starts], minlength=count),
+        observed=np.bincount(streams[:-1], weights=observed, minlength=count),
+        last_time=last_time,
+        last_status=last_status,
+        on_since=on_since,
+        day_stream=cells // width,
+        day=cells % width + day0,
+        day_runtime=np.bincount(inverse[:-1], weights=runtime, minlength=len(cells)),
+        day_cycles=np.bincount(inverse[starts], minlength=len(cells)),
+        day_observed=np.bincount(inverse[:-1], weights=observed, minlength=len(cells)),
+    )
+
+
+def _timestamp(seconds):
+    return None if np.isnan(seconds) else datetime.fromtimestamp(float(seconds), timezone.utc)
+
+
+class PumpAccounting:
+    """Turns readings into pump_runtime and pump_runtime_daily increments.
+
+    Keeps each zone's last (time, status, on_since) so a stream continues
+    across batches; zones it has not seen yet are continued from their
+    pump_runtime row. write() runs in the caller's transaction; the new
+    state and stats are only kept after mark_written(), and discard()
+    puts a rolled-back batch's readings back, to be accounted again when
+    the batch is retried.
+    """
+
+    def __init__(self, conn=None, max_gap=MAX_GAP):
+        self.conn = conn
+        self.max_gap = max_gap
+        self.state = {}                  # zone key -> (last time, last status, on_since)
+        self.pending = {}
+        self.keys, self.times, self.status = [], [], []
+        self.unwritten = []              # (keys, times, status) written, not committed
+        self.stats = {"readings": 0, "cycles": 0, "runtime_seconds": 0.0,
+                      "observed_seconds": 0.0}
+        self.pending_stats = dict.fromkeys(self.stats, 0)
+
+    def observe(self, key, when, status):
+        """One reading of zone key at when (epoch seconds)"""
+        self.keys.append(key)
+        self.times.append(when)
+        self.status.append(bool(status))
+
+    def observe_many(self, keys, times, status):
+        self.keys.extend(keys)
+        self.times.extend(times)
+        self.status.extend(status)
+
+    def forget(self, keys):
+        """Zones handed to another worker continue from the table there"""
+        for key in keys:
+            self.state.pop(key, None)
+
+    def _load(self, keys):
+        if self.conn is None or not keys:
+            return
+        with self.conn.cursor() as cur:
+            cur.execute(STATE_QUERY, tuple(map(list, zip(*keys))))
+            for gateway_id, field_id, zone_id, last_time, last_status, on_since in cur:
+                self.state[(gateway_id, field_id, zone_id)] = (
+                    last_time.timestamp() if last_time else np.nan, bool(last_status),
+                    on_since.timestamp() if on_since else np.nan)
+
+    def account(self, keys, times, status):
+        """(zone keys, RunLengths) of a batch continued from the known state"""
+        codes = {}
+        streams = np.array([codes.setdefault(key, len(codes)) for key in keys], dtype=np.int64)
+        zones = list(codes)
+        self._load([key for key in zones if key not in self.state])
+
+        carried = [(codes[key], *self.state[key][:2]) for key in zones
+                   if key in self.state and not np.isnan(self.state[key][0])]
+        times = np.asarray(times, dtype=np.float64)
+        status = np.asarray(status, dtype=bool)
+        marks = np.zeros(len(streams), dtype=bool)
+        if carried:
+            extra = np.array(carried, dtype=np.float64)
+            streams = np.concatenate([streams, extra[:, 0].astype(np.int64)])
+            times = np.concatenate([times, extra[:, 1]])
+            status = np.concatenate([status, extra[:, 2].astype(bool)])
+            marks = np.concatenate([marks, np.ones(len(carried), dtype=bool)])
+        return zones, run_lengths(streams, times, status, marks, len(zones), self.max_gap)
+
+    def write(self, conn=None):
+        """Add the buffered readings to both tables; returns readings accounted"""
+        if not self.keys:
+            return 0
+        keys, times, status = self.keys, self.times, self.status
+        self.keys, self.times, self.status = [], [], []
+        self.unwritten.append((keys, times, status))
+        zones, result = self.account(keys, times, status)
+
+        on_since = []
+        for i, key in enumerate(zones):
+            since = result.on_since[i]
+            if np.isnan(since) and result.last_status[i] and key in self.state:
+                since = self.state[key][2]     # still the run from an earlier batch
+            on_since.append(since if result.last_status[i] else np.nan)
+            self.pending[key] = (result.last_time[i], bool(result.last_status[i]), on_since[-1])
+
+        self.pending_stats["readings"] += len(keys)
+        self.pending_stats["cycles"] += int(result.cycles.sum())
+        self.pending_stats["runtime_seconds"] += float(result.runtime.sum())
+        self.pending_stats["observed_seconds"] += float(result.observed.sum())
+
+        conn = conn or self.conn
+        if conn is not None:
+            gateways, fields, zone_ids = (list(column) for column in zip(*zones))
+            day_gateways = [zones[i][0] for i in result.day_stream]
+            with conn.cursor() as cur:
+                cur.execute(UPSERT_TOTALS, (
+                    gateways, fields, zone_ids, result.runtime.tolist(),
+                    result.cycles.tolist(), result.observed.tolist(),
+                    [_timestamp(t) for t in result.last_time], result.last_status.tolist(),
+                    [_timestamp(t) for t in on_since]))
+                cur.execute(UPSERT_DAILY, (
+                    day_gateways,
+                    [datetime.fromtimestamp(int(d) * 86400, timezone.utc).date()
+                     for d in result.day],
+                    result.day_runtime.tolist(), result.day_cycles.tolist(),
+                    result.day_observed.tolist()))
+        return len(keys)
+
+    def mark_written(self):
+        """The batch was committed; its last states are the new starting point"""
+        self.state.update(self.pending)
+        self.pending.clear()
+        for name, value in self.pending_stats.items():
+            self.stats[name] += value
+        self.pending_stats = dict.fromkeys(self.stats, 0)
+        self.unwritten = []
+
+    def discard(self):
+        """The batch was rolled back; its readings are buffered again"""
+        self.pending.clear()
+        self.pending_stats = dict.fromkeys(self.stats, 0)
+        for keys, times, status in reversed(self.unwritten):
+            self.keys[:0], self.times[:0], self.status[:0] = keys, times, status
+        self.unwritten = []
+
+
+# ==========================================
+# HISTORY
+# ==========================================
+
+def rebuild(conn, chunk_size=200000):
+    """Recompute pump_runtime and pump_runtime_daily from all readings"""
+    accounting = PumpAccounting()
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE pump_runtime, pump_runtime_daily")
+    readings = 0
+    started = time.perf_counter()
+    for rows in db.iter_chunks(conn, HISTORY_QUERY, (), chunk_size, name="pump_history"):
+        columns = list(zip(*rows))
+        accounting.observe_many(zip(columns[0], columns[1], columns[2]),
+                                map(float, columns[3]), columns[4])
+        # Rows come in zone order, so only a chunk's first zone continues
+        readings += accounting.write(conn)
+        accounting.mark_written()
+        print(f"  {readings:,} readings, {accounting.stats['cycles']:,} cycles, "
+              f"{time.perf_counter() - started:.1f}s")
+    conn.commit()
+    return accounting.stats
+
+
+def usage(conn, gateway_id=None):
+    with conn.cursor() as cur:
+        cur.execute(USAGE_QUERY, (gateway_id, gateway_id))
+        return cur.fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pump runtime and cycle accounting")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Recompute the tables from all of sensor_readings")
+    parser.add_argument("--gateway-id", help="Show one gateway (default: all)")
+    parser.add_argument("--chunk-size", type=int, default=200000)
+    args = parser.parse_args()
+
+    config = load_config()
+    with db.connect(config.database_url) as conn:
+        if args.rebuild:
+            started = time.perf_counter()
+            stats = rebuild(conn, args.chunk_size)
+            elapsed = time.perf_counter() - started
+            print(f"✓ Rebuilt pump accounting from {stats['readings']:,} readings in "
+                  f"{elapsed:.1f}s ({stats['readings'] / max(elapsed, 1e-9):,.0f} readings/s)")
+            print(f"[STATS] {stats}")
+
+        rows = usage(conn, args.gateway_id)
+    print(f"\n{'gateway':<18}{'runtime h':>10}{'cycles':>8}{'running':>9}"
+          f"{'duty 7d':>9}{'cycles 7d':>10}")
+    for gateway_id, hours, cycles, running, on_since, duty, recent in rows:
+        state = on_since.astimezone(LOCAL_TZ).strftime("%H:%M") if running and on_since else "-"
+        print(f"{gateway_id:<18}{hours:>10.1f}{cycles:>8}{state:>9}"
+              f"{(duty or 0):>9.0%}{recent:>10}")
+
+
+if __name__ == "__main__":
+    main()
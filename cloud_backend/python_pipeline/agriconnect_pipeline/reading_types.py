@@ -0,0 +1,635 @@
+"""
+Sensor Reading Types
+Generated by codegen.py from the sensor_readings table (schema.sql and
+the ADD COLUMN migrations). Do not edit; re-run
+    python -m agriconnect_pipeline.codegen
+
+SensorReading is one row with __slots__. ReadingBatch keeps many rows as
+one typed array per column (NULL is NaN, NULL_INT or NULL_BOOL), which
+takes a fraction of the memory of a tuple per row and turns into COPY
+text a column at a time.
+
+A missing or null payload value is stored as NULL, or the column's
+constant default; 0 and false are kept. A value that cannot be converted
+to its column's type, or is outside the range the column can hold (e.g.
+DECIMAL(5, 2) or INTEGER), is stored as NULL and clears data_valid.
+"""
+
+import math
+from array import array
+from datetime import datetime, timezone
+
+NULL_INT = -(1 << 63)    # stands for NULL in integer columns
+NULL_BOOL = 2            # stands for NULL in boolean columns
+NAN = math.nan           # stands for NULL in float and time columns
+
+_COPY_NULL = "\\N"
+_BOOL_TEXT = ("f", "t", _COPY_NULL)
+
+
+def _int(value):
+    """JSON value -> int (450.0 -> 450), or None if it is not a number"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return int(round(value)) if math.isfinite(value) else None
+
+
+def _float(value):
+    if isinstance(value, bool):
+        return float(value)
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+def _bool(value):
+    if isinstance(value, (bool, int, float)):
+        return bool(value)
+    if isinstance(value, str) and value.lower() in ("true", "false", "1", "0"):
+        return value.lower() in ("true", "1")
+    return None
+
+
+def _text(value):
+    return value if isinstance(value, str) else str(value)
+
+
+def _copy_escape(value):
+    if "\\" in value or "\t" in value or "\n" in value or "\r" in value:
+        return (value.replace("\\", "\\\\").replace("\t", "\\t")
+                .replace("\n", "\\n").replace("\r", "\\r"))
+    return value
+
+
+def _text_column(values):
+    return [_COPY_NULL if value is None else _copy_escape(value) for value in values]
+
+
+def _int_column(values):
+    return [_COPY_NULL if value == NULL_INT else str(value) for value in values]
+
+
+def _float_column(values):
+    return [_COPY_NULL if value != value else repr(value) for value in values]
+
+
+def _bool_column(values):
+    return [_BOOL_TEXT[value] for value in values]
+
+
+def _time_column(values):
+    # Readings in one batch share few distinct seconds; format each once
+    formatted = {}
+    column = []
+    for value in values:
+        text = formatted.get(value)
+        if text is None:
+            text = formatted[value] = (
+                _COPY_NULL if value != value
+                else datetime.fromtimestamp(value, timezone.utc).isoformat())
+        column.append(text)
+    return column
+
+
+def _time(value):
+    return None if value != value else datetime.fromtimestamp(value, timezone.utc)
+
+
+COPY_COLUMNS = (
+    "gateway_id",
+    "field_id",
+    "zone_id",
+    "reading_time",
+    "latitude",
+    "longitude",
+    "air_temperature",
+    "air_humidity",
+    "light_intensity",
+    "par_value",
+    "co2_ppm",
+    "soil_moisture",
+    "soil_temperature",
+    "ph_value",
+    "ec_value",
+    "nitrogen_ppm",
+    "phosphorus_ppm",
+    "potassium_ppm",
+    "water_level",
+    "battery_level",
+    "pump_status",
+    "rssi",
+    "data_valid",
+    "reading_fingerprint",
+)
+
+
+class SensorReading:
+    """One sensor_readings row"""
+
+    __slots__ = COPY_COLUMNS
+
+    @classmethod
+    def from_payload(cls, gateway_id, field_id, zone_id, reading_time, data, fingerprint=None):
+        """Row for one agriconnect/data payload"""
+        if not -2147483649 < field_id < 2147483648:
+            raise ValueError(f"field_id {field_id} is out of range")
+        if not -2147483649 < zone_id < 2147483648:
+            raise ValueError(f"zone_id {zone_id} is out of range")
+        sensors = data.get("sensors") or {}
+        system = data.get("system") or {}
+        location = data.get("location") or {}
+        valid = True
+        self = cls.__new__(cls)
+        self.gateway_id = gateway_id
+        self.field_id = field_id
+        self.zone_id = zone_id
+        self.reading_time = reading_time
+        value = location.get("lat")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -99.999999995 < value < 99.999999995:
+                value = None
+                valid = False
+        self.latitude = value
+        value = location.get("lon")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -999.999999995 < value < 999.999999995:
+                value = None
+                valid = False
+        self.longitude = value
+        value = sensors.get("airTemperature")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -999.995 < value < 999.995:
+                value = None
+                valid = False
+        self.air_temperature = value
+        value = sensors.get("airHumidity")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -999.995 < value < 999.995:
+                value = None
+                valid = False
+        self.air_humidity = value
+        value = sensors.get("lightIntensity")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        self.light_intensity = value
+        value = sensors.get("parValue")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -999999.995 < value < 999999.995:
+                value = None
+                valid = False
+        self.par_value = value
+        value = sensors.get("co2PPM")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        self.co2_ppm = value
+        value = sensors.get("soilMoisture")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        self.soil_moisture = value
+        value = sensors.get("soilTemperature")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -999.995 < value < 999.995:
+                value = None
+                valid = False
+        self.soil_temperature = value
+        value = sensors.get("phValue")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -99.995 < value < 99.995:
+                value = None
+                valid = False
+        self.ph_value = value
+        value = sensors.get("ecValue")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -9999.995 < value < 9999.995:
+                value = None
+                valid = False
+        self.ec_value = value
+        value = sensors.get("nitrogenPPM")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        self.nitrogen_ppm = value
+        value = sensors.get("phosphorusPPM")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        self.phosphorus_ppm = value
+        value = sensors.get("potassiumPPM")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        self.potassium_ppm = value
+        value = system.get("waterLevel")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        self.water_level = value
+        value = system.get("batteryLevel")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        self.battery_level = value
+        value = system.get("pumpStatus")
+        if value is not None and type(value) is not bool:
+            value = _bool(value)
+            if value is None:
+                valid = False
+        if value is None:
+            value = False
+        self.pump_status = value
+        value = system.get("rssi")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        self.rssi = value
+        self.reading_fingerprint = fingerprint
+        self.data_valid = valid
+        return self
+
+    def copy_row(self):
+        """Values in COPY_COLUMNS order"""
+        return (self.gateway_id, self.field_id, self.zone_id, self.reading_time, self.latitude,
+                self.longitude, self.air_temperature, self.air_humidity, self.light_intensity,
+                self.par_value, self.co2_ppm, self.soil_moisture, self.soil_temperature,
+                self.ph_value, self.ec_value, self.nitrogen_ppm, self.phosphorus_ppm,
+                self.potassium_ppm, self.water_level, self.battery_level, self.pump_status,
+                self.rssi, self.data_valid, self.reading_fingerprint)
+
+    def __repr__(self):
+        return f"SensorReading({self.gateway_id}/{self.field_id}/{self.zone_id})"
+
+
+class ReadingBatch:
+    """sensor_readings rows as one array per column (struct of arrays)"""
+
+    __slots__ = COPY_COLUMNS
+
+    def __init__(self):
+        self.gateway_id = []
+        self.field_id = array("q")
+        self.zone_id = array("q")
+        self.reading_time = array("d")
+        self.latitude = array("d")
+        self.longitude = array("d")
+        self.air_temperature = array("d")
+        self.air_humidity = array("d")
+        self.light_intensity = array("q")
+        self.par_value = array("d")
+        self.co2_ppm = array("q")
+        self.soil_moisture = array("q")
+        self.soil_temperature = array("d")
+        self.ph_value = array("d")
+        self.ec_value = array("d")
+        self.nitrogen_ppm = array("q")
+        self.phosphorus_ppm = array("q")
+        self.potassium_ppm = array("q")
+        self.water_level = array("q")
+        self.battery_level = array("q")
+        self.pump_status = bytearray()
+        self.rssi = array("q")
+        self.data_valid = bytearray()
+        self.reading_fingerprint = array("q")
+
+    def __len__(self):
+        return len(self.gateway_id)
+
+    def append_payload(self, gateway_id, field_id, zone_id, reading_time, data, fingerprint=None):
+        """Add one agriconnect/data payload (same rules as SensorReading).
+
+        Every value is converted before any column is touched, and a value
+        a column cannot hold undoes the columns already appended, so the
+        row is stored whole or not at all and the columns stay aligned.
+        """
+        if not -2147483649 < field_id < 2147483648:
+            raise ValueError(f"field_id {field_id} is out of range")
+        if not -2147483649 < zone_id < 2147483648:
+            raise ValueError(f"zone_id {zone_id} is out of range")
+        sensors = data.get("sensors") or {}
+        system = data.get("system") or {}
+        location = data.get("location") or {}
+        valid = True
+        value = location.get("lat")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -99.999999995 < value < 99.999999995:
+                value = None
+                valid = False
+        latitude = NAN if value is None else value
+        value = location.get("lon")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -999.999999995 < value < 999.999999995:
+                value = None
+                valid = False
+        longitude = NAN if value is None else value
+        value = sensors.get("airTemperature")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -999.995 < value < 999.995:
+                value = None
+                valid = False
+        air_temperature = NAN if value is None else value
+        value = sensors.get("airHumidity")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -999.995 < value < 999.995:
+                value = None
+                valid = False
+        air_humidity = NAN if value is None else value
+        value = sensors.get("lightIntensity")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        light_intensity = NULL_INT if value is None else value
+        value = sensors.get("parValue")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -999999.995 < value < 999999.995:
+                value = None
+                valid = False
+        par_value = NAN if value is None else value
+        value = sensors.get("co2PPM")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        co2_ppm = NULL_INT if value is None else value
+        value = sensors.get("soilMoisture")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        soil_moisture = NULL_INT if value is None else value
+        value = sensors.get("soilTemperature")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -999.995 < value < 999.995:
+                value = None
+                valid = False
+        soil_temperature = NAN if value is None else value
+        value = sensors.get("phValue")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -99.995 < value < 99.995:
+                value = None
+                valid = False
+        ph_value = NAN if value is None else value
+        value = sensors.get("ecValue")
+        if value is not None:
+            if type(value) is not float:
+                value = _float(value)
+            if value is None or not -9999.995 < value < 9999.995:
+                value = None
+                valid = False
+        ec_value = NAN if value is None else value
+        value = sensors.get("nitrogenPPM")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        nitrogen_ppm = NULL_INT if value is None else value
+        value = sensors.get("phosphorusPPM")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        phosphorus_ppm = NULL_INT if value is None else value
+        value = sensors.get("potassiumPPM")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        potassium_ppm = NULL_INT if value is None else value
+        value = system.get("waterLevel")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        water_level = NULL_INT if value is None else value
+        value = system.get("batteryLevel")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        battery_level = NULL_INT if value is None else value
+        value = system.get("pumpStatus")
+        if value is not None and type(value) is not bool:
+            value = _bool(value)
+            if value is None:
+                valid = False
+        if value is None:
+            value = False
+        pump_status = NULL_BOOL if value is None else value
+        value = system.get("rssi")
+        if value is not None:
+            if type(value) is not int:
+                value = _int(value)
+            if value is None or not -2147483649 < value < 2147483648:
+                value = None
+                valid = False
+        rssi = NULL_INT if value is None else value
+        row = len(self)
+        try:
+            self.gateway_id.append(gateway_id)
+            self.field_id.append(field_id)
+            self.zone_id.append(zone_id)
+            self.reading_time.append(reading_time.timestamp())
+            self.latitude.append(latitude)
+            self.longitude.append(longitude)
+            self.air_temperature.append(air_temperature)
+            self.air_humidity.append(air_humidity)
+            self.light_intensity.append(light_intensity)
+            self.par_value.append(par_value)
+            self.co2_ppm.append(co2_ppm)
+            self.soil_moisture.append(soil_moisture)
+            self.soil_temperature.append(soil_temperature)
+            self.ph_value.append(ph_value)
+            self.ec_value.append(ec_value)
+            self.nitrogen_ppm.append(nitrogen_ppm)
+            self.phosphorus_ppm.append(phosphorus_ppm)
+            self.potassium_ppm.append(potassium_ppm)
+            self.water_level.append(water_level)
+            self.battery_level.append(battery_level)
+            self.pump_status.append(pump_status)
+            self.rssi.append(rssi)
+            self.data_valid.append(valid)
+            self.reading_fingerprint.append(NULL_INT if fingerprint is None else fingerprint)
+        except Exception:
+            for name in COPY_COLUMNS:
+                del getattr(self, name)[row:]
+            raise
+
+    def rows(self):
+        """Rows as tuples in COPY_COLUMNS order (NULLs as None)"""
+        gateway_id = self.gateway_id
+        field_id = self.field_id
+        zone_id = self.zone_id
+        reading_time = self.reading_time
+        latitude = self.latitude
+        longitude = self.longitude
+        air_temperature = self.air_temperature
+        air_humidity = self.air_humidity
+        light_intensity = self.light_intensity
+        par_value = self.par_value
+        co2_ppm = self.co2_ppm
+        soil_moisture = self.soil_moisture
+        soil_temperature = self.soil_temperature
+        ph_value = self.ph_value
+        ec_value = self.ec_value
+        nitrogen_ppm = self.nitrogen_ppm
+        phosphorus_ppm = self.phosphorus_ppm
+        potassium_ppm = self.potassium_ppm
+        water_level = self.water_level
+        battery_level = self.battery_level
+        pump_status = self.pump_status
+        rssi = self.rssi
+        data_valid = self.data_valid
+        reading_fingerprint = self.reading_fingerprint
+        for i in range(len(self)):
+            yield (
+                gateway_id[i],
+                None if field_id[i] == NULL_INT else field_id[i],
+                None if zone_id[i] == NULL_INT else zone_id[i],
+                _time(reading_time[i]),
+                None if latitude[i] != latitude[i] else latitude[i],
+                None if longitude[i] != longitude[i] else longitude[i],
+                None if air_temperature[i] != air_temperature[i] else air_temperature[i],
+                None if air_humidity[i] != air_humidity[i] else air_humidity[i],
+                None if light_intensity[i] == NULL_INT else light_intensity[i],
+                None if par_value[i] != par_value[i] else par_value[i],
+                None if co2_ppm[i] == NULL_INT else co2_ppm[i],
+                None if soil_moisture[i] == NULL_INT else soil_moisture[i],
+                None if soil_temperature[i] != soil_temperature[i] else soil_temperature[i],
+                None if ph_value[i] != ph_value[i] else ph_value[i],
+                None if ec_value[i] != ec_value[i] else ec_value[i],
+                None if nitrogen_ppm[i] == NULL_INT else nitrogen_ppm[i],
+                None if phosphorus_ppm[i] == NULL_INT else phosphorus_ppm[i],
+                None if potassium_ppm[i] == NULL_INT else potassium_ppm[i],
+                None if water_level[i] == NULL_INT else water_level[i],
+                None if battery_level[i] == NULL_INT else battery_level[i],
+                None if pump_status[i] == NULL_BOOL else bool(pump_status[i]),
+                None if rssi[i] == NULL_INT else rssi[i],
+                None if data_valid[i] == NULL_BOOL else bool(data_valid[i]),
+                None if reading_fingerprint[i] == NULL_INT else reading_fingerprint[i],
+            )
+
+    def copy_text(self):
+        """COPY ... FROM STDIN text for every row, columns in COPY_COLUMNS order"""
+        columns = (
+            _text_column(self.gateway_id),
+            _int_column(self.field_id),
+            _int_column(self.zone_id),
+            _time_column(self.reading_time),
+            _float_column(self.latitude),
+            _float_column(self.longitude),
+            _float_column(self.air_temperature),
+            _float_column(self.air_humidity),
+            _int_column(self.light_intensity),
+            _float_column(self.par_value),
+            _int_column(self.co2_ppm),
+            _int_column(self.soil_moisture),
+            _float_column(self.soil_temperature),
+            _float_column(self.ph_value),
+            _float_column(self.ec_value),
+            _int_column(self.nitrogen_ppm),
+            _int_column(self.phosphorus_ppm),
+            _int_column(self.potassium_ppm),
+            _int_column(self.water_level),
+            _int_column(self.battery_level),
+            _bool_column(self.pump_status),
+            _int_column(self.rssi),
+            _bool_column(self.data_valid),
+            _int_column(self.reading_fingerprint),
+        )
+        return "".join("\t".join(row) + "\n" for row in zip(*columns))
+
+    def nbytes(self):
+        """Memory held by the columns (not counting shared str objects)"""
+        total = 0
+        for name in COPY_COLUMNS:
+            column = getattr(self, name)
+            if isinstance(column, array):
+                total += column.itemsize * len(column)
+            elif isinstance(column, bytearray):
+                total += len(column)
+            else:
+                total += 8 * len(column)
+        return total
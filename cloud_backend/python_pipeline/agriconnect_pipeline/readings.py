@@ -0,0 +1,115 @@
+"""
+Sensor Readings
+Column mapping between sensor_readings rows and the MQTT payload shape
+({"sensors": {...}, "system": {...}}) the analyzers expect
+"""
+
+import math
+
+from .intelligence.utils import js_round, to_fixed
+
+# sensor_readings column -> payload key, grouped the way handleSensorData reads them
+SENSOR_FIELDS = (
+    ("air_temperature", "airTemperature"),
+    ("air_humidity", "airHumidity"),
+    ("light_intensity", "lightIntensity"),
+    ("par_value", "parValue"),
+    ("co2_ppm", "co2PPM"),
+    ("soil_moisture", "soilMoisture"),
+    ("soil_temperature", "soilTemperature"),
+    ("ph_value", "phValue"),
+    ("ec_value", "ecValue"),
+    ("nitrogen_ppm", "nitrogenPPM"),
+    ("phosphorus_ppm", "phosphorusPPM"),
+    ("potassium_ppm", "potassiumPPM"),
+)
+
+SYSTEM_FIELDS = (
+    ("water_level", "waterLevel"),
+    ("battery_level", "batteryLevel"),
+    ("pump_status", "pumpStatus"),
+    ("rssi", "rssi"),
+)
+
+READING_COLUMNS = (
+    ("id", "gateway_id", "field_id", "zone_id", "reading_time")
+    + tuple(column for column, _ in SENSOR_FIELDS)
+    + tuple(column for column, _ in SYSTEM_FIELDS)
+)
+
+SELECT_READINGS = f"SELECT {', '.join(READING_COLUMNS)} FROM sensor_readings"
+
+# Columns written by live ingest (id is the BIGSERIAL default)
+INSERT_COLUMNS = READING_COLUMNS[1:] + ("latitude", "longitude", "data_valid",
+                                        "reading_fingerprint")
+
+# Sensor resolution as reported by the field node firmware; mirrors
+# nodejs_subscriber/intelligence/insight-cache.js
+SENSOR_RESOLUTION = {
+    "airTemperature": 0.1,
+    "airHumidity": 0.1,
+    "soilMoisture": 1,
+    "soilTemperature": 0.1,
+    "phValue": 0.01,
+    "ecValue": 0.01,
+    "nitrogenPPM": 1,
+    "phosphorusPPM": 1,
+    "potassiumPPM": 1,
+    "lightIntensity": 1,
+    "parValue": 0.1,
+    "co2PPM": 1,
+    "batteryLevel": 1,
+}
+
+
+def _number(value):
+    # DECIMAL columns come back as Decimal; analyzers work on floats
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    return float(value)
+
+
+def row_to_payload(row):
+    """Convert a READING_COLUMNS tuple into (sensors, system) dicts.
+
+    NULL columns are left out, matching an absent key in the live payload.
+    """
+    offset = 5
+    sensors = {}
+    for i, (_, key) in enumerate(SENSOR_FIELDS):
+        value = row[offset + i]
+        if value is not None:
+            sensors[key] = _number(value)
+
+    offset += len(SENSOR_FIELDS)
+    system = {}
+    for i, (_, key) in enumerate(SYSTEM_FIELDS):
+        value = row[offset + i]
+        if value is not None:
+            system[key] = _number(value)
+    return sensors, system
+
+
+def payload_to_row(gateway_id, field_id, zone_id, reading_time, data, fingerprint=None):
+    """Convert an MQTT data payload into an INSERT_COLUMNS tuple"""
+    sensors = data.get("sensors") or {}
+    system = data.get("system") or {}
+    location = data.get("location") or {}
+    return (
+        (gateway_id, field_id, zone_id, reading_time)
+        + tuple(sensors.get(key) for _, key in SENSOR_FIELDS)
+        + (system.get("waterLevel"), system.get("batteryLevel"),
+           bool(system.get("pumpStatus")), system.get("rssi"))
+        + (location.get("lat"), location.get("lon"), True, fingerprint)
+    )
+
+
+def quantize(sensors):
+    """Snap readings to sensor resolution, like InsightCache.quantize()"""
+    quantized = dict(sensors)
+    for sensor, step in SENSOR_RESOLUTION.items():
+        value = sensors.get(sensor)
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            decimals = 0 if step >= 1 else js_round(-math.log10(step))
+            quantized[sensor] = float(to_fixed(js_round(value / step) * step, decimals))
+    return quantized
@@ -0,0 +1,307 @@
+"""
+Disease Risk Timeline
+Stores hourly disease risk per zone, instead of Charts.calculateDiseaseRisks
+(dashboard) re-scoring every reading in the browser for the disease risk
+chart and DiseaseAnalyzer's scores only surviving as alerts.
+
+A reading's risk for a disease is DiseaseAnalyzer's probability before
+its action threshold (temperature, humidity and leaf wetness factors,
+soil moisture for blossom end rot), in percent. All readings of a batch
+are scored at once as arrays, one column per disease model, and summed
+per zone and hour into disease_risk_hourly; the hourly mean is the sum
+over the reading count. Ingest workers add their commit batches in the
+same transaction as the readings. The disease_risk_timeline() function
+bins the hours of a farm so a chart range is at most a few hundred rows.
+
+--backfill rebuilds a time range from sensor_readings, one zone per task
+in a process pool, like agriconnect_pipeline.backfill.
+
+Usage:
+    python -m agriconnect_pipeline.risk --backfill --start 2025-01-01 --end 2025-07-01 \\
+        --workers 8
+    python -m agriconnect_pipeline.risk --farm-id FARM-CM-001 --hours 720
+"""
+
+import argparse
+import multiprocessing
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from . import db
+from .backfill import LOCAL_TZ, ZONES_QUERY, ZoneTask, time_windows
+from .config import load_config
+from .intelligence.disease import DEFAULT_MODELS
+
+# disease_risk_hourly column per DiseaseAnalyzer model key
+RISK_COLUMNS = {
+    "earlyBlight": "early_blight",
+    "lateBlight": "late_blight",
+    "septoriaLeafSpot": "septoria_leaf_spot",
+    "powderyMildew": "powdery_mildew",
+    "bacterialSpot": "bacterial_spot",
+    "blossomEndRot": "blossom_end_rot",
+}
+DISEASES = tuple(RISK_COLUMNS)
+
+HOUR = 3600
+
+# Each column holds the hour's sum of percent scores
+UPSERT_HOURS = f"""
+    INSERT INTO disease_risk_hourly AS h (gateway_id, field_id, zone_id, hour, readings,
+                                          {", ".join(RISK_COLUMNS.values())})
+    SELECT * FROM unnest(%s::text[], %s::int[], %s::int[], %s::timestamptz[], %s::int[],
+                         {", ".join(["%s::int[]"] * len(RISK_COLUMNS))})
+    ON CONFLICT (gateway_id, field_id, zone_id, hour) DO UPDATE SET
+        readings = h.readings + EXCLUDED.readings,
+        {", ".join(f"{c} = h.{c} + EXCLUDED.{c}" for c in RISK_COLUMNS.values())}
+"""
+
+DELETE_HOURS = """
+    DELETE FROM disease_risk_hourly
+    WHERE gateway_id = %s AND field_id = %s AND zone_id = %s AND hour >= %s AND hour < %s
+"""
+
+ZONE_HISTORY_QUERY = """
+    SELECT EXTRACT(EPOCH FROM reading_time), air_temperature, air_humidity, soil_moisture
+    FROM sensor_readings
+    WHERE gateway_id = %s AND field_id = %s AND zone_id = %s
+      AND reading_time >= %s AND reading_time < %s
+      AND data_valid
+    ORDER BY reading_time
+"""
+
+TIMELINE_QUERY = f"""
+    SELECT bucket, {", ".join(RISK_COLUMNS.values())}
+    FROM disease_risk_timeline(%s, %s, %s, %s)
+"""
+
+
+def risk_scores(models, temperature, humidity, moisture):
+    """Percent risk [readings, len(DISEASES)] of each reading for every model.
+
+    Same factors and weights as DiseaseAnalyzer.evaluate_disease, without
+    its action threshold; missing values (NaN) meet no factor.
+    """
+    temperature = np.asarray(temperature, dtype=np.float64)
+    humidity = np.asarray(humidity, dtype=np.float64)
+    moisture = np.asarray(moisture, dtype=np.float64)
+    scores = np.zeros((len(temperature), len(DISEASES)))
+    for column, key in enumerate(DISEASES):
+        conditions = models[key]["conditions"]
+        probability = scores[:, column]
+        if "tempMin" in conditions:
+            probability += 0.4 * ((temperature >= conditions["tempMin"])
+                                  & (temperature <= conditions["tempMax"]))
+        if "humidityMin" in conditions:
+            inside = humidity >= conditions["humidityMin"]
+            if conditions.get("humidityMax"):
+                inside &= humidity <= conditions["humidityMax"]
+            probability += 0.4 * inside
+        if conditions.get("leafWetnessHours"):
+            probability += 0.2 * (humidity > 95)
+        if key == "blossomEndRot":
+            probability += 0.5 * ((moisture < 350) | (moisture > 600))
+    return np.rint(np.minimum(scores, 1.0) * 100).astype(np.int64)
+
+
+def hourly_sums(streams, times, scores):
+    """(stream, hour start epoch, readings, score sums) per stream and hour"""
+    hours = (np.asarray(times, dtype=np.float64) // HOUR).astype(np.int64)
+    streams = np.asarray(streams, dtype=np.int64)
+    first = int(hours.min()) if len(hours) else 0
+    span = int(hours.max()) - first + 1 if len(hours) else 1
+    cells, inverse = np.unique(streams * span + (hours - first), return_inverse=True)
+    sums = np.column_stack([np.bincount(inverse, weights=scores[:, i], minlength=len(cells))
+                            for i in range(scores.shape[1])]).astype(np.int64)
+    return (cells // span, (cells % span + first) * HOUR,
+            np.bincount(inverse, minlength=len(cells)), sums)
+
+
+def _upsert(conn, keys, streams, hours, readings, sums):
+    with conn.cursor() as cur:
+        cur.execute(UPSERT_HOURS, (
+            [keys[s][0] for s in streams], [keys[s][1] for s in streams],
+            [keys[s][2] for s in streams],
+            [datetime.fromtimestamp(int(h), timezone.utc) for h in hours],
+            readings.tolist(), *(sums[:, i].tolist() for i in range(len(DISEASES)))))
+
+
+def _as_float(values):
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=np.float64)
+
+
+class RiskTimeline:
+    """Buffers scored readings of an ingest worker until its next commit.
+
+    Readings without airTemperature or airHumidity are skipped, as the
+    disease analyzer skips them. write() runs in the caller's transaction
+    and the buffer is kept until mark_written(), so a rolled-back batch is
+    written again when it is retried.
+    """
+
+    def __init__(self, models=None):
+        self.models = models or DEFAULT_MODELS
+        self.keys, self.times = [], []
+        self.temperature, self.humidity, self.moisture = [], [], []
+        self.written = 0
+        self.stats = {"readings": 0, "hours": 0}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def observe(self, key, when, sensors):
+        temperature, humidity = sensors.get("airTemperature"), sensors.get("airHumidity")
+        if not (temperature and humidity):
+            return
+        self.keys.append(key)
+        self.times.append(when)
+        self.temperature.append(temperature)
+        self.humidity.append(humidity)
+        self.moisture.append(sensors.get("soilMoisture"))
+
+    def write(self, conn):
+        """Add the buffered readings to disease_risk_hourly; returns rows upserted"""
+        if not self.keys:
+            return 0
+        codes = {}
+        streams = [codes.setdefault(key, len(codes)) for key in self.keys]
+        scores = risk_scores(self.models, _as_float(self.temperature),
+                             _as_float(self.humidity), _as_float(self.moisture))
+        cells, hours, readings, sums = hourly_sums(streams, self.times, scores)
+        if conn is not None:
+            _upsert(conn, list(codes), cells, hours, readings, sums)
+        self.written = len(cells)
+        return len(cells)
+
+    def mark_written(self):
+        """The batch was committed"""
+        self.stats["readings"] += len(self.keys)
+        self.stats["hours"] += self.written
+        self.clear()
+
+    def clear(self):
+        self.keys, self.times = [], []
+        self.temperature, self.humidity, self.moisture = [], [], []
+
+
+# ==========================================
+# BACKFILL
+# ==========================================
+
+# Per-process state, set up once by the pool initializer
+_worker = {}
+
+
+def _init_worker(dsn, window, chunk_size):
+    _worker["conn"] = db.connect(dsn)
+    _worker["window"] = window
+    _worker["chunk_size"] = chunk_size
+
+
+def backfill_zone(args):
+    """Pool task: replace one zone's hours in [start, end) from its readings"""
+    task, start, end = args
+    conn = _worker["conn"]
+    key = (task.gateway_id, task.field_id, task.zone_id)
+    readings = hours = 0
+    with conn.cursor() as cur:
+        cur.execute(DELETE_HOURS, key + (start, end))
+    for lower, upper in time_windows(start, end, _worker["window"]):
+        params = key + (lower, upper)
+        for rows in db.iter_chunks(conn, ZONE_HISTORY_QUERY, params, _worker["chunk_size"],
+                                   name="risk_zone"):
+            times, temperature, humidity, moisture = zip(*rows)
+            temperature, humidity = _as_float(temperature), _as_float(humidity)
+            scored = (temperature != 0) & (humidity != 0) & ~np.isnan(temperature) \
+                & ~np.isnan(humidity)
+            scores = risk_scores(DEFAULT_MODELS, temperature[scored], humidity[scored],
+                                 _as_float(moisture)[scored])
+            cells, starts, counts, sums = hourly_sums(
+                np.zeros(int(scored.sum()), dtype=np.int64),
+                _as_float(times)[scored], scores)
+            # Chunks can split an hour; the upsert adds the two halves
+            _upsert(conn, [key], cells, starts, counts, sums)
+            readings += len(rows)
+            hours += len(cells)
+    conn.commit()
+    return task, readings, hours
+
+
+def run_backfill(start, end, workers, window, farm_id=None):
+    config = load_config()
+    with db.connect(config.database_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute(ZONES_QUERY, {"start": start, "end": end, "farm_id": farm_id})
+            zones = [ZoneTask(*row) for row in cur.fetchall()]
+    print(f"Scoring {len(zones)} zone(s) from {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M} "
+          f"with {workers} worker(s)")
+
+    started = time.perf_counter()
+    total_readings = total_hours = 0
+    init_args = (config.database_url, window, config.chunk_size)
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=init_args) as pool:
+        tasks = [(zone, start, end) for zone in zones]
+        for zone, readings, hours in pool.imap_unordered(backfill_zone, tasks):
+            total_readings += readings
+            total_hours += hours
+            print(f"  ✓ {zone.gateway_id}/{zone.field_id}/{zone.zone_id}: "
+                  f"{readings} readings → {hours} hour rows")
+
+    elapsed = time.perf_counter() - started
+    rate = total_readings / elapsed if elapsed else 0.0
+    print(f"✓ {total_readings} readings → {total_hours} hour rows in {elapsed:.1f}s "
+          f"({rate:,.0f} readings/s)")
+
+
+def timeline(conn, farm_id, since, until, buckets=200):
+    """[(bucket start, mean risk per disease of the riskiest zone)] for a chart"""
+    with conn.cursor() as cur:
+        cur.execute(TIMELINE_QUERY, (farm_id, since, until, buckets))
+        return cur.fetchall()
+
+
+def _parse_hour(value):
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=LOCAL_TZ)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hourly disease risk per zone")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Rebuild [--start, --end) from sensor_readings")
+    parser.add_argument("--start", type=_parse_hour)
+    parser.add_argument("--end", type=_parse_hour,
+                        help="Default: start of the current hour (ingest owns that one)")
+    parser.add_argument("--farm-id", help="Limit to one farm (default: all farms)")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--window-days", type=int, default=7)
+    parser.add_argument("--hours", type=int, default=168, help="Timeline to print")
+    parser.add_argument("--buckets", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.backfill:
+        if args.start is None:
+            parser.error("--backfill needs --start")
+        end = args.end or datetime.now(LOCAL_TZ).replace(minute=0, second=0, microsecond=0)
+        run_backfill(args.start, end, args.workers, timedelta(days=args.window_days),
+                     args.farm_id)
+        return
+
+    if not args.farm_id:
+        parser.error("--farm-id is required to print a timeline")
+    until = datetime.now(LOCAL_TZ)
+    with db.connect(load_config().database_url) as conn:
+        rows = timeline(conn, args.farm_id, until - timedelta(hours=args.hours), until,
+                        args.buckets)
+    print(f"{'bucket':<18}" + "".join(f"{key[:12]:>13}" for key in DISEASES))
+    for bucket, *risks in rows:
+        print(f"{bucket.astimezone(LOCAL_TZ):%Y-%m-%d %H:%M}  "
+              + "".join(f"{(risk or 0):>13.0f}" for risk in risks))
+
+
+if __name__ == "__main__":
+    main()
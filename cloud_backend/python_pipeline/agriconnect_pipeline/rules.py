@@ -0,0 +1,398 @@
+"""
+Crop Threshold Rules
+Compiles the declarative rule files in cloud_backend/rules/ (one file per
+crop, with growth-stage overrides) into array-backed lookup tables, and
+evaluates whole batches of readings against them with NumPy.
+
+Each (crop, stage) pair is one row ("profile") in every table, so a batch
+is evaluated with a single fancy-indexing gather per table no matter how
+many crops are configured.
+
+The Node.js subscriber reads the same files (intelligence/crop-rules.js);
+the dashboard reads the crop_rules table, which --publish fills from the
+compiled tables. Run it after editing a rule file.
+
+Usage:
+    python -m agriconnect_pipeline.rules              # compile and list profiles
+    python -m agriconnect_pipeline.rules --publish
+"""
+
+import argparse
+import copy
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from . import db
+from .config import load_config
+from .features import crop_key
+from .intelligence.anomaly import (DEFAULT_NORMAL_RANGES, DEFAULT_OPTIMAL_RANGES,
+                                   out_of_range_anomaly, suboptimal_anomaly)
+from .intelligence.irrigation import DEFAULT_THRESHOLDS
+from .intelligence.nutrients import DEFAULT_OPTIMAL_RANGES as DEFAULT_NUTRIENT_RANGES, nutrient_issue
+
+DEFAULT_CROP = "tomato"
+DEFAULT_STAGE = "default"
+
+# Column order of the sensor tables (and of the values matrix passed to evaluate)
+SENSORS = tuple(DEFAULT_NORMAL_RANGES)
+NUTRIENTS = ("nitrogen", "phosphorus", "potassium")
+NUTRIENT_SENSORS = ("nitrogenPPM", "phosphorusPPM", "potassiumPPM")
+IRRIGATION_KEYS = tuple(DEFAULT_THRESHOLDS)
+
+# analyzeNutrients only reports HIGH for nitrogen
+NUTRIENT_HIGH_REPORTED = np.array([True, False, False])
+
+# Sections a crop's default stage leaves out fall back to the built-in values
+BUILTIN_RULES = {
+    "normalRanges": DEFAULT_NORMAL_RANGES,
+    "optimalRanges": DEFAULT_OPTIMAL_RANGES,
+    "nutrients": DEFAULT_NUTRIENT_RANGES,
+    "irrigation": DEFAULT_THRESHOLDS,
+}
+
+DEFAULT_RULES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "rules")
+
+
+def _merge(base, override):
+    """Deep-merge override into a copy of base"""
+    merged = copy.deepcopy(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = copy.deepcopy(value)
+    return merged
+
+
+def _range_table(profiles, section, names):
+    low = np.full((len(profiles), len(names)), np.nan)
+    high = np.full((len(profiles), len(names)), np.nan)
+    for p, rules in enumerate(profiles):
+        for j, name in enumerate(names):
+            rng = rules.get(section, {}).get(name)
+            if rng:
+                low[p, j] = rng.get("min", np.nan)
+                high[p, j] = rng.get("max", np.nan)
+    return low, high
+
+
+def sensor_values(sensors):
+    """A reading's row of the values matrix: SENSORS in column order, NaN
+    where a sensor is missing or not a number"""
+    return [
+        value if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+        for value in map(sensors.get, SENSORS)
+    ]
+
+
+@dataclass
+class RuleResult:
+    """Boolean masks for a batch; rows align with the evaluated values"""
+    out_of_range: np.ndarray     # [n, len(SENSORS)]
+    below_optimal: np.ndarray    # [n, len(SENSORS)], only where not out of range
+    above_optimal: np.ndarray
+    nutrient_low: np.ndarray     # [n, len(NUTRIENTS)]
+    nutrient_high: np.ndarray
+
+    def any(self):
+        """Rows with at least one flag"""
+        return (self.out_of_range.any(axis=1) | self.below_optimal.any(axis=1)
+                | self.above_optimal.any(axis=1) | self.nutrient_low.any(axis=1)
+                | self.nutrient_high.any(axis=1))
+
+
+@dataclass(frozen=True)
+class RuleTables:
+    version: str
+    profiles: tuple              # ((crop, stage), ...) row order of every table
+    index: dict                  # (crop, stage) -> row
+    stage_days: dict             # crop -> [(first_day, last_day, stage), ...]
+    normal_min: np.ndarray
+    normal_max: np.ndarray
+    optimal_min: np.ndarray
+    optimal_max: np.ndarray
+    nutrient_min: np.ndarray
+    nutrient_max: np.ndarray
+    irrigation: np.ndarray       # [profiles, len(IRRIGATION_KEYS)]
+
+    def profile(self, crop, stage=DEFAULT_STAGE):
+        """Row for (crop, stage), falling back to the crop, then tomato, default"""
+        for key in ((crop, stage), (crop, DEFAULT_STAGE), (DEFAULT_CROP, DEFAULT_STAGE)):
+            if key in self.index:
+                return self.index[key]
+        raise KeyError(f"No rules for {crop!r} and no {DEFAULT_CROP!r} fallback")
+
+    def stage_for_day(self, crop, day):
+        """Growth stage for a crop on a given day after planting"""
+        for first, last, stage in self.stage_days.get(crop, ()):
+            if first <= day < last:
+                return stage
+        return DEFAULT_STAGE
+
+    def profile_for_farm(self, crop, planting_date, on_date):
+        """Row for a farm's crop at its current growth stage"""
+        crop = crop_key(crop)
+        if planting_date is None:
+            return self.profile(crop)
+        return self.profile(crop, self.stage_for_day(crop, (on_date - planting_date).days))
+
+    def evaluate(self, profiles, values, nutrients=None):
+        """Evaluate a batch of readings.
+
+        profiles: int array [n] of profile rows (one per reading)
+        values:   float array [n, len(SENSORS)], NaN where a sensor is missing
+        nutrients: float array [n, 3] of N/P/K ppm; defaults to the NPK
+                   columns of values
+        """
+        profiles = np.asarray(profiles, dtype=np.intp)
+        values = np.asarray(values, dtype=np.float64)
+        if nutrients is None:
+            nutrients = values[:, [SENSORS.index(s) for s in NUTRIENT_SENSORS]]
+
+        # NaN comparisons are False, so missing sensors never flag
+        with np.errstate(invalid="ignore"):
+            out_of_range = (values < self.normal_min[profiles]) | (values > self.normal_max[profiles])
+            below = ~out_of_range & (values < self.optimal_min[profiles])
+            above = ~out_of_range & (values > self.optimal_max[profiles])
+            low = nutrients < self.nutrient_min[profiles]
+            high = (nutrients > self.nutrient_max[profiles]) & NUTRIENT_HIGH_REPORTED
+
+        return RuleResult(out_of_range, below, above, low, high)
+
+    def findings(self, result, row, profile, sensors, context):
+        """Anomalies and nutrient issues of one evaluated reading.
+
+        row is the reading's index in result, profile its rule row and
+        sensors its sensor dict. The dicts match AnomalyDetector.detect
+        (without the cross-sensor checks) and analyze_nutrients.
+        """
+        anomalies = []
+        flagged = result.out_of_range[row] | result.below_optimal[row] | result.above_optimal[row]
+        for j in np.flatnonzero(flagged):
+            sensor = SENSORS[j]
+            name = DEFAULT_NORMAL_RANGES[sensor]["name"]
+            if result.out_of_range[row, j]:
+                rng = {"min": self.normal_min[profile, j].item(),
+                       "max": self.normal_max[profile, j].item()}
+                anomalies.append(out_of_range_anomaly(name, sensors[sensor], rng, context))
+            else:
+                optimal = {"min": self.optimal_min[profile, j].item(),
+                           "max": self.optimal_max[profile, j].item()}
+                anomalies.append(suboptimal_anomaly(sensor, name, sensors[sensor], optimal,
+                                                    context))
+
+        nutrients = []
+        for j in np.flatnonzero(result.nutrient_low[row] | result.nutrient_high[row]):
+            rng = {"min": self.nutrient_min[profile, j].item(),
+                   "max": self.nutrient_max[profile, j].item(),
+                   "name": DEFAULT_NUTRIENT_RANGES[NUTRIENTS[j]]["name"]}
+            status = "LOW" if result.nutrient_low[row, j] else "HIGH"
+            nutrients.append(nutrient_issue(rng, status, sensors[NUTRIENT_SENSORS[j]]))
+        return anomalies, nutrients
+
+    def thresholds(self, profile):
+        """Thresholds of one profile in the shape of a rule file stage"""
+        def ranges(low, high, names):
+            return {
+                name: {"min": low[profile, j].item(), "max": high[profile, j].item()}
+                for j, name in enumerate(names)
+                if not np.isnan(low[profile, j])
+            }
+        return {
+            "normalRanges": ranges(self.normal_min, self.normal_max, SENSORS),
+            "optimalRanges": ranges(self.optimal_min, self.optimal_max, SENSORS),
+            "nutrients": ranges(self.nutrient_min, self.nutrient_max, NUTRIENTS),
+            "irrigation": dict(zip(IRRIGATION_KEYS, self.irrigation[profile].tolist())),
+        }
+
+    def overrides_for(self, profile):
+        """Thresholds of one profile in the shape intelligence.Analyzers accepts"""
+        rules = self.thresholds(profile)
+        return {
+            "anomaly": {
+                "normalRanges": rules["normalRanges"],
+                "optimalRanges": rules["optimalRanges"],
+            },
+            "nutrients": rules["nutrients"],
+            "irrigation": rules["irrigation"],
+        }
+
+
+FARMS_QUERY = "SELECT farm_id, crop_type, planting_date FROM farms"
+
+PUBLISH_QUERY = """
+    INSERT INTO crop_rules (crop, stage, first_day, last_day, rules, version, updated_at)
+    VALUES (%s, %s, %s, %s, %s::jsonb, %s, NOW())
+    ON CONFLICT (crop, stage) DO UPDATE SET
+        first_day = EXCLUDED.first_day,
+        last_day = EXCLUDED.last_day,
+        rules = EXCLUDED.rules,
+        version = EXCLUDED.version,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+def farm_profiles(conn, tables, on_date):
+    """Map every farm to its (crop, growth stage) profile row on on_date"""
+    with conn.cursor() as cur:
+        cur.execute(FARMS_QUERY)
+        return {
+            farm_id: tables.profile_for_farm(crop, planting_date, on_date)
+            for farm_id, crop, planting_date in cur.fetchall()
+        }
+
+
+def publish_rules(conn, tables):
+    """Write every profile to crop_rules (read by the dashboard) and remove
+    profiles the rule files no longer have"""
+    days = {
+        (crop, stage): (first, last)
+        for crop, stages in tables.stage_days.items()
+        for first, last, stage in stages
+    }
+    with conn.cursor() as cur:
+        cur.executemany(PUBLISH_QUERY, [
+            (crop, stage, *days.get((crop, stage), (None, None)),
+             json.dumps(tables.thresholds(row)), tables.version)
+            for row, (crop, stage) in enumerate(tables.profiles)
+        ])
+        cur.execute("DELETE FROM crop_rules WHERE version <> %s", (tables.version,))
+    return len(tables.profiles)
+
+
+def compile_rules(directory=DEFAULT_RULES_DIR):
+    """Load every <crop>.json in directory and build the lookup tables"""
+    paths = sorted(glob.glob(os.path.join(directory, "*.json")))
+    if not paths:
+        raise FileNotFoundError(f"No rule files in {directory}")
+
+    digest = hashlib.sha1()
+    profiles, keys, stage_days = [], [], {}
+
+    for path in paths:
+        with open(path, "rb") as f:
+            raw = f.read()
+        digest.update(raw)
+        spec = json.loads(raw)
+
+        # Same spelling as farms.crop_type goes through in profile_for_farm
+        crop = crop_key(spec.get("crop") or os.path.splitext(os.path.basename(path))[0])
+        stages = spec.get("stages", {})
+        base = _merge(BUILTIN_RULES, stages.get(DEFAULT_STAGE, {}))
+
+        for stage, override in [(DEFAULT_STAGE, {})] + [
+            (name, body) for name, body in stages.items() if name != DEFAULT_STAGE
+        ]:
+            profiles.append(_merge(base, override))
+            keys.append((crop, stage))
+            if "days" in override:
+                first, last = override["days"]
+                stage_days.setdefault(crop, []).append((first, last, stage))
+
+    normal_min, normal_max = _range_table(profiles, "normalRanges", SENSORS)
+    optimal_min, optimal_max = _range_table(profiles, "optimalRanges", SENSORS)
+    nutrient_min, nutrient_max = _range_table(profiles, "nutrients", NUTRIENTS)
+    irrigation = np.array(
+        [[rules["irrigation"][k] for k in IRRIGATION_KEYS] for rules in profiles],
+        dtype=np.float64,
+    )
+
+    return RuleTables(
+        version=digest.hexdigest()[:12],
+        profiles=tuple(keys),
+        index={key: row for row, key in enumerate(keys)},
+        stage_days={crop: sorted(days) for crop, days in stage_days.items()},
+        normal_min=normal_min,
+        normal_max=normal_max,
+        optimal_min=optimal_min,
+        optimal_max=optimal_max,
+        nutrient_min=nutrient_min,
+        nutrient_max=nutrient_max,
+        irrigation=irrigation,
+    )
+
+
+class RuleRegistry:
+    """Holds the current RuleTables and hot-reloads them when files change.
+
+    Readers take `registry.current` once per batch. A reload compiles a
+    complete new RuleTables and then swaps one reference, so a batch never
+    sees a mix of old and new thresholds. A rule file that fails to parse
+    is reported and the previous tables stay active.
+    """
+
+    def __init__(self, directory=DEFAULT_RULES_DIR, check_interval=5.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._signature = self._scan()
+        self._tables = compile_rules(directory)
+        self._last_check = time.monotonic()
+
+    def _scan(self):
+        entries = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.json"))):
+            stat = os.stat(path)
+            entries.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(entries)
+
+    @property
+    def current(self):
+        self.maybe_reload()
+        return self._tables
+
+    def maybe_reload(self):
+        """Reload if the rule files changed; at most one stat pass per interval"""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        if not self._lock.acquire(blocking=False):
+            return False  # another thread is already reloading
+        try:
+            self._last_check = now
+            signature = self._scan()
+            if signature == self._signature:
+                return False
+            # Remember the signature even on failure so a broken file is
+            # reported once, not on every check
+            self._signature = signature
+            try:
+                tables = compile_rules(self.directory)
+            except (OSError, ValueError, KeyError) as error:
+                print(f"✗ Rule reload failed, keeping version {self._tables.version}: {error}")
+                return False
+            self._tables = tables
+            print(f"✓ Rules reloaded: version {tables.version} ({len(tables.profiles)} profiles)")
+            return True
+        finally:
+            self._lock.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the crop threshold rule files")
+    parser.add_argument("--rules-dir", default=DEFAULT_RULES_DIR)
+    parser.add_argument("--publish", action="store_true",
+                        help="Write the compiled profiles to crop_rules for the dashboard")
+    args = parser.parse_args()
+
+    tables = compile_rules(args.rules_dir)
+    print(f"✓ Rules version {tables.version}: {len(tables.profiles)} profiles")
+    for crop, stage in tables.profiles:
+        print(f"  {crop}/{stage}")
+
+    if args.publish:
+        with db.connect(load_config().database_url) as conn:
+            count = publish_rules(conn, tables)
+            conn.commit()
+        print(f"✓ {count} profiles written to crop_rules")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+Adaptive Sampling
+Sets each field node's reporting interval from what its zone is doing,
+instead of every node reporting every 60 s: a zone that is steady
+overnight reports every 5 minutes, a zone drying towards its moisture
+threshold or being irrigated reports every minute.
+
+For every reading the controller keeps, per signal, a smoothed slope and
+noise level, and works out how long the signal needs to reach the nearest
+threshold of the farm's crop rules (normal, optimal and nutrient ranges).
+The node's target interval is that time divided by a safety factor,
+rounded down to a rung of the interval ladder. A node with an active
+alert, a flagged reading or the pump running goes to the shortest rung.
+
+A sudden step (a sensor fault, a door opened) cannot be seen coming, so
+the longest rung is also the worst-case delay before such a crossing is
+seen; longer rungs save more messages for a longer worst case.
+
+Hysteresis keeps intervals from flapping: a shorter interval is sent at
+once (possibly several rungs down), a longer one only after the target
+has stayed above the next rung for the hold time, one rung at a time.
+With --send, changes are queued in command_outbox as config_update
+commands, which the command broker delivers on
+agriconnect/commands/{gateway_id}. The gateway and field node firmware
+do not apply config_update yet (the gateway acks it with "error"), so
+by default the controller runs dry: it logs the changes it would send
+and writes nothing.
+
+field_nodes.sample_interval is what liveness expects, so it follows
+the interval the node is actually using: a requested interval is
+written once the gateway acks it "ok" or the node's readings arrive at
+the new cadence, whichever comes first.
+
+Usage:
+    python -m agriconnect_pipeline.sampling
+    python -m agriconnect_pipeline.sampling --send --ladder 60 120 300 600 900 --hold 1800
+"""
+
+import argparse
+import json
+import math
+import time
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+
+from . import db
+from .commands import handle_ack
+from .config import load_config
+from .liveness import NODE_SAMPLE_INTERVAL
+from .mqtt_client import create_client
+from .rules import NUTRIENT_SENSORS, SENSORS, compile_rules, farm_profiles
+
+LADDER = (60, 120, 300)
+
+NODES_QUERY = """
+    SELECT n.gateway_id, n.field_id, n.zone_id, COALESCE(n.sample_interval, 60), g.farm_id
+    FROM field_nodes n
+    JOIN gateways g USING (gateway_id)
+    WHERE n.status <> 'decommissioned'
+"""
+
+# Unacknowledged alerts of the last few hours, by zone; correlated incidents
+# list their zones in member_zones
+ACTIVE_ALERTS_QUERY = """
+    SELECT gateway_id, field_id, zone_id
+    FROM alerts
+    WHERE NOT acknowledged AND created_at > NOW() - %(window)s * INTERVAL '1 second'
+      AND field_id IS NOT NULL AND zone_id IS NOT NULL AND member_zones IS NULL
+    UNION
+    SELECT m->>0, (m->>1)::INTEGER, (m->>2)::INTEGER
+    FROM alerts, jsonb_array_elements(member_zones) AS m
+    WHERE NOT acknowledged AND created_at > NOW() - %(window)s * INTERVAL '1 second'
+"""
+
+INSERT_COMMANDS = """
+    INSERT INTO command_outbox (command_id, farm_id, gateway_id, target_field_id,
+                                target_zone_id, action, parameters, requested_by)
+    SELECT u.command_id, u.farm_id, u.gateway_id, u.field_id, u.zone_id,
+           'config_update', u.parameters::jsonb, 'sampling_controller'
+    FROM unnest(%s::text[], %s::text[], %s::text[], %s::int[], %s::int[], %s::text[])
+         AS u(command_id, farm_id, gateway_id, field_id, zone_id, parameters)
+"""
+
+UPDATE_INTERVALS = """
+    UPDATE field_nodes AS n
+    SET sample_interval = u.sample_interval, updated_at = NOW()
+    FROM unnest(%s::text[], %s::int[], %s::int[], %s::int[])
+         AS u(gateway_id, field_id, zone_id, sample_interval)
+    WHERE n.gateway_id = u.gateway_id AND n.field_id = u.field_id AND n.zone_id = u.zone_id
+"""
+
+# A minimum of 0 on these can never be crossed, so it sets no deadline
+NON_NEGATIVE = frozenset(SENSORS) - {"airTemperature", "soilTemperature"}
+
+# A reading gap within this fraction of a requested interval means the node applied it
+CADENCE_TOLERANCE = 0.25
+
+
+def signal_bounds(tables, profile):
+    """Thresholds per SENSORS column for one rule profile: float array [len(SENSORS), 6],
+    NaN where a column has no such bound"""
+    bounds = np.full((len(SENSORS), 6), np.nan)
+    bounds[:, 0] = tables.normal_min[profile]
+    bounds[:, 1] = tables.normal_max[profile]
+    bounds[:, 2] = tables.optimal_min[profile]
+    bounds[:, 3] = tables.optimal_max[profile]
+    for j, sensor in enumerate(NUTRIENT_SENSORS):
+        row = SENSORS.index(sensor)
+        bounds[row, 4] = tables.nutrient_min[profile, j]
+        bounds[row, 5] = tables.nutrient_max[profile, j]
+    floor = np.array([name in NON_NEGATIVE for name in SENSORS])[:, None]
+    lower = bounds[:, [0, 2, 4]]
+    lower[floor & (lower <= 0)] = np.nan
+    bounds[:, [0, 2, 4]] = lower
+    return bounds
+
+
+def payload_values(data):
+    """(values in SENSORS order with NaN for missing, pump running) from an MQTT payload"""
+    sensors = data.get("sensors") or {}
+    system = data.get("system") or {}
+    merged = {**system, **sensors}
+    values = np.array([merged.get(name, np.nan) for name in SENSORS], dtype=np.float64)
+    return values, bool(system.get("pumpStatus"))
+
+
+@dataclass
+class NodeState:
+    bounds: np.ndarray
+    interval: int                # last interval requested (or restored)
+    configured: int              # value in field_nodes.sample_interval
+    last_time: float = None
+    level: np.ndarray = None     # smoothed value per signal
+    slope: np.ndarray = None     # smoothed change of level, units per second
+    noise: np.ndarray = None     # smoothed squared deviation from level
+    pump: bool = False
+    alert: bool = False          # unacknowledged alert in the database
+    calm_since: float = None     # when the target first allowed the next rung up
+    target: int = None
+
+
+class SamplingController:
+    """Per-node signal state and interval decisions; all methods take the time.
+
+    observe() feeds readings, decide() returns the interval changes to
+    send. Nothing here talks to MQTT or the database, so the replay in
+    benchmarks/bench_sampling runs the same code as the live controller.
+    """
+
+    def __init__(self, ladder=LADDER, safety=3.0, hold=1800.0, tau=600.0, noise_sigmas=0.5,
+                 alert_interval=300):
+        self.ladder = tuple(sorted(ladder))
+        self.safety = safety
+        self.hold = hold
+        self.tau = tau
+        self.noise_sigmas = noise_sigmas
+        self.alert_interval = alert_interval
+        self.nodes = {}              # (gateway_id, field_id, zone_id) -> NodeState
+        self.confirmed = {}          # key -> interval to write to field_nodes
+        self.requested = {}          # command_id -> (key, interval) awaiting an ack
+        self.stats = {"readings": 0, "faster": 0, "slower": 0}
+
+    def restore(self, key, bounds, interval=NODE_SAMPLE_INTERVAL):
+        self.nodes[key] = NodeState(bounds, interval, interval)
+
+    def observe(self, key, now, values, pump=False):
+        """A reading from key's node arrived"""
+        node = self.nodes[key]
+        self.stats["readings"] += 1
+        node.pump = pump
+        if node.last_time is None:
+            node.level = values.copy()
+            node.slope = np.zeros_like(values)
+            node.noise = np.zeros_like(values)
+            node.last_time = now
+            return
+
+        dt = max(now - node.last_time, 1.0)
+        alpha = 1.0 - math.exp(-dt / self.tau)
+        known = ~np.isnan(values)
+        fresh = known & np.isnan(node.level)
+        node.level[fresh] = values[fresh]
+        deviation = np.where(known, values - node.level, 0.0)
+        node.noise += alpha * (deviation ** 2 - node.noise)
+        step = alpha * deviation
+        node.level += step
+        node.slope += alpha * (step / dt - node.slope)
+        node.last_time = now
+
+        # The node now reports at the cadence last requested
+        if node.interval != node.configured and \
+                abs(dt - node.interval) <= CADENCE_TOLERANCE * node.interval:
+            self._confirm(key, node)
+
+    def set_alerts(self, keys):
+        """Zones with an active alert (replaces the previous set)"""
+        for key, node in self.nodes.items():
+            node.alert = key in keys
+
+    def target_interval(self, node):
+        """Longest rung that leaves safety x its length before any signal can reach a threshold"""
+        if node.pump or node.level is None:
+            return self.ladder[0]
+        with np.errstate(invalid="ignore"):
+            distance = np.abs(node.bounds - node.level[:, None])
+        margin = np.fmin.reduce(distance, axis=1) - self.noise_sigmas * np.sqrt(node.noise)
+        usable = ~np.isnan(margin)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            crossing = np.maximum(margin[usable], 0.0) / np.abs(node.slope[usable])
+        # 0 / 0: a signal without noise or trend, e.g. light at night on its 0 minimum
+        seconds = np.nan_to_num(crossing, nan=np.inf).min(initial=np.inf) / self.safety
+        if node.alert:
+            seconds = min(seconds, self.alert_interval)
+        return max([rung for rung in self.ladder if rung <= seconds], default=self.ladder[0])
+
+    def decide(self, now, keys=None):
+        """[(key, old, new)] interval changes for keys (default all nodes)"""
+        changes = []
+        for key in self.nodes if keys is None else keys:
+            node = self.nodes[key]
+            target = node.target = self.target_interval(node)
+            current = node.interval
+            if target < current:
+                node.calm_since = None
+                self._change(key, node, target, changes)
+                self.stats["faster"] += 1
+                continue
+            if target == current:
+                node.calm_since = None
+                continue
+            if node.calm_since is None:
+                node.calm_since = now
+            elif now - node.calm_since >= self.hold:
+                node.calm_since = now
+                self._change(key, node, self.ladder[self.ladder.index(current) + 1]
+                             if current in self.ladder else target, changes)
+                self.stats["slower"] += 1
+        return changes
+
+    def _change(self, key, node, interval, changes):
+        changes.append((key, node.interval, interval))
+        node.interval = interval
+
+    def _confirm(self, key, node):
+        node.configured = node.interval
+        self.confirmed[key] = node.interval
+
+    def track(self, sent):
+        """[(command_id, key, interval)] queued by write_changes; older requests
+        for the same nodes will not be acked (the broker supersedes them)"""
+        keys = {key for _, key, _ in sent}
+        self.requested = {command_id: request for command_id, request in self.requested.items()
+                          if request[0] not in keys}
+        for command_id, key, interval in sent:
+            self.requested[command_id] = (key, interval)
+
+    def acknowledge(self, gateway_id, command_id, now, ok=True, error=None):
+        """A gateway's ack for a config_update: "ok" means the node applied it"""
+        request = self.requested.pop(command_id, None)
+        if request is None or not ok:
+            return request
+        key, interval = request
+        node = self.nodes[key]
+        if node.interval == interval and node.configured != interval:
+            self._confirm(key, node)
+        return request
+
+    def drain_confirmed(self):
+        """[(gateway_id, field_id, zone_id, interval)] for UPDATE_INTERVALS; clears them"""
+        rows = [key + (interval,) for key, interval in self.confirmed.items()]
+        self.confirmed = {}
+        return rows
+
+    def messages_per_hour(self):
+        """(at the requested intervals, at NODE_SAMPLE_INTERVAL for every node)"""
+        adaptive = sum(3600.0 / node.interval for node in self.nodes.values())
+        return adaptive, len(self.nodes) * 3600.0 / NODE_SAMPLE_INTERVAL
+
+
+# ==========================================
+# DATABASE
+# ==========================================
+
+def load_nodes(conn, controller, tables, on_date=None):
+    """Restore every node with its crop's thresholds; returns {key: farm_id}"""
+    profiles = farm_profiles(conn, tables, on_date or date.today())
+    default = tables.profile("tomato")
+    farms = {}
+    with conn.cursor() as cur:
+        cur.execute(NODES_QUERY)
+        for gateway_id, field_id, zone_id, interval, farm_id in cur.fetchall():
+            key = (gateway_id, field_id, zone_id)
+            bounds = signal_bounds(tables, profiles.get(farm_id, default))
+            controller.restore(key, bounds, interval)
+            farms[key] = farm_id
+    conn.commit()
+    return farms
+
+
+def load_alerts(conn, window):
+    with conn.cursor() as cur:
+        cur.execute(ACTIVE_ALERTS_QUERY, {"window": window})
+        keys = set(cur.fetchall())
+    conn.commit()
+    return keys
+
+
+def write_changes(conn, farms, changes, confirmed, now):
+    """Queue config_update commands and update field_nodes in one transaction;
+    returns [(command_id, key, interval)] for SamplingController.track"""
+    stamp = int(now * 1000)
+    sent = [(f"interval-{g}-{f}-{z}-{stamp}", (g, f, z), new) for (g, f, z), _, new in changes]
+    with conn.cursor() as cur:
+        if sent:
+            rows = [(command_id, farms[key], *key, json.dumps({"sampleInterval": interval}))
+                    for command_id, key, interval in sent]
+            cur.execute(INSERT_COMMANDS, [list(column) for column in zip(*rows)])
+        if confirmed:
+            cur.execute(UPDATE_INTERVALS, [list(column) for column in zip(*confirmed)])
+    conn.commit()
+    return sent
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive per-node sampling intervals")
+    parser.add_argument("--ladder", type=int, nargs="+", default=list(LADDER),
+                        help="Allowed intervals in seconds")
+    parser.add_argument("--safety", type=float, default=3.0,
+                        help="Intervals that must fit before a signal can reach a threshold")
+    parser.add_argument("--hold", type=float, default=1800.0,
+                        help="Seconds a longer interval must stay justified before it is sent")
+    parser.add_argument("--alert-interval", type=int, default=300,
+                        help="Longest interval for a zone with an active alert")
+    parser.add_argument("--alert-window", type=float, default=6 * 3600,
+                        help="Unacknowledged alerts younger than this keep a zone fast")
+    parser.add_argument("--decide-interval", type=float, default=30.0)
+    parser.add_argument("--stats-interval", type=float, default=600.0)
+    parser.add_argument("--send", action="store_true",
+                        help="Queue config_update commands (needs firmware that applies them); "
+                             "without it, only log the changes")
+    args = parser.parse_args()
+
+    config = load_config()
+    conn = db.connect(config.database_url)
+    controller = SamplingController(args.ladder, args.safety, args.hold,
+                                    alert_interval=args.alert_interval)
+    tables = compile_rules()
+    farms = load_nodes(conn, controller, tables)
+    print(f"✓ Controlling {len(controller.nodes)} node(s), ladder {controller.ladder}")
+    if not args.send:
+        print("⚠ Dry run: firmware does not apply config_update yet; pass --send to queue changes")
+
+    def on_message(message):
+        if message.topic.startswith("agriconnect/ack/"):
+            handle_ack(controller, message.topic, message.payload, time.time())
+            return
+        parts = message.topic.split("/")
+        try:
+            key = (parts[2], int(parts[3]), int(parts[4]))
+            data = json.loads(message.payload)
+        except (IndexError, ValueError):
+            return
+        if key not in controller.nodes or not isinstance(data, dict):
+            return
+        try:
+            values, pump = payload_values(data)
+        except (TypeError, ValueError):
+            return                   # sensors/system not objects, or non-numeric values
+        controller.observe(key, time.time(), values, pump)
+
+    topics = [("agriconnect/data/+/+/+", 0)] + ([("agriconnect/ack/+", 1)] if args.send else [])
+    client = create_client(config, "sampling_controller", topics, on_message)
+
+    last_decide = 0.0
+    last_stats = time.monotonic()
+    try:
+        # Single thread: readings, decisions and writes never race
+        while True:
+            client.loop(timeout=0.2)
+            if time.monotonic() - last_decide < args.decide_interval:
+                continue
+            last_decide = time.monotonic()
+            now = time.time()
+            controller.set_alerts(load_alerts(conn, args.alert_window))
+            changes = controller.decide(now)
+            if args.send:
+                controller.track(write_changes(conn, farms, changes,
+                                               controller.drain_confirmed(), now))
+            for (gateway_id, field_id, zone_id), old, new in changes:
+                print(f"  {gateway_id}/{field_id}/{zone_id}: {old}s → {new}s"
+                      f"{'' if args.send else ' (dry run)'}")
+
+            if time.monotonic() - last_stats >= args.stats_interval:
+                last_stats = time.monotonic()
+                adaptive, fixed = controller.messages_per_hour()
+                print(f"[STATS] {controller.stats} | {adaptive:,.0f} msg/h vs {fixed:,.0f} "
+                      f"at {NODE_SAMPLE_INTERVAL}s ({1 - adaptive / max(fixed, 1):.0%} fewer)")
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down gracefully...")
+    finally:
+        client.disconnect()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,543 @@
+"""
+Irrigation Scheduler
+Plans a day of irrigation for every zone of a farm at once, instead of
+SmartScheduler (dashboard) planning one zone at a time and
+IrrigationOptimizer advising per reading: zones share one pump, which
+waters a limited number of zones at a time and delivers a limited flow,
+and one tank, which must not run dry.
+
+Soil moisture is forecast per zone in 10-minute slots from its current
+reading, how fast it dries per mm of evapotranspiration (ET) and the
+forecast rain. A run raises a zone to its crop's moistureOptimal.
+
+A plan's cost adds up, per zone:
+  * moisture-hours below moistureLow, with moisture below moistureCritical
+    counting extra;
+  * moisture-hours above moistureHigh (watering just before rain);
+  * litres used, weighted by the slot's window: free in the preferred
+    windows (5-7 and 17-19, as getNextOptimalWindow), cheap at night,
+    expensive 10-16 when most evaporates.
+
+A priority queue hands out zones by deadline (the first slot they would
+drop below moistureLow). Each run goes to its cheapest feasible start,
+with every start evaluated at once as a slot array. Local search then
+revisits zones that still go dry: where the pump is taken at their best
+start, one of the runs in the way is taken out, the dry zone placed and
+the other run put back at its own best start, kept if the two zones cost
+less together.
+
+Usage:
+    python -m agriconnect_pipeline.scheduler --farm-id FARM-001
+    python -m agriconnect_pipeline.scheduler --farm-id FARM-001 --pumps 2 --pump-flow 60 \\
+        --tank-capacity 5000 --weather forecast.json --json plan.json
+"""
+
+import argparse
+import heapq
+import json
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from . import db
+from .backfill import LOCAL_TZ
+from .config import load_config
+from .intelligence.irrigation import DEFAULT_THRESHOLDS
+from .rules import IRRIGATION_KEYS, compile_rules
+
+SLOT_MINUTES = 10
+DAY_SLOTS = 24 * 60 // SLOT_MINUTES
+
+# Penalty per litre by hour of day
+PREFERRED_WINDOWS = ((5, 7), (17, 19))
+AVOID_WINDOWS = ((10, 16),)
+NIGHT_WINDOW = (22, 5)           # cheaper electricity (SmartScheduler's night rule)
+WINDOW_PENALTY = {"preferred": 0.0, "night": 0.3, "day": 1.0, "avoid": 3.0}
+
+# Sum of the daylight weights over one day, so a day's slots add up to the daily ET
+DAYLIGHT = np.clip(np.sin((np.arange(DAY_SLOTS) * SLOT_MINUTES / 60 - 6) / 12 * np.pi),
+                   0, None).sum()
+
+RADIATION = 15.0                 # extraterrestrial radiation, mm/day, near the equator
+DEFAULT_DRYDOWN = 12.0           # moisture units per mm of ET without history
+MAX_RUNS_PER_ZONE = 4
+EJECT_TRIES = 3                  # runs in the way tried per dry zone and pass
+DRY_MARGIN = 5.0                 # units below moistureLow before a zone counts as dry
+
+FARM_QUERY = "SELECT crop_type, planting_date FROM farms WHERE farm_id = %s"
+
+# Latest state and recent drying rate (units per second, pump off) of every zone
+ZONE_STATE_QUERY = """
+    SELECT r.gateway_id, r.field_id, r.zone_id,
+           (array_agg(r.soil_moisture ORDER BY r.reading_time DESC))[1],
+           (array_agg(r.air_temperature ORDER BY r.reading_time DESC))[1],
+           (array_agg(r.air_humidity ORDER BY r.reading_time DESC))[1],
+           (array_agg(r.water_level ORDER BY r.reading_time DESC))[1],
+           regr_slope(r.soil_moisture, EXTRACT(EPOCH FROM r.reading_time))
+               FILTER (WHERE NOT r.pump_status)
+    FROM sensor_readings r
+    JOIN gateways g ON g.gateway_id = r.gateway_id
+    WHERE g.farm_id = %s AND r.reading_time > NOW() - INTERVAL '6 hours'
+      AND r.soil_moisture IS NOT NULL
+    GROUP BY r.gateway_id, r.field_id, r.zone_id
+    ORDER BY r.gateway_id, r.field_id, r.zone_id
+"""
+
+
+@dataclass
+class Zone:
+    key: tuple                   # (gateway_id, field_id, zone_id)
+    moisture: float              # soil moisture now
+    thresholds: dict = field(default_factory=lambda: dict(DEFAULT_THRESHOLDS))
+    drydown: float = DEFAULT_DRYDOWN     # moisture units lost per mm of ET
+    flow: float = 20.0           # L/min through the zone's valve
+    wetting: float = 10.0        # moisture units gained per minute (calculate_duration)
+    rain_gain: float = 8.0       # moisture units per mm of rain
+
+
+@dataclass
+class Weather:
+    """Per-slot forecast"""
+    temperature: np.ndarray      # C
+    humidity: np.ndarray         # %
+    rain: np.ndarray             # mm in the slot
+
+
+@dataclass
+class Resources:
+    pumps: int = 2               # zones watered at the same time
+    pump_flow: float = 60.0      # L/min the pump delivers
+    tank_capacity: float = 5000.0
+    tank_level: float = 1.0      # fraction full now
+    refill: float = 0.0          # L/min into the tank
+    reserve: float = 0.1         # fraction never planned
+
+
+@dataclass
+class Run:
+    zone: int
+    start: int                   # slot
+    slots: int
+    minutes: float
+    water: float                 # litres
+    gain: float                  # moisture units added
+
+
+# ==========================================
+# FORECAST
+# ==========================================
+
+def slot_hours(start, slots=DAY_SLOTS):
+    """Local hour of day (float) at the start of every slot"""
+    first = start.hour + start.minute / 60
+    return (first + np.arange(slots) * SLOT_MINUTES / 60) % 24
+
+
+def _in_window(hours, window):
+    first, last = window
+    if first <= last:
+        return (hours >= first) & (hours < last)
+    return (hours >= first) | (hours < last)
+
+
+def window_penalty(hours, preferred=PREFERRED_WINDOWS, avoid=AVOID_WINDOWS,
+                   night=NIGHT_WINDOW, weights=WINDOW_PENALTY):
+    """Penalty per litre for every slot"""
+    penalty = np.full(len(hours), weights["day"])
+    penalty[_in_window(hours, night)] = weights["night"]
+    for window in avoid:
+        penalty[_in_window(hours, window)] = weights["avoid"]
+    for window in preferred:
+        penalty[_in_window(hours, window)] = weights["preferred"]
+    return penalty
+
+
+def et_per_slot(weather, hours, radiation=RADIATION):
+    """mm of reference ET per slot: Hargreaves (0.0023 Ra (T + 17.8) sqrt(Tmax - Tmin)
+    per day) at each slot's temperature, spread over daylight"""
+    spread = np.sqrt(max(float(np.ptp(weather.temperature)), 1.0))
+    daily = 0.0023 * radiation * (weather.temperature + 17.8) * spread
+    sun = np.clip(np.sin((hours - 6) / 12 * np.pi), 0, None)
+    return daily * sun / DAYLIGHT
+
+
+def diurnal_weather(temperature, humidity, hours):
+    """A dry day around the latest reading when there is no forecast"""
+    phase = np.sin((hours - 9) / 24 * 2 * np.pi)
+    return Weather(temperature=temperature + 6 * phase,
+                   humidity=np.clip(humidity - 10 * phase, 5, 100),
+                   rain=np.zeros(len(hours)))
+
+
+def load_openweather(path, start, slots=DAY_SLOTS):
+    """Weather from an OpenWeather 5-day/3-hour forecast (the dashboard's source)"""
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)["list"]
+    times = np.array([entry["dt"] for entry in entries], dtype=float)
+    at = start.timestamp() + np.arange(slots) * SLOT_MINUTES * 60
+    rain_rate = np.array([(entry.get("rain") or {}).get("3h", 0.0) for entry in entries]) / 180
+    return Weather(
+        temperature=np.interp(at, times, [entry["main"]["temp"] for entry in entries]),
+        humidity=np.interp(at, times, [entry["main"]["humidity"] for entry in entries]),
+        # Each entry's rain falls over the 3 hours before it
+        rain=np.interp(at, times, rain_rate, left=0.0) * SLOT_MINUTES,
+    )
+
+
+def forecast_moisture(zones, et, rain):
+    """Moisture at the start of every slot without irrigation: [zones, slots + 1]"""
+    drydown = np.array([z.drydown for z in zones])[:, None]
+    gain = np.array([z.rain_gain for z in zones])[:, None]
+    change = np.concatenate([[0.0], np.cumsum(rain)]) * gain \
+        - np.concatenate([[0.0], np.cumsum(et)]) * drydown
+    return np.array([z.moisture for z in zones])[:, None] + change
+
+
+# ==========================================
+# PLANNER
+# ==========================================
+
+class IrrigationPlanner:
+    """Greedy plus local search over one day of slots.
+
+    plan() returns the runs; every placement and move keeps the pump
+    (zones at once, flow) and the tank (capacity, reserve, refill) within
+    limits for the whole day.
+    """
+
+    def __init__(self, zones, weather, resources, start, stress_weight=1.0,
+                 critical_weight=10.0, excess_weight=0.5, water_weight=0.05, penalty=None):
+        self.zones = zones
+        self.resources = resources
+        self.start = start
+        self.slots = len(weather.temperature)
+        hours = slot_hours(start, self.slots)
+        self.penalty = window_penalty(hours) if penalty is None else penalty
+        self.base = forecast_moisture(zones, et_per_slot(weather, hours), weather.rain)
+        self.weights = (stress_weight, critical_weight, excess_weight, water_weight)
+
+        self.low = np.array([z.thresholds["moistureLow"] for z in zones])
+        self.critical = np.array([z.thresholds["moistureCritical"] for z in zones])
+        self.high = np.array([z.thresholds["moistureHigh"] for z in zones])
+        self.target = np.array([z.thresholds["moistureOptimal"] for z in zones])
+
+        # A zone that starts below moistureLow stays there until its first run ends
+        first = np.ceil((self.target - self.base[:, 0]) / np.array([z.wetting for z in zones])
+                        / SLOT_MINUTES)
+        self.relief = np.where(self.base[:, 0] < self.low - DRY_MARGIN, first, 0).astype(np.int64)
+
+        self.runs = [[] for _ in zones]
+        self.active = np.zeros(self.slots, dtype=np.int64)     # zones watered per slot
+        self.flow = np.zeros(self.slots)                       # L/min per slot
+        self.use = np.zeros(self.slots)                        # litres per slot
+        self.stats = {"evaluations": 0, "moves": 0, "passes": 0}
+
+    # ---- state ------------------------------------------------------------
+
+    def _apply(self, run, sign):
+        zone = self.zones[run.zone]
+        window = slice(run.start, run.start + run.slots)
+        self.active[window] += sign
+        self.flow[window] += sign * zone.flow
+        self.use[window] += sign * run.water / run.slots
+        if sign > 0:
+            self.runs[run.zone].append(run)
+        else:
+            self.runs[run.zone].remove(run)
+
+    def trajectory(self, i, runs=None):
+        """Moisture of zone i at every slot boundary with its runs"""
+        moisture = self.base[i].copy()
+        for run in self.runs[i] if runs is None else runs:
+            moisture[run.start + run.slots:] += run.gain
+        return moisture
+
+    def _moisture_cost(self, moisture, i):
+        """Cost of moisture trajectories ([..., slots + 1]) of zone i"""
+        stress, critical, excess, _ = self.weights
+        hours = SLOT_MINUTES / 60
+        body = moisture[..., 1:]
+        return hours * (stress * np.maximum(self.low[i] - body, 0).sum(axis=-1)
+                        + critical * np.maximum(self.critical[i] - body, 0).sum(axis=-1)
+                        + excess * np.maximum(body - self.high[i], 0).sum(axis=-1))
+
+    def _water_cost(self, run):
+        return self.weights[3] * run.water / run.slots * \
+            self.penalty[run.start:run.start + run.slots].sum()
+
+    def zone_cost(self, i):
+        return (self._moisture_cost(self.trajectory(i), i)
+                + sum(self._water_cost(run) for run in self.runs[i]))
+
+    def tank_levels(self, use=None):
+        """Litres in the tank at the end of every slot; it spills above capacity"""
+        r = self.resources
+        inflow = r.refill * SLOT_MINUTES * (np.arange(self.slots) + 1)
+        unclipped = r.tank_capacity * r.tank_level + inflow - np.cumsum(
+            self.use if use is None else use, axis=-1)
+        spilled = np.maximum(np.maximum.accumulate(unclipped - r.tank_capacity, axis=-1), 0)
+        return unclipped - spilled
+
+    # ---- placement --------------------------------------------------------
+
+    def best_run(self, i, pump=True):
+        """(cost change, Run) of the cheapest feasible new run for zone i, or None.
+
+        pump=False ignores other zones' runs on the pump (the tank still counts).
+        """
+        self.stats["evaluations"] += 1
+        zone = self.zones[i]
+        moisture = self.trajectory(i)
+        starts = np.arange(self.slots)
+
+        gain = self.target[i] - moisture[:-1]
+        minutes = gain / zone.wetting
+        slots = np.ceil(np.maximum(minutes, 1e-9) / SLOT_MINUTES).astype(np.int64)
+        end = starts + slots
+
+        # Pump: first slot from each start where this zone would not fit
+        r = self.resources
+        blocked = (self.active >= r.pumps) | (self.flow + zone.flow > r.pump_flow)
+        if not pump:
+            blocked[:] = False
+        position = np.where(blocked, starts, self.slots)
+        next_blocked = np.minimum.accumulate(position[::-1])[::-1]
+        ok = (gain > 0) & (end <= self.slots) & (next_blocked >= end)
+        for run in self.runs[i]:
+            ok &= (end <= run.start) | (starts >= run.start + run.slots)
+        if not ok.any():
+            return None
+        starts, slots, gain, minutes = starts[ok], slots[ok], gain[ok], minutes[ok]
+        water = minutes * zone.flow
+
+        # Cost of the zone's day with each candidate
+        after = moisture[None, :] + gain[:, None] * (
+            np.arange(self.slots + 1)[None, :] >= (starts + slots)[:, None])
+        cumulative = np.concatenate([[0.0], np.cumsum(self.penalty)])
+        window = cumulative[starts + slots] - cumulative[starts]
+        cost = self._moisture_cost(after, i) + self.weights[3] * water / slots * window
+        current = self._moisture_cost(moisture, i)
+
+        # Tank: cheapest candidate that keeps the day's levels above the reserve
+        floor = r.reserve * r.tank_capacity - 1e-9
+        for best in np.argsort(cost, kind="stable"):
+            if cost[best] >= current and best != np.argmin(cost):
+                break
+            use = self.use.copy()
+            use[starts[best]:starts[best] + slots[best]] += water[best] / slots[best]
+            if self.tank_levels(use).min() >= floor:
+                return float(cost[best] - current), Run(
+                    i, int(starts[best]), int(slots[best]), float(minutes[best]),
+                    float(water[best]), float(gain[best]))
+        return None
+
+    def deadline(self, i):
+        """First slot zone i is below moistureLow, or None"""
+        below = np.flatnonzero(self.trajectory(i)[1:] < self.low[i])
+        return int(below[0]) if len(below) else None
+
+    def unmet(self, i):
+        """Whether zone i is dry after it could first have been watered"""
+        return bool((self.trajectory(i)[1 + self.relief[i]:] < self.low[i] - DRY_MARGIN).any())
+
+    def greedy(self):
+        """Place runs zone by zone, earliest deadline first"""
+        queue = []
+        for i in range(len(self.zones)):
+            due = self.deadline(i)
+            if due is not None:
+                deficit = self.low[i] - self.trajectory(i).min()
+                heapq.heappush(queue, (due, -deficit, i))
+        while queue:
+            _, _, i = heapq.heappop(queue)
+            found = self.best_run(i)
+            if found is None or found[0] >= 0:
+                continue
+            self._apply(found[1], +1)
+            due = self.deadline(i)
+            if due is not None and len(self.runs[i]) < MAX_RUNS_PER_ZONE:
+                deficit = self.low[i] - self.trajectory(i).min()
+                heapq.heappush(queue, (due, -deficit, i))
+
+    def local_search(self, max_passes=5):
+        """Make room for zones still going dry by moving runs in their way; returns moves"""
+        moved = 0
+        for _ in range(max_passes):
+            self.stats["passes"] += 1
+            changed = 0
+            for i in range(len(self.zones)):
+                if not self.unmet(i) or len(self.runs[i]) >= MAX_RUNS_PER_ZONE:
+                    continue
+                if self._place(i) or self._eject(i):
+                    changed += 1
+            moved += changed
+            if not changed:
+                break
+        self.stats["moves"] += moved
+        return moved
+
+    def _place(self, i):
+        found = self.best_run(i)
+        if found is None or found[0] >= 0:
+            return False
+        self._apply(found[1], +1)
+        return True
+
+    def _eject(self, i):
+        """Take out one run overlapping zone i's best start if that lowers the total"""
+        wanted = self.best_run(i, pump=False)
+        if wanted is None or wanted[0] >= 0:
+            return False
+        first, last = wanted[1].start, wanted[1].start + wanted[1].slots
+        blocking = [run for runs in self.runs for run in runs
+                    if run.zone != i and run.start < last and run.start + run.slots > first]
+        # Runs of the zones furthest above moistureLow have the most room to move
+        slack = {run.zone: self.trajectory(run.zone).min() - self.low[run.zone] for run in blocking}
+        for other in sorted(blocking, key=lambda run: -slack[run.zone])[:EJECT_TRIES]:
+            j = other.zone
+            before = self.zone_cost(i) + self.zone_cost(j)
+            self._apply(other, -1)
+            placed = self._place(i)
+            moved = self.best_run(j)
+            if moved is not None and moved[0] < 0:
+                self._apply(moved[1], +1)
+            else:
+                moved = None
+            if placed and self.zone_cost(i) + self.zone_cost(j) < before - 1e-6:
+                return True
+            if moved is not None:
+                self._apply(moved[1], -1)
+            if placed:
+                self._apply(self.runs[i][-1], -1)
+            self._apply(other, +1)
+        return False
+
+    def plan(self, local_search=True):
+        self.greedy()
+        if local_search:
+            self.local_search()
+        return sorted((run for runs in self.runs for run in runs),
+                      key=lambda run: (run.start, self.zones[run.zone].key))
+
+    def summary(self):
+        levels = self.tank_levels()
+        unmet = [i for i in range(len(self.zones)) if self.unmet(i)]
+        return {
+            "runs": sum(len(runs) for runs in self.runs),
+            "zones_watered": sum(1 for runs in self.runs if runs),
+            "zones_below_low": len(unmet),
+            "water_l": float(self.use.sum()),
+            "tank_min_l": float(min(levels.min(), self.resources.tank_capacity
+                                    * self.resources.tank_level)),
+            "peak_zones": int(self.active.max()),
+            "peak_flow_l_min": float(self.flow.max()),
+            "cost": float(sum(self.zone_cost(i) for i in range(len(self.zones)))),
+        }
+
+    def describe(self, run):
+        zone = self.zones[run.zone]
+        at = self.start + timedelta(minutes=run.start * SLOT_MINUTES)
+        moisture = self.trajectory(run.zone)[run.start]
+        return {
+            "gateway_id": zone.key[0], "field_id": zone.key[1], "zone_id": zone.key[2],
+            "start": at.isoformat(), "minutes": round(run.minutes, 1),
+            "water_l": round(run.water, 1), "moisture_before": round(float(moisture), 1),
+            "moisture_after": round(float(moisture + run.gain), 1),
+        }
+
+
+# ==========================================
+# DATABASE
+# ==========================================
+
+def load_farm(conn, farm_id, tables, on_date=None):
+    """(zones, latest air temperature, humidity, tank fraction) of a farm"""
+    with conn.cursor() as cur:
+        cur.execute(FARM_QUERY, (farm_id,))
+        row = cur.fetchone()
+        crop, planting_date = row if row else (None, None)
+        profile = tables.profile_for_farm(crop, planting_date, on_date or date.today())
+        thresholds = dict(zip(IRRIGATION_KEYS, tables.irrigation[profile].tolist()))
+
+        cur.execute(ZONE_STATE_QUERY, (farm_id,))
+        rows = cur.fetchall()
+    conn.commit()
+
+    zones, temperatures, humidities, tank = [], [], [], []
+    for gateway_id, field_id, zone_id, moisture, temp, humidity, water, slope in rows:
+        zones.append(Zone((gateway_id, field_id, zone_id), float(moisture), dict(thresholds)))
+        temperatures.append(float(temp) if temp is not None else 25.0)
+        humidities.append(float(humidity) if humidity is not None else 65.0)
+        if water is not None:
+            tank.append(float(water) / 100)
+        if slope is not None and slope < 0:
+            zones[-1].drydown = -float(slope) * 86400    # units/day, rescaled below
+    return zones, float(np.mean(temperatures or [25.0])), \
+        float(np.mean(humidities or [65.0])), min(tank) if tank else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Farm-wide irrigation day plan")
+    parser.add_argument("--farm-id", required=True)
+    parser.add_argument("--weather", help="OpenWeather 5-day/3-hour forecast JSON")
+    parser.add_argument("--pumps", type=int, default=2, help="Zones watered at the same time")
+    parser.add_argument("--pump-flow", type=float, default=60.0, help="L/min")
+    parser.add_argument("--zone-flow", type=float, default=20.0, help="L/min per zone valve")
+    parser.add_argument("--tank-capacity", type=float, default=5000.0, help="Litres")
+    parser.add_argument("--refill", type=float, default=0.0, help="L/min into the tank")
+    parser.add_argument("--reserve", type=float, default=0.1, help="Tank fraction kept back")
+    parser.add_argument("--json", help="Write the plan to this file")
+    args = parser.parse_args()
+
+    config = load_config()
+    tables = compile_rules()
+    with db.connect(config.database_url) as conn:
+        zones, temperature, humidity, tank = load_farm(conn, args.farm_id, tables)
+    if not zones:
+        print(f"✗ No recent readings for farm {args.farm_id}")
+        return
+
+    start = datetime.now(LOCAL_TZ).replace(second=0, microsecond=0)
+    start -= timedelta(minutes=start.minute % SLOT_MINUTES)
+    hours = slot_hours(start)
+    weather = (load_openweather(args.weather, start) if args.weather
+               else diurnal_weather(temperature, humidity, hours))
+    et = et_per_slot(weather, hours)
+    for zone in zones:
+        zone.flow = args.zone_flow
+        if zone.drydown != DEFAULT_DRYDOWN:
+            # Observed units/day over the day's ET gives units per mm
+            zone.drydown /= max(et.sum(), 1e-6)
+
+    resources = Resources(args.pumps, args.pump_flow, args.tank_capacity, tank,
+                          args.refill, args.reserve)
+    started = time.perf_counter()
+    planner = IrrigationPlanner(zones, weather, resources, start)
+    runs = planner.plan()
+    elapsed = time.perf_counter() - started
+    summary = planner.summary()
+
+    print(f"✓ Planned {len(zones)} zone(s) in {elapsed * 1e3:.1f} ms "
+          f"({planner.stats['evaluations']} evaluations, {planner.stats['moves']} moves)")
+    for run in runs:
+        row = planner.describe(run)
+        print(f"  {row['start'][11:16]}  {row['gateway_id']} F{row['field_id']} "
+              f"Z{row['zone_id']}  {row['minutes']:5.1f} min  {row['water_l']:7.1f} L  "
+              f"moisture {row['moisture_before']:.0f} → {row['moisture_after']:.0f}")
+    print(f"[STATS] {summary}")
+    if summary["zones_below_low"]:
+        print(f"⚠ {summary['zones_below_low']} zone(s) still drop below moistureLow: "
+              f"not enough pump time or water")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"farm_id": args.farm_id, "start": start.isoformat(),
+                       "runs": [planner.describe(run) for run in runs],
+                       "summary": summary}, f, indent=2)
+        print(f"✓ Plan written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+Delta Sync
+Lets an offline-first dashboard catch up after a reconnect by fetching
+only what changed, instead of refetching whole windows of sensor_readings
+over a slow mobile link.
+
+Every insert or update of sensor_readings, alerts and gateways takes the
+next value of the shared sync_seq sequence (migration 0011), so one
+cursor per farm covers all three. GET /sync/<farm_id>?cursor=<token>
+returns the farm's rows above the cursor in sync_seq order, as NDJSON
+sent in chunks and gzip-compressed when the client accepts it:
+
+    {"t":"reading","id":981,"gateway_id":"GW-CM-BUE-001",...}
+    {"t":"alert","alert_id":"6f1c...","severity":"warning",...}
+    {"t":"gateway","gateway_id":"GW-CM-BUE-001","status":"online",...}
+    {"t":"cursor","cursor":"1523.1610","more":false}
+
+A cursor line follows every chunk. The dashboard stores rows by key and
+keeps the last cursor it saw; after a dropped connection it resumes from
+that cursor, and on "more": true it asks again straight away. Without a
+cursor it gets an initial sync: the farm's gateways, unacknowledged and
+recent alerts, and the last --initial-hours of readings. NULL columns
+are left out of each line.
+
+A row takes its sequence value when it is written but only becomes
+visible when its transaction commits, so it can commit below a cursor
+already handed out. A cursor is "<floor>.<after>": the next pass reads
+from floor, which only moves past sequence values assigned at least
+--settle seconds ago; after is where a pass that was cut short resumes.
+Rows between the two are sent again, and the keyed store absorbs them.
+
+Requests need a Supabase access token (Authorization: Bearer ...) with
+the authenticated role, the same rule as the tables' RLS policies,
+checked against SUPABASE_JWT_SECRET.
+
+Usage:
+    python -m agriconnect_pipeline.sync --port 8780
+"""
+
+import argparse
+import base64
+import bisect
+import hashlib
+import hmac
+import json
+import threading
+import time
+import urllib.parse
+import zlib
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from uuid import UUID
+
+from . import db
+from .config import load_config
+from .readings import READING_COLUMNS
+
+# kind -> (table, columns sent, filter to the farm)
+SYNC_TABLES = {
+    "reading": ("sensor_readings",
+                READING_COLUMNS + ("latitude", "longitude", "data_valid"),
+                "gateway_id = ANY(%(gateways)s)"),
+    "alert": ("alerts",
+              ("alert_id", "gateway_id", "field_id", "zone_id", "alert_type", "severity",
+               "message", "acknowledged", "acknowledged_at", "zone_count", "member_zones",
+               "created_at", "updated_at"),
+              "farm_id = %(farm)s"),
+    "gateway": ("gateways",
+                ("gateway_id", "name", "status", "last_seen", "firmware_version",
+                 "latitude", "longitude", "updated_at"),
+                "farm_id = %(farm)s"),
+}
+
+# What a dashboard without a cursor starts from
+INITIAL_WINDOWS = {
+    "gateway": "TRUE",
+    "alert": "(NOT acknowledged OR created_at > now() - %(hours)s * interval '1 hour')",
+    "reading": "reading_time > now() - %(hours)s * interval '1 hour'",
+}
+
+FARM_GATEWAYS_QUERY = "SELECT gateway_id FROM gateways WHERE farm_id = %s"
+SEQUENCE_QUERY = "SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM sync_seq"
+
+CHUNK_ROWS = 500             # rows between cursor lines (and compressor flushes)
+
+
+def delta_query(kind):
+    table, columns, farm_filter = SYNC_TABLES[kind]
+    return (f"SELECT sync_seq, {', '.join(columns)} FROM {table} "
+            f"WHERE {farm_filter} AND sync_seq > %(after)s "
+            f"ORDER BY sync_seq LIMIT %(limit)s")
+
+
+def initial_query(kind):
+    table, columns, farm_filter = SYNC_TABLES[kind]
+    return (f"SELECT sync_seq, {', '.join(columns)} FROM {table} "
+            f"WHERE {farm_filter} AND {INITIAL_WINDOWS[kind]}")
+
+
+# ==========================================
+# CURSORS
+# ==========================================
+
+def parse_cursor(token):
+    """(floor, after) from "<floor>.<after>"; raises ValueError"""
+    floor, _, after = token.partition(".")
+    floor, after = int(floor), int(after or floor)
+    if floor < 0 or after < floor:
+        raise ValueError(f"bad cursor {token!r}")
+    return floor, after
+
+
+def format_cursor(floor, after):
+    return f"{floor}.{after}"
+
+
+class SequenceClock:
+    """Recent sync_seq values by time, to tell which values have settled.
+
+    sample() is called about once a second with the sequence's current
+    value; horizon() is the newest value sampled at least settle seconds
+    ago. Any row with a lower sync_seq was written before then, and its
+    transaction has had settle seconds to commit.
+    """
+
+    def __init__(self, settle=10.0, clock=time.monotonic):
+        self.settle = settle
+        self.clock = clock
+        self.samples = deque()   # (time, sequence value), oldest first
+        self.lock = threading.Lock()
+
+    def sample(self, value):
+        now = self.clock()
+        with self.lock:
+            self.samples.append((now, value))
+            # Keep one sample older than settle: it is the current horizon
+            while len(self.samples) > 1 and now - self.samples[1][0] >= self.settle:
+                self.samples.popleft()
+
+    def horizon(self):
+        """Newest settled value (the first sample until one has settled, 0 before any)"""
+        cutoff = self.clock() - self.settle
+        with self.lock:
+            if not self.samples:
+                return 0
+            index = bisect.bisect_right(self.samples, (cutoff, float("inf")))
+            return self.samples[max(index, 1) - 1][1]
+
+
+# ==========================================
+# ENCODING
+# ==========================================
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_row(kind, columns, row):
+    """One NDJSON line; row is (sync_seq, *columns), NULLs left out"""
+    record = {"t": kind}
+    for column, value in zip(columns, row[1:]):
+        if value is not None:
+            record[column] = value
+    return json.dumps(record, separators=(",", ":"), default=_json_default) + "\n"
+
+
+def merge_deltas(batches, limit):
+    """Rows of several tables in sync_seq order, cut where every table is complete.
+
+    batches maps kind -> rows (sync_seq first, ascending), each at most
+    limit long. A table that returned limit rows may have more below the
+    other tables' later rows, so the merge stops at the lowest last
+    sync_seq among full tables. Returns ([(kind, row)], more).
+    """
+    cutoff = min((rows[-1][0] for rows in batches.values() if len(rows) >= limit),
+                 default=None)
+    merged = sorted(((row[0], kind, row) for kind, rows in batches.items() for row in rows
+                     if cutoff is None or row[0] <= cutoff), key=lambda item: item[0])
+    return [(kind, row) for _, kind, row in merged], cutoff is not None
+
+
+def ndjson_chunks(rows, floor, after, horizon, more, chunk_rows=CHUNK_ROWS):
+    """Text chunks for [(kind, row)]: rows, each chunk closed by a cursor line.
+
+    floor moves with the rows but never past horizon; the last cursor of
+    a finished pass resumes from its floor.
+    """
+    chunk = []
+    for n, (kind, row) in enumerate(rows, 1):
+        chunk.append(encode_row(kind, SYNC_TABLES[kind][1], row))
+        seq = row[0]
+        if seq is not None:
+            after = max(after, seq)
+            floor = max(floor, min(seq, horizon))
+        if n % chunk_rows == 0 or n == len(rows):
+            last = n == len(rows)
+            cursor = format_cursor(floor, after if (more or not last) else floor)
+            chunk.append(json.dumps({"t": "cursor", "cursor": cursor,
+                                     "more": more if last else True},
+                                    separators=(",", ":")) + "\n")
+            yield "".join(chunk)
+            chunk = []
+    if not rows:
+        yield json.dumps({"t": "cursor", "cursor": format_cursor(floor, floor),
+                          "more": False}, separators=(",", ":")) + "\n"
+
+
+def compressed(chunks):
+    """gzip stream of chunks, flushed after each so the client can use it as it arrives"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        yield compressor.compress(chunk.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+# ==========================================
+# AUTH
+# ==========================================
+
+def _b64decode(part):
+    return base64.urlsafe_b64decode(part + "=" * (-len(part) % 4))
+
+
+def verify_token(token, secret, now=None):
+    """Claims of a valid HS256 Supabase access token with the authenticated role, else None"""
+    try:
+        header, payload, signature = token.split(".")
+        if json.loads(_b64decode(header)).get("alg") != "HS256":
+            return None
+        expected = hmac.new(secret.encode(), f"{header}.{payload}".encode(),
+                            hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, TypeError):
+        return None
+    if claims.get("role") != "authenticated":
+        return None
+    if claims.get("exp", float("inf")) < (time.time() if now is None else now):
+        return None
+    return claims
+
+
+# ==========================================
+# SERVER
+# ==========================================
+
+class SyncService:
+    """Runs sync queries on one connection per server thread"""
+
+    def __init__(self, dsn, settle=10.0, limit=5000, initial_hours=24):
+        self.dsn = dsn
+        self.limit = limit
+        self.initial_hours = initial_hours
+        self.clock = SequenceClock(settle)
+        self.local = threading.local()
+        self.stats = {"requests": 0, "initial": 0, "rows": 0, "bytes": 0}
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None or conn.closed:
+            conn = self.local.conn = db.connect(self.dsn)
+        return conn
+
+    def sample_forever(self, interval=1.0):
+        """Record sync_seq about every interval seconds (run in a thread)"""
+        conn = db.connect(self.dsn)
+        while True:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(SEQUENCE_QUERY)
+                    self.clock.sample(cur.fetchone()[0])
+                conn.commit()
+            except Exception as error:
+                print(f"✗ sync_seq sample failed: {error}")
+                conn = db.connect(self.dsn)
+            time.sleep(interval)
+
+    def changes(self, farm_id, cursor):
+        """NDJSON text chunks for one request"""
+        horizon = self.clock.horizon()
+        conn = self.connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(FARM_GATEWAYS_QUERY, (farm_id,))
+                params = {"farm": farm_id, "gateways": [row[0] for row in cur.fetchall()],
+                          "limit": self.limit, "hours": self.initial_hours}
+                if cursor is None:
+                    # Initial sync: whole windows, then deltas from the settled horizon
+                    rows = []
+                    for kind in SYNC_TABLES:
+                        cur.execute(initial_query(kind), params)
+                        rows.extend((kind, row) for row in cur.fetchall())
+                    floor, after, more = horizon, horizon, False
+                    rows = [(kind, (None,) + row[1:]) for kind, row in rows]
+                else:
+                    floor, after = cursor
+                    params["after"] = after
+                    batches = {}
+                    for kind in SYNC_TABLES:
+                        cur.execute(delta_query(kind), params)
+                        batches[kind] = cur.fetchall()
+                    rows, more = merge_deltas(batches, self.limit)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        self.stats["requests"] += 1
+        self.stats["initial"] += cursor is None
+        self.stats["rows"] += len(rows)
+        return ndjson_chunks(rows, floor, after, horizon, more)
+
+
+def make_handler(service, secret, allow_origin):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"       # chunked transfer encoding
+
+        def _cors(self):
+            if allow_origin:
+                self.send_header("Access-Control-Allow-Origin", allow_origin)
+                self.send_header("Access-Control-Allow-Headers", "Authorization")
+
+        def do_OPTIONS(self):
+            self.send_response(204)
+            self._cors()
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def _error(self, status, message):
+            body = (json.dumps({"error": message}) + "\n").encode()
+            self.send_response(status)
+            self._cors()
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            parts = url.path.strip("/").split("/")
+            if len(parts) != 2 or parts[0] != "sync" or not parts[1]:
+                self._error(404, "not found")
+                return
+            if secret is not None:
+                auth = self.headers.get("Authorization", "")
+                if not auth.startswith("Bearer ") or verify_token(auth[7:], secret) is None:
+                    self._error(401, "a valid access token is required")
+                    return
+            query = urllib.parse.parse_qs(url.query)
+            try:
+                cursor = parse_cursor(query["cursor"][0]) if "cursor" in query else None
+            except ValueError as error:
+                self._error(400, str(error))
+                return
+
+            try:
+                chunks = service.changes(urllib.parse.unquote(parts[1]), cursor)
+            except Exception as error:
+                print(f"✗ Sync query failed: {error}")
+                self._error(503, "database unavailable")
+                return
+            gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+            self.send_response(200)
+            self._cors()
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Transfer-Encoding", "chunked")
+            if gzip:
+                self.send_header("Content-Encoding", "gzip")
+            self.end_headers()
+            for data in (compressed(chunks) if gzip else (c.encode() for c in chunks)):
+                if data:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    service.stats["bytes"] += len(data)
+            self.wfile.write(b"0\r\n\r\n")
+
+        def log_message(self, format, *args):
+            pass  # one line per request is too much for mobile polling
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cursor-based delta sync for dashboards")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8780)
+    parser.add_argument("--settle", type=float, default=10.0,
+                        help="Seconds before a sync_seq value is trusted to be committed")
+    parser.add_argument("--limit", type=int, default=5000,
+                        help="Rows per table per response; more follow with \"more\": true")
+    parser.add_argument("--initial-hours", type=float, default=24.0,
+                        help="Readings (and acknowledged alerts) sent to a dashboard without a cursor")
+    parser.add_argument("--allow-origin", default="*",
+                        help="Access-Control-Allow-Origin for the dashboard")
+    parser.add_argument("--no-auth", action="store_true",
+                        help="Skip access token checks (local testing only)")
+    args = parser.parse_args()
+
+    config = load_config()
+    secret = None if args.no_auth else config.supabase_jwt_secret
+    if not args.no_auth and not secret:
+        raise RuntimeError("SUPABASE_JWT_SECRET is not set; use --no-auth for local testing")
+
+    service = SyncService(config.database_url, args.settle, args.limit, args.initial_hours)
+    threading.Thread(target=service.sample_forever, daemon=True).start()
+    # Cursors handed out before a sample has settled could skip late commits
+    print(f"⚠ Waiting {args.settle:g}s for sync_seq samples to settle...")
+    time.sleep(args.settle)
+    server = ThreadingHTTPServer((args.host, args.port),
+                                 make_handler(service, secret, args.allow_origin))
+    print(f"✓ Delta sync on http://{args.host}:{args.port}/sync/<farm_id> "
+          f"({args.settle:g}s settle, {args.limit} rows per table)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Shutting down gracefully...")
+        print(f"[STATS] {service.stats}")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
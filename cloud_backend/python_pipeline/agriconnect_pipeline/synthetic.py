@@ -0,0 +1,59 @@
+"""
+Synthetic Readings
+Deterministic sensor_readings rows for benchmarks, shaped like
+readings.READING_COLUMNS. Values follow a daily cycle with noise and
+occasional humid nights, so every analyzer has something to do.
+"""
+
+import math
+import random
+from datetime import datetime, timedelta, timezone
+
+
+def generate_readings(count, gateway_id="GW-CM-BUE-001", field_id=1, zone_id=0,
+                      start=None, interval=60, seed=42, first_id=1):
+    """Yield count reading rows for one zone, one every interval seconds"""
+    rng = random.Random(seed)
+    start = start or datetime(2025, 1, 1, tzinfo=timezone.utc)
+    moisture = 500.0
+    pump = False
+
+    for i in range(count):
+        reading_time = start + timedelta(seconds=i * interval)
+        hour = reading_time.hour + reading_time.minute / 60
+        day_phase = math.sin((hour - 9) / 24 * 2 * math.pi)
+
+        air_temperature = round(25 + 6 * day_phase + rng.gauss(0, 0.5), 2)
+        humid_night = reading_time.timetuple().tm_yday % 5 == 0 and day_phase < 0
+        air_humidity = round(min(100.0, (93 if humid_night else 70) - 10 * day_phase
+                                 + rng.gauss(0, 1.5)), 2)
+
+        # Soil dries during the day; the pump refills it below 380
+        moisture -= 0.05 + 0.1 * max(day_phase, 0)
+        if moisture < 380:
+            pump = True
+        if pump:
+            moisture += 2.0
+            if moisture > 560:
+                pump = False
+        soil_moisture = int(moisture + rng.gauss(0, 3))
+
+        yield (
+            first_id + i, gateway_id, field_id, zone_id, reading_time,
+            air_temperature,
+            air_humidity,
+            max(0, int(45000 * max(day_phase, 0) + rng.gauss(0, 500))),
+            round(max(0.0, 850 * max(day_phase, 0)), 2),
+            int(420 + rng.gauss(0, 10)),
+            soil_moisture,
+            round(air_temperature - 2 + rng.gauss(0, 0.3), 2),
+            round(6.5 + rng.gauss(0, 0.1), 2),
+            round(2.6 + rng.gauss(0, 0.1), 2),
+            int(180 + rng.gauss(0, 15)),
+            int(45 + rng.gauss(0, 5)),
+            int(230 + rng.gauss(0, 20)),
+            1,
+            max(0, 85 - i // 20000),
+            pump,
+            int(-65 + rng.gauss(0, 4)),
+        )
@@ -0,0 +1,249 @@
+"""
+Yield Models
+Per-crop ridge regression trained server-side from harvest records.
+Models are versioned on disk and only retrained when the training data
+changes; all zones are scored in one vectorized call per crop.
+
+Usage:
+    python -m agriconnect_pipeline.yield_models train
+    python -m agriconnect_pipeline.yield_models score --season-start 2025-03-01
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+import numpy as np
+
+from .config import load_config
+from .features import YIELD_FEATURES, crop_key
+
+# Ridge penalty on standardized features; keeps small crops stable
+RIDGE_ALPHA = 1.0
+
+# Below this many harvests per crop we only predict the crop mean
+MIN_SAMPLES = len(YIELD_FEATURES) + 2
+
+
+@dataclass
+class YieldModel:
+    crop: str
+    version: str
+    mean: np.ndarray        # feature means (also used to impute missing values)
+    scale: np.ndarray       # feature standard deviations
+    coef: np.ndarray        # weights on standardized features
+    intercept: float
+    n_samples: int
+    rmse: float
+    fingerprint: str
+
+    def predict(self, X):
+        """Predict yield (kg/ha) for a 2-D feature matrix"""
+        X = np.asarray(X, dtype=np.float64)
+        X = np.where(np.isnan(X), self.mean, X)
+        return np.maximum((X - self.mean) / self.scale @ self.coef + self.intercept, 0.0)
+
+
+def fingerprint(X, y):
+    """Stable hash of a training set, used to skip retraining unchanged data"""
+    digest = hashlib.sha1()
+    order = np.lexsort(np.column_stack([X, y]).T[::-1])
+    digest.update(np.ascontiguousarray(X[order]).tobytes())
+    digest.update(np.ascontiguousarray(y[order]).tobytes())
+    return digest.hexdigest()
+
+
+def fit(crop, X, y, alpha=RIDGE_ALPHA):
+    """Fit a ridge model with a single least-squares solve"""
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n, width = X.shape
+    data_fingerprint = fingerprint(X, y)
+
+    mean = np.nanmean(X, axis=0) if n else np.zeros(width)
+    mean = np.where(np.isnan(mean), 0.0, mean)
+    X = np.where(np.isnan(X), mean, X)
+    scale = X.std(axis=0) if n else np.ones(width)
+    scale = np.where(scale > 0, scale, 1.0)
+    intercept = float(y.mean()) if n else 0.0
+
+    if n >= MIN_SAMPLES:
+        Z = (X - mean) / scale
+        # Ridge as an augmented least-squares problem: [Z; sqrt(a)I] w = [y - b; 0]
+        A = np.vstack([Z, np.sqrt(alpha) * np.eye(width)])
+        b = np.concatenate([y - intercept, np.zeros(width)])
+        coef = np.linalg.lstsq(A, b, rcond=None)[0]
+    else:
+        coef = np.zeros(width)
+
+    model = YieldModel(
+        crop=crop,
+        version="",
+        mean=mean,
+        scale=scale,
+        coef=coef,
+        intercept=intercept,
+        n_samples=n,
+        rmse=0.0,
+        fingerprint=data_fingerprint,
+    )
+    if n:
+        model.rmse = float(np.sqrt(np.mean((model.predict(X) - y) ** 2)))
+    return model
+
+
+class ModelStore:
+    """Versioned on-disk model cache: {root}/{crop}/{version}.npz + latest.json"""
+
+    def __init__(self, root):
+        self.root = root
+        self._loaded = {}
+
+    def _crop_dir(self, crop):
+        return os.path.join(self.root, crop_key(crop).replace(os.sep, "_"))
+
+    def latest_manifest(self, crop):
+        path = os.path.join(self._crop_dir(crop), "latest.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, model):
+        """Persist a model under the next version number and mark it latest"""
+        model.crop = crop_key(model.crop)
+        crop_dir = self._crop_dir(model.crop)
+        os.makedirs(crop_dir, exist_ok=True)
+
+        previous = self.latest_manifest(model.crop)
+        number = previous["number"] + 1 if previous else 1
+        model.version = f"v{number}-{model.fingerprint[:8]}"
+
+        np.savez(
+            os.path.join(crop_dir, f"{model.version}.npz"),
+            mean=model.mean,
+            scale=model.scale,
+            coef=model.coef,
+            intercept=model.intercept,
+        )
+        manifest = {
+            "crop": model.crop,
+            "version": model.version,
+            "number": number,
+            "features": list(YIELD_FEATURES),
+            "n_samples": model.n_samples,
+            "rmse": model.rmse,
+            "fingerprint": model.fingerprint,
+            "trained_at": datetime.now(timezone.utc).isoformat(),
+        }
+        # Write-then-rename so readers never see a half-written manifest
+        fd, tmp_path = tempfile.mkstemp(dir=crop_dir, suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, os.path.join(crop_dir, "latest.json"))
+
+        self._loaded[model.crop] = model
+        return model
+
+    def load(self, crop):
+        """Load the latest model for a crop (cached in memory), or None"""
+        crop = crop_key(crop)
+        manifest = self.latest_manifest(crop)
+        if manifest is None:
+            return None
+        cached = self._loaded.get(crop)
+        if cached is not None and cached.version == manifest["version"]:
+            return cached
+
+        arrays = np.load(os.path.join(self._crop_dir(crop), f"{manifest['version']}.npz"))
+        model = YieldModel(
+            crop=crop,
+            version=manifest["version"],
+            mean=arrays["mean"],
+            scale=arrays["scale"],
+            coef=arrays["coef"],
+            intercept=float(arrays["intercept"]),
+            n_samples=manifest["n_samples"],
+            rmse=manifest["rmse"],
+            fingerprint=manifest["fingerprint"],
+        )
+        self._loaded[crop] = model
+        return model
+
+
+def train_all(training_sets, store):
+    """Train every crop whose data changed since its latest cached version.
+
+    Returns {crop: (model, retrained)}.
+    """
+    results = {}
+    for crop, (X, y) in training_sets.items():
+        manifest = store.latest_manifest(crop)
+        if manifest and manifest["fingerprint"] == fingerprint(X, y):
+            results[crop] = (store.load(crop), False)
+            continue
+        results[crop] = (store.save(fit(crop, X, y)), True)
+    return results
+
+
+def score_zones(zone_features, store):
+    """Score all zones in one pass; returns a list of prediction rows.
+
+    zone_features is {crop: (keys, X)} as produced by
+    features.load_zone_features. Crops without a trained model are skipped.
+    """
+    predicted_at = datetime.now(timezone.utc)
+    rows = []
+    for crop, (keys, X) in zone_features.items():
+        model = store.load(crop)
+        if model is None or not keys:
+            continue
+        predictions = model.predict(X)
+        for (farm_id, field_id, zone_id), value in zip(keys, predictions):
+            rows.append((farm_id, field_id, zone_id, crop, model.version,
+                         round(float(value), 2), predicted_at))
+    return rows
+
+
+PREDICTION_COLUMNS = (
+    "farm_id", "field_id", "zone_id", "crop_type",
+    "model_version", "predicted_yield_kg_ha", "predicted_at",
+)
+
+
+def main():
+    """Command-line entry point for training and batch scoring"""
+    from . import db
+    from .features import load_training_sets, load_zone_features
+
+    parser = argparse.ArgumentParser(description="AgriConnect yield model pipeline")
+    parser.add_argument("command", choices=["train", "score"])
+    parser.add_argument("--season-start", help="ISO date the current season started (score)")
+    args = parser.parse_args()
+
+    config = load_config()
+    store = ModelStore(os.path.join(config.model_dir, "yield"))
+
+    with db.connect(config.database_url) as conn:
+        if args.command == "train":
+            training_sets = load_training_sets(conn, config.chunk_size)
+            for crop, (model, retrained) in train_all(training_sets, store).items():
+                status = "trained" if retrained else "cached"
+                print(f"✓ {crop}: {model.version} ({status}, n={model.n_samples}, "
+                      f"rmse={model.rmse:.1f} kg/ha)")
+        else:
+            if not args.season_start:
+                parser.error("score requires --season-start")
+            zones = load_zone_features(conn, args.season_start, config.chunk_size)
+            rows = score_zones(zones, store)
+            db.upsert_rows(conn, "yield_predictions", PREDICTION_COLUMNS,
+                           ("farm_id", "field_id", "zone_id"), rows)
+            print(f"✓ Scored {len(rows)} zone(s)")
+
+
+if __name__ == "__main__":
+    main()
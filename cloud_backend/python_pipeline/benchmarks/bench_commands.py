@@ -0,0 +1,151 @@
+"""
+Command Broker Benchmark
+Simulates dashboard pump clicks against a fleet of gateways over a lossy
+link: commands and acks are dropped at random, some gateways go offline
+for a while, and some users toggle a pump back before the first command
+is acknowledged. Drives the command broker on a simulated clock and
+reports click-to-ack latency (p50/p99), retries, superseded and failed
+commands, and whether every pump ends in the state last clicked.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_commands --gateways 500 --minutes 30
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import random
+import time
+
+import numpy as np
+
+from agriconnect_pipeline.commands import Command, CommandBroker
+
+STEP = 0.05                  # broker loop period (client.loop timeout)
+POLL_INTERVAL = 0.25         # outbox poll period
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--gateways", type=int, default=500)
+    parser.add_argument("--minutes", type=int, default=30)
+    parser.add_argument("--clicks-per-second", type=float, default=5.0)
+    parser.add_argument("--loss", type=float, default=0.05,
+                        help="Probability a command or an ack is lost")
+    parser.add_argument("--toggle-back", type=float, default=0.1,
+                        help="Share of clicks undone within a few seconds")
+    parser.add_argument("--offline", type=float, default=0.02,
+                        help="Share of gateways offline for 2 minutes")
+    parser.add_argument("--window", type=int, default=4)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    start = 1_750_000_000.0
+    end = start + args.minutes * 60
+    gateways = [f"GW-{g:05d}" for g in range(args.gateways)]
+    outages = {gw: (at, at + 120) for gw in rng.sample(gateways, int(len(gateways) * args.offline))
+               for at in [start + rng.uniform(0, args.minutes * 60 - 120)]}
+
+    def online(gateway_id, at):
+        window = outages.get(gateway_id)
+        return window is None or not window[0] <= at < window[1]
+
+    events = []              # (time, seq, kind, data)
+    seq = itertools.count()
+    link_free = {}           # gateway_id -> arrival time of its last message (MQTT keeps order)
+    pump_state = {}          # (gateway, field, zone) -> state the gateway last executed
+    last_click = {}          # (gateway, field, zone) -> (state, Command) the user last clicked
+
+    def delay():
+        return rng.lognormvariate(-1.2, 0.5)   # ~0.3 s median one-way
+
+    def publish(gateway_id, payload):
+        if rng.random() < args.loss or not online(gateway_id, now):
+            return
+        arrival = max(link_free.get(gateway_id, 0.0), now + delay())
+        link_free[gateway_id] = arrival
+        heapq.heappush(events, (arrival, next(seq), "deliver", (gateway_id, payload)))
+
+    broker = CommandBroker(publish, window=args.window, ack_timeout=2.0, max_attempts=6)
+
+    # Dashboard clicks, some toggled back shortly after
+    t = start
+    clicks = 0
+    while True:
+        t += rng.expovariate(args.clicks_per_second)
+        if t >= end - 120:
+            break
+        target = (rng.choice(gateways), rng.randint(1, 2), rng.randint(0, 3))
+        turn_on = rng.random() < 0.5
+        heapq.heappush(events, (t, next(seq), "click", (target, turn_on)))
+        clicks += 1
+        if rng.random() < args.toggle_back:
+            heapq.heappush(events, (t + rng.uniform(0.1, 3.0), next(seq), "click",
+                                    (target, not turn_on)))
+            clicks += 1
+
+    outbox = []              # clicks inserted but not yet polled
+    broker_time = 0.0
+    next_poll = start
+    now = start
+    while now < end:
+        now += STEP
+        while events and events[0][0] <= now:
+            at, _, kind, data = heapq.heappop(events)
+            if kind == "click":
+                target, turn_on = data
+                command = Command(f"cmd-{next(seq)}", target[0], target[1], target[2],
+                                  "pump_control", {"activate": turn_on}, at)
+                last_click[target] = (turn_on, command)
+                outbox.append(command)
+            elif kind == "deliver":
+                gateway_id, payload = data
+                message = json.loads(payload)
+                pump_state[(gateway_id, message["targetFieldId"], message["targetZoneId"])] = \
+                    message["parameters"]["activate"]
+                if rng.random() >= args.loss and online(gateway_id, at):
+                    ack = json.dumps({"commandId": message["commandId"], "status": "ok"})
+                    heapq.heappush(events, (at + delay(), next(seq), "ack", (gateway_id, ack)))
+            else:
+                gateway_id, ack = data
+                began = time.perf_counter()
+                broker.acknowledge(gateway_id, json.loads(ack)["commandId"], at)
+                broker_time += time.perf_counter() - began
+
+        began = time.perf_counter()
+        if now >= next_poll:
+            next_poll += POLL_INTERVAL
+            for command in outbox:
+                broker.enqueue(command, now)
+            outbox = []
+        broker.expire(now)
+        broker.pump(now)
+        broker.drain()
+        broker_time += time.perf_counter() - began
+
+    stats = broker.stats
+    latencies = np.array(broker.latencies)
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    # A failed last command may legitimately leave the pump in its old state
+    delivered = [(target, state) for target, (state, command) in last_click.items()
+                 if command.status == "acked"]
+    mismatched = sum(1 for target, state in delivered if pump_state.get(target) != state)
+    print(f"Clicks             : {clicks:,} on {len(gateways):,} gateways over "
+          f"{args.minutes} simulated minutes ({args.loss:.0%} loss each way, "
+          f"{len(outages)} gateway outages)")
+    print(f"Click-to-ack       : p50 {p50:.2f}s  p90 {p90:.2f}s  p99 {p99:.2f}s "
+          f"(poll {POLL_INTERVAL}s, ack timeout 2s doubling)")
+    print(f"Outcomes           : {stats['acked']:,} acked, {stats['superseded']:,} superseded, "
+          f"{stats['failed']:,} failed, {len(broker.commands):,} still open")
+    print(f"Sends              : {stats['sent']:,} ({stats['retries']:,} retries, "
+          f"{stats['sent'] / max(1, stats['queued']):.2f} per command), "
+          f"{stats['unmatched_acks']:,} unmatched acks")
+    print(f"Final pump state   : {len(delivered) - mismatched:,}/{len(delivered):,} "
+          f"acked targets match the last click")
+    print(f"Broker CPU         : {broker_time * 1e6 / max(1, stats['queued']):,.0f} µs "
+          f"per command")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Compaction Benchmark
+Generates a sensor_readings dataset (100M rows by default) in a scratch
+schema, copies it into the compact layout from migration 0012 with
+agriconnect_pipeline.compact, and reports bytes per row, index sizes,
+insert rate and the latency of the dashboard's queries before and after.
+Needs DATABASE_URL; everything it creates is in the compact_bench schema,
+which is dropped first.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_compact --rows 100000000 --zones 2000 --workers 8
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+from agriconnect_pipeline import db
+from agriconnect_pipeline.codegen import DEFAULT_MIGRATIONS
+from agriconnect_pipeline.compact import (
+    compact_columns, compact_select, location_query, migrate, run_ranges, table_sizes,
+)
+from agriconnect_pipeline.config import load_config
+from agriconnect_pipeline.metrics import Histogram
+
+SCHEMA = "compact_bench"
+MIGRATION = os.path.join(DEFAULT_MIGRATIONS, "20250118000012_create_sensor_readings_compact.sql")
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+SETUP = f"""
+    DROP SCHEMA IF EXISTS {SCHEMA} CASCADE;
+    CREATE SCHEMA {SCHEMA};
+    CREATE TABLE {SCHEMA}.sensor_readings (LIKE public.sensor_readings INCLUDING ALL);
+    CREATE TABLE {SCHEMA}.field_nodes (LIKE public.field_nodes INCLUDING ALL);
+"""
+
+# The dashboard's reads; the latest-N query gets a one-day bound, which
+# it needs once there is no btree on reading_time alone
+QUERIES = (
+    ("latest 20 (dashboard.js)",
+     "SELECT * FROM {table} WHERE reading_time > %(now)s - INTERVAL '1 day' "
+     "ORDER BY reading_time DESC LIMIT 20"),
+    ("chart 24 h (charts.js)",
+     "SELECT * FROM {table} WHERE reading_time >= %(now)s - INTERVAL '1 day' "
+     "ORDER BY reading_time LIMIT 500"),
+    ("node 7 days (map.js)",
+     "SELECT * FROM {table} WHERE gateway_id = %(gateway)s AND field_id = 1 AND zone_id = 2 "
+     "AND reading_time >= %(now)s - INTERVAL '7 days' AND reading_time <= %(now)s "
+     "ORDER BY reading_time"),
+    ("gateway hourly, 7 days",
+     "SELECT date_trunc('hour', reading_time), avg(air_temperature), avg(soil_moisture) "
+     "FROM {table} WHERE gateway_id = %(gateway)s "
+     "AND reading_time >= %(now)s - INTERVAL '7 days' GROUP BY 1"),
+    ("fleet day scan",
+     "SELECT count(*), avg(air_temperature) FROM {table} "
+     "WHERE reading_time >= %(now)s - INTERVAL '2 days' "
+     "AND reading_time < %(now)s - INTERVAL '1 day'"),
+)
+
+
+def generated_rows(zones):
+    """SELECT of sensor_readings rows for ids %s..%s, one reading per zone per minute"""
+    return f"""
+        SELECT i AS id,
+               'GW-BENCH-' || lpad((i % {zones} / 16)::TEXT, 4, '0') AS gateway_id,
+               (i % {zones} % 16 / 4 + 1)::INTEGER AS field_id,
+               (i % 4)::INTEGER AS zone_id,
+               TIMESTAMPTZ '{START.isoformat()}' + (i / {zones}) * INTERVAL '1 minute' AS reading_time,
+               (4.05 + (i % {zones}) * 0.0001)::DECIMAL(10, 8) AS latitude,
+               (9.76 + (i % {zones}) * 0.0001)::DECIMAL(11, 8) AS longitude,
+               round((24 + 6 * sin((i / {zones}) * pi() / 720) + random())::NUMERIC, 2)
+                   AS air_temperature,
+               round((65 + 20 * random())::NUMERIC, 2) AS air_humidity,
+               (random() * 60000)::INTEGER AS light_intensity,
+               round((random() * 1800)::NUMERIC, 2) AS par_value,
+               (400 + random() * 200)::INTEGER AS co2_ppm,
+               (300 + random() * 400)::INTEGER AS soil_moisture,
+               round((22 + 3 * random())::NUMERIC, 2) AS soil_temperature,
+               round((5.5 + 1.5 * random())::NUMERIC, 2) AS ph_value,
+               round((3 * random())::NUMERIC, 2) AS ec_value,
+               (100 + random() * 100)::INTEGER AS nitrogen_ppm,
+               (30 + random() * 40)::INTEGER AS phosphorus_ppm,
+               (150 + random() * 100)::INTEGER AS potassium_ppm,
+               (random() * 100)::INTEGER AS water_level,
+               (60 + random() * 40)::INTEGER AS battery_level,
+               i % 7 = 0 AS pump_status,
+               (-90 + random() * 40)::INTEGER AS rssi,
+               TRUE AS data_valid,
+               i AS reading_fingerprint,
+               i AS sync_seq
+        FROM generate_series(%s::BIGINT, %s::BIGINT - 1) AS i
+    """
+
+
+GENERATED_COLUMNS = ("id", "gateway_id", "field_id", "zone_id", "reading_time", "latitude",
+                     "longitude", "air_temperature", "air_humidity", "light_intensity",
+                     "par_value", "co2_ppm", "soil_moisture", "soil_temperature", "ph_value",
+                     "ec_value", "nitrogen_ppm", "phosphorus_ppm", "potassium_ppm",
+                     "water_level", "battery_level", "pump_status", "rssi", "data_valid",
+                     "reading_fingerprint", "sync_seq")
+
+
+def generate(dsn, zones, rows, workers, chunk_rows):
+    """Fill compact_bench.sensor_readings in parallel id ranges; returns seconds"""
+    query = (f"INSERT INTO {SCHEMA}.sensor_readings ({', '.join(GENERATED_COLUMNS)}) "
+             + generated_rows(zones))
+    ranges = [(start, min(start + chunk_rows, rows + 1))
+              for start in range(1, rows + 1, chunk_rows)]
+    return run_ranges(dsn, query, ranges, workers)[1]
+
+
+def insert_rate(conn, zones, first_id, rows):
+    """rows/s inserting rows new readings into each layout, indexes included"""
+    generated = f"({generated_rows(zones)}) AS g"
+    targets = {
+        "before": (f"INSERT INTO {SCHEMA}.sensor_readings ({', '.join(GENERATED_COLUMNS)}) "
+                   f"SELECT * FROM {generated}"),
+        "after": (f"INSERT INTO {SCHEMA}.sensor_readings_compact "
+                  f"({', '.join(c for c, _ in compact_columns())}) {compact_select(generated)}"),
+    }
+    rates = {}
+    for label, query in targets.items():
+        started = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute(query, (first_id, first_id + rows))
+        conn.commit()
+        rates[label] = rows / (time.perf_counter() - started)
+    return rates
+
+
+def query_latency(conn, table, params, repeat):
+    """{query label: Histogram of µs}"""
+    results = {}
+    with conn.cursor() as cur:
+        for label, query in QUERIES:
+            histogram = results[label] = Histogram()
+            sql = query.format(table=table)
+            cur.execute(sql, params)        # warm the cache
+            cur.fetchall()
+            for _ in range(repeat):
+                started = time.perf_counter_ns()
+                cur.execute(sql, params)
+                cur.fetchall()
+                histogram.record((time.perf_counter_ns() - started) // 1000)
+    conn.rollback()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100_000_000)
+    parser.add_argument("--zones", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-rows", type=int, default=100000)
+    parser.add_argument("--insert-rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per dashboard query")
+    args = parser.parse_args()
+
+    dsn = load_config().database_url
+    with db.connect(dsn) as conn:
+        conn.execute(SETUP)
+        conn.execute(f"SET search_path = {SCHEMA}, public")
+        with open(MIGRATION, "r", encoding="utf-8") as f:
+            conn.execute(f.read())
+        conn.commit()
+
+    print(f"Generating {args.rows:,} readings over {args.zones:,} zones...")
+    seconds = generate(dsn, args.zones, args.rows, args.workers, args.chunk_rows)
+    print(f"✓ Generated in {seconds:.0f}s")
+
+    with db.connect(dsn) as conn:
+        conn.execute(location_query(f"{SCHEMA}.sensor_readings", f"{SCHEMA}.field_nodes"))
+        conn.commit()
+    copied, migrate_seconds = migrate(dsn, f"{SCHEMA}.sensor_readings",
+                                      f"{SCHEMA}.sensor_readings_compact",
+                                      args.workers, args.chunk_rows)
+    print(f"✓ Migrated {copied:,} rows in {migrate_seconds:.0f}s "
+          f"({copied / migrate_seconds:,.0f} rows/s, {args.workers} workers)\n")
+
+    with db.connect(dsn) as conn:
+        conn.autocommit = True
+        for table in ("sensor_readings", "sensor_readings_compact", "field_nodes"):
+            conn.execute(f"VACUUM ANALYZE {SCHEMA}.{table}")
+        conn.autocommit = False
+        before = table_sizes(conn, f"{SCHEMA}.sensor_readings")
+        after = table_sizes(conn, f"{SCHEMA}.sensor_readings_compact")
+
+        now = START + timedelta(minutes=args.rows // args.zones)
+        params = {"now": now, "gateway": "GW-BENCH-0000"}
+        latency_before = query_latency(conn, f"{SCHEMA}.sensor_readings", params, args.repeat)
+        latency_after = query_latency(conn, f"{SCHEMA}.sensor_readings_compact_v", params,
+                                      args.repeat)
+        rates = insert_rate(conn, args.zones, args.rows + 1, args.insert_rows)
+
+    print(f"{'':<26}{'before':>14}{'after':>14}")
+    print(f"{'Heap bytes/row':<26}{before['bytes_per_row']:>14.1f}{after['bytes_per_row']:>14.1f}")
+    print(f"{'Heap MiB':<26}{before['table_bytes'] / 2**20:>14,.0f}"
+          f"{after['table_bytes'] / 2**20:>14,.0f}")
+    print(f"{'Index MiB':<26}{before['index_bytes'] / 2**20:>14,.0f}"
+          f"{after['index_bytes'] / 2**20:>14,.0f}")
+    print(f"{'Insert rows/s':<26}{rates['before']:>14,.0f}{rates['after']:>14,.0f}")
+    for label, _ in QUERIES:
+        print(f"{label + ' p50 ms':<26}{latency_before[label].quantile(0.5) / 1e3:>14.2f}"
+              f"{latency_after[label].quantile(0.5) / 1e3:>14.2f}")
+
+    print()
+    for label, sizes in (("before", before), ("after", after)):
+        for name, size in sorted(sizes["indexes"].items()):
+            print(f"Index ({label:<6})     : {name:<36}{size / 2**20:>10,.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
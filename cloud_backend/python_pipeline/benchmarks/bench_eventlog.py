@@ -0,0 +1,176 @@
+"""
+Event Log Benchmark
+Compares the logging cost per message of the Node.js subscriber's style
+(10-20 console lines per reading, written line by line) with the sampled
+event log ingest workers use, on the insights and alerts of synthetic
+readings. Also injects a burst of bad payloads and checks that every
+error reached the log with its context.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_eventlog --zones 500 --messages 50000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from agriconnect_pipeline.backfill import LOCAL_TZ
+from agriconnect_pipeline.eventlog import EventLog
+from agriconnect_pipeline.intelligence import AlertManager, Analyzers
+from agriconnect_pipeline.readings import quantize
+from benchmarks.bench_ingest import make_messages
+
+
+def analyzed(messages):
+    """(topic, data, insights, alerts) per message, computed once up front"""
+    analyzers = Analyzers()
+    managers = {}
+    results = []
+    for n, (topic, payload) in enumerate(messages):
+        data = json.loads(payload)
+        _, _, gateway_id, field_id, zone_id = topic.split("/")
+        context = {"farmId": "FARM-CM-001", "gatewayId": gateway_id,
+                   "fieldId": int(field_id), "zoneId": int(zone_id)}
+        now = datetime.fromtimestamp(1_750_000_000 + n * 6, timezone.utc)
+        insights = analyzers.analyze(quantize(data["sensors"]), data["system"], context,
+                                     now.astimezone(LOCAL_TZ))
+        alerts = managers.setdefault(topic, AlertManager()).process_insights(insights, context,
+                                                                             now)
+        results.append((topic, data, insights, alerts))
+    return results
+
+
+def console_style(out, topic, data, insights, alerts):
+    """The lines index.js prints for one reading"""
+    out.write(f"\n[{datetime.now(timezone.utc).isoformat()}] Message received on: {topic}\n")
+    out.write(f" Processing sensor data from {data['gatewayId']}...\n")
+    out.write("✓ Data stored in database\n")
+    out.write("\n Running intelligent analysis...\n")
+    if insights["diseases"]:
+        out.write(f"  ⚠ {len(insights['diseases'])} disease risk(s) detected\n")
+        for risk in insights["diseases"]:
+            out.write(f"    - {risk['disease']}: {risk['severity']} "
+                      f"({risk['probability']}% probability)\n")
+    else:
+        out.write("  ✓ No disease risks detected\n")
+    if insights["irrigation"]:
+        out.write(f"  💧 Irrigation: {insights['irrigation']['recommendation']}\n")
+        out.write(f"    Action: {insights['irrigation']['action']}\n")
+    if insights["anomalies"]:
+        out.write(f"  🔍 {len(insights['anomalies'])} anomaly/anomalies detected\n")
+        for anomaly in insights["anomalies"]:
+            out.write(f"    - {anomaly['sensor']}: {anomaly['message']}\n")
+    else:
+        out.write("  ✓ No anomalies detected\n")
+    if insights["nutrients"]:
+        out.write("   Nutrient issues detected:\n")
+        for issue in insights["nutrients"]:
+            out.write(f"    - {issue['nutrient']}: {issue['status']} ({issue['current']} ppm)\n")
+    else:
+        out.write("  ✓ Nutrient levels optimal\n")
+    if alerts:
+        out.write(f"[ALERT] {len(alerts)} alert(s) generated and stored\n")
+        for alert in alerts:
+            out.write(f"[{alert['severity'].upper()}] {alert['message']}\n")
+    else:
+        out.write("[INFO] No alerts generated - conditions normal\n")
+    out.write("=" * 60 + "\n")
+
+
+def event_style(log, topic, data, insights, alerts):
+    """The events ShardWorker.process() logs for one reading"""
+    log.event("reading", "received", {"topic": topic})
+    if (insights["diseases"] or insights["anomalies"] or insights["nutrients"]
+            or insights["irrigation"]):
+        log.event("insight", "analysis", {"topic": topic, "insights": insights})
+    for alert in alerts:
+        log.event("alert", alert["message"],
+                  {"topic": topic, "alert_type": alert["alert_type"],
+                   "severity": alert["severity"]})
+
+
+def count_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def run_console(results, path):
+    # Line buffered, as stdout is on a terminal or under journald
+    with open(path, "w", encoding="utf-8", buffering=1) as out:
+        started = time.perf_counter()
+        for result in results:
+            console_style(out, *result)
+        elapsed = time.perf_counter() - started
+    return elapsed, elapsed, count_lines(path)
+
+
+def run_events(results, path, rates=None):
+    log = EventLog(path=path, rates=rates, source="bench").start()
+    started = time.perf_counter()
+    for result in results:
+        event_style(log, *result)
+    caller = time.perf_counter() - started
+    log.close()
+    total = time.perf_counter() - started
+    return caller, total, count_lines(path)
+
+
+def run_burst(results, path, errors):
+    """Bad payloads in the middle of the stream: every error and its context must be kept"""
+    log = EventLog(path=path, source="bench").start()
+    middle = len(results) // 2
+    for result in results[:middle]:
+        event_style(log, *result)
+    for n in range(errors):
+        log.error("reading", "bad payload", {"topic": results[n][0], "error": "Expecting value"})
+    for result in results[middle:]:
+        event_style(log, *result)
+    log.close()
+
+    written = context = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            written += record["level"] == "error"
+            context += bool(record.get("context"))
+    return written, context, log.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--errors", type=int, default=500, help="Size of the error burst")
+    args = parser.parse_args()
+
+    results = analyzed(make_messages(args.zones, args.messages))
+    n = len(results)
+    print(f"Messages           : {n:,} over {args.zones} zones "
+          f"({sum(len(r[3]) for r in results):,} alerts)\n")
+    print(f"{'logging':<28}{'caller µs/msg':>15}{'total µs/msg':>14}{'lines':>10}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        runs = [
+            ("console (index.js style)", lambda path: run_console(results, path)),
+            ("event log, unsampled", lambda path: run_events(
+                results, path, {category: 1.0 for category in ("reading", "duplicate",
+                                                               "insight")})),
+            ("event log, default rates", lambda path: run_events(results, path)),
+        ]
+        for label, run in runs:
+            caller, total, lines = run(os.path.join(directory, "run.log"))
+            print(f"{label:<28}{caller * 1e6 / n:>15.2f}{total * 1e6 / n:>14.2f}{lines:>10,}")
+            os.remove(os.path.join(directory, "run.log"))
+
+        written, context, stats = run_burst(results, os.path.join(directory, "burst.log"),
+                                            args.errors)
+    print()
+    print(f"Error burst        : {written:,}/{args.errors:,} errors written, "
+          f"{context} context lines, {stats['dropped']} dropped")
+
+
+if __name__ == "__main__":
+    main()
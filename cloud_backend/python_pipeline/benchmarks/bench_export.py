@@ -0,0 +1,106 @@
+"""
+Export Benchmark
+Streams a year of one farm's readings (one per zone per minute) through
+agriconnect_pipeline.export in each format and reports rows/s and output
+size, then compares peak memory of the streaming export with building
+the whole file in memory, as the dashboard does, for short and long
+ranges. Rows are synthetic and prebuilt, so the timing is the encoding
+and compression; no database is needed.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_export --zones 16 --days 365
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+from agriconnect_pipeline.export import EXPORT_COLUMNS, export
+from agriconnect_pipeline.reading_types import COPY_COLUMNS, SensorReading
+from benchmarks.bench_ingest import make_messages
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def day_rows(zones):
+    """One day of EXPORT_COLUMNS rows for a farm, in reading_time order"""
+    start = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for n, (topic, payload) in enumerate(make_messages(zones, zones * MINUTES_PER_DAY)):
+        _, _, gateway_id, field_id, zone_id = topic.split("/")
+        reading = SensorReading.from_payload(gateway_id, int(field_id), int(zone_id),
+                                             start + timedelta(minutes=n // zones),
+                                             json.loads(payload))
+        values = {"id": n, **dict(zip(COPY_COLUMNS, reading.copy_row()))}
+        rows.append(tuple(values.get(column) for column in EXPORT_COLUMNS))
+    return rows
+
+
+def chunks(rows, days, chunk_size):
+    """The day's rows repeated for days, in chunks as a server-side cursor returns them"""
+    for _ in range(days):
+        for i in range(0, len(rows), chunk_size):
+            yield rows[i:i + chunk_size]
+
+
+def stream(rows, days, chunk_size, fmt, compress):
+    """(seconds, bytes) to encode days of rows with the output discarded"""
+    started = time.perf_counter()
+    size = sum(map(len, export(chunks(rows, days, chunk_size), fmt, compress)))
+    return time.perf_counter() - started, size
+
+
+def in_memory(rows, days, chunk_size):
+    """All rows fetched into a list, then one CSV string (the dashboard's approach)"""
+    data = [row for chunk in chunks(rows, days, chunk_size) for row in chunk]
+    csv = ",".join(EXPORT_COLUMNS) + "\n"
+    csv += "".join(",".join("" if v is None else str(v) for v in row) + "\n" for row in data)
+    return len(csv)
+
+
+def peak_memory(fn, *args):
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=16)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "csv.gz", "ndjson", "ndjson.gz",
+                                                         "parquet"])
+    parser.add_argument("--memory-days", type=int, nargs=2, default=[7, 90],
+                        help="Short and long range for the memory comparison")
+    args = parser.parse_args()
+
+    rows = day_rows(args.zones)
+    total = len(rows) * args.days
+    print(f"Export             : {args.zones} zones x {args.days} days = {total:,} rows, "
+          f"{len(EXPORT_COLUMNS)} columns, chunks of {args.chunk_size:,}\n")
+    print(f"{'format':<12}{'rows/s':>12}{'seconds':>10}{'MB':>10}{'B/row':>8}")
+    for name in args.formats:
+        fmt, _, suffix = name.partition(".")
+        try:
+            seconds, size = stream(rows, args.days, args.chunk_size, fmt, suffix == "gz")
+        except RuntimeError as error:
+            print(f"{name:<12}  skipped: {error}")
+            continue
+        print(f"{name:<12}{total / seconds:>12,.0f}{seconds:>10.1f}{size / 1e6:>10.1f}"
+              f"{size / total:>8.1f}")
+
+    print()
+    for days in args.memory_days:
+        streamed = peak_memory(stream, rows, days, args.chunk_size, "csv", True)
+        loaded = peak_memory(in_memory, rows, days, args.chunk_size)
+        print(f"Peak memory {days:>3} d  : streaming {streamed / 1e6:.1f} MB, "
+              f"in memory {loaded / 1e6:.1f} MB ({len(rows) * days:,} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Fan-out Benchmark
+Connects thousands of WebSocket subscribers (in separate client
+processes) to one fan-out hub on this host, publishes synthetic readings
+for many zones each tick, and reports the server's flush time per tick,
+the frame latency and bytes subscribers see, and how slow subscribers
+are handled. Also compares the traffic with the current per-row path,
+where every dashboard receives every sensor_readings row.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_fanout --subscribers 10000 --farms 20 --zones 2000
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import multiprocessing
+import os
+import re
+import socket
+import struct
+import time
+from datetime import datetime, timezone
+
+from agriconnect_pipeline.fanout import FanoutHub, handle_dashboard, live_fields
+from agriconnect_pipeline.metrics import Histogram
+from agriconnect_pipeline.reading_types import COPY_COLUMNS, SensorReading
+from agriconnect_pipeline.readings import quantize
+from benchmarks.bench_ingest import make_messages
+
+TS = re.compile(rb'"ts":(\d+)')
+
+
+# ==========================================
+# CLIENTS
+# ==========================================
+
+async def connect(port, farm_id, slow):
+    """Open one dashboard connection and complete the WebSocket handshake"""
+    sock = socket.socket()
+    if slow:
+        # Small window, so the server's buffer for it fills as on a bad link
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    sock.setblocking(False)
+    await asyncio.get_running_loop().sock_connect(sock, ("127.0.0.1", port))
+    reader, writer = await asyncio.open_connection(sock=sock, limit=4096 if slow else 1 << 16)
+    key = base64.b64encode(os.urandom(16)).decode()
+    writer.write((f"GET /farms/{farm_id} HTTP/1.1\r\nHost: bench\r\nUpgrade: websocket\r\n"
+                  f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n"
+                  "Sec-WebSocket-Version: 13\r\n\r\n").encode())
+    await reader.readuntil(b"\r\n\r\n")
+    return reader, writer
+
+
+async def read_frames(reader, slow, stats, latency, done):
+    """Read until the server closes; records each frame's age from its "ts" """
+    try:
+        while True:
+            if slow:
+                # A dashboard on a bad link: far less than a tick's worth per tick
+                await asyncio.sleep(1.0)
+                if done.is_set():
+                    break
+                data = await reader.read(512)
+                if not data:
+                    break
+                stats["bytes"] += len(data)
+                continue
+            head = await reader.readexactly(2)
+            length = head[1] & 0x7F
+            if length == 126:
+                length = struct.unpack("!H", await reader.readexactly(2))[0]
+            elif length == 127:
+                length = struct.unpack("!Q", await reader.readexactly(8))[0]
+            payload = await reader.readexactly(length)
+            stats["frames"] += 1
+            stats["bytes"] += 2 + length
+            if payload[6:7] == b"s":
+                stats["snapshots"] += 1
+            match = TS.search(payload, 0, 64)
+            if match:
+                latency.record(int(time.time() * 1e6) - int(match.group(1)) * 1000)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+
+
+async def run_clients(port, farms, first, count, slow_every, results, done):
+    stats = {"frames": 0, "bytes": 0, "snapshots": 0, "connected": 0}
+    latency = Histogram()
+    gate = asyncio.Semaphore(256)     # connects in flight, to stay within the accept backlog
+
+    async def one(i):
+        slow = bool(slow_every) and i % slow_every == 0
+        async with gate:
+            reader, writer = await connect(port, f"FARM-{i % farms:03d}", slow)
+        stats["connected"] += 1
+        try:
+            await read_frames(reader, slow, stats, latency, done)
+        finally:
+            writer.close()
+
+    await asyncio.gather(*(one(i) for i in range(first, first + count)),
+                         return_exceptions=True)
+    results.put((stats, latency.snapshot()))
+
+
+def _client_process(port, farms, first, count, slow_every, results, done):
+    asyncio.run(run_clients(port, farms, first, count, slow_every, results, done))
+
+
+# ==========================================
+# SERVER
+# ==========================================
+
+def prepared_updates(zones, farms, readings):
+    """(farm_id, zone key, live fields) per reading, in arrival order"""
+    updates = []
+    for n, (topic, payload) in enumerate(make_messages(zones, readings)):
+        _, _, gateway_id, field_id, zone_id = topic.split("/")
+        data = json.loads(payload)
+        now = datetime.fromtimestamp(1_750_000_000 + n, timezone.utc)
+        zone = n % zones
+        updates.append((f"FARM-{zone % farms:03d}", f"{gateway_id}/{field_id}/{zone_id}",
+                        live_fields(quantize(data["sensors"]), data["system"], now)))
+    return updates
+
+
+def row_bytes(zones):
+    """Size of one sensor_readings row as JSON, as Realtime sends it"""
+    topic, payload = make_messages(zones, 1)[0]
+    _, _, gateway_id, field_id, zone_id = topic.split("/")
+    reading = SensorReading.from_payload(gateway_id, int(field_id), int(zone_id),
+                                         datetime.now(timezone.utc), json.loads(payload))
+    return len(json.dumps(dict(zip(COPY_COLUMNS, reading.copy_row())), default=str))
+
+
+async def serve(args, updates):
+    hub = FanoutHub(tick=args.tick, high_water=args.high_water)
+    server = await asyncio.start_server(lambda r, w: handle_dashboard(hub, r, w),
+                                        "127.0.0.1", 0, backlog=4096)
+    port = server.sockets[0].getsockname()[1]
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    done = context.Event()
+    per_process = -(-args.subscribers // args.client_processes)
+    processes = []
+    for p in range(args.client_processes):
+        first = p * per_process
+        count = min(per_process, args.subscribers - first)
+        process = context.Process(target=_client_process,
+                                  args=(port, args.farms, first, count, args.slow_every, results,
+                                        done),
+                                  daemon=True)
+        process.start()
+        processes.append(process)
+
+    started = time.perf_counter()
+    while hub.stats["subscribers"] < args.subscribers:
+        if time.perf_counter() - started > 300:
+            raise RuntimeError(f"only {hub.stats['subscribers']} subscribers connected")
+        await asyncio.sleep(0.1)
+    connect_time = time.perf_counter() - started
+    connected_stats = dict(hub.stats)
+
+    # Publish a tick's worth of readings, flush, and keep the tick schedule
+    loop = asyncio.get_running_loop()
+    per_tick = int(args.rate * args.tick)
+    flush_times = Histogram()
+    next_tick = loop.time()
+    ticks = int(args.duration / args.tick)
+    for tick in range(ticks):
+        for farm_id, zone, fields in updates[tick * per_tick:(tick + 1) * per_tick]:
+            hub.publish(farm_id, {zone: fields})
+        t = time.perf_counter_ns()
+        hub.flush()
+        flush_times.record((time.perf_counter_ns() - t) // 1000)
+        next_tick += args.tick
+        await asyncio.sleep(max(0.0, next_tick - loop.time()))
+    # Give clients one more tick to read what was written, then hang up
+    await asyncio.sleep(args.tick)
+
+    server.close()
+    for channel in hub.channels.values():
+        for sub in list(channel.subscribers):
+            sub.transport.abort()     # slow subscribers would hold a close() open
+    await server.wait_closed()
+    done.set()
+
+    totals = {"frames": 0, "bytes": 0, "snapshots": 0, "connected": 0}
+    latency = Histogram()
+    for _ in processes:
+        stats, snapshot = await asyncio.to_thread(results.get)
+        for name in totals:
+            totals[name] += stats[name]
+        latency.merge(snapshot)
+    for process in processes:
+        process.join()
+    return connect_time, connected_stats, hub.stats, flush_times, totals, latency, ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--farms", type=int, default=20)
+    parser.add_argument("--zones", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=2000.0, help="Readings published per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of publishing")
+    parser.add_argument("--tick", type=float, default=1.0)
+    parser.add_argument("--high-water", type=int, default=64 * 1024)
+    parser.add_argument("--slow-every", type=int, default=100,
+                        help="Every n-th subscriber reads only 512 bytes a second (0 for none)")
+    parser.add_argument("--client-processes", type=int, default=4)
+    args = parser.parse_args()
+
+    updates = prepared_updates(args.zones, args.farms, int(args.rate * args.duration) + 1)
+    connect_time, connected, stats, flush_times, totals, latency, ticks = asyncio.run(
+        serve(args, updates))
+
+    n = args.subscribers
+    slow = len(range(0, n, args.slow_every)) if args.slow_every else 0
+    frames = stats["frames"] - connected["frames"]
+    sent_bytes = stats["bytes"] - connected["bytes"]
+    seconds = ticks * args.tick
+    print(f"Subscribers        : {n:,} over {args.farms} farms ({slow} slow), "
+          f"connected in {connect_time:.1f}s")
+    print(f"Published          : {args.rate:,.0f} readings/s over {args.zones:,} zones "
+          f"for {seconds:.0f}s, {args.tick:g}s tick")
+    print(f"Flush per tick     : p50 {flush_times.quantile(0.5) / 1e3:.1f} ms, "
+          f"p99 {flush_times.quantile(0.99) / 1e3:.1f} ms, max {flush_times.max / 1e3:.1f} ms")
+    print(f"Frames sent        : {frames:,} ({frames / seconds / n:.2f}/s per subscriber), "
+          f"{sent_bytes / seconds / n / 1024:.1f} KiB/s per subscriber")
+    print(f"Frame latency      : p50 {latency.quantile(0.5) / 1e3:.1f} ms, "
+          f"p99 {latency.quantile(0.99) / 1e3:.1f} ms (tick to client read)")
+    print(f"Slow subscribers   : {stats['dropped']:,} frames dropped, "
+          f"{stats['snapshots'] - connected['snapshots']:,} resync snapshots")
+    print(f"Frames received    : {totals['frames']:,} by {totals['connected']:,} clients")
+
+    # Supabase Realtime on sensor_readings: every row to every dashboard
+    per_row = row_bytes(args.zones)
+    print()
+    print(f"Per-row fan-out    : {args.rate:,.0f} messages/s, "
+          f"{args.rate * per_row / 1024:.1f} KiB/s per subscriber ({per_row} B rows)")
+    print(f"Reduction          : {args.rate * per_row * seconds * n / max(1, sent_bytes):.0f}x "
+          f"fewer bytes, {args.rate * seconds * n / max(1, frames):.0f}x fewer messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Ingest Benchmark
+Pushes synthetic MQTT data messages for many zones through the sharded
+ingest supervisor (dry run, no database) at increasing worker counts and
+reports throughput, scaling and per-zone ordering.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_ingest --zones 2000 --messages 200000 --workers 8
+"""
+
+import argparse
+import json
+import tempfile
+import time
+
+from agriconnect_pipeline.ingest import IngestSupervisor
+from agriconnect_pipeline.readings import SENSOR_FIELDS, SYSTEM_FIELDS
+from agriconnect_pipeline.synthetic import generate_readings
+
+
+def make_messages(zones, count):
+    """(topic, payload) pairs, round-robin over zones, one reading each"""
+    per_zone = -(-count // zones)
+    streams = []
+    for z in range(zones):
+        gateway_id = f"GW-CM-{z // 16:04d}"
+        field_id, zone_id = (z % 16) // 4 + 1, z % 4
+        topic = f"agriconnect/data/{gateway_id}/{field_id}/{zone_id}"
+        payloads = []
+        for n, row in enumerate(generate_readings(per_zone, gateway_id, field_id, zone_id,
+                                                  seed=z)):
+            sensors = {key: row[5 + i] for i, (_, key) in enumerate(SENSOR_FIELDS)}
+            system = {key: row[5 + len(SENSOR_FIELDS) + i]
+                      for i, (_, key) in enumerate(SYSTEM_FIELDS)}
+            payloads.append(json.dumps({"gatewayId": gateway_id, "timestamp": n * 60000,
+                                        "sensors": sensors, "system": system}).encode())
+        streams.append((topic, payloads))
+
+    messages = []
+    for i in range(per_zone):
+        for topic, payloads in streams:
+            messages.append((topic, payloads[i]))
+    return messages[:count]
+
+
+def run(messages, workers, rebalance):
+    supervisor = IngestSupervisor(workers, log_dir=tempfile.mkdtemp(prefix="bench_ingest_"))
+    supervisor.start()
+    time.sleep(1.0)  # let spawned workers import before timing
+
+    started = time.perf_counter()
+    for i, (topic, payload) in enumerate(messages):
+        if rebalance and i == len(messages) // 2:
+            supervisor.add_worker()
+        supervisor.submit(topic, payload)
+    supervisor.stop()
+    elapsed = time.perf_counter() - started
+    return elapsed, supervisor.stats, supervisor.worker_processed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--workers", type=int, default=8, help="Largest worker count to try")
+    parser.add_argument("--rebalance", action="store_true",
+                        help="Add one worker halfway through each run")
+    args = parser.parse_args()
+
+    messages = make_messages(args.zones, args.messages)
+    print(f"{len(messages):,} messages over {args.zones} zones\n")
+    print(f"{'workers':>8}{'readings/s':>14}{'speedup':>10}{'alerts':>10}{'incidents':>11}"
+          f"{'dupes':>8}{'order errors':>14}{'moved zones':>13}")
+
+    baseline = None
+    workers = 1
+    while workers <= args.workers:
+        elapsed, stats, _ = run(messages, workers, args.rebalance)
+        rate = stats["processed"] / elapsed
+        baseline = baseline or rate
+        print(f"{workers:>8}{rate:>14,.0f}{rate / baseline:>10.2f}{stats['alerts']:>10,}"
+              f"{stats['incidents']:>11,}{stats['duplicates']:>8}"
+              f"{stats['order_violations']:>14}{stats['rebalanced_zones']:>13}")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Pipeline Metrics Benchmark
+Runs one ingest worker in-process (no database) over synthetic readings
+with stage metrics off and on, reports the per-reading overhead of the
+instrumentation, and prints the per-stage latency table it collected so
+the stage that dominates p99 is visible.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_metrics --zones 500 --messages 50000
+"""
+
+import argparse
+import os
+import queue
+import time
+
+from agriconnect_pipeline.eventlog import EventLog
+from agriconnect_pipeline.ingest import ShardWorker
+from agriconnect_pipeline.metrics import Metrics
+
+from benchmarks.bench_ingest import make_messages
+
+
+def run(messages, metrics):
+    """Seconds one worker takes for messages, and its merged snapshots"""
+    inbox, outbox = queue.Queue(), queue.Queue()
+    worker = ShardWorker(0, inbox, outbox, None, "FARM-CM-001", metrics=metrics,
+                         log=EventLog(path=os.devnull))
+    batch = 200
+    for start in range(0, len(messages), batch):
+        inbox.put(("readings", [(start + i, topic, payload, 1_750_000_000.0 + (start + i) / 10)
+                                for i, (topic, payload) in enumerate(messages[start:start + batch])]))
+    inbox.put(("stop",))
+
+    started = time.perf_counter()
+    worker.run()
+    elapsed = time.perf_counter() - started
+
+    merged = Metrics()
+    while not outbox.empty():
+        item = outbox.get()
+        if item[0] == "metrics":
+            merged.merge(item[2])
+    return elapsed, merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3, help="Best of n runs each way")
+    args = parser.parse_args()
+
+    messages = make_messages(args.zones, args.messages)
+    # Alternate the two so drift in machine load hits both equally
+    offs, ons = [], []
+    for _ in range(args.repeat):
+        offs.append(run(messages, False)[0])
+        ons.append(run(messages, True))
+    off = min(offs)
+    on, merged = min(ons, key=lambda item: item[0])
+
+    n = len(messages)
+    print(f"Readings           : {n:,} over {args.zones} zones, one worker, no database")
+    print(f"Metrics off        : {off * 1e6 / n:.1f} µs per reading")
+    print(f"Metrics on         : {on * 1e6 / n:.1f} µs per reading "
+          f"({(on - off) * 1e6 / n:+.2f} µs, {(on - off) / off:+.1%})")
+    print()
+
+    print(f"{'stage':<22}{'count':>9}{'p50 µs':>10}{'p99 µs':>10}{'p99.9 µs':>10}"
+          f"{'max µs':>10}{'share':>8}")
+    reading = merged.histograms["reading"]
+    # write_lag here is just time queued behind the whole run, not a stage
+    stages = {stage: histogram for stage, histogram in merged.histograms.items()
+              if not stage.endswith("_lag")}
+    for stage, histogram in sorted(stages.items(), key=lambda item: -item[1].quantile(0.99)):
+        share = histogram.total / reading.total if stage != "reading" else 1.0
+        print(f"{stage:<22}{histogram.count:>9,}{histogram.quantile(0.5) / 1e3:>10.1f}"
+              f"{histogram.quantile(0.99) / 1e3:>10.1f}{histogram.quantile(0.999) / 1e3:>10.1f}"
+              f"{histogram.max / 1e3:>10.1f}{share:>8.0%}")
+    print()
+    print("Counters           : " + ", ".join(f"{event} {count:,}"
+                                               for event, count in sorted(merged.counters.items())))
+
+
+if __name__ == "__main__":
+    main()
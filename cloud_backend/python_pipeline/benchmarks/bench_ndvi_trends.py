@@ -0,0 +1,146 @@
+"""
+NDVI Trend Rollup Benchmark
+Saves synthetic NDVI analyses (every --every days per field, higher in
+the rainy season) one at a time and rolls each up as the
+agriconnect_pipeline.ndvi_trends job does: its month from that month's
+analyses, its season and the next from month sums, its field from month
+sums and the latest analyses. The result must match a rebuild from the
+whole history; reports the time per save against regrouping the whole
+history per query (the old ndvi_monthly_trends view) and the rows a
+history modal reads either way.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_ndvi_trends --fields 20 --years 3
+"""
+
+import argparse
+import math
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from agriconnect_pipeline.ndvi_trends import (
+    RECENT, TrendSums, field_row, month_sums, next_season, season_of, season_rows,
+)
+
+START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+FARM = "FARM-BENCH"
+
+
+def analyses(fields, years, every, rng):
+    """(farm_id, field_name, month, analysis_date, ndvi, health, stressed) in save order"""
+    rows = []
+    for field in range(fields):
+        day = rng.uniform(0, every)
+        while day < years * 365:
+            at = START + timedelta(days=day)
+            ndvi = 0.55 + 0.15 * math.sin(2 * math.pi * (at.month - 3) / 12) \
+                + 0.02 * day / 365 + rng.normal(0, 0.04)
+            ndvi = float(np.clip(ndvi, 0.05, 0.95))
+            rows.append((FARM, f"Field {field + 1}", at.date().replace(day=1), at,
+                         round(ndvi, 3), int(ndvi * 100), round(max(0.0, 60 - ndvi * 80), 2)))
+            day += rng.uniform(0.5, 1.5) * every
+    rows.sort(key=lambda row: row[3])
+    return rows
+
+
+def incremental(rows, now):
+    """Roll each saved analysis up into months, seasons and fields"""
+    by_month, months, seasons, fields = {}, {}, {}, {}
+    latest, first = {}, {}
+    for row in rows:
+        farm_id, field_name, month = row[:3]
+        key = row[:3]
+        by_month.setdefault(key, []).append(row)
+        months[key] = month_sums(by_month[key])[key]
+
+        start = season_of(month)[0]
+        field_months = {m: sums for (f, n, m), sums in months.items()
+                        if (f, n) == (farm_id, field_name) and m >= start.replace(year=start.year - 1)}
+        written, _ = season_rows(farm_id, field_name, field_months,
+                                 {start, next_season(start)}, now)
+        for season in written:
+            seasons[season[:3]] = season
+
+        recent = latest.setdefault((farm_id, field_name), deque(maxlen=2 * RECENT))
+        recent.appendleft((row[3], row[4], row[5], None, row[6]))
+        first.setdefault((farm_id, field_name), (row[3], row[4]))
+        totals = TrendSums()
+        for (f, n, _), sums in months.items():
+            if (f, n) == (farm_id, field_name):
+                totals.add(sums)
+        fields[(farm_id, field_name)] = field_row(farm_id, field_name, totals, list(recent),
+                                                  first[(farm_id, field_name)], now)
+    return months, seasons, fields
+
+
+def rebuilt(rows, now):
+    """The same rollups from the whole history at once"""
+    months = month_sums(rows)
+    seasons = {}
+    for farm_id, field_name in {row[:2] for row in rows}:
+        field_months = {m: sums for (f, n, m), sums in months.items()
+                        if (f, n) == (farm_id, field_name)}
+        starts = {season_of(m)[0] for m in field_months}
+        for season in season_rows(farm_id, field_name, field_months, starts, now)[0]:
+            seasons[season[:3]] = season
+    return months, seasons
+
+
+def close(a, b):
+    return all(x == y or (isinstance(x, float) and isinstance(y, float)
+                          and math.isclose(x, y, rel_tol=1e-9, abs_tol=1e-9))
+               for x, y in zip(a, b))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--fields", type=int, default=20)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--every", type=float, default=3.0, help="Days between analyses")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    rows = analyses(args.fields, args.years, args.every, rng)
+    now = datetime.now(timezone.utc)
+
+    started = time.perf_counter()
+    months, seasons, fields = incremental(rows, now)
+    save_seconds = (time.perf_counter() - started) / len(rows)
+
+    started = time.perf_counter()
+    full_months, full_seasons = rebuilt(rows, now)
+    regroup_seconds = time.perf_counter() - started
+
+    agree = (months.keys() == full_months.keys() and seasons.keys() == full_seasons.keys()
+             and all(close(vars(months[k]).values(), vars(full_months[k]).values())
+                     for k in months)
+             and all(close(seasons[k], full_seasons[k]) for k in seasons))
+
+    per_field = len(rows) / args.fields
+    print(f"Analyses           : {len(rows):,} ({args.fields} fields x {args.years} years, "
+          f"every ~{args.every:g} days)")
+    print(f"Rollup per save    : {save_seconds * 1e3:.2f} ms (month, 2 seasons, field)")
+    print(f"Regroup per query  : {regroup_seconds * 1e3:.1f} ms (whole history, as the view)")
+    print(f"Agree with rebuild : {agree}")
+    print(f"Rollup rows        : {len(months):,} months, {len(seasons):,} seasons, "
+          f"{len(fields):,} fields")
+
+    field = fields[(FARM, "Field 1")]
+    slope = "n/a" if field[12] is None else f"{field[12]:+.3f}"
+    print(f"\nField 1            : latest {field[6]:.3f}, last {RECENT} {field[10]:.3f} vs "
+          f"{field[11]:.3f}, slope {slope} per 30 days")
+    for key in sorted(k for k in seasons if k[1] == "Field 1")[-4:]:
+        season = seasons[key]
+        change = "" if season[13] is None else f", {season[13]:+.1f}% vs previous"
+        print(f"  {season[3]:<5} {season[2]}  : {season[5]:.3f} over {season[4]} analyses{change}")
+
+    print("\nHistory modal rows read per field:")
+    print(f"  satellite_ndvi_history         : {per_field:,.0f} (grows with every analysis)")
+    print(f"  ndvi_field_trends + months     : {1 + len(months) / args.fields:,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Notification Dispatcher Benchmark
+Replays an irrigation emergency (every zone of every farm raising
+"Irrigation Needed" plus follow-up warnings within a few seconds) through
+the dispatcher with local stand-in sinks, and compares provider calls and
+log rows with sending one message per alert and recipient. Windows are
+scaled down so the run takes seconds. With --metrics the dispatcher
+records into a MetricsAggregate, as notify --metrics-port does, and its
+send counters must match the messages delivered.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_notify --farms 20 --zones 200
+    python -m benchmarks.bench_notify --farms 5 --zones 50 --metrics
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+import numpy as np
+
+from agriconnect_pipeline.metrics import NULL_METRICS, MetricsAggregate
+from agriconnect_pipeline.notify import SEVERITY_RANK, Dispatcher, LocalSink
+
+CHANNELS = ("email", "sms", "whatsapp")
+
+
+class TimedSink(LocalSink):
+    """LocalSink that also remembers when each message went out"""
+
+    def __init__(self, latency):
+        super().__init__(latency=latency)
+        self.sent_at = []
+
+    async def send(self, notification):
+        result = await super().send(notification)
+        self.sent_at.append(time.time())
+        return result
+
+
+async def run(args):
+    rng = random.Random(5)
+    sinks = {channel: TimedSink(args.latency) for channel in CHANNELS}
+    rate = (args.rate, args.rate)
+    metrics = MetricsAggregate() if args.metrics else NULL_METRICS
+    dispatcher = Dispatcher(sinks, window=args.window, critical_window=args.critical_window,
+                            workers=args.workers, rates={channel: rate for channel in CHANNELS},
+                            metrics=metrics)
+
+    farms = [f"FARM-{f:03d}" for f in range(args.farms)]
+    recipients = []
+    for farm in farms:
+        recipients.append((farm, "email", f"owner@{farm.lower()}.cm", "warning"))
+        recipients.append((farm, "sms", f"+2376{rng.randrange(10**7, 10**8)}", "critical"))
+        recipients.append((farm, "whatsapp", f"+2376{rng.randrange(10**7, 10**8)}", "warning"))
+    dispatcher.set_recipients(recipients)
+    by_farm = {}
+    for recipient in recipients:
+        by_farm.setdefault(recipient[0], []).append(recipient)
+
+    # Critical "Irrigation Needed" from every zone within the first seconds,
+    # then a trickle of soil-moisture warnings
+    alerts = []
+    for farm in farms:
+        for z in range(args.zones):
+            field_id, zone_id = z // 25 + 1, z % 25
+            alerts.append((rng.uniform(0, args.spread), {
+                "farm_id": farm, "field_id": field_id, "zone_id": zone_id,
+                "alert_type": "Irrigation Needed", "severity": "critical",
+                "message": "Soil moisture 310 is below the 350 threshold"}))
+            if rng.random() < 0.5:
+                alerts.append((rng.uniform(0, args.spread * 2), {
+                    "farm_id": farm, "field_id": field_id, "zone_id": zone_id,
+                    "alert_type": "Low Soil Moisture", "severity": "warning",
+                    "message": "Soil moisture trending down"}))
+    alerts.sort(key=lambda item: item[0])
+
+    naive_calls = sum(
+        1 for _, alert in alerts for recipient in by_farm[alert["farm_id"]]
+        if SEVERITY_RANK[alert["severity"]] >= SEVERITY_RANK[recipient[3]]
+    )
+
+    stop = asyncio.Event()
+    runner = asyncio.create_task(dispatcher.run(stop, tick=0.05))
+    started = time.monotonic()
+    started_at = time.time()
+    for at, alert in alerts:
+        delay = started + at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        dispatcher.submit(alert, time.time())
+    await asyncio.sleep(args.window + 0.5)
+    stop.set()
+    await runner
+    elapsed = time.monotonic() - started
+
+    log = dispatcher.drain_log()
+    per_recipient = {}
+    first_message = {}
+    for sink in sinks.values():
+        for notification, sent_at in zip(sink.sent, sink.sent_at):
+            key = (notification.channel, notification.address)
+            per_recipient[key] = per_recipient.get(key, 0) + 1
+            first_message.setdefault(key, sent_at - started_at)
+    counts = np.array(list(per_recipient.values()))
+    first = np.array(list(first_message.values()))
+    stats = dispatcher.stats
+
+    print(f"Alerts             : {len(alerts):,} from {args.farms} farms × {args.zones} zones "
+          f"over {args.spread * 2:.0f}s, {len(recipients)} recipients")
+    print(f"Provider calls     : {stats['sent']:,} (one per alert and recipient: {naive_calls:,}, "
+          f"{naive_calls / max(1, stats['sent']):.0f}× fewer)")
+    print(f"Per recipient      : {counts.mean():.1f} messages avg, {counts.max()} max")
+    print(f"Log rows           : {len(log['email']):,} alert_emails_log, "
+          f"{len(log['sms']):,} sms_alerts_log (2 COPYs)")
+    print(f"First message      : p50 {np.percentile(first, 50):.2f}s, "
+          f"p99 {np.percentile(first, 99):.2f}s after the storm began "
+          f"(critical window {args.critical_window}s, rate {args.rate}/s per channel)")
+    print(f"Run time           : {elapsed:.1f}s")
+
+    if args.metrics:
+        delivered = sum(len(sink.sent) for sink in sinks.values())
+        registry = metrics.reset()
+        counted = sum(n for event, n in registry.counters.items()
+                      if event.startswith("notify_sent_"))
+        sends = sum(registry.histograms[f"notify_send_{channel}"].count
+                    for channel in CHANNELS if f"notify_send_{channel}" in registry.histograms)
+        ok = delivered == stats["sent"] == counted == sends and delivered > 0
+        print(f"Metrics            : {counted:,} counted, {sends:,} timed, "
+              f"{delivered:,} delivered {'✓' if ok else '✗'}")
+        if not ok:
+            sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--farms", type=int, default=20)
+    parser.add_argument("--zones", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=2.0,
+                        help="Seconds over which the critical alerts arrive")
+    parser.add_argument("--window", type=float, default=3.0)
+    parser.add_argument("--critical-window", type=float, default=0.5)
+    parser.add_argument("--rate", type=float, default=20.0, help="Messages/s per channel")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Simulated provider call time")
+    parser.add_argument("--metrics", action="store_true",
+                        help="Record into a MetricsAggregate and check its send counters")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
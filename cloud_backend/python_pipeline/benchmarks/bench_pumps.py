@@ -0,0 +1,115 @@
+"""
+Pump Accounting Benchmark
+Accounts pump runtime and cycles of synthetic zones (one reading a
+minute from agriconnect_pipeline.synthetic, with its irrigation cycles)
+three ways: one vectorized pass over the whole history (the --rebuild
+path), the same readings in ingest-sized batches that carry each zone's
+state over, and a per-reading loop as a counter-based tracker would
+run. All three must agree; reports readings/s of each.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_pumps --zones 50 --days 14
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from agriconnect_pipeline.pumps import MAX_GAP, PumpAccounting, run_lengths
+from agriconnect_pipeline.readings import READING_COLUMNS
+from agriconnect_pipeline.synthetic import generate_readings
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+TIME_COLUMN = READING_COLUMNS.index("reading_time")
+PUMP_COLUMN = READING_COLUMNS.index("pump_status")
+
+
+def zone_history(zones, minutes, rng, dropout):
+    """(stream ids, epoch seconds, pump status) of every zone, in arrival order"""
+    streams, times, status = [], [], []
+    for zone in range(zones):
+        rows = generate_readings(minutes, zone_id=zone, seed=zone,
+                                 start=START + timedelta(minutes=37 * zone))
+        for row in rows:
+            streams.append(zone)
+            times.append(row[TIME_COLUMN].timestamp())
+            status.append(row[PUMP_COLUMN])
+    streams, times, status = np.array(streams), np.array(times), np.array(status)
+    # Lost uplinks, and an hour of silence per zone and day
+    keep = rng.random(len(times)) >= dropout
+    keep &= ((times - START.timestamp()) // 60 % 1440) // 60 != 13 + streams % 5
+    order = np.argsort(times[keep], kind="stable")
+    return streams[keep][order], times[keep][order], status[keep][order]
+
+
+def per_reading(streams, times, status, zones):
+    """runtime, cycles and observed seconds one reading at a time"""
+    totals = np.zeros((zones, 3))
+    last = {}
+    for zone, at, on in zip(streams.tolist(), times.tolist(), status.tolist()):
+        if zone in last:
+            previous_at, previous_on = last[zone]
+            step = at - previous_at
+            if 0 <= step <= MAX_GAP:
+                totals[zone, 2] += step
+                if previous_on:
+                    totals[zone, 0] += step
+        if on and not last.get(zone, (0, False))[1]:
+            totals[zone, 1] += 1
+        last[zone] = (at, on)
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=50)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--batch", type=int, default=2000, help="Ingest commit batch")
+    parser.add_argument("--dropout", type=float, default=0.02)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    streams, times, status = zone_history(args.zones, args.days * 1440, rng, args.dropout)
+    readings = len(times)
+
+    started = time.perf_counter()
+    result = run_lengths(streams, times, status, count=args.zones)
+    vector_seconds = time.perf_counter() - started
+    vectorized = np.column_stack([result.runtime, result.cycles, result.observed])
+
+    accounting = PumpAccounting()
+    keys = [("GW-BENCH", 1, zone) for zone in streams.tolist()]
+    started = time.perf_counter()
+    for first in range(0, readings, args.batch):
+        window = slice(first, first + args.batch)
+        accounting.observe_many(keys[window], times[window].tolist(), status[window].tolist())
+        accounting.write()
+        accounting.mark_written()
+    batch_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    looped = per_reading(streams, times, status, args.zones)
+    loop_seconds = time.perf_counter() - started
+
+    print(f"Readings           : {readings:,} ({args.zones} zones x {args.days} days, "
+          f"{args.dropout:.0%} lost, 1 h silent a day)")
+    print(f"Vectorized         : {vector_seconds:.2f}s ({readings / vector_seconds:,.0f} readings/s)")
+    print(f"Batches of {args.batch:<7} : {batch_seconds:.2f}s "
+          f"({readings / batch_seconds:,.0f} readings/s)")
+    print(f"Per reading        : {loop_seconds:.2f}s ({readings / loop_seconds:,.0f} readings/s)")
+    batched = [accounting.stats[name] for name in
+               ("runtime_seconds", "cycles", "observed_seconds")]
+    print(f"Agree              : vectorized {np.allclose(vectorized, looped)}, "
+          f"batched {np.allclose(batched, looped.sum(axis=0))}")
+    hours = vectorized[:, 0].sum() / 3600
+    print(f"Pump               : {hours:,.0f} h, {int(vectorized[:, 1].sum()):,} cycles, "
+          f"duty {vectorized[:, 0].sum() / vectorized[:, 2].sum():.1%}, "
+          f"{hours / max(vectorized[:, 1].sum(), 1) * 60:.0f} min a cycle "
+          f"(the dashboard assumes 15)")
+    print(f"Daily rollup rows  : {len(result.day):,}")
+
+
+if __name__ == "__main__":
+    main()
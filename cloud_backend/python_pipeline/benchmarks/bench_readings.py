@@ -0,0 +1,143 @@
+"""
+Reading Types Benchmark
+Compares the tuple rows ingest used to buffer (readings.payload_to_row)
+with the generated SensorReading records and ReadingBatch column arrays:
+memory per buffered reading, payload -> buffer conversion per commit
+batch, and building the COPY data for that batch. Also checks that zero
+readings survive conversion as 0, not NULL.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_readings --zones 500 --messages 50000 --batch 2000
+"""
+
+import argparse
+import json
+import math
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from agriconnect_pipeline.reading_types import COPY_COLUMNS, ReadingBatch, SensorReading
+from agriconnect_pipeline.readings import payload_to_row
+from benchmarks.bench_ingest import make_messages
+
+
+def parsed(messages):
+    """(gateway_id, field_id, zone_id, reading_time, data) per message"""
+    items = []
+    for n, (topic, payload) in enumerate(messages):
+        _, _, gateway_id, field_id, zone_id = topic.split("/")
+        now = datetime.fromtimestamp(1_750_000_000 + n * 6, timezone.utc)
+        items.append((gateway_id, int(field_id), int(zone_id), now, json.loads(payload)))
+    return items
+
+
+def to_tuples(items):
+    return [payload_to_row(*item, n) for n, item in enumerate(items)]
+
+
+def to_records(items):
+    return [SensorReading.from_payload(*item, n) for n, item in enumerate(items)]
+
+
+def to_batch(items):
+    batch = ReadingBatch()
+    for n, item in enumerate(items):
+        batch.append_payload(*item, n)
+    return batch
+
+
+def _copy_value(value):
+    """psycopg's text COPY formatting of one value, in Python"""
+    if value is None:
+        return "\\N"
+    if value is True:
+        return "t"
+    if value is False:
+        return "f"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def row_copy_text(rows):
+    """COPY data built row by row, as copy.write_row() does for tuples"""
+    return "".join("\t".join(map(_copy_value, row)) + "\n" for row in rows)
+
+
+def measure_memory(build, items):
+    """Bytes per reading the buffer keeps alive once each payload dict is dropped"""
+    items = [item[:4] + (json.dumps(item[4]),) for item in items]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    buffer = build(item[:4] + (json.loads(item[4]),) for item in items)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del buffer
+    return size / len(items)
+
+
+def best_of(repeat, fn, *args):
+    best, result = math.inf, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def check_zeros(item):
+    """Columns whose zero reading came out as NULL (the Node `|| null` bug)"""
+    gateway_id, field_id, zone_id, now, data = item
+    data = {**data, "sensors": {**data["sensors"], "airTemperature": 0, "soilMoisture": 0.0},
+            "system": {**data["system"], "rssi": 0, "pumpStatus": False}}
+    batch = ReadingBatch()
+    batch.append_payload(gateway_id, field_id, zone_id, now, data)
+    record = SensorReading.from_payload(gateway_id, field_id, zone_id, now, data)
+    lost = []
+    for row in (record.copy_row(), next(batch.rows())):
+        values = dict(zip(COPY_COLUMNS, row))
+        lost += [column for column in ("air_temperature", "soil_moisture", "rssi", "pump_status")
+                 if values[column] is None]
+    return lost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--batch", type=int, default=2000, help="Readings per commit batch")
+    parser.add_argument("--repeat", type=int, default=5, help="Best of n runs")
+    args = parser.parse_args()
+
+    items = parsed(make_messages(args.zones, args.messages))
+    batch_items = items[:args.batch]
+
+    print(f"Readings           : {len(items):,} over {args.zones} zones, "
+          f"{len(COPY_COLUMNS)} columns, batches of {len(batch_items):,}\n")
+    print(f"{'buffer':<22}{'bytes/reading':>15}{'convert ms':>12}{'COPY text ms':>14}")
+
+    tuple_bytes = measure_memory(to_tuples, items)
+    convert, rows = best_of(args.repeat, to_tuples, batch_items)
+    copy, _ = best_of(args.repeat, row_copy_text, rows)
+    print(f"{'tuple rows':<22}{tuple_bytes:>15.0f}{convert * 1e3:>12.2f}{copy * 1e3:>14.2f}")
+
+    record_bytes = measure_memory(to_records, items)
+    convert, records = best_of(args.repeat, to_records, batch_items)
+    copy, _ = best_of(args.repeat, row_copy_text, [r.copy_row() for r in records])
+    print(f"{'SensorReading':<22}{record_bytes:>15.0f}{convert * 1e3:>12.2f}{copy * 1e3:>14.2f}")
+
+    batch_bytes = measure_memory(to_batch, items)
+    convert, batch = best_of(args.repeat, to_batch, batch_items)
+    copy, _ = best_of(args.repeat, batch.copy_text)
+    print(f"{'ReadingBatch':<22}{batch_bytes:>15.0f}{convert * 1e3:>12.2f}{copy * 1e3:>14.2f}")
+    print(f"{'  (array payload)':<22}{batch.nbytes() / len(batch):>15.0f}")
+
+    print()
+    print(f"Memory saved       : {1 - batch_bytes / tuple_bytes:.0%} vs tuple rows")
+    lost = check_zeros(items[0])
+    print(f"Zero readings      : {'✓ kept as 0' if not lost else '✗ NULL in ' + ', '.join(lost)}")
+
+
+if __name__ == "__main__":
+    main()
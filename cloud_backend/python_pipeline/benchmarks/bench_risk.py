@@ -0,0 +1,110 @@
+"""
+Disease Risk Timeline Benchmark
+Scores synthetic zones (one reading a minute from agriconnect_pipeline.
+synthetic, with humid nights every fifth day) into hourly disease risk
+with agriconnect_pipeline.risk: all at once as the backfill does, and in
+ingest-sized batches through RiskTimeline. Both are checked against
+DiseaseAnalyzer run reading by reading (its alerts must be exactly the
+readings at or above each model's action threshold), and the rows a
+chart of --chart-days has to read are counted per layout.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_risk --zones 20 --days 14
+"""
+
+import argparse
+import math
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from agriconnect_pipeline.intelligence.disease import DEFAULT_MODELS, DiseaseAnalyzer
+from agriconnect_pipeline.readings import READING_COLUMNS
+from agriconnect_pipeline.risk import DISEASES, RiskTimeline, hourly_sums, risk_scores
+from agriconnect_pipeline.synthetic import generate_readings
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+COLUMNS = [READING_COLUMNS.index(c) for c in
+           ("reading_time", "air_temperature", "air_humidity", "soil_moisture")]
+
+
+def history(zones, minutes):
+    """(stream ids, epoch seconds, temperature, humidity, moisture) in arrival order"""
+    streams, rows = [], []
+    for zone in range(zones):
+        for row in generate_readings(minutes, zone_id=zone, seed=zone,
+                                     start=START + timedelta(minutes=37 * zone)):
+            streams.append(zone)
+            rows.append([row[COLUMNS[0]].timestamp()] + [float(row[c]) for c in COLUMNS[1:]])
+    values = np.array(rows)
+    order = np.argsort(values[:, 0], kind="stable")
+    return (np.array(streams)[order],) + tuple(values[order].T)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=20)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--batch", type=int, default=2000, help="Ingest commit batch")
+    parser.add_argument("--chart-days", type=int, default=30)
+    parser.add_argument("--buckets", type=int, default=200)
+    args = parser.parse_args()
+
+    streams, times, temperature, humidity, moisture = history(args.zones, args.days * 1440)
+    readings = len(times)
+
+    started = time.perf_counter()
+    scores = risk_scores(DEFAULT_MODELS, temperature, humidity, moisture)
+    cells, hours, counts, sums = hourly_sums(streams, times, scores)
+    vector_seconds = time.perf_counter() - started
+
+    timeline = RiskTimeline()
+    keys = [("GW-BENCH", 1, zone) for zone in streams.tolist()]
+    started = time.perf_counter()
+    for first in range(0, readings, args.batch):
+        for i in range(first, min(first + args.batch, readings)):
+            timeline.observe(keys[i], times[i], {"airTemperature": temperature[i],
+                                                 "airHumidity": humidity[i],
+                                                 "soilMoisture": moisture[i]})
+        timeline.write(None)
+        timeline.mark_written()
+    batch_seconds = time.perf_counter() - started
+
+    analyzer = DiseaseAnalyzer()
+    names = [DEFAULT_MODELS[key]["name"] for key in DISEASES]
+    thresholds = np.array([DEFAULT_MODELS[key]["actionThreshold"] * 100 for key in DISEASES])
+    alerted = np.zeros_like(scores, dtype=bool)
+    started = time.perf_counter()
+    for i in range(readings):
+        for risk in analyzer.analyze({"airTemperature": temperature[i],
+                                      "airHumidity": humidity[i],
+                                      "soilMoisture": moisture[i]}):
+            alerted[i, names.index(risk["disease"])] = True
+    loop_seconds = time.perf_counter() - started
+    agree = np.array_equal(alerted, scores >= thresholds - 1e-9)
+
+    print(f"Readings           : {readings:,} ({args.zones} zones x {args.days} days)")
+    print(f"Vectorized         : {vector_seconds:.2f}s ({readings / vector_seconds:,.0f} readings/s)"
+          f" → {len(cells):,} hour rows")
+    print(f"Batches of {args.batch:<7} : {batch_seconds:.2f}s "
+          f"({readings / batch_seconds:,.0f} readings/s) → {timeline.stats['hours']:,} row upserts")
+    print(f"DiseaseAnalyzer    : {loop_seconds:.2f}s ({readings / loop_seconds:,.0f} readings/s)")
+    print(f"Alerts agree       : {agree}")
+
+    means = sums / counts[:, None]
+    print("\nHourly mean risk (all zones): "
+          + ", ".join(f"{key} {means[:, i].mean():.0f}% (max {means[:, i].max():.0f})"
+                      for i, key in enumerate(DISEASES)))
+
+    chart_hours = args.chart_days * 24
+    width = max(1, math.ceil(chart_hours / args.buckets))
+    print(f"\n{args.chart_days}-day chart of {args.zones} zones, rows read:")
+    print(f"  readings scored in the browser : {args.zones * args.chart_days * 1440:,}")
+    print(f"  disease_risk_hourly rows       : {args.zones * chart_hours:,}")
+    print(f"  disease_risk_timeline() bins   : {math.ceil(chart_hours / width)} "
+          f"({width} h each)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Rule Table Benchmark
+Evaluates a batch of readings against compiled crop/stage rule tables and
+shows that throughput does not depend on how many crops are configured.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_rules --batch 100000
+"""
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from agriconnect_pipeline.rules import DEFAULT_RULES_DIR, SENSORS, compile_rules
+
+
+def make_rules_dir(crop_count):
+    """Copy tomato.json under crop_count synthetic crop names"""
+    directory = tempfile.mkdtemp(prefix="agriconnect_rules_")
+    with open(os.path.join(DEFAULT_RULES_DIR, "tomato.json"), "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    for i in range(crop_count):
+        spec["crop"] = "tomato" if i == 0 else f"crop_{i:03d}"
+        with open(os.path.join(directory, f"{spec['crop']}.json"), "w", encoding="utf-8") as f:
+            json.dump(spec, f)
+    return directory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    values = rng.normal(
+        loc=[25, 70, 500, 22, 6.5, 2.6, 180, 50, 250, 40000, 800, 80],
+        scale=[6, 15, 150, 6, 0.8, 0.8, 60, 30, 120, 20000, 400, 20],
+        size=(args.batch, len(SENSORS)),
+    )
+
+    print(f"{'crops':>6}{'profiles':>10}{'compile ms':>12}{'eval ms':>10}{'readings/s':>14}")
+    for crop_count in (1, 10, 100, 500):
+        directory = make_rules_dir(crop_count)
+        try:
+            started = time.perf_counter()
+            tables = compile_rules(directory)
+            compile_ms = (time.perf_counter() - started) * 1000
+        finally:
+            shutil.rmtree(directory)
+
+        profiles = rng.integers(0, len(tables.profiles), size=args.batch)
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            tables.evaluate(profiles, values)
+        eval_ms = (time.perf_counter() - started) * 1000 / args.repeat
+
+        print(f"{crop_count:>6}{len(tables.profiles):>10}{compile_ms:>12.1f}{eval_ms:>10.2f}"
+              f"{args.batch / eval_ms * 1000:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
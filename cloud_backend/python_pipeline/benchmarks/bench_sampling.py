@@ -0,0 +1,173 @@
+"""
+Adaptive Sampling Benchmark
+Replays synthetic zones (one reading a minute from agriconnect_pipeline.
+synthetic, so daily cycles, humid nights and irrigation cycles) through
+the SamplingController. The synthetic zone spends about half its time
+outside an optimal range; every other zone is replayed "calm", with
+its swings around the middle of each range halved. A node only reports at the interval it was last
+told, and a new interval takes effect after its next report, the way a
+LoRa node picks up a downlink. Reports how many messages each policy
+sends and how much later than the one-minute baseline each threshold
+crossing is first seen, against fixed longer intervals. Crossings
+shorter than --sustained minutes are sensor noise at a threshold and
+are counted apart.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_sampling --zones 50 --days 7
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from agriconnect_pipeline.readings import READING_COLUMNS, SENSOR_FIELDS, SYSTEM_FIELDS
+from agriconnect_pipeline.rules import SENSORS, compile_rules
+from agriconnect_pipeline.sampling import LADDER, SamplingController, signal_bounds
+from agriconnect_pipeline.synthetic import generate_readings
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+BASE = 60
+
+PAYLOAD_COLUMNS = {key: column for column, key in SENSOR_FIELDS + SYSTEM_FIELDS}
+VALUE_COLUMNS = [READING_COLUMNS.index(PAYLOAD_COLUMNS[name]) for name in SENSORS]
+PUMP_COLUMN = READING_COLUMNS.index("pump_status")
+
+
+def zone_series(zone, minutes, bounds, calm=False):
+    """(values [minutes, len(SENSORS)], pump [minutes]) of one zone at one reading a minute"""
+    rows = list(generate_readings(minutes, zone_id=zone, seed=zone,
+                                  start=START + timedelta(minutes=37 * zone)))
+    values = np.array([[row[c] for c in VALUE_COLUMNS] for row in rows], dtype=np.float64)
+    pump = np.array([row[PUMP_COLUMN] for row in rows], dtype=bool)
+    if calm:
+        # Optimal range, or nutrient range for N/P/K
+        low = np.where(np.isnan(bounds[:, 2]), bounds[:, 4], bounds[:, 2])
+        high = np.where(np.isnan(bounds[:, 3]), bounds[:, 5], bounds[:, 3])
+        middle = (low + high) / 2
+        ranged = ~np.isnan(middle)
+        values[:, ranged] = middle[ranged] + (values[:, ranged] - middle[ranged]) / 2
+    return values, pump
+
+
+def conditions(tables, profile, values):
+    """Boolean [minutes, conditions]: every flag the rules can raise"""
+    result = tables.evaluate(np.full(len(values), profile), values)
+    return np.hstack([result.out_of_range, result.below_optimal, result.above_optimal,
+                      result.nutrient_low, result.nutrient_high])
+
+
+def replay(controller, key, values, pump):
+    """Minute indexes at which the node reports under the controller"""
+    sent = []
+    index, step, pending = 0, controller.nodes[key].interval // BASE, None
+    while index < len(values):
+        sent.append(index)
+        now = index * BASE
+        controller.observe(key, now, values[index], bool(pump[index]))
+        if pending is not None:
+            step, pending = pending, None
+        for _, _, new in controller.decide(now, [key]):
+            pending = new // BASE
+        index += step
+    return np.array(sent)
+
+
+def episodes(flags):
+    """[(first, last)] minute index runs of each condition"""
+    padded = np.vstack([np.zeros((1, flags.shape[1]), bool), flags,
+                        np.zeros((1, flags.shape[1]), bool)]).astype(np.int8)
+    edges = np.diff(padded, axis=0)
+    runs = []
+    for column in range(flags.shape[1]):
+        starts = np.flatnonzero(edges[:, column] == 1)
+        ends = np.flatnonzero(edges[:, column] == -1) - 1
+        runs.extend(zip(starts, ends))
+    return runs
+
+
+def detection(sent, runs):
+    """Minutes after each run starts until a report sees it (NaN if none does)"""
+    delays = np.full(len(runs), np.nan)
+    for i, (first, last) in enumerate(runs):
+        j = np.searchsorted(sent, first)
+        if j < len(sent) and sent[j] <= last:
+            delays[i] = sent[j] - first
+    return delays
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=50)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--ladder", type=int, nargs="+", default=list(LADDER))
+    parser.add_argument("--safety", type=float, default=3.0)
+    parser.add_argument("--hold", type=float, default=1800.0)
+    parser.add_argument("--noise-sigmas", type=float, default=0.5)
+    parser.add_argument("--sustained", type=int, default=10,
+                        help="Minutes a crossing must last to count as sustained")
+    args = parser.parse_args()
+
+    tables = compile_rules()
+    profile = tables.profile("tomato")
+    bounds = signal_bounds(tables, profile)
+    minutes = args.days * 1440
+    controller = SamplingController(args.ladder, args.safety, args.hold,
+                                    noise_sigmas=args.noise_sigmas)
+    fixed = {f"fixed {BASE * k}s": k for k in (1, 5, 15)}
+
+    # (group, policy) -> [(messages, delays, sustained mask)]
+    results = {}
+    replay_seconds = 0.0
+    for zone in range(args.zones):
+        group = "calm" if zone % 2 else "synthetic"
+        values, pump = zone_series(zone, minutes, bounds, calm=group == "calm")
+        runs = episodes(conditions(tables, profile, values))
+        sustained = np.array([last - first + 1 >= args.sustained for first, last in runs],
+                             dtype=bool)
+
+        key = ("GW-BENCH", 1, zone)
+        controller.restore(key, bounds)
+        started = time.perf_counter()
+        adaptive = replay(controller, key, values, pump)
+        replay_seconds += time.perf_counter() - started
+
+        sent = {name: np.arange(0, minutes, k) for name, k in fixed.items()}
+        sent["adaptive"] = adaptive
+        for name, indexes in sent.items():
+            results.setdefault((group, name), []).append(
+                (len(indexes), detection(indexes, runs), sustained))
+
+    print(f"Zones x days       : {args.zones} x {args.days} "
+          f"({args.zones * minutes:,} readings at {BASE}s)")
+    print(f"Controller         : {controller.stats['readings'] / replay_seconds:,.0f} "
+          f"readings/s, {controller.stats['faster']} faster / "
+          f"{controller.stats['slower']} slower changes")
+
+    for group in ("synthetic", "calm"):
+        baseline = sum(count for count, _, _ in results[(group, f"fixed {BASE}s")])
+        crossings = np.concatenate([s for _, _, s in results[(group, f"fixed {BASE}s")]])
+        print(f"\n{group} zones: {crossings.sum():,} sustained crossings "
+              f"({args.sustained}+ min), {(~crossings).sum():,} brief")
+        print(f"  {'policy':<12}{'messages':>10}{'fewer':>8}{'p50 min':>9}{'p95 min':>9}"
+              f"{'max min':>9}{'missed':>8}{'brief missed':>14}")
+        for (name_group, name), rows in results.items():
+            if name_group != group:
+                continue
+            messages = sum(count for count, _, _ in rows)
+            delays = np.concatenate([d for _, d, _ in rows])
+            sustained = np.concatenate([s for _, _, s in rows])
+            seen = delays[sustained & ~np.isnan(delays)]
+            p50, p95 = np.percentile(seen, [50, 95]) if len(seen) else (np.nan, np.nan)
+            print(f"  {name:<12}{messages:>10,}{1 - messages / baseline:>8.0%}{p50:>9.1f}"
+                  f"{p95:>9.1f}{seen.max(initial=0):>9.0f}"
+                  f"{np.isnan(delays[sustained]).sum():>8,}"
+                  f"{np.isnan(delays[~sustained]).sum():>14,}")
+
+    intervals = [node.interval for node in controller.nodes.values()]
+    print(f"\nFinal intervals    : {dict(zip(*np.unique(intervals, return_counts=True)))}")
+
+
+if __name__ == "__main__":
+    main()
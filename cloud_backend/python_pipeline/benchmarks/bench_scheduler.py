@@ -0,0 +1,94 @@
+"""
+Irrigation Scheduler Benchmark
+Plans one dry day for a growing number of synthetic zones (moisture
+spread across the tomato range, drying rates from slow to fast) with
+agriconnect_pipeline.scheduler, greedy only and with local search. Each
+plan is set against zones scheduled one at a time, each at its own best
+window as SmartScheduler.getNextOptimalWindow does, and how often that
+plan overruns the pump (zones at once, flow) and draws the tank below
+its reserve.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_scheduler --zones 100 300 1000
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+
+from agriconnect_pipeline.backfill import LOCAL_TZ
+from agriconnect_pipeline.scheduler import (
+    IrrigationPlanner, Resources, Zone, diurnal_weather, slot_hours,
+)
+
+START = datetime(2025, 6, 1, tzinfo=LOCAL_TZ)
+
+
+def synthetic_zones(count, rng):
+    return [Zone(("GW-BENCH", 1 + i // 50, i % 50), float(rng.uniform(380, 560)),
+                 drydown=float(rng.uniform(6, 18))) for i in range(count)]
+
+
+def independent(zones, weather, resources):
+    """Every zone planned as if it had the pump and tank to itself, checked together"""
+    alone = IrrigationPlanner(zones, weather, Resources(pumps=len(zones), pump_flow=np.inf,
+                                                       tank_capacity=1e12), START)
+    alone.greedy()
+    shared = IrrigationPlanner(zones, weather, resources, START)
+    for runs in alone.runs:
+        for run in runs:
+            shared._apply(run, +1)
+    return shared
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--zones-per-pump", type=int, default=40)
+    parser.add_argument("--litres-per-zone", type=float, default=200.0,
+                        help="Tank capacity per zone")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    weather = diurnal_weather(25.0, 65.0, slot_hours(START))
+
+    print(f"{'zones':>6}{'pumps':>6}{'greedy ms':>11}{'+search ms':>12}{'greedy cost':>13}"
+          f"{'searched':>10}{'moves':>7}{'dry':>5}"
+          f"{'| alone cost':>13}{'dry':>5}{'peak zones':>11}{'over pump':>11}{'tank min L':>12}")
+    for count in args.zones:
+        zones = synthetic_zones(count, rng)
+        pumps = max(1, count // args.zones_per_pump)
+        resources = Resources(pumps=pumps, pump_flow=pumps * 25.0,
+                              tank_capacity=count * args.litres_per_zone)
+
+        started = time.perf_counter()
+        planner = IrrigationPlanner(zones, weather, resources, START)
+        planner.greedy()
+        greedy_seconds = time.perf_counter() - started
+        greedy_cost = planner.summary()["cost"]
+        started = time.perf_counter()
+        planner.local_search()
+        search_seconds = time.perf_counter() - started
+        planned = planner.summary()
+
+        alone = independent(zones, weather, resources)
+        over = ((alone.active > pumps) | (alone.flow > resources.pump_flow)).sum()
+        reserve = resources.reserve * resources.tank_capacity
+        levels = alone.tank_levels()
+        tank = f"{levels.min():,.0f}" + ("!" if levels.min() < reserve else "")
+
+        print(f"{count:>6}{pumps:>6}{greedy_seconds * 1e3:>11.1f}{search_seconds * 1e3:>12.1f}"
+              f"{greedy_cost:>13,.1f}{planned['cost']:>10,.1f}{planner.stats['moves']:>7}"
+              f"{planned['zones_below_low']:>5}"
+              f"{alone.summary()['cost']:>13,.1f}{alone.summary()['zones_below_low']:>5}"
+              f"{int(alone.active.max()):>11}{over:>6} slots{tank:>12}")
+
+    print("\nalone: each zone at its own best start, ignoring the others; "
+          "'over pump' counts slots with more zones or flow than the pump takes, "
+          "'!' a tank drawn below its reserve")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Delta Sync Benchmark
+Bytes a dashboard downloads when it reconnects after being offline for
+a while: the current refetch of the latest sensor_readings and alerts
+(select * as JSON, plain and gzip) against the gzip NDJSON delta from
+agriconnect_pipeline.sync for the same farm. Rows are synthetic (no
+database needed): readings every minute per zone, gateway status every
+five minutes and an alert now and then, as the firmware sends them.
+
+Usage (from python_pipeline/):
+    python -m benchmarks.bench_sync --zones 16 --gateways 1
+"""
+
+import argparse
+import gzip
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from agriconnect_pipeline.reading_types import COPY_COLUMNS, SensorReading
+from agriconnect_pipeline.sync import (
+    SYNC_TABLES, compressed, format_cursor, merge_deltas, ndjson_chunks, parse_cursor,
+)
+from benchmarks.bench_ingest import make_messages
+
+# What dashboard.js and charts.js fetch when a page (re)loads
+REFETCH_READINGS = (20, 10, 500, 1000)
+REFETCH_ALERTS = 10
+
+OFFLINE = (("1 min", 1), ("10 min", 10), ("1 h", 60), ("6 h", 360), ("24 h", 1440))
+
+
+def reading_rows(zones, minutes, start):
+    """Full sensor_readings rows (dicts), one per zone per minute"""
+    rows = []
+    for n, (topic, payload) in enumerate(make_messages(zones, zones * minutes)):
+        _, _, gateway_id, field_id, zone_id = topic.split("/")
+        now = start + timedelta(minutes=n // zones)
+        reading = SensorReading.from_payload(gateway_id, int(field_id), int(zone_id), now,
+                                             json.loads(payload))
+        row = dict(zip(COPY_COLUMNS, reading.copy_row()))
+        rows.append({"id": 10_000_000 + n, **row, "data_valid": True, "created_at": now})
+    return rows
+
+
+def alert_row(n, gateway_id, now):
+    return {"alert_id": uuid.UUID(int=n), "farm_id": "FARM-CM-001", "gateway_id": gateway_id,
+            "field_id": 1, "zone_id": n % 4, "alert_type": "LOW_MOISTURE", "severity": "warning",
+            "message": "Soil moisture below 30% in Field 1 Zone 1", "acknowledged": False,
+            "acknowledged_at": None, "acknowledged_by": None, "member_zones": None,
+            "zone_count": 1, "created_at": now, "updated_at": now}
+
+
+def gateway_row(n, now):
+    return {"gateway_id": f"GW-CM-{n:04d}", "farm_id": "FARM-CM-001", "name": f"Gateway {n}",
+            "firmware_version": "2.1.0", "latitude": 4.0511, "longitude": 9.7679,
+            "status": "online", "last_seen": now, "updated_at": now}
+
+
+def changes(zones, gateways, minutes, start):
+    """(kind, row dict) in write order for minutes of farm activity"""
+    readings = reading_rows(zones, minutes, start)
+    events = []
+    for minute in range(minutes):
+        now = start + timedelta(minutes=minute)
+        events += [("reading", row) for row in readings[minute * zones:(minute + 1) * zones]]
+        if minute % 5 == 0:
+            events += [("gateway", gateway_row(g, now)) for g in range(gateways)]
+        if minute % 45 == 0:
+            events.append(("alert", alert_row(minute, "GW-CM-0000", now)))
+    return events
+
+
+def sync_bytes(events, first_seq, limit):
+    """Response bytes (gzip, chunked) and requests to sync events from one cursor"""
+    by_kind = {kind: [] for kind in SYNC_TABLES}
+    for seq, (kind, row) in enumerate(events, first_seq):
+        by_kind[kind].append((seq,) + tuple(row.get(c) for c in SYNC_TABLES[kind][1]))
+    horizon = first_seq + len(events) - 1
+    token, total, requests = format_cursor(first_seq - 1, first_seq - 1), 0, 0
+    while True:
+        floor, after = parse_cursor(token)
+        batches = {kind: [r for r in rows if r[0] > after][:limit]
+                   for kind, rows in by_kind.items()}
+        rows, more = merge_deltas(batches, limit)
+        for data in compressed(ndjson_chunks(rows, floor, after, horizon, more)):
+            if data:
+                total += len(b"%x\r\n\r\n" % len(data)) + len(data)
+        total += 5
+        requests += 1
+        *_, last = ndjson_chunks(rows, floor, after, horizon, more)
+        token = json.loads(last.splitlines()[-1])["cursor"]
+        if not more:
+            return total, requests
+
+
+def refetch_bytes(readings, alerts):
+    """The dashboard's reload queries as PostgREST JSON arrays: (plain, gzip)"""
+    bodies = [json.dumps(readings[-n:][::-1], default=str).encode() for n in REFETCH_READINGS]
+    bodies.append(json.dumps(alerts[-REFETCH_ALERTS:][::-1], default=str).encode())
+    return sum(map(len, bodies)), sum(len(gzip.compress(body)) for body in bodies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--zones", type=int, default=16, help="Zones on the farm")
+    parser.add_argument("--gateways", type=int, default=1)
+    parser.add_argument("--limit", type=int, default=5000, help="Rows per table per response")
+    args = parser.parse_args()
+
+    start = datetime(2025, 6, 1, tzinfo=timezone.utc)
+    history = changes(args.zones, args.gateways, max(minutes for _, minutes in OFFLINE), start)
+    readings = [row for kind, row in history if kind == "reading"]
+    alerts = [row for kind, row in history if kind == "alert"] or [alert_row(0, "GW-CM-0000", start)]
+    plain, zipped = refetch_bytes(readings, alerts)
+
+    print(f"Farm               : {args.zones} zones, {args.gateways} gateway(s), "
+          f"1 reading/min per zone")
+    print(f"Refetch on reload  : {sum(REFETCH_READINGS) + REFETCH_ALERTS:,} rows, "
+          f"{plain / 1024:,.1f} KiB JSON, {zipped / 1024:,.1f} KiB gzip\n")
+    print(f"{'offline':<10}{'changed rows':>14}{'delta KiB':>12}{'requests':>10}"
+          f"{'vs JSON':>10}{'vs gzip':>10}")
+    for label, minutes in OFFLINE:
+        events = changes(args.zones, args.gateways, minutes, start)
+        size, requests = sync_bytes(events, 1_000_000, args.limit)
+        print(f"{label:<10}{len(events):>14,}{size / 1024:>12.1f}{requests:>10}"
+              f"{plain / size:>9.0f}x{zipped / size:>9.1f}x")
+
+    print()
+    print(f"Refetch covers     : last {1000 // args.zones} min of readings; "
+          f"longer outages leave gaps the delta fills")
+
+
+if __name__ == "__main__":
+    main()
@@ -225,6 +225,13 @@ window.initDashboardModules = async function() {
             WhatsAppBot.init();
         }
 
+        // Move alert recipients saved in this browser to the dispatcher's table
+        if (typeof GlobalAlerts !== 'undefined') {
+            GlobalAlerts.init().catch(err => {
+                console.error('[ERROR] Syncing alert recipients failed:', err);
+            });
+        }
+
         // Notification removed to reduce UI spam
         console.log('[SUCCESS] All dashboard modules initialized');
     } catch (error) {
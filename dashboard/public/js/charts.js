@@ -251,6 +251,11 @@ const Charts = {
                 if (data && data.length > 0) {
                     console.log('[INFO] Sample data point:', data[0]);
                 }
+            } else if (typeof OfflineManager !== 'undefined' &&
+                       await OfflineManager.canServeLocally(this.timeRange > 0 ? this.timeRange : 720)) {
+                const hours = this.timeRange > 0 ? this.timeRange : 720;
+                const since = new Date(Date.now() - hours * 60 * 60 * 1000).toISOString();
+                data = (await OfflineManager.getSyncedReadings(since)).slice(0, 500);
             } else {
                 // Fallback to direct Supabase
                 let query = window.supabase
@@ -310,7 +315,7 @@ const Charts = {
             this.renderSoilMoistureChart(processed);
             this.renderPhEcChart(processed);
             this.renderNpkChart(processed);
-            this.renderDiseaseRiskChart(processed);
+            await this.renderDiseaseRiskChart(processed);
 
             console.log('[SUCCESS] All charts rendered');
 
@@ -672,7 +677,7 @@ const Charts = {
     },
 
     // Render Disease Risk Timeline Chart
-    renderDiseaseRiskChart(processed) {
+    async renderDiseaseRiskChart(processed) {
         const ctx = document.getElementById('disease-risk-chart');
         if (!ctx) return;
 
@@ -680,11 +685,10 @@ const Charts = {
         const textColor = isDark ? '#E0E0E0' : '#212121';
         const gridColor = isDark ? '#333333' : '#E0E0E0';
 
-        // Extract labels and data
-        const { labels, data } = processed;
-
-        // Calculate disease risk scores based on conditions
-        const diseaseRisks = data.map(d => this.calculateDiseaseRisks(d));
+        // Hourly risk stored at ingest first, scoring every reading here as fallback
+        const server = await this.fetchServerRiskTimeline();
+        const labels = server ? server.labels : processed.labels;
+        const diseaseRisks = server ? server.risks : processed.data.map(d => this.calculateDiseaseRisks(d));
 
         // Update existing chart if it exists
         if (this.charts.diseaseRisk) {
@@ -761,6 +765,41 @@ const Charts = {
         });
     },
 
+    // Fetch the binned disease risk timeline (riskiest zone per bin)
+    async fetchServerRiskTimeline() {
+        if (!window.supabase || typeof window.supabase.rpc !== 'function') {
+            return null;
+        }
+
+        try {
+            const hours = this.timeRange > 0 ? this.timeRange : 720;
+            const until = new Date();
+            const since = new Date(until.getTime() - hours * 60 * 60 * 1000);
+            const { data, error } = await window.supabase.rpc('disease_risk_timeline', {
+                p_farm_id: CONFIG.farmId,
+                p_since: since.toISOString(),
+                p_until: until.toISOString(),
+                max_buckets: 200
+            });
+
+            if (error || !data || data.length === 0) {
+                return null;
+            }
+
+            return {
+                labels: data.map(row => new Date(row.bucket)),
+                risks: data.map(row => ({
+                    lateBlight: Math.round(row.late_blight),
+                    earlyBlight: Math.round(row.early_blight),
+                    powderyMildew: Math.round(row.powdery_mildew)
+                }))
+            };
+        } catch (error) {
+            console.log('[INFO] Server risk timeline unavailable, scoring readings locally');
+            return null;
+        }
+    },
+
     // Calculate disease risks
     calculateDiseaseRisks(reading) {
         const temp = reading.air_temperature || 0;
@@ -22,11 +22,25 @@ const CONFIG = {
 
     // WebSocket Configuration (for real-time updates)
     websocket: {
-        enabled: false, // Enable when WebSocket server is deployed
+        enabled: false, // Enable when the fan-out service (agriconnect_pipeline.fanout) is deployed
         url: 'wss://your-websocket-server.com', // UPDATE THIS
         reconnectInterval: 5000
     },
 
+    // Delta Sync Configuration (offline catch-up on reconnect)
+    sync: {
+        enabled: false, // Enable when the delta sync service (agriconnect_pipeline.sync) is deployed
+        url: 'https://your-sync-server.com', // UPDATE THIS
+        initialHours: 24, // Readings a first sync receives (the service's --initial-hours)
+        retentionHours: 72 // Readings kept in IndexedDB; longer chart ranges are fetched
+    },
+
+    // Export Service Configuration (streamed CSV downloads)
+    export: {
+        enabled: false, // Enable when the export service (agriconnect_pipeline.export --serve) is deployed
+        url: 'https://your-export-server.com' // UPDATE THIS
+    },
+
     // Push Notification Configuration
     pushNotifications: {
         enabled: true,
@@ -44,9 +58,19 @@ const CONFIG = {
             twilioAccountSid: '',
             twilioAuthToken: '',
             twilioPhoneNumber: ''
+        },
+        // Server-side delivery (agriconnect_pipeline.notify): recipients are
+        // kept in notification_recipients and alerts are sent as digests
+        dispatcher: {
+            enabled: false // Enable when the notification dispatcher is deployed
         }
     },
 
+    // Crop names -> the farms.crop_type spelling (features.crop_key in the pipeline)
+    cropAliases: { tomatoes: 'tomato' },
+
+    // Optimal ranges of the tomato default stage; replaced by the farm's
+    // crop and growth stage from crop_rules (cloud_backend/rules/) once loaded
     sensorThresholds: {
         airTemperature: { min: 18, max: 30, unit: '°C' },
         airHumidity: { min: 60, max: 80, unit: '%' },
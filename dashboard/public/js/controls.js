@@ -83,8 +83,9 @@ const FarmControls = {
 
             // Notification removed to reduce UI spam
 
-            // In production, this would publish MQTT command
-            // For now, we'll update the UI and store in database
+            // Queue the MQTT command; the command broker delivers it to the
+            // gateway and tracks its ack
+            await this.queueGatewayCommand('pump_control', { activate: turnOn });
 
             const { error } = await window.supabase
                 .from('pump_commands')
@@ -124,6 +125,28 @@ const FarmControls = {
         }
     },
     
+    // Insert a command into the outbox (published to agriconnect/commands/{gateway_id})
+    async queueGatewayCommand(action, parameters, fieldId = 0, zoneId = 0) {
+        const commandId = `cmd-${Date.now()}-${Math.random().toString(36).slice(2, 8)}`;
+
+        const { error } = await window.supabase
+            .from('command_outbox')
+            .insert({
+                command_id: commandId,
+                farm_id: CONFIG.farmId,
+                target_field_id: fieldId,
+                target_zone_id: zoneId,
+                action: action,
+                parameters: parameters,
+                requested_by: Auth.currentUser?.email || 'demo'
+            });
+
+        if (error) {
+            throw new Error(`Command not queued: ${error.message}`);
+        }
+        return commandId;
+    },
+    
     // Update pump UI
     updatePumpUI(isOn) {
         const pumpIcon = document.getElementById('pump-icon');
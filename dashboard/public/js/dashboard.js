@@ -24,6 +24,9 @@ const Dashboard = {
         // Start auto-refresh
         this.startAutoRefresh();
 
+        // Re-render from the synced stores after a reconnect catch-up
+        document.addEventListener('offline-sync-complete', () => this.renderSynced());
+
         // Initialize additional dashboard modules
         if (typeof window.initDashboardModules === 'function') {
             await window.initDashboardModules();
@@ -77,16 +80,33 @@ const Dashboard = {
         }
     },
     
+    // Whether the delta-synced IndexedDB stores can answer instead of Supabase
+    async useSyncedStores(hours = 0) {
+        return typeof OfflineManager !== 'undefined' && await OfflineManager.canServeLocally(hours);
+    },
+
+    // Re-render cards, alerts and the readings table without refetching
+    async renderSynced() {
+        await this.loadAlerts();
+        await this.loadSensorData();
+        await this.loadRecentReadings();
+    },
+
     // Load active alerts
     async loadAlerts() {
         try {
-            const { data, error } = await window.supabase
-                .from('alerts')
-                .select('*')
-                .eq('farm_id', CONFIG.farmId)
-                .eq('acknowledged', false)
-                .order('created_at', { ascending: false })
-                .limit(10);
+            let data, error;
+            if (await this.useSyncedStores()) {
+                data = await OfflineManager.getSyncedAlerts(10);
+            } else {
+                ({ data, error } = await window.supabase
+                    .from('alerts')
+                    .select('*')
+                    .eq('farm_id', CONFIG.farmId)
+                    .eq('acknowledged', false)
+                    .order('created_at', { ascending: false })
+                    .limit(10));
+            }
 
             if (error) throw error;
 
@@ -129,12 +149,20 @@ const Dashboard = {
                         <span class="alert-type">${this.formatAlertType(alert.alert_type)}</span>
                     </div>
                     <div class="alert-message">${alert.message}</div>
-                    <div class="alert-time">Field ${alert.field_id} Zone ${alert.zone_id} - ${time}</div>
+                    <div class="alert-time">${this.formatAlertLocation(alert)} - ${time}</div>
                 </div>
             </div>
         `;
     },
     
+    // Location of an alert; correlated incidents cover several zones
+    formatAlertLocation(alert) {
+        const zones = alert.zone_count || 1;
+        if (zones === 1) return `Field ${alert.field_id} Zone ${alert.zone_id}`;
+        if (alert.field_id !== null) return `Field ${alert.field_id} - ${zones} zones`;
+        return `${zones} zones across the farm`;
+    },
+    
     // Format alert type for display
     formatAlertType(type) {
         return type.replace(/_/g, ' ').replace(/\b\w/g, c => c.toUpperCase());
@@ -149,6 +177,8 @@ const Dashboard = {
                 const result = await MockData.getSensorData();
                 data = result.data;
                 error = result.error;
+            } else if (await this.useSyncedStores()) {
+                data = await OfflineManager.getSyncedReadings(null, { limit: 20, newestFirst: true });
             } else {
                 // Fallback to direct Supabase call
                 const result = await window.supabase
@@ -376,11 +406,16 @@ const Dashboard = {
     // Load recent readings table
     async loadRecentReadings() {
         try {
-            const { data, error } = await window.supabase
-                .from('sensor_readings')
-                .select('*')
-                .order('reading_time', { ascending: false })
-                .limit(10);
+            let data, error;
+            if (await this.useSyncedStores()) {
+                data = await OfflineManager.getSyncedReadings(null, { limit: 10, newestFirst: true });
+            } else {
+                ({ data, error } = await window.supabase
+                    .from('sensor_readings')
+                    .select('*')
+                    .order('reading_time', { ascending: false })
+                    .limit(10));
+            }
             
             if (error) throw error;
             
@@ -426,9 +461,50 @@ const Dashboard = {
         document.getElementById('last-update').textContent = `Last update: ${time}`;
     },
     
+    // Save a readings export from agriconnect_pipeline.export to disk.
+    // The access token goes in a header to get a single-use ticket, and only
+    // the ticket is put in the download link, so the token never ends up in
+    // URLs, browser history or server logs.
+    async downloadExport(params) {
+        const { data: { session } } = await window.supabase.auth.getSession();
+        if (!session) throw new Error('Please sign in to download data');
+
+        const farmUrl = `${CONFIG.export.url}/export/${encodeURIComponent(CONFIG.farmId)}`;
+        const response = await fetch(`${farmUrl}/ticket`, {
+            method: 'POST',
+            headers: { Authorization: `Bearer ${session.access_token}` }
+        });
+        if (!response.ok) throw new Error(`Export service returned ${response.status}`);
+        const { ticket } = await response.json();
+
+        const url = new URL(farmUrl);
+        Object.entries(params).forEach(([key, value]) => url.searchParams.set(key, value));
+        url.searchParams.set('ticket', ticket);
+
+        const link = document.createElement('a');
+        link.href = url.toString();
+        document.body.appendChild(link);
+        link.click();
+        document.body.removeChild(link);
+    },
+
     // Export data to Excel - Enhanced with multiple sheets
     async exportToCSV() {
         try {
+            // Stream the readings from the export service when it is deployed
+            // instead of fetching them all into the browser
+            if (CONFIG.export?.enabled) {
+                const end = new Date();
+                const start = new Date(end.getTime() - 30 * 24 * 60 * 60 * 1000);
+                await this.downloadExport({
+                    format: 'csv',
+                    start: start.toISOString(),
+                    end: end.toISOString()
+                });
+                console.log('[SUCCESS] Export started for the last 30 days of sensor readings');
+                return;
+            }
+
             console.log('[INFO] Exporting comprehensive farm data to Excel...');
 
             // Use MockData if available (handles both mock and real data)
@@ -747,6 +823,11 @@ const Dashboard = {
             Notifications.info('🔄 Refreshing', 'Updating dashboard data...');
         }
 
+        // Fetch only what changed; the loaders then read the synced stores
+        if (CONFIG.sync?.enabled && typeof OfflineManager !== 'undefined' && OfflineManager.isOnline) {
+            await OfflineManager.syncDelta();
+        }
+
         await this.loadAlerts();
         await this.loadSensorData();
         await this.loadRecentReadings();
@@ -74,6 +74,9 @@ const EmailAlerts = {
             // Save to localStorage
             localStorage.setItem('alertRecipientEmail', this.recipientEmail);
             localStorage.setItem('emailAlertsEnabled', this.enabled.toString());
+            if (typeof GlobalAlerts !== 'undefined') {
+                await GlobalAlerts.saveRecipient('email', this.recipientEmail, this.enabled, previousEmail);
+            }
 
             // Check if this is a new email or newly enabled
             const isNewSetup = (this.recipientEmail !== previousEmail) ||
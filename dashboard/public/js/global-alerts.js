@@ -4,13 +4,80 @@
  * - Email
  * - SMS
  * - WhatsApp
+ *
+ * With CONFIG.alerts.dispatcher enabled, alerts are stored in the alerts
+ * table and delivered by the server-side notification dispatcher to the
+ * recipients in notification_recipients, which the settings forms keep
+ * up to date.
  */
 
 const GlobalAlerts = {
+    get dispatcherEnabled() {
+        return Boolean(CONFIG.alerts.dispatcher && CONFIG.alerts.dispatcher.enabled);
+    },
+
+    // Copy recipients saved in this browser before the dispatcher to the table, once
+    async init() {
+        if (!this.dispatcherEnabled || localStorage.getItem('notificationRecipientsSynced')) return;
+
+        const whatsapp = JSON.parse(localStorage.getItem('whatsapp-bot-settings') || '{}');
+        const saved = [
+            ['email', localStorage.getItem('alertRecipientEmail'),
+                localStorage.getItem('emailAlertsEnabled') === 'true'],
+            ['sms', localStorage.getItem('sms_alert_phone'),
+                localStorage.getItem('sms_alerts_enabled') === 'true'],
+            ['whatsapp', whatsapp.phoneNumber, Boolean(whatsapp.enabled)]
+        ];
+
+        let synced = true;
+        for (const [channel, address, enabled] of saved) {
+            if (address) {
+                synced = (await this.saveRecipient(channel, address, enabled)) && synced;
+            }
+        }
+        if (synced) {
+            localStorage.setItem('notificationRecipientsSynced', 'true');
+            console.log('[SUCCESS] Alert recipients synced to notification_recipients');
+        }
+    },
+
+    // Store one recipient for the dispatcher; a replaced address is disabled
+    async saveRecipient(channel, address, enabled, previousAddress = null) {
+        if (!this.dispatcherEnabled || !window.supabase) return false;
+
+        try {
+            if (previousAddress && previousAddress !== address) {
+                const { error } = await window.supabase
+                    .from('notification_recipients')
+                    .update({ enabled: false })
+                    .eq('farm_id', CONFIG.farmId)
+                    .eq('channel', channel)
+                    .eq('address', previousAddress);
+                if (error) throw error;
+            }
+            if (address) {
+                const { error } = await window.supabase
+                    .from('notification_recipients')
+                    .upsert({ farm_id: CONFIG.farmId, channel, address, enabled },
+                        { onConflict: 'farm_id,channel,address' });
+                if (error) throw error;
+            }
+            return true;
+        } catch (error) {
+            console.error(`[ERROR] Saving ${channel} recipient failed:`, error);
+            return false;
+        }
+    },
+
     // Send alert to all enabled channels
     async sendAlert({ alertType, severity, message, sensorData = null }) {
         console.log(`[GLOBAL ALERT] Dispatching ${severity} alert: ${alertType}`);
 
+        // The dispatcher picks the alert up and sends it to every recipient
+        if (this.dispatcherEnabled) {
+            return { queued: await this.queueAlert({ alertType, severity, message }) };
+        }
+
         const results = {
             email: null,
             sms: null,
@@ -65,6 +132,27 @@ const GlobalAlerts = {
         return results;
     },
 
+    // Store the alert for the dispatcher
+    async queueAlert({ alertType, severity, message }) {
+        if (!window.supabase) return false;
+
+        try {
+            const { error } = await window.supabase
+                .from('alerts')
+                .insert({
+                    farm_id: CONFIG.farmId,
+                    alert_type: alertType,
+                    severity,
+                    message
+                });
+            if (error) throw error;
+            return true;
+        } catch (error) {
+            console.error('[ERROR] Queueing alert failed:', error);
+            return false;
+        }
+    },
+
     // Convenience methods for specific alert types
     async sendCriticalTemperatureAlert(temperature, threshold) {
         await this.sendAlert({
@@ -277,7 +277,7 @@ const Intelligence = {
 
         // Get TensorFlow ML insights (if available)
         let mlInsights = null;
-        if (typeof TensorFlowML !== 'undefined' && TensorFlowML.yieldPredictionModel) {
+        if (typeof TensorFlowML !== 'undefined' && TensorFlowML.anomalyDetectionModel) {
             mlInsights = await TensorFlowML.getMLInsights(latest, data, 0.7);
         }
 
@@ -293,8 +293,8 @@ const Intelligence = {
                         <span class="intelligence-value">${mlInsights.yieldPrediction.yield} ${mlInsights.yieldPrediction.unit}</span>
                     </div>
                     <div class="intelligence-metric">
-                        <span class="intelligence-label">Confidence</span>
-                        <span class="intelligence-value">${mlInsights.yieldPrediction.confidence}%</span>
+                        <span class="intelligence-label">Model</span>
+                        <span class="intelligence-value">${mlInsights.yieldPrediction.modelVersion}</span>
                     </div>
                     ${mlInsights.anomalyDetection ? `
                         <div class="intelligence-recommendation ${mlInsights.anomalyDetection.isAnomaly ? 'anomaly-warning' : ''}">
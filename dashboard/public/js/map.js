@@ -140,6 +140,19 @@ const FarmMap = {
             
             const nodes = Array.from(nodesMap.values());
             
+            // Liveness status maintained by the backend liveness tracker
+            const { data: fieldNodes } = await window.supabase
+                .from('field_nodes')
+                .select('gateway_id, field_id, zone_id, status');
+            
+            const nodeStatus = new Map();
+            fieldNodes?.forEach(n => {
+                nodeStatus.set(`${n.gateway_id}-${n.field_id}-${n.zone_id}`, n.status);
+            });
+            nodes.forEach(node => {
+                node.node_status = nodeStatus.get(`${node.gateway_id}-${node.field_id}-${node.zone_id}`);
+            });
+            
             console.log(`[INFO] Found ${nodes.length} unique nodes`);
             
             // Add farm marker
@@ -252,15 +265,21 @@ const FarmMap = {
     
     // Determine node status based on sensor data
     getNodeStatus(nodeData) {
-        // Check if data is recent (within last hour)
-        const lastUpdate = new Date(nodeData.reading_time);
-        const now = new Date();
-        const hoursSinceUpdate = (now - lastUpdate) / (1000 * 60 * 60);
-        
-        if (hoursSinceUpdate > 1) {
+        if (nodeData.node_status === 'offline') {
             return 'offline';
         }
         
+        // Nodes not tracked by the backend: check if data is recent (within last hour)
+        if (!nodeData.node_status) {
+            const lastUpdate = new Date(nodeData.reading_time);
+            const now = new Date();
+            const hoursSinceUpdate = (now - lastUpdate) / (1000 * 60 * 60);
+            
+            if (hoursSinceUpdate > 1) {
+                return 'offline';
+            }
+        }
+        
         // Check sensor thresholds
         let warningCount = 0;
         
@@ -438,6 +457,13 @@ const FarmMap = {
             const startDate = new Date();
             startDate.setDate(startDate.getDate() - days);
 
+            // Stream from the export service when it is deployed: the file is
+            // written as it downloads instead of being built here in memory
+            if (CONFIG.export?.enabled) {
+                await this.downloadFromExportService(fieldId, zoneId, startDate, endDate);
+                return;
+            }
+
             // Fetch data from Supabase
             const { data, error } = await window.supabase
                 .from('sensor_readings')
@@ -486,6 +512,19 @@ const FarmMap = {
         }
     },
 
+    // Download a node's readings as CSV from agriconnect_pipeline.export
+    async downloadFromExportService(fieldId, zoneId, startDate, endDate) {
+        await Dashboard.downloadExport({
+            format: 'csv',
+            field: fieldId,
+            zone: zoneId,
+            start: startDate.toISOString(),
+            end: endDate.toISOString()
+        });
+
+        console.log(`[SUCCESS] Export started for Field ${fieldId} - Zone ${zoneId}`);
+    },
+
     // Generate CSV from node data
     generateNodeCSV(data, fieldId, zoneId) {
         // CSV Header
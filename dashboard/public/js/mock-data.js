@@ -407,9 +407,14 @@ const MockData = {
         };
     },
 
-    // Get real data from Supabase
+    // Get real data from the synced stores, else Supabase
     async getRealData() {
         try {
+            if (typeof OfflineManager !== 'undefined' && await OfflineManager.canServeLocally()) {
+                const data = await OfflineManager.getSyncedReadings(null, { limit: 10, newestFirst: true });
+                return { data, error: null };
+            }
+
             const { data, error } = await window.supabase
                 .from('sensor_readings')
                 .select('*')
@@ -430,6 +435,11 @@ const MockData = {
             const cutoffTime = new Date();
             cutoffTime.setHours(cutoffTime.getHours() - hours);
 
+            if (typeof OfflineManager !== 'undefined' && await OfflineManager.canServeLocally(hours)) {
+                const data = await OfflineManager.getSyncedReadings(cutoffTime.toISOString());
+                return { data, error: null };
+            }
+
             const { data, error } = await window.supabase
                 .from('sensor_readings')
                 .select('*')
@@ -5,6 +5,8 @@
 
 const NDVIHistory = {
     historicalData: [],
+    summary: null,
+    monthly: false,
     selectedFieldName: null,
 
     // Initialize NDVI history module
@@ -83,16 +85,28 @@ const NDVIHistory = {
         try {
             console.log(`[INFO] Loading NDVI history for ${fieldName}...`);
 
-            const { data, error } = await window.supabase
-                .from('satellite_ndvi_history')
-                .select('*')
-                .eq('farm_id', CONFIG.farmId)
-                .eq('field_name', fieldName)
-                .order('analysis_date', { ascending: true });
-
-            if (error) throw error;
-
-            this.historicalData = data || [];
+            // Rollups kept by the pipeline's ndvi_trends job: one summary
+            // row and the field's months, however many analyses it has
+            const trends = await this.fetchServerTrends(fieldName);
+
+            if (trends) {
+                this.historicalData = trends.months;
+                this.summary = trends.summary;
+                this.monthly = true;
+            } else {
+                const { data, error } = await window.supabase
+                    .from('satellite_ndvi_history')
+                    .select('*')
+                    .eq('farm_id', CONFIG.farmId)
+                    .eq('field_name', fieldName)
+                    .order('analysis_date', { ascending: true });
+
+                if (error) throw error;
+
+                this.historicalData = data || [];
+                this.summary = this.summarizeHistory(this.historicalData);
+                this.monthly = false;
+            }
 
             console.log(`[SUCCESS] Loaded ${this.historicalData.length} historical records`);
 
@@ -110,9 +124,108 @@ const NDVIHistory = {
         }
     },
 
+    // Load a field's rolled-up trends; null when the rollups are not available
+    async fetchServerTrends(fieldName) {
+        if (!window.supabase || typeof window.supabase.from !== 'function') {
+            return null;
+        }
+
+        try {
+            const [fieldResult, monthsResult, seasonsResult] = await Promise.all([
+                window.supabase
+                    .from('ndvi_field_trends')
+                    .select('*')
+                    .eq('farm_id', CONFIG.farmId)
+                    .eq('field_name', fieldName)
+                    .maybeSingle(),
+                window.supabase
+                    .from('ndvi_monthly_trends')
+                    .select('month, avg_ndvi, avg_health_score, avg_stressed_pct, analysis_count')
+                    .eq('farm_id', CONFIG.farmId)
+                    .eq('field_name', fieldName)
+                    .order('month', { ascending: true }),
+                window.supabase
+                    .from('ndvi_season_trends')
+                    .select('season, season_start, avg_ndvi, ndvi_slope, previous_avg_ndvi, ndvi_change_pct')
+                    .eq('farm_id', CONFIG.farmId)
+                    .eq('field_name', fieldName)
+                    .order('season_start', { ascending: false })
+                    .limit(1)
+            ]);
+
+            const field = fieldResult.data;
+            if (fieldResult.error || monthsResult.error || !field) {
+                return null;
+            }
+
+            // Months in the shape of history records, so the chart reads either
+            const months = (monthsResult.data || []).map(m => ({
+                analysis_date: m.month,
+                mean_ndvi: m.avg_ndvi,
+                health_score: m.avg_health_score === null ? null : Math.round(m.avg_health_score),
+                stressed_percentage: m.avg_stressed_pct
+            }));
+
+            return {
+                months,
+                summary: {
+                    count: field.analysis_count,
+                    latestNDVI: parseFloat(field.latest_ndvi),
+                    latestDate: field.last_analysis,
+                    latestHealthScore: field.latest_health_score,
+                    latestHealthClass: field.latest_health_class,
+                    latestStressedPct: parseFloat(field.latest_stressed_pct),
+                    firstNDVI: parseFloat(field.first_ndvi),
+                    recentAvg: parseFloat(field.recent_avg_ndvi),
+                    earlierAvg: field.earlier_avg_ndvi === null ? null : parseFloat(field.earlier_avg_ndvi),
+                    season: (!seasonsResult.error && seasonsResult.data && seasonsResult.data[0]) || null
+                }
+            };
+
+        } catch (error) {
+            console.log('[INFO] NDVI trend rollups unavailable, using full history');
+            return null;
+        }
+    },
+
+    // Same summary as ndvi_field_trends, from a field's full history
+    summarizeHistory(records) {
+        if (records.length === 0) return null;
+
+        const ndvi = records.map(d => parseFloat(d.mean_ndvi));
+        const average = values => values.reduce((a, b) => a + b, 0) / values.length;
+        const recent = ndvi.slice(-3);
+        const earlier = ndvi.slice(-6, -3);
+        const latest = records[records.length - 1];
+
+        return {
+            count: records.length,
+            latestNDVI: parseFloat(latest.mean_ndvi),
+            latestDate: latest.analysis_date,
+            latestHealthScore: latest.health_score,
+            latestHealthClass: latest.health_class,
+            latestStressedPct: parseFloat(latest.stressed_percentage),
+            firstNDVI: ndvi[0],
+            recentAvg: average(recent),
+            earlierAvg: earlier.length > 0 ? average(earlier) : null,
+            season: null
+        };
+    },
+
     // Load all field names
     async loadFieldNames() {
         try {
+            // One row per field when the rollups are kept
+            const trends = await window.supabase
+                .from('ndvi_field_trends')
+                .select('field_name')
+                .eq('farm_id', CONFIG.farmId)
+                .order('field_name');
+
+            if (!trends.error && trends.data && trends.data.length > 0) {
+                return trends.data.map(d => d.field_name);
+            }
+
             const { data, error } = await window.supabase
                 .from('satellite_ndvi_history')
                 .select('field_name')
@@ -191,8 +304,9 @@ const NDVIHistory = {
         }
 
         // Prepare data
-        const labels = this.historicalData.map(d =>
-            new Date(d.analysis_date).toLocaleDateString()
+        const labels = this.historicalData.map(d => this.monthly
+            ? new Date(d.analysis_date).toLocaleDateString(undefined, { month: 'short', year: 'numeric' })
+            : new Date(d.analysis_date).toLocaleDateString()
         );
 
         const ndviData = this.historicalData.map(d => parseFloat(d.mean_ndvi));
@@ -256,7 +370,7 @@ const NDVIHistory = {
                     },
                     title: {
                         display: true,
-                        text: `NDVI Time-Series for ${this.selectedFieldName}`,
+                        text: `${this.monthly ? 'Monthly NDVI' : 'NDVI Time-Series'} for ${this.selectedFieldName}`,
                         color: textColor,
                         font: { size: 16, weight: 'bold' }
                     },
@@ -306,22 +420,12 @@ const NDVIHistory = {
 
     // Update history statistics
     updateHistoryStats() {
-        if (this.historicalData.length === 0) return;
+        const summary = this.summary;
+        if (!summary) return;
 
         // Calculate trend
-        const recentNDVI = this.historicalData.slice(-3).map(d => parseFloat(d.mean_ndvi));
-        const olderNDVI = this.historicalData.slice(-6, -3).map(d => parseFloat(d.mean_ndvi));
-
-        const recentAvg = recentNDVI.reduce((a, b) => a + b, 0) / recentNDVI.length;
-        const olderAvg = olderNDVI.length > 0
-            ? olderNDVI.reduce((a, b) => a + b, 0) / olderNDVI.length
-            : recentAvg;
-
-        const trendChange = ((recentAvg - olderAvg) / olderAvg) * 100;
-
-        // Get latest and oldest records
-        const latest = this.historicalData[this.historicalData.length - 1];
-        const oldest = this.historicalData[0];
+        const olderAvg = summary.earlierAvg !== null ? summary.earlierAvg : summary.recentAvg;
+        const trendChange = ((summary.recentAvg - olderAvg) / olderAvg) * 100;
 
         // Update stats display
         const statsContainer = document.getElementById('history-stats-container');
@@ -329,12 +433,12 @@ const NDVIHistory = {
             statsContainer.innerHTML = `
                 <div class="history-stat-card">
                     <div class="stat-label">Total Analyses</div>
-                    <div class="stat-value">${this.historicalData.length}</div>
+                    <div class="stat-value">${summary.count}</div>
                 </div>
                 <div class="history-stat-card">
                     <div class="stat-label">Latest NDVI</div>
-                    <div class="stat-value">${parseFloat(latest.mean_ndvi).toFixed(3)}</div>
-                    <div class="stat-date">${new Date(latest.analysis_date).toLocaleDateString()}</div>
+                    <div class="stat-value">${summary.latestNDVI.toFixed(3)}</div>
+                    <div class="stat-date">${new Date(summary.latestDate).toLocaleDateString()}</div>
                 </div>
                 <div class="history-stat-card">
                     <div class="stat-label">Health Trend</div>
@@ -345,8 +449,8 @@ const NDVIHistory = {
                 </div>
                 <div class="history-stat-card">
                     <div class="stat-label">Health Score</div>
-                    <div class="stat-value">${latest.health_score}%</div>
-                    <div class="stat-date">${latest.health_class}</div>
+                    <div class="stat-value">${summary.latestHealthScore}%</div>
+                    <div class="stat-date">${summary.latestHealthClass}</div>
                 </div>
             `;
         }
@@ -354,7 +458,7 @@ const NDVIHistory = {
         // Update insights
         const insightsContainer = document.getElementById('history-insights-container');
         if (insightsContainer) {
-            const insights = this.generateInsights(trendChange, latest, oldest);
+            const insights = this.generateInsights(trendChange, summary);
             insightsContainer.innerHTML = insights.map(insight => `
                 <div class="insight-item ${insight.type}">
                     <i data-lucide="${insight.icon}"></i>
@@ -372,7 +476,7 @@ const NDVIHistory = {
     },
 
     // Generate insights from historical data
-    generateInsights(trendChange, latest, oldest) {
+    generateInsights(trendChange, summary) {
         const insights = [];
 
         // Trend insight
@@ -400,17 +504,17 @@ const NDVIHistory = {
         }
 
         // Stressed area insight
-        if (parseFloat(latest.stressed_percentage) > 25) {
+        if (summary.latestStressedPct > 25) {
             insights.push({
                 type: 'alert',
                 icon: 'alert-triangle',
                 title: 'High Stress Detected',
-                message: `${latest.stressed_percentage}% of field showing stress. Prioritize irrigation and nutrient management in affected zones.`
+                message: `${summary.latestStressedPct}% of field showing stress. Prioritize irrigation and nutrient management in affected zones.`
             });
         }
 
         // Long-term comparison
-        const totalChange = ((parseFloat(latest.mean_ndvi) - parseFloat(oldest.mean_ndvi)) / parseFloat(oldest.mean_ndvi)) * 100;
+        const totalChange = ((summary.latestNDVI - summary.firstNDVI) / summary.firstNDVI) * 100;
         insights.push({
             type: totalChange >= 0 ? 'positive' : 'warning',
             icon: 'calendar',
@@ -418,6 +522,19 @@ const NDVIHistory = {
             message: `Since first analysis, NDVI has ${totalChange >= 0 ? 'increased' : 'decreased'} by ${Math.abs(totalChange).toFixed(1)}%.`
         });
 
+        // Current season against the one before it (rollups only)
+        const season = summary.season;
+        if (season && season.ndvi_change_pct !== null) {
+            const change = parseFloat(season.ndvi_change_pct);
+            const slope = season.ndvi_slope !== null ? parseFloat(season.ndvi_slope) : 0;
+            insights.push({
+                type: change >= 0 ? 'positive' : 'warning',
+                icon: 'sun',
+                title: `${season.season === 'dry' ? 'Dry' : 'Rainy'} Season`,
+                message: `Season average NDVI ${parseFloat(season.avg_ndvi).toFixed(3)} is ${Math.abs(change).toFixed(1)}% ${change >= 0 ? 'above' : 'below'} the previous season, ${slope >= 0 ? 'rising' : 'falling'} ${Math.abs(slope).toFixed(3)} per month.`
+            });
+        }
+
         return insights;
     }
 };
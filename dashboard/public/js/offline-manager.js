@@ -3,11 +3,21 @@
  * Enables offline functionality with smart sync
  */
 
+// Columns of a synced reading; the sync service leaves NULL columns out
+const SYNCED_READING_COLUMNS = [
+    'id', 'gateway_id', 'field_id', 'zone_id', 'reading_time', 'air_temperature',
+    'air_humidity', 'light_intensity', 'par_value', 'co2_ppm', 'soil_moisture',
+    'soil_temperature', 'ph_value', 'ec_value', 'nitrogen_ppm', 'phosphorus_ppm',
+    'potassium_ppm', 'water_level', 'battery_level', 'pump_status', 'rssi',
+    'latitude', 'longitude', 'data_valid'
+];
+
 const OfflineManager = {
     db: null,
     isOnline: navigator.onLine,
     syncQueue: [],
     syncInProgress: false,
+    deltaSyncInProgress: false,
 
     // Initialize offline mode
     async init() {
@@ -24,7 +34,7 @@ const OfflineManager = {
     // Setup IndexedDB
     async setupDatabase() {
         return new Promise((resolve, reject) => {
-            const request = indexedDB.open('AgriConnectDB', 1);
+            const request = indexedDB.open('AgriConnectDB', 2);
 
             request.onerror = () => {
                 console.error('[ERROR] IndexedDB failed to open');
@@ -57,6 +67,24 @@ const OfflineManager = {
                     db.createObjectStore('offline-logs', { keyPath: 'id', autoIncrement: true });
                 }
 
+                // Delta sync (v2): rows keyed like their tables, so re-sent rows overwrite
+                if (!db.objectStoreNames.contains('readings')) {
+                    const readings = db.createObjectStore('readings', { keyPath: 'id' });
+                    readings.createIndex('reading_time', 'reading_time');
+                }
+
+                if (!db.objectStoreNames.contains('alerts')) {
+                    db.createObjectStore('alerts', { keyPath: 'alert_id' });
+                }
+
+                if (!db.objectStoreNames.contains('gateways')) {
+                    db.createObjectStore('gateways', { keyPath: 'gateway_id' });
+                }
+
+                if (!db.objectStoreNames.contains('sync-state')) {
+                    db.createObjectStore('sync-state', { keyPath: 'farmId' });
+                }
+
                 console.log('[INFO] IndexedDB stores created');
             };
         });
@@ -102,8 +130,11 @@ const OfflineManager = {
         this.isOnline = true;
         this.updateOnlineStatus();
 
-        // Auto-sync pending commands
+        // Auto-sync pending commands, then catch up on what changed while offline
         this.syncPendingCommands();
+        if (CONFIG.sync?.enabled) {
+            this.syncDelta().then(() => this.notifySynced());
+        }
 
         // Show notification
         if (typeof Notifications !== 'undefined') {
@@ -173,9 +204,12 @@ const OfflineManager = {
         });
     },
 
-    // Get cached sensor data
+    // Get cached sensor data (the synced readings once delta sync has run)
     async getCachedSensorData(limit = 100) {
         if (!this.db) return [];
+        if (await this.canServeLocally()) {
+            return this.getSyncedReadings(null, { limit, newestFirst: true });
+        }
 
         const transaction = this.db.transaction(['sensor-data'], 'readonly');
         const store = transaction.objectStore('sensor-data');
@@ -383,6 +417,228 @@ const OfflineManager = {
         }
 
         await this.syncPendingCommands();
+        if (CONFIG.sync?.enabled) {
+            await this.syncDelta();
+            this.notifySynced();
+        }
+    },
+
+    // Let the dashboard re-render from the synced stores
+    notifySynced() {
+        document.dispatchEvent(new CustomEvent('offline-sync-complete'));
+    },
+
+    // Fetch readings, alerts and gateways changed since the saved cursor
+    // (agriconnect_pipeline.sync). Rows are stored as each chunk arrives and
+    // the cursor after them, so a dropped connection resumes where it stopped.
+    async syncDelta() {
+        if (!this.db || !this.isOnline || this.deltaSyncInProgress) return;
+        this.deltaSyncInProgress = true;
+
+        try {
+            const { data: { session } } = await window.supabase.auth.getSession();
+            if (!session) return;
+
+            let more = true;
+            let rows = 0;
+            while (more && this.isOnline) {
+                const state = await this.getSyncState(CONFIG.farmId);
+                // Without a cursor the service sends its initial window of readings
+                const coveredFrom = state?.coveredFrom ?? new Date(
+                    Date.now() - (CONFIG.sync.initialHours || 24) * 3600000
+                ).toISOString();
+                const url = new URL(`${CONFIG.sync.url}/sync/${encodeURIComponent(CONFIG.farmId)}`);
+                if (state) url.searchParams.set('cursor', state.cursor);
+
+                const response = await fetch(url, {
+                    headers: { Authorization: `Bearer ${session.access_token}` }
+                });
+                if (!response.ok) throw new Error(`Sync failed: HTTP ${response.status}`);
+
+                more = false;
+                let pending = [];
+                await this.readLines(response, async (line) => {
+                    const item = JSON.parse(line);
+                    if (item.t !== 'cursor') {
+                        pending.push(item);
+                        return;
+                    }
+                    await this.storeDelta(pending, item.cursor, coveredFrom);
+                    rows += pending.length;
+                    pending = [];
+                    more = item.more;
+                });
+            }
+
+            await this.pruneSynced();
+            console.log(`[SUCCESS] Delta sync: ${rows} rows updated`);
+        } catch (error) {
+            console.error('[ERROR] Delta sync failed:', error);
+        } finally {
+            this.deltaSyncInProgress = false;
+        }
+    },
+
+    // Call onLine for each NDJSON line of a streamed response, in order
+    async readLines(response, onLine) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffered = '';
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffered += decoder.decode(value, { stream: true });
+            const lines = buffered.split('\n');
+            buffered = lines.pop();
+            for (const line of lines) {
+                if (line) await onLine(line);
+            }
+        }
+    },
+
+    // Store one chunk of synced rows together with the cursor that follows it
+    async storeDelta(items, cursor, coveredFrom) {
+        const stores = { reading: 'readings', alert: 'alerts', gateway: 'gateways' };
+        const transaction = this.db.transaction(
+            ['readings', 'alerts', 'gateways', 'sync-state'], 'readwrite'
+        );
+
+        for (const { t, ...row } of items) {
+            // One time format, so the reading_time index orders and ranges correctly
+            if (t === 'reading') row.reading_time = new Date(row.reading_time).toISOString();
+            if (stores[t]) transaction.objectStore(stores[t]).put(row);
+        }
+        transaction.objectStore('sync-state').put({
+            farmId: CONFIG.farmId,
+            cursor: cursor,
+            coveredFrom: coveredFrom,           // readings are complete from here on
+            timestamp: new Date().toISOString()
+        });
+
+        return new Promise((resolve, reject) => {
+            transaction.oncomplete = () => resolve();
+            transaction.onerror = () => reject(transaction.error);
+        });
+    },
+
+    // Get the saved delta sync cursor for a farm
+    async getSyncState(farmId) {
+        const transaction = this.db.transaction(['sync-state'], 'readonly');
+        const store = transaction.objectStore('sync-state');
+
+        return new Promise((resolve, reject) => {
+            const request = store.get(farmId);
+            request.onsuccess = () => resolve(request.result || null);
+            request.onerror = () => reject(request.error);
+        });
+    },
+
+    // Hours of readings kept in IndexedDB
+    retentionHours() {
+        return CONFIG.sync?.retentionHours || 72;
+    },
+
+    // Whether reads can come from the synced stores instead of the network:
+    // delta sync has run, and the last `hours` are stored (offline, any window)
+    async canServeLocally(hours = 0) {
+        if (!this.db || !CONFIG.sync?.enabled) return false;
+        const state = await this.getSyncState(CONFIG.farmId);
+        if (!state) return false;
+        if (!this.isOnline) return true;
+        const since = new Date(Date.now() - hours * 3600000).toISOString();
+        return Boolean(state.coveredFrom) && state.coveredFrom <= since;
+    },
+
+    // Synced readings from an ISO time on, oldest first (newestFirst for latest-N)
+    async getSyncedReadings(since, { limit = Infinity, newestFirst = false } = {}) {
+        const transaction = this.db.transaction(['readings'], 'readonly');
+        const index = transaction.objectStore('readings').index('reading_time');
+        const range = since ? IDBKeyRange.lowerBound(since) : null;
+        const rows = [];
+
+        return new Promise((resolve, reject) => {
+            const request = index.openCursor(range, newestFirst ? 'prev' : 'next');
+            request.onsuccess = () => {
+                const cursor = request.result;
+                if (!cursor || rows.length >= limit) {
+                    resolve(rows);
+                    return;
+                }
+                const row = {};
+                SYNCED_READING_COLUMNS.forEach(column => { row[column] = null; });
+                rows.push(Object.assign(row, cursor.value));
+                cursor.continue();
+            };
+            request.onerror = () => reject(request.error);
+        });
+    },
+
+    // Synced unacknowledged alerts, newest first
+    async getSyncedAlerts(limit = 10) {
+        const transaction = this.db.transaction(['alerts'], 'readonly');
+        const store = transaction.objectStore('alerts');
+
+        return new Promise((resolve, reject) => {
+            const request = store.getAll();
+            request.onsuccess = () => {
+                const alerts = request.result
+                    .filter(alert => !alert.acknowledged)
+                    .sort((a, b) => (b.created_at > a.created_at ? 1 : -1))
+                    .slice(0, limit)
+                    .map(alert => ({ field_id: null, zone_id: null, ...alert }));
+                resolve(alerts);
+            };
+            request.onerror = () => reject(request.error);
+        });
+    },
+
+    // Drop readings, acknowledged alerts and cached sensor data older than
+    // retentionHours(), so IndexedDB does not grow without limit
+    async pruneSynced() {
+        const cutoff = new Date(Date.now() - this.retentionHours() * 3600000).toISOString();
+        const transaction = this.db.transaction(
+            ['readings', 'alerts', 'sensor-data', 'sync-state'], 'readwrite'
+        );
+
+        const readings = transaction.objectStore('readings').index('reading_time');
+        readings.openCursor(IDBKeyRange.upperBound(cutoff, true)).onsuccess = (event) => {
+            const cursor = event.target.result;
+            if (!cursor) return;
+            cursor.delete();
+            cursor.continue();
+        };
+
+        transaction.objectStore('alerts').openCursor().onsuccess = (event) => {
+            const cursor = event.target.result;
+            if (!cursor) return;
+            const alert = cursor.value;
+            const changed = new Date(alert.updated_at || alert.created_at).toISOString();
+            if (alert.acknowledged && changed < cutoff) {
+                cursor.delete();
+            }
+            cursor.continue();
+        };
+
+        transaction.objectStore('sensor-data').openCursor().onsuccess = (event) => {
+            const cursor = event.target.result;
+            if (!cursor) return;
+            if (cursor.value.timestamp < cutoff) cursor.delete();
+            cursor.continue();
+        };
+
+        const states = transaction.objectStore('sync-state');
+        states.get(CONFIG.farmId).onsuccess = (event) => {
+            const state = event.target.result;
+            if (state && (!state.coveredFrom || state.coveredFrom < cutoff)) {
+                states.put({ ...state, coveredFrom: cutoff });
+            }
+        };
+
+        return new Promise((resolve, reject) => {
+            transaction.oncomplete = () => resolve();
+            transaction.onerror = () => reject(transaction.error);
+        });
     },
 
     // Cache weather data
@@ -447,6 +703,7 @@ const OfflineManager = {
             isOnline: this.isOnline,
             pendingCommands: this.syncQueue.length,
             syncInProgress: this.syncInProgress,
+            deltaSyncInProgress: this.deltaSyncInProgress,
             dbAvailable: this.db !== null
         };
     }
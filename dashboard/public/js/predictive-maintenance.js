@@ -103,8 +103,11 @@ const PredictiveMaintenance = {
     trackPumpUsage() {
         if (!this.equipment.pump) return;
 
-        this.equipment.pump.cycles++;
-        this.equipment.pump.runtime += 15; // Assume 15 min average
+        // Server counters (pump_usage) come from the readings themselves
+        if (!this.equipment.pump.serverCounters) {
+            this.equipment.pump.cycles++;
+            this.equipment.pump.runtime += 15; // Assume 15 min average
+        }
 
         // Check for maintenance due
         this.checkPumpMaintenance();
@@ -133,9 +136,10 @@ const PredictiveMaintenance = {
     },
 
     // Analyze equipment health
-    analyzeEquipmentHealth() {
+    async analyzeEquipmentHealth() {
         console.log('[INFO] Analyzing equipment health...');
 
+        await this.fetchServerPumpUsage();
         this.analyzePumpHealth();
         this.analyzeGatewayHealth();
         this.analyzeSensorHealth();
@@ -144,6 +148,33 @@ const PredictiveMaintenance = {
         this.updateUI();
     },
 
+    // Load pump runtime and cycles accounted at ingest (all of the farm's gateways)
+    async fetchServerPumpUsage() {
+        const pump = this.equipment.pump;
+        if (!pump || !window.supabase || typeof window.supabase.from !== 'function') {
+            return;
+        }
+
+        try {
+            const { data, error } = await window.supabase
+                .from('pump_usage')
+                .select('runtime_hours, cycles, running, duty_cycle_7d')
+                .eq('farm_id', CONFIG.farmId);
+
+            if (error || !data || data.length === 0) {
+                return;
+            }
+
+            pump.runtime = data.reduce((sum, row) => sum + parseFloat(row.runtime_hours || 0), 0);
+            pump.cycles = data.reduce((sum, row) => sum + parseInt(row.cycles || 0, 10), 0);
+            pump.running = data.some(row => row.running);
+            pump.dutyCycle = Math.max(...data.map(row => parseFloat(row.duty_cycle_7d || 0)));
+            pump.serverCounters = true;
+        } catch (error) {
+            console.log('[INFO] Server pump usage unavailable, using local counters');
+        }
+    },
+
     // Analyze pump health
     analyzePumpHealth() {
         const pump = this.equipment.pump;
@@ -186,6 +217,17 @@ const PredictiveMaintenance = {
             health -= 5;
         }
 
+        // Check duty cycle (last 7 days, from the server)
+        if (pump.dutyCycle > 0.5) {
+            alerts.push({
+                type: 'warning',
+                message: `Pump running ${Math.round(pump.dutyCycle * 100)}% of the time - check for leaks or undersizing`,
+                severity: 'medium',
+                dueDate: this.addDays(new Date(), 7)
+            });
+            health -= 10;
+        }
+
         pump.health = Math.max(0, health);
         pump.alerts = alerts;
     },
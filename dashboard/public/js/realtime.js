@@ -38,13 +38,59 @@ const Realtime = {
             (reading) => this._updateMap(reading)
         );
 
-        this.subscribeToSensorReadings();
+        // The fan-out service sends one coalesced frame per farm per tick
+        // instead of every sensor_readings row
+        if (CONFIG.websocket && CONFIG.websocket.enabled) {
+            this.subscribeToFanout();
+        } else {
+            this.subscribeToSensorReadings();
+        }
         this.subscribeToAlerts();
         this.subscribeToControlCommands();
+        this.loadCropThresholds();
 
         console.log('[SUCCESS] Real-time module initialized');
     },
 
+    // Replace the built-in thresholds with the farm's crop and growth stage
+    // from crop_rules, the rule files the pipeline checks readings against
+    async loadCropThresholds() {
+        try {
+            const { data: farm, error: farmError } = await window.supabase
+                .from('farms')
+                .select('crop_type, planting_date')
+                .eq('farm_id', CONFIG.farmId)
+                .single();
+            if (farmError) throw farmError;
+
+            const key = (farm.crop_type || 'tomato').trim().toLowerCase();
+            const crop = CONFIG.cropAliases[key] || key;
+            const { data: profiles, error } = await window.supabase
+                .from('crop_rules')
+                .select('crop, stage, first_day, last_day, rules')
+                .in('crop', [crop, 'tomato']);
+            if (error) throw error;
+
+            const day = farm.planting_date
+                ? Math.floor((Date.now() - new Date(farm.planting_date)) / 86400000)
+                : null;
+            const ofCrop = profiles.filter(p => p.crop === crop);
+            const candidates = ofCrop.length ? ofCrop : profiles;
+            const profile = candidates.find(p => day !== null && p.first_day !== null &&
+                                                 p.first_day <= day && day < p.last_day)
+                || candidates.find(p => p.stage === 'default');
+            if (!profile) return;
+
+            for (const [sensor, range] of Object.entries(profile.rules.optimalRanges)) {
+                const current = CONFIG.sensorThresholds[sensor] || { unit: '' };
+                CONFIG.sensorThresholds[sensor] = { ...current, min: range.min, max: range.max };
+            }
+            console.log(`[SUCCESS] Thresholds loaded for ${crop}/${profile.stage}`);
+        } catch (error) {
+            console.warn('[WARNING] Crop thresholds not loaded, using built-in values:', error.message);
+        }
+    },
+
     // Subscribe to sensor readings table
     subscribeToSensorReadings() {
         console.log('[INFO] Subscribing to sensor readings...');
@@ -93,6 +139,56 @@ const Realtime = {
             });
     },
 
+    // Subscribe to live zone values from the fan-out service. Browsers cannot
+    // set headers on a WebSocket, so the access token is offered as a
+    // "bearer.<token>" subprotocol; the service answers with agriconnect.v1
+    async subscribeToFanout() {
+        const url = `${CONFIG.websocket.url}/farms/${encodeURIComponent(CONFIG.farmId)}`;
+        console.log(`[INFO] Connecting to live updates at ${url}...`);
+
+        const { data: { session } } = await window.supabase.auth.getSession();
+        if (!session) {
+            console.log('[WARNING] Not signed in - live updates need an access token');
+            setTimeout(() => this.subscribeToFanout(), CONFIG.websocket.reconnectInterval);
+            return;
+        }
+
+        this.zoneState = {};
+        this.socket = new WebSocket(url, ['agriconnect.v1', `bearer.${session.access_token}`]);
+        this.socket.onopen = () => {
+            this.isConnected = true;
+            this.reconnectAttempts = 0;
+            console.log('[SUCCESS] Connected to live updates');
+        };
+        this.socket.onmessage = (event) => this.handleFanoutFrame(JSON.parse(event.data));
+        this.socket.onclose = () => {
+            this.isConnected = false;
+            this.socket = null;
+            console.log('[WARNING] Live updates connection closed');
+            setTimeout(() => this.subscribeToFanout(), CONFIG.websocket.reconnectInterval);
+        };
+    },
+
+    // Apply a snapshot ("s") or delta ("d") frame: changed fields per zone
+    handleFanoutFrame(frame) {
+        if (frame.t === 's') {
+            this.zoneState = {};
+        }
+        Object.entries(frame.z).forEach(([zone, fields]) => {
+            let reading = this.zoneState[zone];
+            if (!reading) {
+                const [gatewayId, fieldId, zoneId] = zone.split('/');
+                reading = this.zoneState[zone] = {
+                    gateway_id: gatewayId,
+                    field_id: Number(fieldId),
+                    zone_id: Number(zoneId)
+                };
+            }
+            Object.assign(reading, fields);
+            this.handleNewSensorReading(reading);
+        });
+    },
+
     // Subscribe to alerts table
     subscribeToAlerts() {
         console.log('[INFO] Subscribing to alerts...');
@@ -238,7 +334,8 @@ const Realtime = {
         }
     },
 
-    // Check sensor thresholds
+    // Check sensor thresholds (on-screen only: the pipeline turns readings
+    // into alerts and the notification dispatcher sends email/SMS digests)
     checkThresholds(reading) {
         const thresholds = CONFIG.sensorThresholds;
         const violations = [];
@@ -247,28 +344,8 @@ const Realtime = {
         if (reading.air_temperature) {
             if (reading.air_temperature < thresholds.airTemperature.min) {
                 violations.push(`Low temperature: ${reading.air_temperature}°C`);
-
-                // Send email for critical temperature
-                if (reading.air_temperature < 15 && typeof EmailAlerts !== 'undefined') {
-                    EmailAlerts.sendCriticalTemperatureAlert(reading.air_temperature, 15);
-                }
-
-                // Send SMS for extreme temperature
-                if (reading.air_temperature < 10 && typeof SMSAlerts !== 'undefined') {
-                    SMSAlerts.sendCriticalTemperatureAlert(reading.air_temperature, 10);
-                }
             } else if (reading.air_temperature > thresholds.airTemperature.max) {
                 violations.push(`High temperature: ${reading.air_temperature}°C`);
-
-                // Send email for critical temperature
-                if (reading.air_temperature > 35 && typeof EmailAlerts !== 'undefined') {
-                    EmailAlerts.sendCriticalTemperatureAlert(reading.air_temperature, 35);
-                }
-
-                // Send SMS for extreme temperature
-                if (reading.air_temperature > 40 && typeof SMSAlerts !== 'undefined') {
-                    SMSAlerts.sendCriticalTemperatureAlert(reading.air_temperature, 40);
-                }
             }
         }
 
@@ -285,16 +362,6 @@ const Realtime = {
         if (reading.soil_moisture) {
             if (reading.soil_moisture < thresholds.soilMoisture.min) {
                 violations.push(`Low soil moisture: ${reading.soil_moisture}`);
-
-                // Send email for critically dry soil
-                if (reading.soil_moisture < 300 && typeof EmailAlerts !== 'undefined') {
-                    EmailAlerts.sendDrySoilAlert(reading.soil_moisture, thresholds.soilMoisture.min);
-                }
-
-                // Send SMS for severely dry soil
-                if (reading.soil_moisture < 250 && typeof SMSAlerts !== 'undefined') {
-                    SMSAlerts.sendDrySoilAlert(reading.soil_moisture, 250);
-                }
             } else if (reading.soil_moisture > thresholds.soilMoisture.max) {
                 violations.push(`High soil moisture: ${reading.soil_moisture}`);
             }
@@ -303,18 +370,6 @@ const Realtime = {
         // Check battery level
         if (reading.battery_level && reading.battery_level < 15) {
             violations.push(`Low battery: ${reading.battery_level}%`);
-
-            // Send email for low battery
-            if (typeof EmailAlerts !== 'undefined') {
-                const nodeId = `Field ${reading.field_id} - Zone ${reading.zone_id}`;
-                EmailAlerts.sendLowBatteryAlert(reading.battery_level, nodeId);
-            }
-
-            // Send SMS for critical battery
-            if (reading.battery_level < 10 && typeof SMSAlerts !== 'undefined') {
-                const nodeId = `Field ${reading.field_id} - Zone ${reading.zone_id}`;
-                SMSAlerts.sendLowBatteryAlert(reading.battery_level, nodeId);
-            }
         }
 
         // Show notifications for violations (with rate limiting)
@@ -472,6 +527,11 @@ const Realtime = {
 
     // Cleanup
     destroy() {
+        if (this.socket) {
+            this.socket.onclose = null;
+            this.socket.close();
+            this.socket = null;
+        }
         if (this.channel) {
             window.supabase.removeChannel(this.channel);
             this.channel = null;
@@ -100,6 +100,9 @@ const SMSAlerts = {
 
         localStorage.setItem('sms_alert_phone', phone);
         localStorage.setItem('sms_alerts_enabled', this.enabled.toString());
+        if (typeof GlobalAlerts !== 'undefined') {
+            await GlobalAlerts.saveRecipient('sms', phone, this.enabled, previousPhone);
+        }
 
         // Check if this is a new phone number or newly enabled
         const isNewSetup = (this.recipientPhone !== previousPhone) ||
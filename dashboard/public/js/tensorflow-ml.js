@@ -1,11 +1,13 @@
 /**
  * TensorFlow.js Advanced Machine Learning Module
- * Provides neural network predictions, anomaly detection, and time-series forecasting
+ * Provides neural network anomaly detection and time-series forecasting.
+ * Yield predictions come from the server-side per-crop models
+ * (agriconnect_pipeline.yield_models, scored nightly into yield_predictions);
+ * no yield model is trained in the browser.
  */
 
 const TensorFlowML = {
     // Model instances
-    yieldPredictionModel: null,
     anomalyDetectionModel: null,
     forecastingModel: null,
 
@@ -16,16 +18,13 @@ const TensorFlowML = {
         std: {}
     },
 
+    // Server predictions per zone ("field|zone" -> { prediction, fetchedAt })
+    serverPredictions: {},
+
     // Model configuration
     config: {
-        yieldModel: {
-            inputFeatures: 8, // temp, humidity, soil, ndvi, rainfall, sunlight, soil_temp, battery
-            hiddenLayers: [32, 16, 8],
-            outputUnits: 1, // yield prediction
-            epochs: 50,
-            batchSize: 16,
-            learningRate: 0.001
-        },
+        inputFeatures: 8, // temp, humidity, soil, ndvi, rainfall, sunlight, soil_temp, battery
+        serverPredictionTtl: 600000, // yield_predictions are rescored nightly
         anomalyModel: {
             encodingDim: 4,
             epochs: 30,
@@ -73,15 +72,10 @@ const TensorFlowML = {
 
     // Initialize or load ML models
     async initializeModels() {
-        // Try to load saved models from IndexedDB
-        try {
-            this.yieldPredictionModel = await tf.loadLayersModel('indexeddb://yield-prediction-model');
-            console.log('[INFO] Loaded saved yield prediction model');
-        } catch (error) {
-            console.log('[INFO] Creating new yield prediction model...');
-            this.yieldPredictionModel = this.buildYieldPredictionModel();
-        }
+        // Yield models used to be trained here; drop the stale copy
+        tf.io.removeModel('indexeddb://yield-prediction-model').catch(() => {});
 
+        // Try to load saved models from IndexedDB
         try {
             this.anomalyDetectionModel = await tf.loadLayersModel('indexeddb://anomaly-detection-model');
             console.log('[INFO] Loaded saved anomaly detection model');
@@ -99,53 +93,10 @@ const TensorFlowML = {
         }
     },
 
-    // Build neural network for yield prediction
-    buildYieldPredictionModel() {
-        const model = tf.sequential();
-
-        // Input layer
-        model.add(tf.layers.dense({
-            inputShape: [this.config.yieldModel.inputFeatures],
-            units: this.config.yieldModel.hiddenLayers[0],
-            activation: 'relu',
-            kernelInitializer: 'heNormal'
-        }));
-
-        model.add(tf.layers.dropout({ rate: 0.2 }));
-
-        // Hidden layers
-        for (let i = 1; i < this.config.yieldModel.hiddenLayers.length; i++) {
-            model.add(tf.layers.dense({
-                units: this.config.yieldModel.hiddenLayers[i],
-                activation: 'relu',
-                kernelInitializer: 'heNormal'
-            }));
-            model.add(tf.layers.dropout({ rate: 0.15 }));
-        }
-
-        // Output layer
-        model.add(tf.layers.dense({
-            units: this.config.yieldModel.outputUnits,
-            activation: 'linear'
-        }));
-
-        // Compile model
-        model.compile({
-            optimizer: tf.train.adam(this.config.yieldModel.learningRate),
-            loss: 'meanSquaredError',
-            metrics: ['mae']
-        });
-
-        console.log('[INFO] Yield prediction model architecture:');
-        model.summary();
-
-        return model;
-    },
-
     // Build autoencoder for anomaly detection
     buildAnomalyDetectionModel() {
         const encodingDim = this.config.anomalyModel.encodingDim;
-        const inputDim = this.config.yieldModel.inputFeatures;
+        const inputDim = this.config.inputFeatures;
 
         const input = tf.input({ shape: [inputDim] });
 
@@ -195,7 +146,7 @@ const TensorFlowML = {
 
         // LSTM layers
         model.add(tf.layers.lstm({
-            inputShape: [this.config.forecastingModel.lookBack, this.config.yieldModel.inputFeatures],
+            inputShape: [this.config.forecastingModel.lookBack, this.config.inputFeatures],
             units: 64,
             returnSequences: true
         }));
@@ -217,7 +168,7 @@ const TensorFlowML = {
 
         // Output layer (predict next values)
         model.add(tf.layers.dense({
-            units: this.config.yieldModel.inputFeatures,
+            units: this.config.inputFeatures,
             activation: 'linear'
         }));
 
@@ -315,55 +266,40 @@ const TensorFlowML = {
         ];
     },
 
-    // Predict yield using neural network
-    async predictYield(sensorData, ndviScore = 0.7, rainfall = 0, sunlight = 8) {
-        if (!this.yieldPredictionModel) {
-            console.error('[ERROR] Yield prediction model not initialized');
-            return null;
+    // Latest server-side yield prediction for the reading's zone
+    async predictYield(sensorData) {
+        const zone = `${sensorData.field_id}|${sensorData.zone_id}`;
+        const cached = this.serverPredictions[zone];
+        if (cached && Date.now() - cached.fetchedAt < this.config.serverPredictionTtl) {
+            return cached.prediction;
         }
 
         try {
-            const features = this.prepareInputFeatures(sensorData, ndviScore, rainfall, sunlight);
-
-            const prediction = await tf.tidy(() => {
-                const inputTensor = tf.tensor2d([features]);
-                const output = this.yieldPredictionModel.predict(inputTensor);
-                return output.dataSync()[0];
-            });
-
-            // Denormalize prediction (assuming yield in tons/hectare, 0-10 range)
-            const yieldPrediction = Math.max(0, prediction * 10);
+            const { data, error } = await window.supabase
+                .from('yield_predictions')
+                .select('predicted_yield_kg_ha, model_version, predicted_at')
+                .eq('farm_id', CONFIG.farmId)
+                .eq('field_id', sensorData.field_id)
+                .eq('zone_id', sensorData.zone_id)
+                .maybeSingle();
 
-            // Calculate confidence based on input quality
-            const confidence = this.calculatePredictionConfidence(features);
+            if (error) throw error;
 
-            return {
-                yield: yieldPrediction.toFixed(2),
-                confidence: (confidence * 100).toFixed(1),
+            const prediction = data ? {
+                yield: (parseFloat(data.predicted_yield_kg_ha) / 1000).toFixed(2),
                 unit: 'tons/hectare',
-                factors: {
-                    temperature: sensorData.air_temperature,
-                    humidity: sensorData.air_humidity,
-                    soilMoisture: sensorData.soil_moisture,
-                    ndvi: ndviScore,
-                    rainfall,
-                    sunlight
-                }
-            };
+                modelVersion: data.model_version,
+                predictedAt: data.predicted_at
+            } : null;
+            this.serverPredictions[zone] = { prediction, fetchedAt: Date.now() };
+            return prediction;
 
         } catch (error) {
-            console.error('[ERROR] Yield prediction failed:', error);
+            console.error('[ERROR] Yield prediction unavailable:', error.message);
             return null;
         }
     },
 
-    // Calculate prediction confidence
-    calculatePredictionConfidence(features) {
-        // Confidence based on feature quality (all normalized, should be close to 0)
-        const deviation = features.reduce((sum, val) => sum + Math.abs(val), 0) / features.length;
-        return Math.max(0.5, 1 - (deviation / 2));
-    },
-
     // Detect anomalies in sensor readings
     async detectAnomalies(sensorData, ndviScore = 0.7, rainfall = 0, sunlight = 8) {
         if (!this.anomalyDetectionModel) {
@@ -512,16 +448,13 @@ const TensorFlowML = {
             console.log('[INFO] Starting model training...');
 
             // Prepare training data
-            const { inputs, outputs } = this.prepareTrainingData();
+            const inputs = this.prepareTrainingData();
 
             if (inputs.length === 0) {
                 console.warn('[WARN] No valid training samples');
                 return false;
             }
 
-            // Train yield prediction model
-            await this.trainYieldModel(inputs, outputs, progressCallback);
-
             // Train anomaly detection model
             await this.trainAnomalyModel(inputs, progressCallback);
 
@@ -537,55 +470,11 @@ const TensorFlowML = {
         }
     },
 
-    // Prepare training data from historical readings
+    // Prepare anomaly model inputs from historical readings
     prepareTrainingData() {
-        const inputs = [];
-        const outputs = [];
-
-        this.historicalData.forEach(reading => {
-            if (reading.air_temperature != null && reading.soil_moisture != null) {
-                const input = this.prepareInputFeatures(reading, 0.7, 0, 8);
-
-                // Simulated yield output (in real scenario, would come from actual harvest data)
-                const yieldValue = this.estimateYield(reading) / 10; // Normalized 0-1
-
-                inputs.push(input);
-                outputs.push([yieldValue]);
-            }
-        });
-
-        return { inputs, outputs };
-    },
-
-    // Estimate yield from sensor readings (simplified)
-    estimateYield(reading) {
-        const tempScore = Math.max(0, 1 - Math.abs(reading.air_temperature - 25) / 15);
-        const moistureScore = Math.max(0, 1 - Math.abs(reading.soil_moisture - 500) / 300);
-        return (tempScore + moistureScore) * 5; // 0-10 tons/hectare
-    },
-
-    // Train yield prediction model
-    async trainYieldModel(inputs, outputs, progressCallback) {
-        const inputTensor = tf.tensor2d(inputs);
-        const outputTensor = tf.tensor2d(outputs);
-
-        const history = await this.yieldPredictionModel.fit(inputTensor, outputTensor, {
-            epochs: this.config.yieldModel.epochs,
-            batchSize: this.config.yieldModel.batchSize,
-            validationSplit: 0.2,
-            callbacks: {
-                onEpochEnd: (epoch, logs) => {
-                    if (progressCallback) {
-                        progressCallback('yield', epoch + 1, this.config.yieldModel.epochs, logs);
-                    }
-                }
-            }
-        });
-
-        inputTensor.dispose();
-        outputTensor.dispose();
-
-        return history;
+        return this.historicalData
+            .filter(reading => reading.air_temperature != null && reading.soil_moisture != null)
+            .map(reading => this.prepareInputFeatures(reading, 0.7, 0, 8));
     },
 
     // Train anomaly detection model
@@ -613,7 +502,6 @@ const TensorFlowML = {
     // Save trained models
     async saveModels() {
         try {
-            await this.yieldPredictionModel.save('indexeddb://yield-prediction-model');
             await this.anomalyDetectionModel.save('indexeddb://anomaly-detection-model');
             await this.forecastingModel.save('indexeddb://forecasting-model');
             console.log('[SUCCESS] Models saved to IndexedDB');
@@ -633,7 +521,7 @@ const TensorFlowML = {
 
         try {
             // Yield prediction
-            insights.yieldPrediction = await this.predictYield(currentReading, ndviScore);
+            insights.yieldPrediction = await this.predictYield(currentReading);
 
             // Anomaly detection
             insights.anomalyDetection = await this.detectAnomalies(currentReading, ndviScore);
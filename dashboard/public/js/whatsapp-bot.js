@@ -668,10 +668,14 @@ const WhatsAppBot = {
 
     // Save settings
     saveSettings() {
+        const previous = JSON.parse(localStorage.getItem('whatsapp-bot-settings') || '{}');
         localStorage.setItem('whatsapp-bot-settings', JSON.stringify({
             enabled: this.enabled,
             phoneNumber: this.phoneNumber
         }));
+        if (typeof GlobalAlerts !== 'undefined') {
+            GlobalAlerts.saveRecipient('whatsapp', this.phoneNumber, this.enabled, previous.phoneNumber);
+        }
     },
 
     // Send welcome message to verify setup
@@ -122,8 +122,8 @@ const YieldForecast = {
             trained: false
         };
 
-        // Train model on historical data
-        this.trainModel();
+        // Trained on first use: forecasts come from the server models when
+        // they have scored this farm, so most visits never need it
     },
 
     // Train model using historical data
@@ -151,16 +151,14 @@ const YieldForecast = {
                 const avgIrrigation = this.average(cropData.map(d => d.irrigationHours));
 
                 // Store crop-specific parameters
-                if (!this.model[crop]) {
-                    this.model[crop] = {
-                        avgYield,
-                        avgMoisture,
-                        avgTemp,
-                        avgRain,
-                        avgNDVI,
-                        avgIrrigation
-                    };
-                }
+                this.model[crop] = {
+                    avgYield,
+                    avgMoisture,
+                    avgTemp,
+                    avgRain,
+                    avgNDVI,
+                    avgIrrigation
+                };
             }
         });
 
@@ -183,9 +181,9 @@ const YieldForecast = {
             const area = parseFloat(document.getElementById('forecast-area')?.value) || 1.0;
             console.log('[DEBUG] Crop:', crop, 'Area:', area);
 
-            // Make prediction
+            // Make prediction (server batch score first, local model as fallback)
             console.log('[DEBUG] Making prediction...');
-            const prediction = this.predict(crop, conditions);
+            const prediction = await this.fetchServerPrediction(crop, area) || this.predict(crop, conditions);
             console.log('[DEBUG] Prediction:', prediction);
 
             // Calculate confidence based on data quality
@@ -282,8 +280,49 @@ const YieldForecast = {
         return conditions;
     },
 
+    // Crop name as stored server-side (farms.crop_type spelling); mirrors
+    // features.crop_key in the Python pipeline
+    serverCropKey(crop) {
+        const key = (crop || 'tomato').trim().toLowerCase();
+        return CONFIG.cropAliases[key] || key;
+    },
+
+    // Fetch the latest server-side prediction (scored nightly per zone)
+    async fetchServerPrediction(crop, area) {
+        if (!window.supabase || typeof window.supabase.from !== 'function') {
+            return null;
+        }
+
+        try {
+            const { data, error } = await window.supabase
+                .from('yield_predictions')
+                .select('predicted_yield_kg_ha, model_version')
+                .eq('farm_id', CONFIG.farmId)
+                .eq('crop_type', this.serverCropKey(crop));
+
+            if (error || !data || data.length === 0) {
+                return null;
+            }
+
+            const yieldPerHa = this.average(data.map(row => parseFloat(row.predicted_yield_kg_ha)));
+            console.log(`[INFO] Using server yield model ${data[0].model_version}`);
+
+            return {
+                yieldPerHa: Math.max(0, Math.round(yieldPerHa)),
+                yield: Math.max(0, Math.round(yieldPerHa * area))
+            };
+        } catch (error) {
+            console.log('[INFO] Server prediction unavailable, using local model');
+            return null;
+        }
+    },
+
     // Predict yield using trained model
     predict(crop, conditions) {
+        if (!this.model.trained) {
+            this.trainModel();
+        }
+
         if (!this.model.trained || !this.model[crop]) {
             console.warn('[WARN] Model not trained for crop:', crop);
             return { yield: 0, yieldPerHa: 0 };
@@ -574,8 +613,37 @@ const YieldForecast = {
         });
         this.saveHistoricalData();
 
-        // Retrain model with new data
-        this.trainModel();
+        // Send to the server so the nightly yield models can train on it
+        this.saveHarvestRecordToServer(record);
+
+        // The local fallback retrains on its next use
+        this.model.trained = false;
+    },
+
+    // Persist a harvest record for server-side model training
+    async saveHarvestRecordToServer(record) {
+        if (!window.supabase || typeof window.supabase.from !== 'function') {
+            return;
+        }
+
+        const { error } = await window.supabase
+            .from('harvest_records')
+            .insert({
+                farm_id: CONFIG.farmId,
+                crop_type: this.serverCropKey(record.crop),
+                area_hectares: record.area || 1.0,
+                avg_soil_moisture: record.avgSoilMoisture,
+                avg_temperature: record.avgTemperature,
+                total_rainfall: record.totalRainfall,
+                avg_ndvi: record.avgNDVI,
+                irrigation_hours: record.irrigationHours,
+                fertilization_level: record.fertilizationLevel,
+                actual_yield_kg_ha: record.actualYield
+            });
+
+        if (error) {
+            console.warn('[WARN] Failed to save harvest record to server:', error.message);
+        }
     },
 
     // Get forecast summary
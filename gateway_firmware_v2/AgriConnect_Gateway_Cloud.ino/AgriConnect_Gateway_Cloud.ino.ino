@@ -88,6 +88,7 @@ void handleLoRaData();
 void publishSensorData(JsonDocument& doc);
 void publishStatus();
 void mqttCallback(char* topic, byte* payload, unsigned int length);
+void publishAck(const char* commandId, const char* status);
 void bufferMessage(String message);
 void sendBufferedMessages();
 void updateLEDs();
@@ -425,6 +426,24 @@ void mqttCallback(char* topic, byte* payload, unsigned int length) {
         digitalWrite(YELLOW_LED_PIN, HIGH);
         delay(1000);
         digitalWrite(YELLOW_LED_PIN, LOW);
+        
+        publishAck(doc["commandId"] | "", "ok");
+    } else {
+        publishAck(doc["commandId"] | "", "error");
+    }
+}
+
+void publishAck(const char* commandId, const char* status) {
+    // The cloud re-sends a command until it sees this ack
+    if (strlen(commandId) == 0) return;
+    
+    String topic = "agriconnect/ack/" + String(GATEWAY_ID);
+    String payload = "{\"gatewayId\":\"" + String(GATEWAY_ID) +
+                     "\",\"commandId\":\"" + String(commandId) +
+                     "\",\"status\":\"" + String(status) + "\"}";
+    
+    if (mqttClient.publish(topic.c_str(), payload.c_str())) {
+        Serial.printf("✓ Ack sent for %s\n", commandId);
     }
 }
 
@@ -0,0 +1,67 @@
+-- Create table for harvest records used to train server-side yield models
+CREATE TABLE IF NOT EXISTS harvest_records (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    farm_id TEXT NOT NULL,
+    field_id INTEGER,
+    zone_id INTEGER,
+    crop_type TEXT NOT NULL,
+    season_start DATE,
+    season_end DATE,
+    area_hectares DECIMAL(10, 2) DEFAULT 1.0,
+
+    -- Season features (same fields as YieldForecast.addHarvestRecord)
+    avg_soil_moisture DECIMAL(8, 2),
+    avg_temperature DECIMAL(5, 2),
+    total_rainfall DECIMAL(8, 2),
+    avg_ndvi DECIMAL(5, 3),
+    irrigation_hours DECIMAL(8, 2),
+    fertilization_level DECIMAL(5, 2),
+
+    -- Outcome
+    actual_yield_kg_ha DECIMAL(10, 2) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX idx_harvest_records_crop ON harvest_records(crop_type, season_end DESC);
+CREATE INDEX idx_harvest_records_farm ON harvest_records(farm_id);
+
+-- Create table for batch-scored yield predictions (one row per zone)
+CREATE TABLE IF NOT EXISTS yield_predictions (
+    farm_id TEXT NOT NULL,
+    field_id INTEGER NOT NULL,
+    zone_id INTEGER NOT NULL,
+    crop_type TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    predicted_yield_kg_ha DECIMAL(10, 2) NOT NULL,
+    predicted_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (farm_id, field_id, zone_id)
+);
+
+CREATE INDEX idx_yield_predictions_crop ON yield_predictions(farm_id, crop_type);
+
+-- Enable Row Level Security
+ALTER TABLE harvest_records ENABLE ROW LEVEL SECURITY;
+ALTER TABLE yield_predictions ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view harvest records"
+    ON harvest_records
+    FOR SELECT
+    USING (auth.role() = 'authenticated');
+
+CREATE POLICY "Users can insert harvest records"
+    ON harvest_records
+    FOR INSERT
+    WITH CHECK (auth.role() = 'authenticated');
+
+CREATE POLICY "Users can view yield predictions"
+    ON yield_predictions
+    FOR SELECT
+    USING (auth.role() = 'authenticated' OR auth.role() = 'anon');
+
+CREATE POLICY "Service role can write yield predictions"
+    ON yield_predictions
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+COMMENT ON TABLE harvest_records IS 'Harvest outcomes and season features for yield model training';
+COMMENT ON TABLE yield_predictions IS 'Latest per-zone yield prediction from the server-side batch scorer';
@@ -0,0 +1,32 @@
+-- Create shadow alerts table for historical reprocessing runs
+-- Same shape as alerts, tagged with the backfill run that produced each row
+CREATE TABLE IF NOT EXISTS alerts_shadow (
+    id BIGSERIAL PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    reading_id BIGINT,
+
+    farm_id TEXT,
+    gateway_id TEXT,
+    field_id INTEGER,
+    zone_id INTEGER,
+
+    alert_type TEXT NOT NULL,
+    severity TEXT DEFAULT 'info',
+    message TEXT NOT NULL,
+    acknowledged BOOLEAN DEFAULT FALSE,
+
+    created_at TIMESTAMPTZ NOT NULL
+);
+
+-- Diff reports group by run and alert target
+CREATE INDEX idx_alerts_shadow_run ON alerts_shadow(run_id, alert_type, severity);
+
+-- Shadow data is internal; only the service role reads or writes it
+ALTER TABLE alerts_shadow ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role manages shadow alerts"
+    ON alerts_shadow
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+COMMENT ON TABLE alerts_shadow IS 'Alerts regenerated by backfill runs for comparison against alerts';
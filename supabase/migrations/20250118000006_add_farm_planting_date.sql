@@ -0,0 +1,5 @@
+-- Track when the current crop was planted so growth-stage thresholds
+-- (cloud_backend/rules/<crop>.json "days" ranges) can be applied per farm
+ALTER TABLE farms ADD COLUMN IF NOT EXISTS planting_date DATE;
+
+COMMENT ON COLUMN farms.planting_date IS 'Planting date of the current crop; drives growth-stage rule selection';
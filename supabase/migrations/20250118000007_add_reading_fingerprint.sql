@@ -0,0 +1,9 @@
+-- Idempotent ingest: QoS 1 redeliveries and gateway buffer replays carry
+-- the same payload, so they get the same fingerprint and are stored once.
+-- Fingerprint = first 8 bytes of SHA-256 over
+--   "{gateway_id}|{field_id}|{zone_id}|{device timestamp}|" + raw payload
+-- with whole-number timestamps written as integers (1.0 -> "1").
+-- The unique index is built by 20250118000016_index_reading_fingerprint.sql.
+ALTER TABLE sensor_readings ADD COLUMN IF NOT EXISTS reading_fingerprint BIGINT;
+
+COMMENT ON COLUMN sensor_readings.reading_fingerprint IS 'Hash of gateway, field, zone, device timestamp and payload; duplicate deliveries share it';
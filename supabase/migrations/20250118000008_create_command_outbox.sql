@@ -0,0 +1,49 @@
+-- Create persistent outbox for gateway commands (agriconnect/commands/{gateway_id})
+-- The dashboard inserts a pending row per click; the command broker publishes
+-- it, retries until the gateway acknowledges on agriconnect/ack/{gateway_id},
+-- and records the outcome here.
+CREATE TABLE IF NOT EXISTS command_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    command_id TEXT NOT NULL UNIQUE,        -- commandId in the MQTT payload and ack
+    farm_id TEXT NOT NULL,
+    gateway_id TEXT,                        -- NULL: the broker uses the farm's gateway
+    target_field_id INTEGER NOT NULL DEFAULT 0,
+    target_zone_id INTEGER NOT NULL DEFAULT 0,
+    action TEXT NOT NULL,                   -- pump_control, config_update, reboot, sync_time
+    parameters JSONB NOT NULL DEFAULT '{}',
+    requested_by TEXT,
+
+    -- pending, sent, acked, superseded, failed
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    superseded_by TEXT,
+    last_error TEXT,
+
+    created_at TIMESTAMPTZ DEFAULT NOW(),  -- dashboard click
+    sent_at TIMESTAMPTZ,                   -- last publish
+    acked_at TIMESTAMPTZ
+);
+
+-- The broker only ever reads commands that are still open
+CREATE INDEX idx_command_outbox_open ON command_outbox(id) WHERE status IN ('pending', 'sent');
+CREATE INDEX idx_command_outbox_farm ON command_outbox(farm_id, created_at DESC);
+
+-- Enable Row Level Security
+ALTER TABLE command_outbox ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view commands"
+    ON command_outbox
+    FOR SELECT
+    USING (auth.role() = 'authenticated' OR auth.role() = 'anon');
+
+CREATE POLICY "Users can queue commands"
+    ON command_outbox
+    FOR INSERT
+    WITH CHECK ((auth.role() = 'authenticated' OR auth.role() = 'anon') AND status = 'pending');
+
+CREATE POLICY "Service role manages commands"
+    ON command_outbox
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+COMMENT ON TABLE command_outbox IS 'Gateway commands queued by the dashboard and delivered with ack tracking by the command broker';
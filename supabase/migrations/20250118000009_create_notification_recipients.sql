@@ -0,0 +1,29 @@
+-- Create table of alert recipients per farm for the notification dispatcher
+-- (email, SMS and WhatsApp addresses used to live only in browser localStorage)
+CREATE TABLE IF NOT EXISTS notification_recipients (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    farm_id TEXT NOT NULL REFERENCES farms(farm_id),
+    channel TEXT NOT NULL CHECK (channel IN ('email', 'sms', 'whatsapp')),
+    address TEXT NOT NULL,                  -- email address or E.164 phone number
+    min_severity TEXT NOT NULL DEFAULT 'warning' CHECK (min_severity IN ('critical', 'warning', 'info')),
+    enabled BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    UNIQUE (farm_id, channel, address)
+);
+
+CREATE INDEX idx_notification_recipients_farm ON notification_recipients(farm_id) WHERE enabled;
+
+-- Enable Row Level Security
+ALTER TABLE notification_recipients ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view notification recipients"
+    ON notification_recipients
+    FOR SELECT
+    USING (auth.role() = 'authenticated');
+
+CREATE POLICY "Users can manage notification recipients"
+    ON notification_recipients
+    FOR ALL
+    USING (auth.role() = 'authenticated' OR auth.role() = 'service_role');
+
+COMMENT ON TABLE notification_recipients IS 'Alert recipients per farm and channel, read by the notification dispatcher';
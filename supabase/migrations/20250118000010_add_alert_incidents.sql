@@ -0,0 +1,17 @@
+-- Turn alerts into incidents: one row per correlated group of zone alerts
+-- (same farm, type and severity within a sliding window) instead of one
+-- row per zone. Rows written before correlation keep the defaults below.
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS incident_key TEXT;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS member_zones JSONB;        -- [[gateway_id, field_id, zone_id], ...]
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS zone_count INTEGER DEFAULT 1;
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ;
+
+-- Lets the correlator upsert an incident as zones join it (NULL keys do not conflict)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_alerts_incident_key ON alerts(incident_key);
+
+-- The dashboard lists one farm's unacknowledged alerts by time
+CREATE INDEX IF NOT EXISTS idx_unacknowledged_farm
+    ON alerts(farm_id, created_at DESC) WHERE NOT acknowledged;
+
+COMMENT ON COLUMN alerts.incident_key IS 'Correlation key; field_id/zone_id are NULL when the incident spans several fields/zones';
+COMMENT ON COLUMN alerts.member_zones IS 'Zones that raised this alert within the correlation window';
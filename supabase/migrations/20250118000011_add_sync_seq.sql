@@ -0,0 +1,39 @@
+-- Delta sync for offline dashboards: every insert or update of a synced row
+-- takes the next value of one shared sequence, so a single number per farm
+-- says how far a dashboard has synced readings, alerts and gateways.
+-- Rows from before this migration keep a NULL sync_seq; dashboards get them
+-- from the initial (time-window) sync instead.
+CREATE SEQUENCE IF NOT EXISTS sync_seq;
+
+-- Readings are append-only: a column default costs less than a row trigger
+-- on the busiest table
+ALTER TABLE sensor_readings ADD COLUMN IF NOT EXISTS sync_seq BIGINT;
+ALTER TABLE sensor_readings ALTER COLUMN sync_seq SET DEFAULT nextval('sync_seq');
+
+ALTER TABLE alerts ADD COLUMN IF NOT EXISTS sync_seq BIGINT;
+ALTER TABLE gateways ADD COLUMN IF NOT EXISTS sync_seq BIGINT;
+
+-- Alerts are acknowledged and incidents grow; gateways change status
+CREATE OR REPLACE FUNCTION set_sync_seq() RETURNS TRIGGER AS $$
+BEGIN
+    NEW.sync_seq := nextval('sync_seq');
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS alerts_sync_seq ON alerts;
+CREATE TRIGGER alerts_sync_seq BEFORE INSERT OR UPDATE ON alerts
+    FOR EACH ROW EXECUTE FUNCTION set_sync_seq();
+
+DROP TRIGGER IF EXISTS gateways_sync_seq ON gateways;
+CREATE TRIGGER gateways_sync_seq BEFORE INSERT OR UPDATE ON gateways
+    FOR EACH ROW EXECUTE FUNCTION set_sync_seq();
+
+-- Per-farm delta queries: readings by the farm's gateways, alerts and gateways by farm
+CREATE INDEX IF NOT EXISTS idx_sensor_readings_sync ON sensor_readings(gateway_id, sync_seq);
+CREATE INDEX IF NOT EXISTS idx_alerts_sync ON alerts(farm_id, sync_seq);
+CREATE INDEX IF NOT EXISTS idx_gateways_sync ON gateways(farm_id, sync_seq);
+
+COMMENT ON COLUMN sensor_readings.sync_seq IS 'Position in the shared sync_seq order; delta sync cursors compare against it';
+COMMENT ON COLUMN alerts.sync_seq IS 'Position in the shared sync_seq order, renewed on every update';
+COMMENT ON COLUMN gateways.sync_seq IS 'Position in the shared sync_seq order, renewed on every update';
@@ -0,0 +1,103 @@
+-- Compacted layout for sensor_readings, filled by agriconnect_pipeline.compact
+-- (in parallel id ranges) and read through sensor_readings_compact_v, which
+-- has the original columns.
+--   * Two-decimal sensors are stored as hundredths in SMALLINT
+--     (air_temperature 23.45 -> 2345) and are exact; par and EC need more
+--     range and are REAL.
+--   * Counts and levels that fit are SMALLINT; light_intensity stays INTEGER.
+--   * latitude/longitude live on field_nodes, not on every reading.
+--   * Columns are ordered widest first so rows carry no alignment padding.
+CREATE TABLE IF NOT EXISTS sensor_readings_compact (
+    id BIGINT PRIMARY KEY,                  -- same id as in sensor_readings
+    reading_time TIMESTAMPTZ NOT NULL,
+    reading_fingerprint BIGINT,
+    sync_seq BIGINT DEFAULT nextval('sync_seq'),
+
+    light_intensity INTEGER,
+    par_value REAL,
+    ec_value REAL,
+
+    field_id SMALLINT NOT NULL,
+    zone_id SMALLINT NOT NULL,
+    air_temperature_x100 SMALLINT,
+    air_humidity_x100 SMALLINT,
+    soil_temperature_x100 SMALLINT,
+    ph_value_x100 SMALLINT,
+    co2_ppm SMALLINT,
+    soil_moisture SMALLINT,
+    nitrogen_ppm SMALLINT,
+    phosphorus_ppm SMALLINT,
+    potassium_ppm SMALLINT,
+    water_level SMALLINT,
+    battery_level SMALLINT,
+    rssi SMALLINT,
+
+    pump_status BOOLEAN DEFAULT FALSE,
+    data_valid BOOLEAN DEFAULT TRUE,
+
+    gateway_id TEXT NOT NULL
+);
+
+-- Rows arrive in time order, so a BRIN index (a few pages for the whole
+-- table) replaces the reading_time btree for range scans. The per-gateway
+-- and per-zone btrees stay for latest-N and single-zone queries.
+CREATE INDEX IF NOT EXISTS idx_compact_time_brin
+    ON sensor_readings_compact USING BRIN (reading_time) WITH (pages_per_range = 32);
+CREATE INDEX IF NOT EXISTS idx_compact_gateway_time
+    ON sensor_readings_compact(gateway_id, reading_time DESC);
+CREATE INDEX IF NOT EXISTS idx_compact_field_zone_time
+    ON sensor_readings_compact(field_id, zone_id, reading_time DESC);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_compact_fingerprint
+    ON sensor_readings_compact(gateway_id, reading_fingerprint);
+CREATE INDEX IF NOT EXISTS idx_compact_sync
+    ON sensor_readings_compact(gateway_id, sync_seq);
+
+-- The original row shape, for the dashboard and the pipeline
+CREATE OR REPLACE VIEW sensor_readings_compact_v AS
+SELECT
+    c.id,
+    c.gateway_id,
+    c.field_id::INTEGER AS field_id,
+    c.zone_id::INTEGER AS zone_id,
+    c.reading_time,
+    n.latitude,
+    n.longitude,
+    (c.air_temperature_x100 / 100.0)::DECIMAL(5, 2) AS air_temperature,
+    (c.air_humidity_x100 / 100.0)::DECIMAL(5, 2) AS air_humidity,
+    c.light_intensity,
+    c.par_value::DECIMAL(8, 2) AS par_value,
+    c.co2_ppm::INTEGER AS co2_ppm,
+    c.soil_moisture::INTEGER AS soil_moisture,
+    (c.soil_temperature_x100 / 100.0)::DECIMAL(5, 2) AS soil_temperature,
+    (c.ph_value_x100 / 100.0)::DECIMAL(4, 2) AS ph_value,
+    c.ec_value::DECIMAL(6, 2) AS ec_value,
+    c.nitrogen_ppm::INTEGER AS nitrogen_ppm,
+    c.phosphorus_ppm::INTEGER AS phosphorus_ppm,
+    c.potassium_ppm::INTEGER AS potassium_ppm,
+    c.water_level::INTEGER AS water_level,
+    c.battery_level::INTEGER AS battery_level,
+    c.pump_status,
+    c.rssi::INTEGER AS rssi,
+    c.data_valid,
+    c.reading_fingerprint,
+    c.sync_seq
+FROM sensor_readings_compact c
+LEFT JOIN field_nodes n
+    ON n.gateway_id = c.gateway_id AND n.field_id = c.field_id AND n.zone_id = c.zone_id;
+
+-- Enable Row Level Security
+ALTER TABLE sensor_readings_compact ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view compact readings"
+    ON sensor_readings_compact
+    FOR SELECT
+    USING (auth.role() = 'authenticated' OR auth.role() = 'anon');
+
+CREATE POLICY "Service role manages compact readings"
+    ON sensor_readings_compact
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+COMMENT ON TABLE sensor_readings_compact IS 'sensor_readings with scaled SMALLINT/REAL columns, location on field_nodes and a BRIN time index';
+COMMENT ON VIEW sensor_readings_compact_v IS 'sensor_readings_compact decoded to the sensor_readings columns';
+COMMENT ON COLUMN sensor_readings_compact.air_temperature_x100 IS 'Air temperature in hundredths of a degree C (NULL if out of SMALLINT range)';
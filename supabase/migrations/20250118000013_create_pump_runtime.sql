@@ -0,0 +1,82 @@
+-- Pump runtime and cycle accounting, kept by agriconnect_pipeline ingest
+-- workers from sensor_readings.pump_status (see pumps.py) and rebuilt from
+-- history with `python -m agriconnect_pipeline.pumps --rebuild`.
+
+-- Totals per zone stream, with its last state so the next batch continues it
+CREATE TABLE IF NOT EXISTS pump_runtime (
+    gateway_id TEXT NOT NULL,
+    field_id INTEGER NOT NULL,
+    zone_id INTEGER NOT NULL,
+
+    runtime_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    cycles BIGINT NOT NULL DEFAULT 0,          -- off -> on steps
+    observed_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+
+    last_reading_time TIMESTAMPTZ,
+    last_status BOOLEAN,
+    on_since TIMESTAMPTZ,                      -- start of the current run, NULL when off
+
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (gateway_id, field_id, zone_id)
+);
+
+-- Duty-cycle rollups per gateway and local (Africa/Douala) day
+CREATE TABLE IF NOT EXISTS pump_runtime_daily (
+    gateway_id TEXT NOT NULL,
+    day DATE NOT NULL,
+    runtime_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    cycles BIGINT NOT NULL DEFAULT 0,
+    observed_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (gateway_id, day)
+);
+
+-- One row per gateway for the maintenance page
+CREATE OR REPLACE VIEW pump_usage AS
+SELECT
+    p.gateway_id,
+    g.farm_id,
+    SUM(p.runtime_seconds) / 3600.0 AS runtime_hours,
+    SUM(p.cycles) AS cycles,
+    BOOL_OR(COALESCE(p.last_status, FALSE)) AS running,
+    MIN(p.on_since) AS on_since,
+    MAX(p.last_reading_time) AS last_reading_time,
+    d.runtime_seconds / NULLIF(d.observed_seconds, 0) AS duty_cycle_7d,
+    COALESCE(d.cycles, 0) AS cycles_7d
+FROM pump_runtime p
+LEFT JOIN gateways g ON g.gateway_id = p.gateway_id
+LEFT JOIN (
+    SELECT gateway_id, SUM(runtime_seconds) AS runtime_seconds,
+           SUM(observed_seconds) AS observed_seconds, SUM(cycles) AS cycles
+    FROM pump_runtime_daily
+    WHERE day > CURRENT_DATE - 7
+    GROUP BY gateway_id
+) d ON d.gateway_id = p.gateway_id
+GROUP BY p.gateway_id, g.farm_id, d.runtime_seconds, d.observed_seconds, d.cycles;
+
+-- Enable Row Level Security
+ALTER TABLE pump_runtime ENABLE ROW LEVEL SECURITY;
+ALTER TABLE pump_runtime_daily ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view pump runtime"
+    ON pump_runtime
+    FOR SELECT
+    USING (auth.role() = 'authenticated' OR auth.role() = 'anon');
+
+CREATE POLICY "Service role manages pump runtime"
+    ON pump_runtime
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+CREATE POLICY "Users can view daily pump runtime"
+    ON pump_runtime_daily
+    FOR SELECT
+    USING (auth.role() = 'authenticated' OR auth.role() = 'anon');
+
+CREATE POLICY "Service role manages daily pump runtime"
+    ON pump_runtime_daily
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+COMMENT ON TABLE pump_runtime IS 'Cumulative pump runtime and cycles per zone, derived from pump_status at ingest';
+COMMENT ON TABLE pump_runtime_daily IS 'Pump runtime, cycles and observed time per gateway and local day';
+COMMENT ON VIEW pump_usage IS 'Per-gateway pump totals and 7-day duty cycle for predictive maintenance';
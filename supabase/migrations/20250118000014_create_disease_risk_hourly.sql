@@ -0,0 +1,84 @@
+-- Hourly disease risk per zone, kept by agriconnect_pipeline ingest workers
+-- (see risk.py) and rebuilt from history with
+-- `python -m agriconnect_pipeline.risk --backfill`.
+-- Each disease column is the sum of the hour's per-reading risk (percent,
+-- DiseaseAnalyzer's probability); the hourly mean is the sum over readings.
+-- Sums rather than means let every commit batch add to its hour.
+CREATE TABLE IF NOT EXISTS disease_risk_hourly (
+    hour TIMESTAMPTZ NOT NULL,
+    gateway_id TEXT NOT NULL,
+    field_id SMALLINT NOT NULL,
+    zone_id SMALLINT NOT NULL,
+    readings INTEGER NOT NULL DEFAULT 0,
+
+    early_blight INTEGER NOT NULL DEFAULT 0,
+    late_blight INTEGER NOT NULL DEFAULT 0,
+    septoria_leaf_spot INTEGER NOT NULL DEFAULT 0,
+    powdery_mildew INTEGER NOT NULL DEFAULT 0,
+    bacterial_spot INTEGER NOT NULL DEFAULT 0,
+    blossom_end_rot INTEGER NOT NULL DEFAULT 0,
+
+    PRIMARY KEY (gateway_id, field_id, zone_id, hour)
+);
+
+-- Farm timelines scan an hour range across zones
+CREATE INDEX IF NOT EXISTS idx_disease_risk_hourly_hour ON disease_risk_hourly(hour);
+
+-- Timeline for charts: the range is cut into at most max_buckets equal bins
+-- of whole hours; each bin has the mean risk of the farm's riskiest zone
+-- per disease, so a chart reads a few hundred rows for any range.
+CREATE OR REPLACE FUNCTION disease_risk_timeline(
+    p_farm_id TEXT, p_since TIMESTAMPTZ, p_until TIMESTAMPTZ, max_buckets INTEGER DEFAULT 200
+)
+RETURNS TABLE (
+    bucket TIMESTAMPTZ,
+    early_blight REAL,
+    late_blight REAL,
+    septoria_leaf_spot REAL,
+    powdery_mildew REAL,
+    bacterial_spot REAL,
+    blossom_end_rot REAL
+) AS $$
+    WITH stride AS (
+        SELECT make_interval(hours => GREATEST(1, CEIL(
+            EXTRACT(EPOCH FROM p_until - p_since) / 3600.0 / GREATEST(max_buckets, 1))::INTEGER)) AS width
+    ), zones AS (
+        SELECT date_bin(s.width, h.hour, date_trunc('hour', p_since)) AS bucket,
+               h.gateway_id, h.field_id, h.zone_id,
+               SUM(h.readings) AS readings,
+               SUM(h.early_blight) AS early_blight, SUM(h.late_blight) AS late_blight,
+               SUM(h.septoria_leaf_spot) AS septoria_leaf_spot,
+               SUM(h.powdery_mildew) AS powdery_mildew,
+               SUM(h.bacterial_spot) AS bacterial_spot,
+               SUM(h.blossom_end_rot) AS blossom_end_rot
+        FROM disease_risk_hourly h
+        JOIN gateways g ON g.gateway_id = h.gateway_id
+        CROSS JOIN stride s
+        WHERE g.farm_id = p_farm_id AND h.hour >= date_trunc('hour', p_since)
+          AND h.hour < p_until AND h.readings > 0
+        GROUP BY 1, 2, 3, 4
+    )
+    SELECT bucket,
+           MAX(early_blight::REAL / readings), MAX(late_blight::REAL / readings),
+           MAX(septoria_leaf_spot::REAL / readings), MAX(powdery_mildew::REAL / readings),
+           MAX(bacterial_spot::REAL / readings), MAX(blossom_end_rot::REAL / readings)
+    FROM zones
+    GROUP BY bucket
+    ORDER BY bucket;
+$$ LANGUAGE sql STABLE;
+
+-- Enable Row Level Security
+ALTER TABLE disease_risk_hourly ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view disease risk"
+    ON disease_risk_hourly
+    FOR SELECT
+    USING (auth.role() = 'authenticated' OR auth.role() = 'anon');
+
+CREATE POLICY "Service role manages disease risk"
+    ON disease_risk_hourly
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+COMMENT ON TABLE disease_risk_hourly IS 'Per-zone hourly sums of disease risk (percent) for each DiseaseAnalyzer model';
+COMMENT ON FUNCTION disease_risk_timeline IS 'Binned farm disease risk timeline (riskiest zone per bin) for the dashboard chart';
@@ -0,0 +1,172 @@
+-- NDVI trend rollups kept by `python -m agriconnect_pipeline.ndvi_trends`,
+-- replacing the ndvi_monthly_trends view, which regrouped all of
+-- satellite_ndvi_history on every query. A trigger queues the (farm, field,
+-- month) of every saved, edited or deleted analysis; the job recomputes
+-- only those months and the seasons and field summaries they belong to.
+-- Analyses without a field_name roll up under ''.
+DROP VIEW IF EXISTS ndvi_monthly_trends;
+
+-- Rollups read one field's analyses by date
+CREATE INDEX IF NOT EXISTS idx_ndvi_history_field_date
+    ON satellite_ndvi_history(farm_id, (COALESCE(field_name, '')), analysis_date);
+
+-- Months waiting for the rollup job
+CREATE TABLE IF NOT EXISTS ndvi_rollup_queue (
+    farm_id TEXT NOT NULL,
+    field_name TEXT NOT NULL,
+    month DATE NOT NULL,                       -- first day of the UTC month
+    queued_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (farm_id, field_name, month)
+);
+
+-- Runs as the table owner: the dashboard inserts analyses but cannot see the queue
+CREATE OR REPLACE FUNCTION queue_ndvi_rollup() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        INSERT INTO ndvi_rollup_queue (farm_id, field_name, month)
+        VALUES (OLD.farm_id, COALESCE(OLD.field_name, ''),
+                date_trunc('month', OLD.analysis_date AT TIME ZONE 'UTC')::date)
+        ON CONFLICT DO NOTHING;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        INSERT INTO ndvi_rollup_queue (farm_id, field_name, month)
+        VALUES (NEW.farm_id, COALESCE(NEW.field_name, ''),
+                date_trunc('month', NEW.analysis_date AT TIME ZONE 'UTC')::date)
+        ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER SET search_path = public, pg_temp;
+
+DROP TRIGGER IF EXISTS satellite_ndvi_history_rollup ON satellite_ndvi_history;
+CREATE TRIGGER satellite_ndvi_history_rollup AFTER INSERT OR UPDATE OR DELETE ON satellite_ndvi_history
+    FOR EACH ROW EXECUTE FUNCTION queue_ndvi_rollup();
+
+-- Queue every month already in the history (later changes are queued by the
+-- trigger); the job's first pass rolls it up
+INSERT INTO ndvi_rollup_queue (farm_id, field_name, month)
+SELECT DISTINCT farm_id, COALESCE(field_name, ''),
+       date_trunc('month', analysis_date AT TIME ZONE 'UTC')::date
+FROM satellite_ndvi_history
+ON CONFLICT DO NOTHING;
+
+-- One row per field and month. The sums let seasons combine months without
+-- rereading analyses; days are counted from 2025-01-01 UTC.
+CREATE TABLE IF NOT EXISTS ndvi_monthly_trends (
+    farm_id TEXT NOT NULL,
+    field_name TEXT NOT NULL,
+    month DATE NOT NULL,
+
+    analysis_count INTEGER NOT NULL,
+    avg_ndvi REAL,
+    min_ndvi REAL,
+    max_ndvi REAL,
+    avg_health_score REAL,
+    avg_stressed_pct REAL,
+    last_analysis TIMESTAMPTZ,
+
+    sum_ndvi DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_ndvi_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_days DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_days_sq DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_days_ndvi DOUBLE PRECISION NOT NULL DEFAULT 0,
+    health_count INTEGER NOT NULL DEFAULT 0,
+    sum_health DOUBLE PRECISION NOT NULL DEFAULT 0,
+    stressed_count INTEGER NOT NULL DEFAULT 0,
+    sum_stressed DOUBLE PRECISION NOT NULL DEFAULT 0,
+
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (farm_id, field_name, month)
+);
+
+-- Dry season: November to February; rainy season: March to October
+CREATE TABLE IF NOT EXISTS ndvi_season_trends (
+    farm_id TEXT NOT NULL,
+    field_name TEXT NOT NULL,
+    season_start DATE NOT NULL,
+    season TEXT NOT NULL,                      -- dry, rainy
+
+    analysis_count INTEGER NOT NULL,
+    avg_ndvi REAL,
+    min_ndvi REAL,
+    max_ndvi REAL,
+    avg_health_score REAL,
+    avg_stressed_pct REAL,
+    ndvi_slope REAL,                           -- least-squares NDVI change per 30 days
+    ndvi_r2 REAL,
+
+    previous_avg_ndvi REAL,                    -- the season before, NULL without analyses
+    ndvi_change_pct REAL,
+
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (farm_id, field_name, season_start)
+);
+
+-- One row per field: what the history modal shows above its chart
+CREATE TABLE IF NOT EXISTS ndvi_field_trends (
+    farm_id TEXT NOT NULL,
+    field_name TEXT NOT NULL,
+
+    analysis_count INTEGER NOT NULL,
+    first_analysis TIMESTAMPTZ,
+    first_ndvi REAL,
+    last_analysis TIMESTAMPTZ,
+    latest_ndvi REAL,
+    latest_health_score INTEGER,
+    latest_health_class TEXT,
+    latest_stressed_pct REAL,
+
+    recent_avg_ndvi REAL,                      -- last 3 analyses
+    earlier_avg_ndvi REAL,                     -- the 3 before them
+    ndvi_slope REAL,                           -- over the whole history, per 30 days
+    ndvi_r2 REAL,
+
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (farm_id, field_name)
+);
+
+-- Enable Row Level Security
+ALTER TABLE ndvi_rollup_queue ENABLE ROW LEVEL SECURITY;
+ALTER TABLE ndvi_monthly_trends ENABLE ROW LEVEL SECURITY;
+ALTER TABLE ndvi_season_trends ENABLE ROW LEVEL SECURITY;
+ALTER TABLE ndvi_field_trends ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Service role manages NDVI rollup queue"
+    ON ndvi_rollup_queue
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+CREATE POLICY "Users can view monthly NDVI trends"
+    ON ndvi_monthly_trends
+    FOR SELECT
+    USING (auth.role() = 'authenticated');
+
+CREATE POLICY "Service role manages monthly NDVI trends"
+    ON ndvi_monthly_trends
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+CREATE POLICY "Users can view seasonal NDVI trends"
+    ON ndvi_season_trends
+    FOR SELECT
+    USING (auth.role() = 'authenticated');
+
+CREATE POLICY "Service role manages seasonal NDVI trends"
+    ON ndvi_season_trends
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+CREATE POLICY "Users can view field NDVI trends"
+    ON ndvi_field_trends
+    FOR SELECT
+    USING (auth.role() = 'authenticated');
+
+CREATE POLICY "Service role manages field NDVI trends"
+    ON ndvi_field_trends
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+COMMENT ON TABLE ndvi_rollup_queue IS 'Field months changed in satellite_ndvi_history since the last NDVI rollup';
+COMMENT ON TABLE ndvi_monthly_trends IS 'Monthly aggregated NDVI trends per field, maintained incrementally';
+COMMENT ON TABLE ndvi_season_trends IS 'Seasonal NDVI trends per field with slope and change versus the previous season';
+COMMENT ON TABLE ndvi_field_trends IS 'Latest values and trend of each field for the NDVI history modal';
@@ -0,0 +1,8 @@
+-- Unique index behind the idempotent ingest of 20250118000007. Built
+-- CONCURRENTLY so writes to sensor_readings continue while it scans the
+-- table; that cannot run in a transaction block, so it is the only
+-- statement in this file. A failed build leaves an INVALID index that
+-- IF NOT EXISTS would skip: DROP INDEX CONCURRENTLY it and run this again.
+-- Rows from before the fingerprint column keep a NULL; NULLs never conflict.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_sensor_readings_fingerprint
+    ON sensor_readings(gateway_id, reading_fingerprint);
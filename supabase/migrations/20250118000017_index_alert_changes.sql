@@ -0,0 +1,5 @@
+-- The notification dispatcher polls alerts by their last change: incidents
+-- are updated in place as zones join, other alerts only have created_at.
+-- Built CONCURRENTLY, so it is the only statement in this file.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_alerts_changed
+    ON alerts ((COALESCE(updated_at, created_at)));
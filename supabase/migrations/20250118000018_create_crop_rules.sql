@@ -0,0 +1,29 @@
+-- Compiled crop/stage thresholds, written by
+-- `python -m agriconnect_pipeline.rules --publish` from cloud_backend/rules/,
+-- so the dashboard checks readings against the same values as the pipeline
+-- instead of its own copies
+CREATE TABLE IF NOT EXISTS crop_rules (
+    crop TEXT NOT NULL,                        -- features.crop_key spelling
+    stage TEXT NOT NULL,                       -- 'default' or a growth stage
+    first_day INTEGER,                         -- days after planting; NULL for default
+    last_day INTEGER,
+    rules JSONB NOT NULL,                      -- normalRanges, optimalRanges, nutrients, irrigation
+    version TEXT NOT NULL,                     -- hash of the rule files
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (crop, stage)
+);
+
+-- Enable Row Level Security
+ALTER TABLE crop_rules ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view crop rules"
+    ON crop_rules
+    FOR SELECT
+    USING (auth.role() = 'authenticated');
+
+CREATE POLICY "Service role manages crop rules"
+    ON crop_rules
+    FOR ALL
+    USING (auth.role() = 'service_role');
+
+COMMENT ON TABLE crop_rules IS 'Compiled threshold profiles per crop and growth stage, published from the rule files';